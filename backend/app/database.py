@@ -1,47 +1,74 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo import MongoClient
+from typing import Any, Dict
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Soportar tanto MONGODB_URL como MONGO_URI para compatibilidad
 MONGODB_URL = os.getenv("MONGODB_URL") or os.getenv("MONGO_URI")
 DATABASE_NAME = os.getenv("DATABASE_NAME")
 
-# Debug: Imprimir información de configuración (sin mostrar la contraseña completa)
-print("=" * 50)
-print("🔍 CONFIGURACIÓN DE BASE DE DATOS")
-print("=" * 50)
-if MONGODB_URL:
-    # Ocultar la contraseña en los logs
-    safe_url = MONGODB_URL.split('@')[1] if '@' in MONGODB_URL else "URL configurada"
-    print(f"✅ MONGO_URI: mongodb+srv://***@{safe_url}")
-else:
-    print("❌ MONGO_URI: NO CONFIGURADO")
-
-print(f"✅ DATABASE_NAME: {DATABASE_NAME}" if DATABASE_NAME else "❌ DATABASE_NAME: NO CONFIGURADO")
-print("=" * 50)
-
-if not MONGODB_URL:
-    raise ValueError("MONGODB_URL o MONGO_URI debe estar configurado en las variables de entorno")
-
-if not DATABASE_NAME:
-    raise ValueError("DATABASE_NAME debe estar configurado en las variables de entorno")
-
-# Cliente asíncrono para FastAPI
-try:
-    print("🔌 Intentando conectar a MongoDB...")
-    client = AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
-    database = client[DATABASE_NAME]
-    print(f"✅ Conexión exitosa a la base de datos: {DATABASE_NAME}")
-except Exception as e:
-    print(f"❌ Error al conectar a MongoDB: {str(e)}")
-    raise
-
-# Cliente síncrono para operaciones que lo requieran
-sync_client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
-sync_database = sync_client[DATABASE_NAME]
+# Los clientes se crean la primera vez que se usan y pertenecen al proceso que
+# los creó: después de un fork (workers de uvicorn/gunicorn) se crean de nuevo,
+# porque los clientes de MongoDB no se pueden compartir entre procesos.
+_clientes: Dict[str, Any] = {"pid": None, "async": None, "sync": None}
+
+
+def _validar_configuracion():
+    if not MONGODB_URL:
+        raise ValueError("MONGODB_URL o MONGO_URI debe estar configurado en las variables de entorno")
+    if not DATABASE_NAME:
+        raise ValueError("DATABASE_NAME debe estar configurado en las variables de entorno")
+
+
+def _clientes_del_proceso() -> Dict[str, Any]:
+    if _clientes["pid"] != os.getpid():
+        _clientes.update({"pid": os.getpid(), "async": None, "sync": None})
+    return _clientes
+
+
+def obtener_cliente() -> AsyncIOMotorClient:
+    """Cliente asíncrono para FastAPI (uno por proceso)."""
+    clientes = _clientes_del_proceso()
+    if clientes["async"] is None:
+        _validar_configuracion()
+        # Ocultar la contraseña en los logs
+        safe_url = MONGODB_URL.split('@')[1] if '@' in MONGODB_URL else "URL configurada"
+        logger.info("Cliente MongoDB (pid %s): ***@%s / %s", os.getpid(), safe_url, DATABASE_NAME)
+        clientes["async"] = AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
+    return clientes["async"]
+
+
+def obtener_cliente_sync() -> MongoClient:
+    """Cliente síncrono para operaciones que lo requieran (uno por proceso)."""
+    clientes = _clientes_del_proceso()
+    if clientes["sync"] is None:
+        _validar_configuracion()
+        clientes["sync"] = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=5000)
+    return clientes["sync"]
+
+
+def obtener_database() -> AsyncIOMotorDatabase:
+    return obtener_cliente()[DATABASE_NAME]
+
+
+def obtener_database_sync():
+    return obtener_cliente_sync()[DATABASE_NAME]
+
+
+def cerrar_clientes():
+    """Cierra los clientes creados por este proceso."""
+    clientes = _clientes_del_proceso()
+    for tipo in ("async", "sync"):
+        if clientes[tipo] is not None:
+            clientes[tipo].close()
+            clientes[tipo] = None
+
 
 async def get_database():
-    return database
\ No newline at end of file
+    return obtener_database()
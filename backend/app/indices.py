@@ -0,0 +1,37 @@
+"""Crea o revisa los índices declarados desde la línea de comandos.
+
+Uso:
+    python -m app.indices juegos_2024            # crea los índices que falten
+    python -m app.indices juegos_2024 --reporte  # índices faltantes y sin uso
+    python -m app.indices juegos_2024 --asesor   # explain de los pipelines del dashboard
+"""
+import argparse
+import asyncio
+import json
+from app.database import obtener_database, cerrar_clientes
+from app.services.indices_service import IndicesService
+
+
+async def main(colecciones, reporte: bool, asesor: bool):
+    service = IndicesService(obtener_database())
+    try:
+        for coleccion in colecciones:
+            if reporte:
+                resultado = await service.reporte(coleccion)
+            elif asesor:
+                resultado = await service.asesorar(coleccion)
+            else:
+                resultado = await service.crear(coleccion)
+            print(json.dumps(resultado, indent=2, ensure_ascii=False, default=str))
+    finally:
+        cerrar_clientes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índices de las colecciones de juegos")
+    parser.add_argument("colecciones", nargs="+")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--reporte", action="store_true", help="solo informar faltantes y sin uso")
+    grupo.add_argument("--asesor", action="store_true", help="revisar los planes de los pipelines")
+    args = parser.parse_args()
+    asyncio.run(main(args.colecciones, args.reporte, args.asesor))
@@ -0,0 +1,46 @@
+import json
+import logging
+import os
+import time
+
+# Nivel global (DEBUG, INFO, WARNING, ERROR). Los volcados de pipelines y
+# resultados solo se emiten en DEBUG, así que en producción no cuestan nada.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (una línea por evento, para agregadores de logs) o "texto"
+LOG_FORMATO = os.getenv("LOG_FORMATO", "json").lower()
+
+# Atributos propios de LogRecord; el resto viene de `extra=` y se agrega al JSON
+_ATRIBUTOS_REGISTRO = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class FormateadorJSON(logging.Formatter):
+    """Un objeto JSON por línea con nivel, logger, mensaje y los campos de `extra=`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        evento = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_REGISTRO:
+                evento[clave] = valor
+        if record.exc_info:
+            evento["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+def configurar_logging():
+    """Configura el logger raíz `app` una sola vez por proceso."""
+    raiz = logging.getLogger("app")
+    if raiz.handlers:
+        return
+    manejador = logging.StreamHandler()
+    if LOG_FORMATO == "json":
+        manejador.setFormatter(FormateadorJSON())
+    else:
+        manejador.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    raiz.addHandler(manejador)
+    raiz.setLevel(LOG_LEVEL)
+    raiz.propagate = False
@@ -1,13 +1,107 @@
+import time
+
+# Referencia para medir el tiempo de arranque (importación + lifespan)
+_INICIO_ARRANQUE = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.logs import configurar_logging
 from app.routes import reportes
-from app.database import database, DATABASE_NAME, MONGODB_URL
+from app.database import obtener_database, cerrar_clientes, DATABASE_NAME, MONGODB_URL
+from app.services.ejecutor import ejecutor_analitica
+from app.services.indices_service import IndicesService
+from app.services.leaderboards_service import LEADERBOARDS, gestor_leaderboards
+from app.services.metricas import MiddlewareMetricas, exponer_metricas
+from app.services.rollup_service import ROLLUP, gestor_rollup
+from app.services.snapshot_service import SNAPSHOTS, gestor_snapshots
+import asyncio
+import logging
 import os
 
+configurar_logging()
+logger = logging.getLogger(__name__)
+
+# Presupuesto de arranque: si se supera se avisa en el log
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2000"))
+# Precalentamiento opcional en segundo plano (conexión, stack analítico y workers)
+PRECALENTAR = os.getenv("PRECALENTAR", "").lower() in ("1", "true", "si")
+# Colecciones (separadas por coma) cuyos índices declarados se crean al arrancar
+CREAR_INDICES = [c.strip() for c in os.getenv("CREAR_INDICES", "").split(",") if c.strip()]
+
+estado_arranque = {"arranque_ms": None, "precalentado": False}
+
+
+async def precalentar():
+    """Abre la conexión a MongoDB y carga pandas/sklearn en los workers antes del primer uso."""
+    from app.services.analitica import cargar_stack_analitico
+    try:
+        await obtener_database().command("ping")
+        await ejecutor_analitica.precalentar(cargar_stack_analitico)
+        estado_arranque["precalentado"] = True
+    except Exception as e:
+        logger.warning("Error en el precalentamiento: %s", e)
+
+
+async def crear_indices():
+    """Crea los índices declarados de CREAR_INDICES (crear uno existente no hace nada)."""
+    service = IndicesService(obtener_database())
+    for coleccion in CREAR_INDICES:
+        resultado = await service.crear(coleccion)
+        if resultado["success"]:
+            logger.info("Índices de %s: %s", coleccion, ", ".join(resultado["indices"]))
+
+
+async def construir_snapshots():
+    """Construye el snapshot columnar de SNAPSHOTS que falte o esté desactualizado."""
+    database = obtener_database()
+    for coleccion in SNAPSHOTS:
+        try:
+            if await gestor_snapshots.vigente(database, coleccion) is None:
+                await gestor_snapshots.construir(database, coleccion)
+        except Exception as e:
+            logger.warning("Error construyendo el snapshot de %s: %s", coleccion, e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los clientes de MongoDB se crean aquí, ya dentro del proceso del worker
+    obtener_database()
+    tarea_precalentamiento = asyncio.create_task(precalentar()) if PRECALENTAR else None
+    # Se crean en segundo plano para no retrasar el arranque
+    tarea_indices = asyncio.create_task(crear_indices()) if CREAR_INDICES else None
+    # Un snapshot vigente en disco se usa tal cual: solo se reconstruye si falta o cambió la colección
+    tarea_snapshots = asyncio.create_task(construir_snapshots()) if SNAPSHOTS else None
+    # Leaderboards en memoria mantenidos por change streams (requiere replica set)
+    gestor_leaderboards.iniciar(obtener_database(), LEADERBOARDS)
+    # Cubos preagregados de ROLLUP, revisados cada ROLLUP_INTERVALO segundos
+    gestor_rollup.iniciar(obtener_database(), ROLLUP)
+
+    arranque_ms = round((time.perf_counter() - _INICIO_ARRANQUE) * 1000, 1)
+    estado_arranque["arranque_ms"] = arranque_ms
+    if arranque_ms > STARTUP_BUDGET_MS:
+        logger.warning("Arranque en %s ms (presupuesto: %g ms)", arranque_ms, STARTUP_BUDGET_MS)
+    else:
+        logger.info("Arranque en %s ms", arranque_ms, extra={"arranque_ms": arranque_ms})
+
+    yield
+
+    for tarea in (tarea_precalentamiento, tarea_indices, tarea_snapshots):
+        if tarea is not None:
+            tarea.cancel()
+    # Detener los change streams, los procesos de analítica y cerrar las conexiones
+    await gestor_leaderboards.detener()
+    await gestor_rollup.detener()
+    ejecutor_analitica.cerrar()
+    cerrar_clientes()
+
+
 app = FastAPI(
     title="API de Reportes MongoDB",
     description="API para generar reportes desde MongoDB Atlas",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS - permitir todos los orígenes en producción
@@ -27,6 +121,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Latencia, solicitudes en curso y bytes por ruta (expuestos en /metrics)
+app.add_middleware(MiddlewareMetricas)
 
 # Incluir rutas
 app.include_router(reportes.router)
@@ -37,12 +133,19 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", **estado_arranque}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metricas():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return PlainTextResponse(exponer_metricas(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/test-db")
 async def test_database():
     """Endpoint para probar la conexión a la base de datos"""
     try:
+        database = obtener_database()
+
         # Intentar listar las colecciones
         collections = await database.list_collection_names()
         
@@ -67,4 +170,4 @@ async def test_database():
             "mensaje": "Error al conectar a la base de datos",
             "error": str(e),
             "database_name": DATABASE_NAME
-        }
\ No newline at end of file
+        }
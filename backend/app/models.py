@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
 
 class ReporteRequest(BaseModel):
@@ -8,13 +8,26 @@ class ReporteRequest(BaseModel):
     campos: Optional[List[str]] = None
     fecha_inicio: Optional[datetime] = None
     fecha_fin: Optional[datetime] = None
+    # Campo fecha BSON que filtran `fecha_inicio`/`fecha_fin` (por defecto `_norm.fecha`)
+    campo_fecha: Optional[str] = None
     limite: Optional[int] = 1000
+    # Paginación por conjunto de claves: campo de orden (+ `_id` como desempate)
+    orden: Optional[str] = None
+    descendente: bool = False
+    # Token `siguiente_cursor` de la página anterior
+    cursor: Optional[str] = None
+    estimar_total: bool = False
+
+class IngestaRequest(BaseModel):
+    documentos: List[Dict[str, Any]]
 
 class ReporteResponse(BaseModel):
     success: bool
     mensaje: str
     total_registros: int
     datos: List[Dict[str, Any]]
+    siguiente_cursor: Optional[str] = None
+    total_estimado: Optional[int] = None
 
 
 class RegresionRequest(BaseModel):
@@ -25,6 +38,10 @@ class RegresionRequest(BaseModel):
     campo_y: str
     filtros: Optional[Dict[str, Any]] = {}
     limite: Optional[int] = 10000
+    # "muestra": primeros `limite` documentos; "servidor": colección completa
+    # con estadísticos calculados en MongoDB; "streaming": colección completa
+    # recorrida por bloques con memoria acotada
+    modo: Literal["muestra", "servidor", "streaming"] = "muestra"
 
 
 class RegresionResponse(BaseModel):
@@ -35,6 +52,16 @@ class RegresionResponse(BaseModel):
     r2: float
     n: int
     ejemplo_predicciones: Optional[List[Dict[str, Any]]] = None
+    # Identificador para `/regresion-lineal/{model_id}/predecir`
+    model_id: Optional[str] = None
+    desde_cache: Optional[bool] = None
+    # True si los datos salieron del snapshot columnar y no de MongoDB
+    desde_snapshot: Optional[bool] = None
+
+
+class PrediccionRequest(BaseModel):
+    # Objetos {feature: valor} o listas en el orden de las features del modelo
+    filas: List[Union[Dict[str, Any], List[Any]]]
 
 
 class CorrelacionRequest(BaseModel):
@@ -42,11 +69,22 @@ class CorrelacionRequest(BaseModel):
     campos: Optional[List[str]] = None
     filtros: Optional[Dict[str, Any]] = {}
     limite: Optional[int] = 10000
+    # "muestra": primeros `limite` documentos; "servidor": colección completa
+    modo: Literal["muestra", "servidor"] = "muestra"
 
 
 class CorrelacionResponse(BaseModel):
     success: bool
     mensaje: str
     fields: List[str]
-    matrix: List[List[float]]
-    n: int
\ No newline at end of file
+    # None cuando la correlación no está definida (varianza nula o < 2 pares)
+    matrix: List[List[Optional[float]]]
+    n: int
+    # Documentos usados en cada par (solo con modo="servidor")
+    n_pares: Optional[List[List[int]]] = None
+    desde_snapshot: Optional[bool] = None
+
+class ComparacionRequest(BaseModel):
+    colecciones: List[str]
+    # rating_promedio, distribucion_rating, conteo_generos, conteo_por_anio (todas por defecto)
+    metricas: Optional[List[str]] = None
@@ -1,13 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.database import get_database
 from app.models import ReporteRequest, ReporteResponse, RegresionRequest, RegresionResponse
-from app.models import CorrelacionRequest, CorrelacionResponse
+from app.models import CorrelacionRequest, CorrelacionResponse, IngestaRequest, PrediccionRequest
+from app.models import ComparacionRequest
 from app.services.reporte_service import ReporteService
-import traceback
+from app.services.normalizacion_service import NormalizacionService
+from app.services.cache_service import EsperaAgotadaError, cache_resultados
+from app.services.catalogo_service import CatalogoService
+from app.services.indices_service import IndicesService
+from app.services.explain_service import ExplainService
+from app.services.leaderboards_service import gestor_leaderboards
+from app.services.modelos_service import cache_modelos
+from app.services.rollup_service import gestor_rollup
+from app.services.snapshot_service import gestor_snapshots
+from app.services.sugerencias_service import SUGERENCIAS_MAX, gestor_sugerencias
+from app.services.ejecutor import ColaLlenaError, TiempoAgotadoError, ejecutor_analitica
+from typing import Literal, Optional
+import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/reportes", tags=["reportes"])
 
+# Segundos sugeridos (Retry-After) cuando vence la espera de un cálculo idéntico en
+# curso: el cálculo sigue y su resultado queda en cache para el reintento
+REINTENTO_ESPERA_AGOTADA = "5"
+
 @router.get("/colecciones")
 async def listar_colecciones(db: AsyncIOMotorDatabase = Depends(get_database)):
     """Obtiene la lista de colecciones disponibles"""
@@ -20,8 +40,11 @@ async def obtener_estadisticas(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Obtiene estadísticas de una colección"""
-    service = ReporteService(db)
-    return await service.obtener_estadisticas(coleccion)
+    try:
+        service = ReporteService(db)
+        return await service.obtener_estadisticas(coleccion)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
 
 @router.post("/generar", response_model=ReporteResponse)
 async def generar_reporte(
@@ -37,12 +60,62 @@ async def generar_reporte(
             campos=request.campos,
             fecha_inicio=request.fecha_inicio,
             fecha_fin=request.fecha_fin,
-            limite=request.limite
+            campo_fecha=request.campo_fecha,
+            limite=request.limite,
+            orden=request.orden,
+            descendente=request.descendente,
+            cursor=request.cursor,
+            estimar_total=request.estimar_total
         )
         return resultado
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Formatos de exportación soportados: formato => tipo MIME
+FORMATOS_EXPORTACION = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+@router.post("/generar/stream")
+async def generar_reporte_stream(
+    request: ReporteRequest,
+    format: str = "csv",
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Exporta un reporte como CSV o NDJSON enviando las filas a medida que se leen.
+
+    A diferencia de `/generar`, la memoria del servidor no crece con `limite`;
+    `limite` = 0 exporta la colección completa. Los errores de validación y de
+    consulta se detectan antes de empezar a enviar (400/500, no un 200 cortado).
+    """
+    if format not in FORMATOS_EXPORTACION:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format}")
+
+    try:
+        service = ReporteService(db)
+        contenido = await service.exportar_reporte(
+            coleccion=request.coleccion,
+            formato=format,
+            filtros=request.filtros,
+            campos=request.campos,
+            fecha_inicio=request.fecha_inicio,
+            fecha_fin=request.fecha_fin,
+            campo_fecha=request.campo_fecha,
+            limite=request.limite
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        contenido,
+        media_type=FORMATOS_EXPORTACION[format],
+        headers={"Content-Disposition": f'attachment; filename="reporte_{request.coleccion}.{format}"'}
+    )
+
 @router.get("/esquema/{coleccion}")
 async def obtener_esquema_coleccion(
     coleccion: str,
@@ -52,6 +125,8 @@ async def obtener_esquema_coleccion(
     try:
         service = ReporteService(db)
         return await service.obtener_esquema_coleccion(coleccion)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -59,12 +134,43 @@ async def obtener_esquema_coleccion(
 async def obtener_valores_unicos(
     coleccion: str,
     campo: str,
+    limite: int = 1000,
+    cursor: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Obtiene valores únicos de un campo específico"""
+    """Obtiene valores únicos de un campo específico (paginados con `cursor`)"""
+    if not 1 <= limite <= 1000:
+        raise HTTPException(status_code=400, detail="`limite` debe estar entre 1 y 1000")
     try:
         service = ReporteService(db)
-        return await service.obtener_valores_unicos(coleccion, campo)
+        return await service.obtener_valores_unicos(coleccion, campo, limite, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sugerencias/estadisticas")
+async def estadisticas_sugerencias():
+    """Diccionarios de sugerencias en memoria (valores, edad y si están vigentes)."""
+    return {"success": True, **gestor_sugerencias.estadisticas()}
+
+@router.get("/sugerencias/{coleccion}/{campo}")
+async def sugerencias(
+    coleccion: str,
+    campo: str,
+    q: str = "",
+    limite: int = 10,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Valores de `campo` que empiezan con `q` (sin distinguir mayúsculas ni acentos), los más frecuentes primero."""
+    if not 1 <= limite <= SUGERENCIAS_MAX:
+        raise HTTPException(status_code=400, detail=f"`limite` debe estar entre 1 y {SUGERENCIAS_MAX}")
+    try:
+        return await gestor_sugerencias.sugerir(db, coleccion, campo, q, limite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,6 +184,8 @@ async def conteo_por_campo(
     try:
         service = ReporteService(db)
         return await service.obtener_conteo_por_campo(coleccion, campo)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -94,6 +202,8 @@ async def conteo_por_anio(
     try:
         service = ReporteService(db)
         return await service.obtener_conteo_por_anio(coleccion, campo, formato)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -101,12 +211,20 @@ async def conteo_por_anio(
 async def conteo_generos(
     coleccion: str,
     campo: str = "Genres",
+    modo: Literal["exacto", "aproximado"] = "exacto",
+    error: float = 0.01,
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Conteo de géneros individuales separando géneros múltiples."""
+    """Conteo de géneros individuales separando géneros múltiples.
+    Con `?modo=aproximado&error=0.01` estima sobre una muestra (ver README).
+    """
     try:
         service = ReporteService(db)
-        return await service.obtener_conteo_generos(coleccion, campo)
+        return await service.obtener_conteo_generos(coleccion, campo, modo=modo, error=error)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -114,12 +232,20 @@ async def conteo_generos(
 async def rating_promedio(
     coleccion: str,
     campo: str = "Rating",
+    modo: Literal["exacto", "aproximado"] = "exacto",
+    error: float = 0.01,
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Obtiene el rating promedio de una colección."""
+    """Obtiene el rating promedio de una colección.
+    Con `?modo=aproximado&error=0.01` estima sobre una muestra (ver README).
+    """
     try:
         service = ReporteService(db)
-        return await service.obtener_rating_promedio(coleccion, campo)
+        return await service.obtener_rating_promedio(coleccion, campo, modo=modo, error=error)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -127,12 +253,38 @@ async def rating_promedio(
 async def distribucion_rating(
     coleccion: str,
     campo: str = "Rating",
+    modo: Literal["exacto", "aproximado"] = "exacto",
+    error: float = 0.01,
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Obtiene la distribución de ratings por rangos."""
+    """Obtiene la distribución de ratings por rangos.
+    Con `?modo=aproximado&error=0.01` estima sobre una muestra (ver README).
+    """
+    try:
+        service = ReporteService(db)
+        return await service.obtener_distribucion_rating(coleccion, campo, modo=modo, error=error)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/comparar")
+async def comparar(
+    request: ComparacionRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Compara métricas entre colecciones en una sola llamada.
+
+    Las agregaciones de todas las colecciones corren en paralelo y cada métrica
+    se devuelve alineada (mismas etiquetas para todas las colecciones).
+    """
     try:
         service = ReporteService(db)
-        return await service.obtener_distribucion_rating(coleccion, campo)
+        return await service.comparar_colecciones(request.colecciones, request.metricas)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -146,6 +298,8 @@ async def conteo_desarrolladores(
     try:
         service = ReporteService(db)
         return await service.obtener_conteo_desarrolladores(coleccion, campo)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -159,6 +313,8 @@ async def top_juegos_populares(
     try:
         service = ReporteService(db)
         return await service.obtener_top_juegos_populares(coleccion, limite)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -172,6 +328,8 @@ async def regresion_lineal(
 
     - `campo_y` es obligatorio (variable objetivo).
     - Especifique `campo_x` (único) o `campos_x` (lista) para features.
+    - `modo="servidor"` ajusta sobre la colección completa sin descargar documentos.
+    - `modo="streaming"` ajusta sobre la colección completa recorriéndola por bloques.
     """
     try:
         service = ReporteService(db)
@@ -181,11 +339,44 @@ async def regresion_lineal(
             campos_x=request.campos_x,
             campo_y=request.campo_y,
             filtros=request.filtros,
-            limite=request.limite
+            limite=request.limite,
+            modo=request.modo
         )
         return resultado
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ColaLlenaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except TiempoAgotadoError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/regresion-lineal/{model_id}/predecir")
+async def predecir_regresion(
+    model_id: str,
+    request: PrediccionRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Predice muchas filas con un modelo ya ajustado (`model_id` de `/regresion-lineal`).
+
+    No consulta la colección: usa los coeficientes guardados en `_modelos` (con
+    una LRU en memoria delante). Responde 404 si el `model_id` no existe.
+    """
+    try:
+        resultado = await cache_modelos.predecir(db, model_id, request.filas)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if resultado is None:
+        raise HTTPException(status_code=404, detail=f"Modelo no encontrado: {model_id}")
+    return resultado
+
+@router.get("/modelos/estadisticas")
+async def estadisticas_modelos(db: AsyncIOMotorDatabase = Depends(get_database)):
+    """Modelos de regresión en memoria y persistidos, aciertos y desalojos."""
+    return {"success": True, **await cache_modelos.estadisticas(db)}
 
 
 @router.post("/correlacion-matriz", response_model=CorrelacionResponse)
@@ -199,20 +390,39 @@ async def correlacion_matriz(
     """
     try:
         service = ReporteService(db)
-        print(f"[API] correlacion_matriz request: coleccion={request.coleccion} campos={request.campos} limite={request.limite}")
         resultado = await service.calcular_matriz_correlacion(
             coleccion=request.coleccion,
             campos=request.campos,
             filtros=request.filtros,
-            limite=request.limite
+            limite=request.limite,
+            modo=request.modo
         )
-        print(f"[API] correlacion_matriz resultado success={resultado.get('success')}")
         return resultado
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ColaLlenaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except TiempoAgotadoError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        print('[API] Error en correlacion_matriz:', str(e))
-        traceback.print_exc()
+        logger.exception("Error en correlacion_matriz de %s", request.coleccion)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/leaderboards/estadisticas")
+async def estadisticas_leaderboards():
+    """Estado de los leaderboards en memoria (colecciones activas, eventos, reconstrucciones)."""
+    return {"success": True, **gestor_leaderboards.estadisticas()}
+
+@router.get("/rollup/estadisticas")
+async def estadisticas_rollup():
+    """Reconstrucciones, sumas incrementales y lecturas de los cubos preagregados."""
+    return {"success": True, **gestor_rollup.estadisticas()}
+
+@router.get("/analitica/estadisticas")
+async def estadisticas_analitica():
+    """Estado del pool de procesos de analítica (trabajos pendientes, rechazados, vencidos)."""
+    return {"success": True, **ejecutor_analitica.estadisticas()}
+
 @router.get("/metricas-dashboard/{coleccion}")
 async def metricas_dashboard(
     coleccion: str,
@@ -222,6 +432,24 @@ async def metricas_dashboard(
     try:
         service = ReporteService(db)
         return await service.obtener_metricas_dashboard(coleccion)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/dashboard/{coleccion}")
+async def dashboard(
+    coleccion: str,
+    limite_populares: int = 20,
+    limite_destacados: int = 5,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Obtiene todos los widgets del dashboard en una sola consulta ($facet) y una sola respuesta."""
+    try:
+        service = ReporteService(db)
+        return await service.obtener_dashboard(coleccion, limite_populares, limite_destacados)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -235,6 +463,8 @@ async def hidden_gems(
     try:
         service = ReporteService(db)
         return await service.obtener_hidden_gems(coleccion, limite)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -248,6 +478,8 @@ async def trending_games(
     try:
         service = ReporteService(db)
         return await service.obtener_trending_games(coleccion, limite)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -261,5 +493,217 @@ async def top_rated_games(
     try:
         service = ReporteService(db)
         return await service.obtener_top_rated_games(coleccion, limite)
+    except EsperaAgotadaError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": REINTENTO_ESPERA_AGOTADA})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/normalizar/{coleccion}")
+async def normalizar_coleccion(
+    coleccion: str,
+    tamano_lote: int = 1000,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Materializa los campos normalizados (`_norm`) de una colección.
+
+    Es incremental: solo procesa documentos sin `_norm` o con una versión anterior.
+    """
+    try:
+        service = NormalizacionService(db)
+        return await service.backfill(coleccion, tamano_lote)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/normalizacion/{coleccion}")
+async def estado_normalizacion(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Indica cuántos documentos tienen los campos normalizados al día."""
+    try:
+        service = NormalizacionService(db)
+        return await service.estado(coleccion)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/rollup/{coleccion}")
+async def reconstruir_rollup(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Reconstruye el cubo preagregado año × género × desarrollador de una colección.
+
+    Mientras esté vigente, los conteos por año, género y desarrollador, el rating
+    promedio y las métricas del dashboard se responden desde el cubo.
+    """
+    try:
+        return {"success": True, **await gestor_rollup.reconstruir(db, coleccion)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/rollup/{coleccion}")
+async def estado_rollup(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Estado del cubo preagregado: vigencia, celdas, juegos cubiertos y última reconstrucción."""
+    try:
+        return {"success": True, **await gestor_rollup.estado(db, coleccion)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/snapshot/{coleccion}")
+async def construir_snapshot(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Exporta los campos numéricos y los códigos de género/desarrollador a un snapshot columnar.
+
+    La regresión y la correlación sin filtros leen el snapshot con memmap
+    mientras su versión de datos coincida con la colección.
+    """
+    try:
+        return {"success": True, **await gestor_snapshots.construir(db, coleccion)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/snapshot/{coleccion}")
+async def estado_snapshot(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Manifiesto del snapshot columnar: filas, columnas, versión de datos y si está vigente."""
+    try:
+        return {"success": True, **await gestor_snapshots.estado(db, coleccion)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ingesta/{coleccion}")
+async def ingestar_juegos(
+    coleccion: str,
+    request: IngestaRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Inserta juegos calculando sus campos normalizados en el momento de la escritura."""
+    try:
+        service = NormalizacionService(db)
+        resultado = await service.insertar_juegos(coleccion, request.documentos)
+        if resultado.get("insertados"):
+            # El catálogo de esquema se pone al día solo con los documentos nuevos
+            CatalogoService(db).perfilar_en_segundo_plano(coleccion)
+        return resultado
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/catalogo/{coleccion}")
+async def perfilar_coleccion(
+    coleccion: str,
+    completo: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Perfila la colección para el catálogo de esquema.
+
+    Por defecto solo procesa los documentos nuevos; `completo=true` rehace el perfil
+    (necesario tras ediciones o borrados masivos).
+    """
+    try:
+        service = CatalogoService(db)
+        return await service.perfilar(coleccion, completo=completo)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/catalogo/{coleccion}")
+async def obtener_catalogo(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Tipos, tasa de nulos, proporción numérica y cardinalidad estimada de cada campo."""
+    try:
+        service = CatalogoService(db)
+        catalogo = await service.obtener(coleccion)
+        if catalogo is None:
+            return {"success": False, "mensaje": "La colección no está perfilada", "campos": []}
+        return {"success": True, **catalogo}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/indices/{coleccion}")
+async def crear_indices(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Crea los índices declarados que necesitan los endpoints del dashboard."""
+    try:
+        service = IndicesService(db)
+        return await service.crear(coleccion)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/indices/{coleccion}")
+async def reporte_indices(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Índices declarados que faltan e índices existentes sin uso."""
+    try:
+        service = IndicesService(db)
+        return await service.reporte(coleccion)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/indices/{coleccion}/asesor")
+async def asesor_indices(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Ejecuta `explain` sobre los pipelines del dashboard y marca COLLSCAN y ordenamientos en memoria."""
+    try:
+        service = IndicesService(db)
+        return await service.asesorar(coleccion)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/explain")
+async def explain_todos(
+    coleccion: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """`explain("executionStats")` normalizado de todos los pipelines con parámetros por defecto."""
+    try:
+        service = ExplainService(db)
+        return {"success": True, "coleccion": coleccion, "consultas": await service.explicar_todos(coleccion)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/explain/{endpoint}")
+async def explain_endpoint(
+    endpoint: str,
+    coleccion: str,
+    campo: Optional[str] = None,
+    limite: Optional[int] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Ejecuta con `explain("executionStats")` el pipeline exacto de un endpoint.
+
+    Devuelve el plan ganador, documentos y claves examinados, ordenamientos en
+    memoria, derrames a disco y el tiempo de cada etapa en una forma comparable.
+    """
+    parametros = {nombre: valor for nombre, valor in (("campo", campo), ("limite", limite)) if valor is not None}
+    try:
+        service = ExplainService(db)
+        return await service.explicar(endpoint, coleccion, **parametros)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/estadisticas")
+async def estadisticas_cache():
+    """Aciertos, fallos, desalojos y tamaño de la cache de resultados."""
+    return cache_resultados.estadisticas()
+
+@router.delete("/cache")
+async def invalidar_cache(coleccion: Optional[str] = None):
+    """Invalida la cache de una colección (o toda la cache si no se indica)."""
+    cache_resultados.invalidar(coleccion)
+    return {"success": True, "coleccion": coleccion}
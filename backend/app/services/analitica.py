@@ -0,0 +1,453 @@
+from typing import Dict, Any, List, Optional, Tuple
+import math
+from app.services.normalizacion_service import a_numero, expr_numero
+
+# Analítica empujada al servidor: MongoDB calcula estadísticos suficientes en
+# un solo `$group` y aquí solo se resuelve el álgebra con NumPy, de modo que el
+# volumen transferido depende del número de campos y no del de documentos.
+#
+# Las funciones `*_muestra` trabajan sobre columnas ({campo: [valores]}) y se
+# ejecutan en el pool de procesos de `ejecutor`, fuera del event loop.
+#
+# NumPy, pandas y sklearn se importan dentro de cada función: solo los usan
+# unos pocos endpoints y cargarlos al importar el módulo retrasa el arranque.
+
+
+def cargar_stack_analitico():
+    """Importa NumPy, pandas y sklearn por adelantado (precalentamiento opcional)."""
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    import sklearn.metrics  # noqa: F401
+
+
+def etapas_estadisticos_ols(campos_x: List[str], campo_y: str) -> List[Dict[str, Any]]:
+    """Etapas que reducen la colección a n, Σx, Σy, XᵀX, Xᵀy y Σy².
+
+    Los valores se convierten a número en el servidor (strings numéricos
+    incluidos) y se descartan los documentos con algún campo no numérico.
+    """
+    variables = {f"x{i}": expr_numero(f"${campo}") for i, campo in enumerate(campos_x)}
+    variables["y"] = expr_numero(f"${campo_y}")
+
+    acumuladores: Dict[str, Any] = {
+        "_id": None,
+        "n": {"$sum": 1},
+        "y": {"$sum": "$y"},
+        "yy": {"$sum": {"$multiply": ["$y", "$y"]}},
+    }
+    for i in range(len(campos_x)):
+        acumuladores[f"x{i}"] = {"$sum": f"$x{i}"}
+        acumuladores[f"xy_{i}"] = {"$sum": {"$multiply": [f"$x{i}", "$y"]}}
+        for j in range(i, len(campos_x)):
+            acumuladores[f"xx_{i}_{j}"] = {"$sum": {"$multiply": [f"$x{i}", f"$x{j}"]}}
+
+    return [
+        {"$project": {"_id": 0, **variables}},
+        {"$match": {nombre: {"$ne": None} for nombre in variables}},
+        {"$group": acumuladores},
+    ]
+
+
+def resolver_ols(estadisticos: Optional[Dict[str, Any]], p: int) -> Dict[str, Any]:
+    """Resuelve las ecuaciones normales a partir de los estadísticos de `etapas_estadisticos_ols`.
+
+    Retorna coeficientes, intercepto, R² y n (n = 0 si no hubo filas válidas).
+    """
+    import numpy as np
+
+    n = int(estadisticos["n"]) if estadisticos else 0
+    if n == 0:
+        return {"coeficientes": [], "intercept": 0.0, "r2": 0.0, "n": 0}
+
+    # Matriz aumentada con la columna de unos del intercepto: [1 X]ᵀ[1 X] β = [1 X]ᵀ y
+    sx = np.array([estadisticos[f"x{i}"] for i in range(p)], dtype=float)
+    xtx = np.empty((p, p))
+    for i in range(p):
+        for j in range(i, p):
+            xtx[i, j] = xtx[j, i] = estadisticos[f"xx_{i}_{j}"]
+    xty = np.array([estadisticos[f"xy_{i}"] for i in range(p)], dtype=float)
+
+    a = np.empty((p + 1, p + 1))
+    a[0, 0] = n
+    a[0, 1:] = a[1:, 0] = sx
+    a[1:, 1:] = xtx
+    b = np.concatenate(([estadisticos["y"]], xty))
+
+    # lstsq tolera features colineales o constantes (solución de norma mínima)
+    beta = np.linalg.lstsq(a, b, rcond=None)[0]
+
+    sy, syy = float(estadisticos["y"]), float(estadisticos["yy"])
+    sst = syy - sy * sy / n
+    sse = syy - 2 * beta @ b + beta @ a @ beta
+    r2 = float(1 - sse / sst) if sst > 0 else 0.0
+
+    return {
+        "coeficientes": [float(c) for c in beta[1:]],
+        "intercept": float(beta[0]),
+        "r2": r2,
+        "n": n,
+    }
+
+
+class AcumuladorOLS:
+    """Estadísticos suficientes de OLS acumulados en NumPy por bloques de filas.
+
+    Produce el mismo diccionario que `etapas_estadisticos_ols`, así que se
+    resuelve (coeficientes y R²) con `resolver_ols`. Ocupa O(p²) sin importar
+    cuántos bloques se agreguen.
+    """
+
+    def __init__(self, p: int):
+        import numpy as np
+
+        self.p = p
+        self.n = 0
+        self.sx = np.zeros(p)
+        self.xtx = np.zeros((p, p))
+        self.xty = np.zeros(p)
+        self.sy = 0.0
+        self.syy = 0.0
+
+    def agregar(self, bloque) -> int:
+        """Suma un bloque float64 de k×(p+1) (features y al final y).
+
+        Las filas con algún NaN (valor faltante o no numérico) se descartan.
+        Retorna cuántas filas se usaron.
+        """
+        import numpy as np
+
+        bloque = bloque[np.isfinite(bloque).all(axis=1)]
+        x, y = bloque[:, :self.p], bloque[:, self.p]
+        self.n += len(bloque)
+        self.sx += x.sum(axis=0)
+        self.xtx += x.T @ x
+        self.xty += x.T @ y
+        self.sy += float(y.sum())
+        self.syy += float(y @ y)
+        return len(bloque)
+
+    def sumar(self, otro: "AcumuladorOLS"):
+        """Suma los acumuladores de otro bloque (por ejemplo, uno calculado en el pool)."""
+        self.n += otro.n
+        self.sx += otro.sx
+        self.xtx += otro.xtx
+        self.xty += otro.xty
+        self.sy += otro.sy
+        self.syy += otro.syy
+
+    def estadisticos(self) -> Dict[str, Any]:
+        estadisticos: Dict[str, Any] = {"n": self.n, "y": self.sy, "yy": self.syy}
+        for i in range(self.p):
+            estadisticos[f"x{i}"] = float(self.sx[i])
+            estadisticos[f"xy_{i}"] = float(self.xty[i])
+            for j in range(i, self.p):
+                estadisticos[f"xx_{i}_{j}"] = float(self.xtx[i, j])
+        return estadisticos
+
+
+def _valor_ruta(doc: Dict[str, Any], ruta: str) -> Any:
+    valor: Any = doc
+    for parte in ruta.split("."):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+
+def acumular_ols_lote(documentos: List[Dict[str, Any]], features: List[str], campo_y: str):
+    """Convierte un lote de documentos a float64 y acumula sus estadísticos OLS (se ejecuta en el pool).
+
+    Retorna (`AcumuladorOLS` del lote, hasta 5 filas válidas de ejemplo).
+    """
+    import numpy as np
+
+    # None (faltante o no numérico) pasa a NaN y `agregar` descarta la fila
+    bloque = np.array(
+        [[a_numero(_valor_ruta(doc, campo)) for campo in features + [campo_y]] for doc in documentos],
+        dtype=np.float64
+    ).reshape(len(documentos), len(features) + 1)
+    acumulador = AcumuladorOLS(len(features))
+    acumulador.agregar(bloque)
+    return acumulador, bloque[np.isfinite(bloque).all(axis=1)][:5]
+
+
+def etapas_estadisticos_pearson(campos: List[str]) -> List[Dict[str, Any]]:
+    """Etapas que acumulan, para cada par de campos, n, Σx, Σy, Σx², Σy² y Σxy.
+
+    Cada par usa solo los documentos donde ambos campos son numéricos
+    (pairwise-complete); `completos` cuenta los documentos con todos los campos.
+    """
+    variables = {f"c{i}": expr_numero(f"${campo}") for i, campo in enumerate(campos)}
+    presente = {f"c{i}": {"$ne": [f"$c{i}", None]} for i in range(len(campos))}
+
+    acumuladores: Dict[str, Any] = {
+        "_id": None,
+        "completos": {"$sum": {"$cond": [{"$and": list(presente.values())}, 1, 0]}},
+    }
+    for i in range(len(campos)):
+        for j in range(i, len(campos)):
+            ambos = {"$and": [presente[f"c{i}"], presente[f"c{j}"]]}
+            x, y = f"$c{i}", f"$c{j}"
+            sufijo = f"{i}_{j}"
+            acumuladores[f"n_{sufijo}"] = {"$sum": {"$cond": [ambos, 1, 0]}}
+            acumuladores[f"sx_{sufijo}"] = {"$sum": {"$cond": [ambos, x, 0]}}
+            acumuladores[f"sy_{sufijo}"] = {"$sum": {"$cond": [ambos, y, 0]}}
+            acumuladores[f"sxx_{sufijo}"] = {"$sum": {"$cond": [ambos, {"$multiply": [x, x]}, 0]}}
+            acumuladores[f"syy_{sufijo}"] = {"$sum": {"$cond": [ambos, {"$multiply": [y, y]}, 0]}}
+            acumuladores[f"sxy_{sufijo}"] = {"$sum": {"$cond": [ambos, {"$multiply": [x, y]}, 0]}}
+
+    return [
+        {"$project": {"_id": 0, **variables}},
+        {"$group": acumuladores},
+    ]
+
+
+def resolver_pearson(estadisticos: Optional[Dict[str, Any]], p: int) -> Dict[str, Any]:
+    """Arma la matriz de Pearson a partir de los estadísticos de `etapas_estadisticos_pearson`.
+
+    Las correlaciones indefinidas (menos de 2 pares o varianza nula) quedan en None.
+    """
+    import numpy as np
+
+    matriz: List[List[Optional[float]]] = [[None] * p for _ in range(p)]
+    n_pares = [[0] * p for _ in range(p)]
+    if not estadisticos:
+        return {"matrix": matriz, "n_pares": n_pares, "n": 0}
+
+    for i in range(p):
+        for j in range(i, p):
+            sufijo = f"{i}_{j}"
+            n = int(estadisticos[f"n_{sufijo}"])
+            n_pares[i][j] = n_pares[j][i] = n
+            if n < 2:
+                continue
+            sx, sy = float(estadisticos[f"sx_{sufijo}"]), float(estadisticos[f"sy_{sufijo}"])
+            var_x = n * float(estadisticos[f"sxx_{sufijo}"]) - sx * sx
+            var_y = n * float(estadisticos[f"syy_{sufijo}"]) - sy * sy
+            cov = n * float(estadisticos[f"sxy_{sufijo}"]) - sx * sy
+            if var_x <= 0 or var_y <= 0:
+                continue
+            r = float(np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0))
+            matriz[i][j] = matriz[j][i] = round(r, 3)
+
+    return {"matrix": matriz, "n_pares": n_pares, "n": int(estadisticos["completos"])}
+
+
+def ajustar_regresion_muestra(
+    columnas: Dict[str, List[Any]],
+    features: List[str],
+    campo_y: str
+) -> Dict[str, Any]:
+    """Ajusta `LinearRegression` sobre columnas ya descargadas (se ejecuta en el pool)."""
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import r2_score
+
+    df = pd.DataFrame(columnas)
+
+    # Convertir a valores numéricos
+    cols_to_convert = features + [campo_y]
+    for col in cols_to_convert:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    df = df.dropna(subset=[c for c in cols_to_convert if c in df.columns])
+
+    if df.empty or len(features) == 0 or not set(cols_to_convert) <= set(df.columns):
+        return {
+            "success": False,
+            "mensaje": "No hay datos numéricos válidos o no se especificaron features",
+            "coeficientes": [],
+            "intercept": 0.0,
+            "r2": 0.0,
+            "n": 0,
+            "ejemplo_predicciones": []
+        }
+
+    X = df[features].values if len(features) > 1 else df[features[0]].values.reshape(-1, 1)
+    y = df[campo_y].values
+
+    model = LinearRegression()
+    model.fit(X, y)
+
+    preds = model.predict(X)
+    score = float(r2_score(y, preds))
+
+    coefs = [float(c) for c in np.atleast_1d(model.coef_).tolist()]
+    intercept = float(model.intercept_)
+
+    # Las predicciones de todas las filas ya están calculadas en `preds`
+    ejemplo = [
+        {"input": dict(zip(features, map(float, fila))), "y": float(real), "pred": float(pred)}
+        for fila, real, pred in zip(df[features].values[:5], y[:5], preds[:5])
+    ]
+
+    return {
+        "success": True,
+        "mensaje": "Regresión lineal ajustada",
+        "coeficientes": coefs,
+        "intercept": intercept,
+        "r2": score,
+        "n": len(df),
+        "ejemplo_predicciones": ejemplo
+    }
+
+
+def calcular_correlacion_muestra(
+    columnas: Dict[str, List[Any]],
+    campos: Optional[List[str]]
+) -> Dict[str, Any]:
+    """Matriz de Pearson con pandas sobre columnas ya descargadas (se ejecuta en el pool)."""
+    import pandas as pd
+
+    df = pd.DataFrame(columnas)
+
+    # Si no se especificaron campos, inferir columnas que pueden convertirse a numéricas
+    if not campos:
+        posibles = []
+        for c in df.columns:
+            # intentar conversión a numérico en una muestra
+            series = pd.to_numeric(df[c], errors='coerce')
+            non_na = series.dropna()
+            if len(non_na) >= max(1, min(10, len(df)//10)):
+                posibles.append(c)
+        campos = posibles
+
+    # Convertir columnas seleccionadas a numéricas y filtrar
+    cols_validas = []
+    for c in campos:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+            if df[c].dropna().shape[0] > 0:
+                cols_validas.append(c)
+
+    if not cols_validas:
+        return {
+            "success": False,
+            "mensaje": "No se encontraron columnas numéricas válidas",
+            "fields": [],
+            "matrix": [],
+            "n": 0
+        }
+
+    df_clean = df[cols_validas].dropna()
+    if df_clean.empty:
+        return {
+            "success": False,
+            "mensaje": "No hay suficientes datos numéricos después de limpiar NA",
+            "fields": cols_validas,
+            "matrix": [],
+            "n": 0
+        }
+
+    corr = df_clean.corr(method='pearson').round(3)
+
+    # Convertir a matriz (lista de listas); las correlaciones indefinidas quedan en None
+    fields = list(corr.columns)
+    matrix = [[None if pd.isna(v) else float(v) for v in row] for row in corr.values.tolist()]
+
+    return {
+        "success": True,
+        "mensaje": "Matriz de correlación calculada",
+        "fields": fields,
+        "matrix": matrix,
+        "n": len(df_clean)
+    }
+
+
+# --- Snapshot columnar ----------------------------------------------------
+# Las funciones `*_snapshot` abren las columnas con memmap dentro del worker
+# (ver `snapshot_service`): entre procesos solo viaja la ruta del snapshot y
+# no se consulta MongoDB.
+
+def ajustar_regresion_snapshot(directorio: str, features: List[str], campo_y: str, limite: int) -> Dict[str, Any]:
+    """`ajustar_regresion_muestra` sobre las primeras `limite` filas del snapshot."""
+    from app.services.snapshot_service import abrir_snapshot
+
+    columnas = abrir_snapshot(directorio).columnas(features + [campo_y], limite)
+    return ajustar_regresion_muestra(columnas, features, campo_y)
+
+
+def calcular_correlacion_snapshot(directorio: str, campos: List[str], limite: int) -> Dict[str, Any]:
+    """`calcular_correlacion_muestra` sobre las primeras `limite` filas del snapshot."""
+    from app.services.snapshot_service import abrir_snapshot
+
+    return calcular_correlacion_muestra(abrir_snapshot(directorio).columnas(campos, limite), campos)
+
+
+def acumular_ols_snapshot(directorio: str, features: List[str], campo_y: str, tamano_lote: int):
+    """Estadísticos OLS de todas las filas del snapshot, por bloques (como `modo="streaming"`).
+
+    Retorna (estadísticos, hasta 5 filas válidas de ejemplo).
+    """
+    import numpy as np
+    from app.services.snapshot_service import abrir_snapshot
+
+    columnas = list(abrir_snapshot(directorio).columnas(features + [campo_y]).values())
+    acumulador = AcumuladorOLS(len(features))
+    filas_ejemplo = None
+    for inicio in range(0, len(columnas[0]), tamano_lote):
+        bloque = np.column_stack([columna[inicio:inicio + tamano_lote] for columna in columnas])
+        acumulador.agregar(bloque)
+        if filas_ejemplo is None:
+            filas_ejemplo = bloque[np.isfinite(bloque).all(axis=1)][:5]
+    return acumulador.estadisticos(), filas_ejemplo
+
+
+# --- Modo aproximado: muestreo con intervalos de confianza -------------------
+# Los endpoints con `modo="aproximado"` ejecutan el mismo pipeline sobre un
+# `$sample` y escalan los conteos al total de la colección.
+
+Z_95 = 1.959964
+# Por encima de ~5% de la colección `$sample` deja de usar el cursor aleatorio y
+# ordena la colección completa: ahí el cálculo exacto es más barato.
+FRACCION_MAXIMA_MUESTRA = 0.05
+
+
+def tamano_muestra(error: float, total: int, z: float = Z_95) -> int:
+    """Documentos necesarios para estimar cualquier proporción con margen `error`.
+
+    Usa el peor caso (p = 0.5) y la corrección por población finita: con
+    `error=0.01` son ~9604 documentos, casi sin importar el tamaño de la colección.
+    """
+    if total <= 0:
+        return 0
+    n0 = z * z * 0.25 / (error * error)
+    return min(total, math.ceil(n0 / (1 + (n0 - 1) / total)))
+
+
+def _correccion_finita(n: int, total: int) -> float:
+    if total <= 1 or n >= total:
+        return 0.0
+    return math.sqrt((total - n) / (total - 1))
+
+
+def intervalo_proporcion(exitos: int, n: int, total: int, z: float = Z_95) -> Tuple[float, float, float]:
+    """Estimación e intervalo de Wilson de `exitos / n`, escalados a `total` documentos.
+
+    Wilson (y no p ± z·se) para que los conteos pequeños no den intervalos de ancho cero.
+    """
+    if n <= 0:
+        return 0.0, 0.0, 0.0
+    p = exitos / n
+    z_efectivo = z * _correccion_finita(n, total)
+    z2 = z_efectivo * z_efectivo
+    centro = (p + z2 / (2 * n)) / (1 + z2 / n)
+    radio = z_efectivo * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / (1 + z2 / n)
+    return p * total, max(centro - radio, 0.0) * total, min(centro + radio, 1.0) * total
+
+
+def intervalo_media(
+    media: float,
+    desviacion: Optional[float],
+    n: int,
+    total: int,
+    z: float = Z_95
+) -> Tuple[float, float]:
+    """Intervalo media ± z·s/√n con corrección por población finita."""
+    if n <= 1 or desviacion is None:
+        return media, media
+    radio = z * desviacion / math.sqrt(n) * _correccion_finita(n, total)
+    return media - radio, media + radio
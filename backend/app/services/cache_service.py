@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Any, Optional, Tuple
+import asyncio
+import inspect
+import json
+import os
+import time
+
+# Configuración por variables de entorno
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "512"))
+CACHE_DESACTIVADA = os.getenv("CACHE_DESACTIVADA", "").lower() in ("1", "true", "si")
+# Segundos máximos que una llamada espera el resultado de otra idéntica en curso
+SINGLE_FLIGHT_ESPERA = float(os.getenv("SINGLE_FLIGHT_ESPERA", "30"))
+
+
+class EsperaAgotadaError(Exception):
+    """La llamada idéntica en curso no terminó dentro de SINGLE_FLIGHT_ESPERA."""
+
+
+class CacheResultados:
+    """Cache LRU en memoria con TTL por entrada para las lecturas de ReporteService.
+
+    Las claves incluyen dos versiones de la colección: la local de este proceso,
+    que incrementa `invalidar`, y la compartida de `_metadatos` que incrementa
+    `registrar_escritura` en cada escritura por la API (ingesta, backfill,
+    eventos de change stream). Así una escritura hecha en otro worker también
+    deja inalcanzables las entradas anteriores. Lo que se escribe por fuera de la
+    API sin change streams activos solo se nota al vencer el TTL.
+    """
+
+    def __init__(self, max_entradas: int = 512):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._versiones: Dict[str, int] = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.expiraciones = 0
+        self._por_metodo: Dict[str, Dict[str, int]] = {}
+        # Cálculos en curso por clave (single-flight)
+        self._en_vuelo: Dict[Tuple, asyncio.Future] = {}
+        self.coalescidas = 0
+        self.esperas_agotadas = 0
+
+    def version(self, coleccion: str) -> int:
+        """Versión local de una colección en este proceso (0 si nunca se invalidó)."""
+        return self._versiones.get(coleccion, 0)
+
+    def invalidar(self, coleccion: Optional[str] = None):
+        """Invalida las entradas de una colección (o todas) incrementando su versión."""
+        if coleccion is None:
+            for nombre in list(self._versiones):
+                self._versiones[nombre] += 1
+            self._entradas.clear()
+            return
+        self._versiones[coleccion] = self.version(coleccion) + 1
+        for clave in [c for c in self._entradas if c[2] == coleccion]:
+            del self._entradas[clave]
+
+    def _contadores_metodo(self, metodo: str) -> Dict[str, int]:
+        return self._por_metodo.setdefault(metodo, {"aciertos": 0, "fallos": 0, "coalescidas": 0})
+
+    def obtener(self, clave: Tuple) -> Tuple[bool, Any]:
+        entrada = self._entradas.get(clave)
+        metodo = self._contadores_metodo(clave[0])
+        if entrada is not None:
+            expira, valor = entrada
+            if expira > time.monotonic():
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                metodo["aciertos"] += 1
+                return True, valor
+            del self._entradas[clave]
+            self.expiraciones += 1
+        self.fallos += 1
+        metodo["fallos"] += 1
+        return False, None
+
+    def guardar(self, clave: Tuple, valor: Any, ttl: float):
+        self._entradas[clave] = (time.monotonic() + ttl, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+
+    async def compartir(self, clave: Tuple, calcular, espera: float = SINGLE_FLIGHT_ESPERA) -> Any:
+        """Single-flight: las llamadas con la misma clave esperan un único cálculo en curso.
+
+        El cálculo corre en su propia tarea y cada llamada lo espera con `shield`,
+        así que si la primera se cancela (cliente desconectado) las demás siguen
+        recibiendo el resultado. Las excepciones se propagan a todas. Cada llamada
+        espera como mucho `espera` segundos; el cálculo continúa igualmente.
+        """
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(calcular())
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar_vuelo(clave, t))
+        else:
+            self.coalescidas += 1
+            self._contadores_metodo(clave[0])["coalescidas"] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(tarea), espera)
+        except asyncio.TimeoutError:
+            self.esperas_agotadas += 1
+            raise EsperaAgotadaError(
+                f"{clave[0]} no terminó en {espera:g} s; el cálculo sigue en curso, reintente"
+            )
+
+    def _terminar_vuelo(self, clave: Tuple, tarea: asyncio.Future):
+        if self._en_vuelo.get(clave) is tarea:
+            del self._en_vuelo[clave]
+        # Marca la excepción como leída aunque todas las esperas hayan vencido
+        if not tarea.cancelled():
+            tarea.exception()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        total = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            "desalojos": self.desalojos,
+            "expiraciones": self.expiraciones,
+            "en_vuelo": len(self._en_vuelo),
+            "coalescidas": self.coalescidas,
+            "esperas_agotadas": self.esperas_agotadas,
+            "versiones": dict(self._versiones),
+            "por_metodo": {m: dict(c) for m, c in self._por_metodo.items()},
+        }
+
+
+cache_resultados = CacheResultados(CACHE_MAX_ENTRADAS)
+
+
+def _normalizar_parametros(parametros: Dict[str, Any]) -> str:
+    """Serializa los parámetros de forma estable (mismo orden, mismos tipos)."""
+    return json.dumps(parametros, sort_keys=True, default=str)
+
+
+def cacheado(ttl: float):
+    """Decorador para métodos async de lectura de ReporteService.
+
+    La clave es (método, base de datos, colección, versiones de datos local y
+    compartida, parámetros normalizados); el primer parámetro del método es
+    siempre la colección. Leer la versión compartida cuesta un `find_one` por
+    `_id` en cada llamada, también en los aciertos.
+    Las respuestas con `success: False` no se guardan. En un fallo de cache, las
+    llamadas concurrentes con la misma clave comparten un único cálculo
+    (`CacheResultados.compartir`), así que una avalancha de pedidos iguales hace
+    una sola consulta a MongoDB.
+    """
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+
+        @wraps(funcion)
+        async def envoltura(self, *args, **kwargs):
+            argumentos = firma.bind(self, *args, **kwargs)
+            argumentos.apply_defaults()
+            parametros = dict(argumentos.arguments)
+            parametros.pop("self")
+            coleccion = parametros.pop(next(iter(parametros)))
+
+            # Import diferido: normalizacion_service importa este módulo
+            from app.services.normalizacion_service import version_datos
+            clave = (
+                funcion.__name__,
+                self.db.name,
+                coleccion,
+                (cache_resultados.version(coleccion), await version_datos(self.db, coleccion)),
+                _normalizar_parametros(parametros),
+            )
+            if not CACHE_DESACTIVADA:
+                encontrado, valor = cache_resultados.obtener(clave)
+                if encontrado:
+                    return valor
+
+            async def calcular():
+                valor = await funcion(self, *args, **kwargs)
+                if not CACHE_DESACTIVADA and not (isinstance(valor, dict) and valor.get("success") is False):
+                    cache_resultados.guardar(clave, valor, ttl)
+                return valor
+
+            return await cache_resultados.compartir(clave, calcular)
+
+        return envoltura
+    return decorador
@@ -0,0 +1,242 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+from app.services.cache_service import cache_resultados
+from app.services.ejecutor import ejecutor_analitica
+from app.services.metricas import a_lista
+from app.services.normalizacion_service import CAMPO_NORMALIZADO, COLECCION_METADATOS, a_numero
+from app.services.sketches import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato del perfil; al cambiarla los perfiles guardados se rehacen
+VERSION_CATALOGO = 1
+
+# Proporción mínima de valores numéricos para considerar un campo "numérico"
+UMBRAL_NUMERICO = 0.5
+
+# Documentos por lote enviado al pool de analítica
+TAMANO_LOTE_PERFIL = 5000
+
+# Perfiles que se están calculando en segundo plano (uno por colección)
+_perfilando: Dict[str, asyncio.Task] = {}
+
+
+def _id_catalogo(coleccion: str) -> str:
+    return f"catalogo:{coleccion}"
+
+
+def tipo_bson(valor: Any) -> str:
+    """Nombre del tipo BSON de un valor, con los mismos nombres que `$type`."""
+    if valor is None:
+        return "null"
+    if isinstance(valor, bool):
+        return "bool"
+    if isinstance(valor, int):
+        return "int" if -2**31 <= valor < 2**31 else "long"
+    if isinstance(valor, float):
+        return "double"
+    if isinstance(valor, str):
+        return "string"
+    if isinstance(valor, list):
+        return "array"
+    if isinstance(valor, dict):
+        return "object"
+    if isinstance(valor, datetime):
+        return "date"
+    if isinstance(valor, ObjectId):
+        return "objectId"
+    return type(valor).__name__
+
+
+def resumir_campo(nombre: str, perfil: Dict[str, Any], documentos: int) -> Dict[str, Any]:
+    """Convierte los contadores guardados de un campo en métricas legibles."""
+    no_nulos = perfil["presentes"] - perfil["nulos"]
+    return {
+        "campo": nombre,
+        "tipos": perfil["tipos"],
+        # Los documentos sin el campo cuentan como nulos
+        "tasa_nulos": round(1 - no_nulos / documentos, 4) if documentos else 0.0,
+        "proporcion_numerica": round(perfil["numericos"] / no_nulos, 4) if no_nulos else 0.0,
+        "cardinalidad_estimada": perfil["cardinalidad"],
+    }
+
+
+def es_numerico(resumen: Dict[str, Any], umbral: float = UMBRAL_NUMERICO) -> bool:
+    """Indica si un campo resumido (`resumir_campo`) puede tratarse como numérico."""
+    return resumen["proporcion_numerica"] >= umbral and not set(resumen["tipos"]) & {"array", "object"}
+
+
+def perfilar_lote(documentos: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Contadores y HyperLogLog parciales de un lote de documentos.
+
+    Corre en el pool de analítica: el hash de cada valor y `a_numero` son
+    CPU-bound. Devuelve {campo: {"tipos", "presentes", "nulos", "numericos",
+    "hll"}}, que se suma al perfil acumulado con `combinar_perfiles`.
+    """
+    campos: Dict[str, Dict[str, Any]] = {}
+    sketches: Dict[str, HyperLogLog] = {}
+    for doc in documentos:
+        for nombre, valor in doc.items():
+            if nombre == "_id":
+                continue
+            perfil = campos.get(nombre)
+            if perfil is None:
+                perfil = campos[nombre] = {"tipos": {}, "presentes": 0, "nulos": 0, "numericos": 0}
+                sketches[nombre] = HyperLogLog()
+            tipo = tipo_bson(valor)
+            perfil["tipos"][tipo] = perfil["tipos"].get(tipo, 0) + 1
+            perfil["presentes"] += 1
+            if valor is None:
+                perfil["nulos"] += 1
+                continue
+            if a_numero(valor) is not None:
+                perfil["numericos"] += 1
+            sketches[nombre].agregar(valor)
+    for nombre, sketch in sketches.items():
+        campos[nombre]["hll"] = sketch.a_bytes()
+    return campos
+
+
+def combinar_perfiles(
+    campos: Dict[str, Dict[str, Any]],
+    sketches: Dict[str, HyperLogLog],
+    parcial: Dict[str, Dict[str, Any]]
+):
+    """Suma el resultado de `perfilar_lote` a los contadores y sketches acumulados."""
+    for nombre, perfil_lote in parcial.items():
+        perfil = campos.get(nombre)
+        if perfil is None:
+            perfil = campos[nombre] = {"tipos": {}, "presentes": 0, "nulos": 0, "numericos": 0}
+            sketches[nombre] = HyperLogLog()
+        for tipo, cantidad in perfil_lote["tipos"].items():
+            perfil["tipos"][tipo] = perfil["tipos"].get(tipo, 0) + cantidad
+        for contador in ("presentes", "nulos", "numericos"):
+            perfil[contador] += perfil_lote[contador]
+        sketches[nombre].combinar(HyperLogLog.desde_bytes(perfil_lote["hll"]))
+
+
+class CatalogoService:
+    """Catálogo persistente del esquema de cada colección.
+
+    Perfila la colección en una pasada por lotes y guarda en `_metadatos`
+    ("catalogo:<colección>") los contadores de cada campo de primer nivel:
+    tipos BSON observados, nulos, valores que se pueden leer como número y un
+    HyperLogLog para la cardinalidad. Cada lote se perfila en el pool de
+    analítica, fuera del event loop. Las actualizaciones son incrementales:
+    solo se procesan los documentos con `_id` mayor a la última marca de agua;
+    si la colección tiene menos documentos que el perfil (borrados) se rehace
+    completo, y las ediciones requieren `perfilar(completo=True)`.
+    """
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+
+    async def perfilar(
+        self, coleccion: str, completo: bool = False, tamano_lote: int = TAMANO_LOTE_PERFIL
+    ) -> Dict[str, Any]:
+        """Crea o actualiza el perfil de `coleccion` y devuelve cuántos documentos procesó."""
+        try:
+            metadatos = self.db[COLECCION_METADATOS]
+            guardado = None if completo else await metadatos.find_one({"_id": _id_catalogo(coleccion)})
+            if guardado and guardado.get("version") != VERSION_CATALOGO:
+                guardado = None
+            # Con borrados los contadores guardados ya no valen: se rehace el perfil
+            if guardado and guardado["documentos"] > await self.db[coleccion].estimated_document_count():
+                guardado = None
+
+            campos: Dict[str, Dict[str, Any]] = guardado["campos"] if guardado else {}
+            sketches = {nombre: HyperLogLog.desde_bytes(perfil["hll"]) for nombre, perfil in campos.items()}
+            documentos = guardado["documentos"] if guardado else 0
+            marca_agua = guardado.get("marca_agua") if guardado else None
+            campos_previos = set(campos) if guardado else None
+
+            consulta = {"_id": {"$gt": marca_agua}} if marca_agua is not None else {}
+            cursor = self.db[coleccion].find(consulta, {CAMPO_NORMALIZADO: 0}).sort("_id", 1).batch_size(tamano_lote)
+
+            procesados = 0
+            while True:
+                lote = await a_lista(cursor, tamano_lote)
+                if not lote:
+                    break
+                marca_agua = lote[-1]["_id"]
+                combinar_perfiles(campos, sketches, await ejecutor_analitica.ejecutar(perfilar_lote, lote))
+                procesados += len(lote)
+
+            documentos += procesados
+            for nombre, sketch in sketches.items():
+                campos[nombre]["hll"] = sketch.a_bytes()
+                campos[nombre]["cardinalidad"] = sketch.estimar()
+
+            await metadatos.replace_one(
+                {"_id": _id_catalogo(coleccion)},
+                {
+                    "version": VERSION_CATALOGO,
+                    "coleccion": coleccion,
+                    "documentos": documentos,
+                    "marca_agua": marca_agua,
+                    "campos": campos,
+                    "actualizado": datetime.utcnow(),
+                },
+                upsert=True
+            )
+            # Los esquemas cacheados quedan viejos si apareció (o se perdió) algún campo
+            if set(campos) != campos_previos:
+                cache_resultados.invalidar(coleccion)
+            return {"success": True, "coleccion": coleccion, "procesados": procesados, "documentos": documentos}
+        except Exception as e:
+            logger.error("Error perfilando %s: %s", coleccion, e)
+            return {"success": False, "procesados": 0, "error": str(e)}
+
+    def perfilar_en_segundo_plano(self, coleccion: str):
+        """Lanza `perfilar` sin esperar, salvo que ya haya uno en curso para la colección."""
+        tarea = _perfilando.get(coleccion)
+        if tarea is None or tarea.done():
+            _perfilando[coleccion] = asyncio.create_task(self.perfilar(coleccion))
+
+    async def obtener(self, coleccion: str) -> Optional[Dict[str, Any]]:
+        """Perfil guardado de la colección con métricas por campo, o None si no existe."""
+        guardado = await self.db[COLECCION_METADATOS].find_one({"_id": _id_catalogo(coleccion)})
+        if not guardado or guardado.get("version") != VERSION_CATALOGO:
+            return None
+        documentos = guardado["documentos"]
+        return {
+            "coleccion": coleccion,
+            "documentos": documentos,
+            "actualizado": guardado.get("actualizado"),
+            "campos": [
+                resumir_campo(nombre, perfil, documentos)
+                for nombre, perfil in sorted(guardado["campos"].items())
+            ],
+        }
+
+    async def cardinalidad(self, coleccion: str, campo: str) -> Optional[Dict[str, Any]]:
+        """Valores distintos estimados de `campo` con el HyperLogLog guardado en el perfil.
+
+        None si la colección no está perfilada o el campo no es de primer nivel.
+        """
+        guardado = await self.db[COLECCION_METADATOS].find_one(
+            {"_id": _id_catalogo(coleccion)},
+            {"version": 1, "documentos": 1, f"campos.{campo}.hll": 1}
+        )
+        if not guardado or guardado.get("version") != VERSION_CATALOGO:
+            return None
+        perfil = guardado.get("campos", {}).get(campo)
+        if not perfil or "hll" not in perfil:
+            return None
+        sketch = HyperLogLog.desde_bytes(perfil["hll"])
+        return {
+            "estimada": sketch.estimar(),
+            "error_relativo": round(sketch.error_relativo, 4),
+            "documentos": guardado["documentos"],
+        }
+
+    async def campos_numericos(self, coleccion: str, umbral: float = UMBRAL_NUMERICO) -> Optional[List[str]]:
+        """Campos cuya proporción de valores numéricos supera `umbral` (None si no hay perfil)."""
+        catalogo = await self.obtener(coleccion)
+        if catalogo is None:
+            return None
+        return [campo["campo"] for campo in catalogo["campos"] if es_numerico(campo, umbral)]
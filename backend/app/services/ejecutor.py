@@ -0,0 +1,107 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import multiprocessing
+import os
+
+# Procesos por defecto como máximo: cada worker de uvicorn tiene su propio pool
+ANALITICA_WORKERS_DEFECTO_MAX = 2
+
+
+def _nucleos_disponibles() -> int:
+    """Núcleos que este proceso puede usar (respeta taskset/cpuset; `cpu_count` cuenta los del host)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Configuración por variables de entorno
+ANALITICA_WORKERS = int(os.getenv("ANALITICA_WORKERS", "0")) or min(_nucleos_disponibles(), ANALITICA_WORKERS_DEFECTO_MAX)
+ANALITICA_COLA_MAX = int(os.getenv("ANALITICA_COLA_MAX", "32"))
+ANALITICA_TIMEOUT = float(os.getenv("ANALITICA_TIMEOUT", "60"))
+
+
+class ColaLlenaError(Exception):
+    """No hay lugar en la cola de trabajos de analítica."""
+
+
+class TiempoAgotadoError(Exception):
+    """Un trabajo de analítica superó ANALITICA_TIMEOUT."""
+
+
+class EjecutorAnalitica:
+    """Pool de procesos para la analítica CPU-bound (pandas/sklearn).
+
+    Mantiene el event loop libre mientras se ajustan modelos. Los trabajos en
+    curso o en espera están acotados por `cola_max`; cuando se llena se rechazan
+    de inmediato en lugar de acumular latencia.
+    """
+
+    def __init__(self, workers: int, cola_max: int, timeout: float):
+        self.workers = workers
+        self.cola_max = cola_max
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pendientes = 0
+        self.completados = 0
+        self.rechazados = 0
+        self.vencidos = 0
+
+    def _obtener_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # "spawn" evita heredar los hilos y sockets del proceso de uvicorn
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _liberar(self, _futuro):
+        self._pendientes -= 1
+        self.completados += 1
+
+    async def ejecutar(self, funcion: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta `funcion(*args)` en el pool; la función y sus argumentos deben ser serializables."""
+        if self._pendientes >= self.cola_max:
+            self.rechazados += 1
+            raise ColaLlenaError(f"Cola de analítica llena ({self.cola_max} trabajos)")
+
+        futuro = asyncio.get_running_loop().run_in_executor(self._obtener_pool(), funcion, *args)
+        # El lugar en la cola se libera cuando el proceso termina, no cuando vence la espera
+        self._pendientes += 1
+        futuro.add_done_callback(self._liberar)
+        try:
+            return await asyncio.wait_for(asyncio.shield(futuro), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.vencidos += 1
+            raise TiempoAgotadoError(f"El trabajo de analítica superó {self.timeout:g} s")
+        except BrokenProcessPool:
+            # Un worker murió (p. ej. sin memoria): el próximo trabajo crea un pool nuevo
+            self._pool = None
+            raise
+
+    async def precalentar(self, funcion: Callable[[], Any]):
+        """Arranca los workers ejecutando `funcion` en cada uno (p. ej. cargar pandas/sklearn)."""
+        pool = self._obtener_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, funcion) for _ in range(self.workers)))
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "cola_max": self.cola_max,
+            "timeout": self.timeout,
+            "pendientes": self._pendientes,
+            "completados": self.completados,
+            "rechazados": self.rechazados,
+            "vencidos": self.vencidos,
+        }
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+ejecutor_analitica = EjecutorAnalitica(ANALITICA_WORKERS, ANALITICA_COLA_MAX, ANALITICA_TIMEOUT)
@@ -0,0 +1,201 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, List, Optional
+
+# Claves de un nodo del plan que apuntan a sus hijos (motor clásico y SBE)
+_CLAVES_HIJOS = ("inputStage", "inputStages", "thenStage", "elseStage", "outerStage", "innerStage", "queryPlan")
+# Etapas del pipeline a partir de las cuales un `$sort` ya no ordena documentos sino grupos
+_ETAPAS_AGREGADORAS = {"$group", "$bucket", "$unwind", "$facet"}
+
+
+def etapas_del_plan(nodo: Any) -> List[Dict[str, Any]]:
+    """Recorre un documento de `explain` y devuelve todas las etapas del plan ganador."""
+    etapas: List[Dict[str, Any]] = []
+    if isinstance(nodo, dict):
+        if "stage" in nodo and isinstance(nodo["stage"], str):
+            etapas.append(nodo)
+        for clave, valor in nodo.items():
+            # Los planes descartados no se ejecutan
+            if clave != "rejectedPlans":
+                etapas.extend(etapas_del_plan(valor))
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            etapas.extend(etapas_del_plan(valor))
+    return etapas
+
+
+def analizar_plan(explicacion: Dict[str, Any]) -> Dict[str, Any]:
+    """Resume un `explain`: índices usados, COLLSCAN y ordenamientos en memoria."""
+    # Solo el plan (no `executionStats`, que repite las mismas etapas)
+    etapas = etapas_del_plan(_seccion_cursor(explicacion).get("queryPlanner", {}))
+    nombres = [etapa["stage"] for etapa in etapas]
+    # SORT de la consulta o `$sort` del pipeline sobre documentos (no sobre grupos)
+    # que no se pudo resolver con un índice. Con SBE el `$group` se empuja al plan
+    # (GROUP) y un SORT por encima de él ordena grupos, no documentos.
+    filas = _aplanar_plan(_seccion_cursor(explicacion).get("queryPlanner", {}).get("winningPlan", {}))
+    ordena_en_memoria = False
+    for i, fila in enumerate(filas):
+        if fila["etapa"] != "SORT":
+            continue
+        subarbol = []
+        for siguiente in filas[i + 1:]:
+            if siguiente["nivel"] <= fila["nivel"]:
+                break
+            subarbol.append(siguiente["etapa"])
+        if "GROUP" not in subarbol:
+            ordena_en_memoria = True
+    for etapa in explicacion.get("stages", []):
+        if set(etapa) & _ETAPAS_AGREGADORAS:
+            break
+        if "$sort" in etapa:
+            ordena_en_memoria = True
+    return {
+        "etapas": nombres,
+        "indices": sorted({etapa["indexName"] for etapa in etapas if etapa.get("indexName")}),
+        "collscan": "COLLSCAN" in nombres,
+        "orden_en_memoria": ordena_en_memoria,
+    }
+
+
+def _seccion_cursor(explicacion: Dict[str, Any]) -> Dict[str, Any]:
+    """Parte del `explain` con queryPlanner/executionStats.
+
+    Con el pipeline entero empujado al motor de consultas (SBE) está en la raíz;
+    si no, en la etapa `$cursor` inicial.
+    """
+    if "stages" in explicacion and explicacion["stages"]:
+        return explicacion["stages"][0].get("$cursor", {})
+    return explicacion
+
+
+def _derrama(nodo: Any) -> bool:
+    """True si alguna etapa usó disco (`usedDisk` o `spills` > 0)."""
+    if isinstance(nodo, dict):
+        if nodo.get("usedDisk") is True or (nodo.get("spills") or 0) > 0:
+            return True
+        return any(_derrama(valor) for valor in nodo.values())
+    if isinstance(nodo, list):
+        return any(_derrama(valor) for valor in nodo)
+    return False
+
+
+def _aplanar_plan(nodo: Dict[str, Any], nivel: int = 0) -> List[Dict[str, Any]]:
+    """Árbol del plan ganador como lista (nivel, etapa, índice) fácil de comparar entre corridas."""
+    if not isinstance(nodo, dict) or "stage" not in nodo:
+        # `winningPlan` de SBE envuelve el plan clásico en `queryPlan`
+        hijo = nodo.get("queryPlan") if isinstance(nodo, dict) else None
+        return _aplanar_plan(hijo, nivel) if hijo else []
+    fila = {"nivel": nivel, "etapa": nodo["stage"]}
+    if nodo.get("indexName"):
+        fila["indice"] = nodo["indexName"]
+    if nodo.get("direction") and nodo["stage"] == "IXSCAN":
+        fila["direccion"] = nodo["direction"]
+    filas = [fila]
+    for clave in _CLAVES_HIJOS:
+        hijos = nodo.get(clave)
+        for hijo in hijos if isinstance(hijos, list) else [hijos] if hijos else []:
+            filas.extend(_aplanar_plan(hijo, nivel + 1))
+    return filas
+
+
+def _nombre_etapa(etapa: Dict[str, Any]) -> str:
+    return next((clave for clave in etapa if clave.startswith("$")), "?")
+
+
+def normalizar_explain(explicacion: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte un `explain("executionStats")` de agregación a una forma estable.
+
+    Las claves no dependen de la versión de MongoDB ni de si el pipeline se
+    ejecutó con el motor clásico o con SBE, así que dos salidas se pueden
+    comparar directamente (p. ej. antes y después de crecer los datos).
+    """
+    cursor = _seccion_cursor(explicacion)
+    estadisticas = cursor.get("executionStats", {})
+    plan = analizar_plan(explicacion)
+
+    etapas = []
+    anterior = 0
+    for etapa in explicacion.get("stages", []):
+        acumulado = etapa.get("executionTimeMillisEstimate")
+        etapas.append({
+            "etapa": _nombre_etapa(etapa),
+            "devueltos": etapa.get("nReturned"),
+            "tiempo_ms": acumulado,
+            # Los tiempos de `explain` son acumulados: lo propio es la diferencia con la anterior
+            "tiempo_propio_ms": max(acumulado - anterior, 0) if acumulado is not None else None,
+            "derrame_a_disco": _derrama(etapa),
+        })
+        if acumulado is not None:
+            anterior = acumulado
+    if not etapas:
+        # Pipeline empujado completo al motor de consultas: una sola etapa
+        etapas.append({
+            "etapa": "$cursor",
+            "devueltos": estadisticas.get("nReturned"),
+            "tiempo_ms": estadisticas.get("executionTimeMillis"),
+            "tiempo_propio_ms": estadisticas.get("executionTimeMillis"),
+            "derrame_a_disco": _derrama(estadisticas),
+        })
+
+    return {
+        "plan_ganador": _aplanar_plan(cursor.get("queryPlanner", {}).get("winningPlan", {})),
+        "indices": plan["indices"],
+        "collscan": plan["collscan"],
+        "orden_en_memoria": plan["orden_en_memoria"],
+        "derrame_a_disco": _derrama(explicacion),
+        "docs_examinados": estadisticas.get("totalDocsExamined"),
+        "claves_examinadas": estadisticas.get("totalKeysExamined"),
+        "devueltos": etapas[-1]["devueltos"],
+        "tiempo_ms": estadisticas.get("executionTimeMillis"),
+        "etapas": etapas,
+    }
+
+
+class ExplainService:
+    """Ejecuta `explain` sobre los pipelines de ReporteService y normaliza el resultado."""
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+
+    async def explicar(
+        self,
+        endpoint: str,
+        coleccion: str,
+        verbosidad: str = "executionStats",
+        **parametros
+    ) -> Dict[str, Any]:
+        """Arma el pipeline exacto del endpoint y lo ejecuta con `explain`.
+
+        Con `executionStats` la consulta se ejecuta de verdad (sin devolver
+        documentos), así que cuesta lo mismo que el endpoint.
+        """
+        from app.services.reporte_service import ReporteService
+
+        pipeline, opciones = await ReporteService(self.db).construir_pipeline(endpoint, coleccion, **parametros)
+        explicacion = await self.db.command(
+            "explain",
+            {"aggregate": coleccion, "pipeline": pipeline, "cursor": {}, **opciones},
+            verbosity=verbosidad
+        )
+        return {
+            "success": True,
+            "endpoint": endpoint,
+            "coleccion": coleccion,
+            "parametros": parametros,
+            "pipeline": [_nombre_etapa(etapa) for etapa in pipeline],
+            "servidor": explicacion.get("serverInfo", {}).get("version"),
+            **normalizar_explain(explicacion),
+        }
+
+    async def explicar_todos(self, coleccion: str, endpoints: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Explica varios endpoints (por defecto todos los que no requieren parámetros)."""
+        from app.services.reporte_service import ReporteService
+
+        if endpoints is None:
+            endpoints = [e for e in ReporteService.PIPELINES if e not in ("valores-unicos", "conteo-por-campo")]
+        resultados = []
+        for endpoint in endpoints:
+            try:
+                resultados.append(await self.explicar(endpoint, coleccion))
+            except Exception as e:
+                resultados.append({"success": False, "endpoint": endpoint, "error": str(e)})
+        return resultados
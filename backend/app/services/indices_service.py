@@ -0,0 +1,212 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from typing import Dict, Any, List
+import logging
+from app.services.explain_service import ExplainService
+from app.services.normalizacion_service import CAMPO_NORMALIZADO, coleccion_normalizada
+from app.services.sugerencias_service import COLACION_SUGERENCIAS
+
+logger = logging.getLogger(__name__)
+
+# Índices que necesitan las consultas del dashboard. Las claves siguen la regla
+# igualdad → orden → rango y el orden coincide con el `$sort` de cada pipeline,
+# así que MongoDB lee los primeros `limite` juegos del índice sin ordenar en memoria.
+INDICES_DECLARADOS: List[Dict[str, Any]] = [
+    {
+        "nombre": "norm_rating_reviews_desc",
+        "claves": [(f"{CAMPO_NORMALIZADO}.rating", -1), (f"{CAMPO_NORMALIZADO}.reviews", -1)],
+        "uso": "top-rated-games",
+    },
+    {
+        "nombre": "norm_rating_desc_reviews_asc",
+        "claves": [(f"{CAMPO_NORMALIZADO}.rating", -1), (f"{CAMPO_NORMALIZADO}.reviews", 1)],
+        "uso": "hidden-gems",
+    },
+    {
+        "nombre": "norm_anio_rating_desc",
+        "claves": [(f"{CAMPO_NORMALIZADO}.anio", -1), (f"{CAMPO_NORMALIZADO}.rating", -1)],
+        "uso": "trending-games, conteo por año",
+    },
+    {
+        "nombre": "norm_popularidad_rating_desc",
+        "claves": [(f"{CAMPO_NORMALIZADO}.popularidad", -1), (f"{CAMPO_NORMALIZADO}.rating", -1)],
+        "uso": "top-juegos-populares",
+    },
+    {
+        "nombre": "norm_generos",
+        "claves": [(f"{CAMPO_NORMALIZADO}.generos", 1)],
+        "uso": "filtros y conteo por género (multikey)",
+    },
+    {
+        "nombre": "norm_desarrolladores",
+        "claves": [(f"{CAMPO_NORMALIZADO}.desarrolladores", 1)],
+        "uso": "filtros y conteo por desarrollador (multikey)",
+    },
+    {
+        "nombre": "norm_fecha",
+        "claves": [(f"{CAMPO_NORMALIZADO}.fecha", 1)],
+        "uso": "reportes por rango de fechas (fecha_inicio/fecha_fin)",
+    },
+    {
+        "nombre": "norm_version",
+        "claves": [(f"{CAMPO_NORMALIZADO}.v", 1)],
+        "uso": "detectar documentos sin `_norm` vigente (escritos por fuera de la API)",
+    },
+    {
+        "nombre": "titulo",
+        "claves": [("Title", 1)],
+        "uso": "búsqueda por título",
+    },
+    # Con la colación de las sugerencias (sin mayúsculas ni acentos): el rango de un
+    # prefijo se lee del índice mientras se construye el diccionario en memoria
+    {
+        "nombre": "sugerencias_titulo",
+        "claves": [("Title", 1)],
+        "collation": COLACION_SUGERENCIAS,
+        "uso": "sugerencias de título (primera consulta)",
+    },
+    {
+        "nombre": "sugerencias_generos",
+        "claves": [(f"{CAMPO_NORMALIZADO}.generos", 1)],
+        "collation": COLACION_SUGERENCIAS,
+        "uso": "sugerencias de género (primera consulta)",
+    },
+    {
+        "nombre": "sugerencias_desarrolladores",
+        "claves": [(f"{CAMPO_NORMALIZADO}.desarrolladores", 1)],
+        "collation": COLACION_SUGERENCIAS,
+        "uso": "sugerencias de desarrollador (primera consulta)",
+    },
+]
+
+
+def _firma(claves, collation) -> tuple:
+    """Claves y colación (solo locale y strength) con las que se compara un índice."""
+    colacion = (collation["locale"], collation.get("strength", 3)) if collation else None
+    return tuple(claves), colacion
+
+
+# Endpoints cuyos planes revisa el asesor (todos usan los índices declarados)
+ENDPOINTS_ASESOR = [
+    "top-juegos-populares", "hidden-gems", "trending-games", "top-rated-games",
+    "conteo-por-anio", "conteo-generos", "distribucion-rating", "metricas-dashboard",
+]
+
+
+class IndicesService:
+    """Crea y revisa los índices declarados en `INDICES_DECLARADOS`."""
+
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+
+    async def crear(self, coleccion: str) -> Dict[str, Any]:
+        """Crea los índices declarados que falten (crear uno existente no hace nada)."""
+        try:
+            modelos = [
+                IndexModel(
+                    indice["claves"], name=indice["nombre"],
+                    **({"collation": indice["collation"]} if "collation" in indice else {})
+                )
+                for indice in INDICES_DECLARADOS
+            ]
+            creados = await self.db[coleccion].create_indexes(modelos)
+            return {"success": True, "coleccion": coleccion, "indices": creados}
+        except Exception as e:
+            logger.error("Error creando índices en %s: %s", coleccion, e)
+            return {"success": False, "indices": [], "error": str(e)}
+
+    async def reporte(self, coleccion: str) -> Dict[str, Any]:
+        """Índices declarados que faltan e índices existentes sin uso desde el último reinicio."""
+        try:
+            collection = self.db[coleccion]
+            existentes = {
+                indice["name"]: _firma(indice["key"].items(), indice.get("collation"))
+                async for indice in collection.list_indexes()
+            }
+
+            # Un índice declarado "existe" si hay uno con las mismas claves y colación, aunque tenga otro nombre
+            faltantes = [
+                {"nombre": indice["nombre"], "claves": dict(indice["claves"]), "uso": indice["uso"]}
+                for indice in INDICES_DECLARADOS
+                if _firma(indice["claves"], indice.get("collation")) not in existentes.values()
+            ]
+
+            uso = {}
+            async for estadistica in collection.aggregate([{"$indexStats": {}}]):
+                uso[estadistica["name"]] = {
+                    "operaciones": estadistica["accesses"]["ops"],
+                    "desde": estadistica["accesses"]["since"],
+                }
+            sin_uso = [
+                {"nombre": nombre, "claves": dict(claves), **uso.get(nombre, {})}
+                for nombre, (claves, _) in existentes.items()
+                if nombre != "_id_" and uso.get(nombre, {}).get("operaciones", 0) == 0
+            ]
+
+            return {
+                "success": True,
+                "coleccion": coleccion,
+                "existentes": list(existentes),
+                "faltantes": faltantes,
+                "sin_uso": sin_uso,
+                "uso": uso
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def asesorar(self, coleccion: str) -> Dict[str, Any]:
+        """Ejecuta `explain("executionStats")` sobre los pipelines del dashboard.
+
+        Marca COLLSCAN, ordenamientos en memoria y derrames a disco, con los
+        documentos examinados de cada consulta.
+        """
+        try:
+            materializada = await coleccion_normalizada(self.db, coleccion)
+
+            consultas = []
+            for plan in await ExplainService(self.db).explicar_todos(coleccion, ENDPOINTS_ASESOR):
+                if not plan["success"]:
+                    consultas.append(plan)
+                    continue
+                avisos = []
+                # Un pipeline que no empieza filtrando u ordenando necesita recorrer todo igualmente
+                if plan["collscan"] and plan["pipeline"][0] not in ("$match", "$sort"):
+                    avisos.append("Recorre la colección completa (esperado: agrega todos los documentos)")
+                elif plan["collscan"]:
+                    avisos.append("COLLSCAN: recorre la colección completa")
+                if plan["orden_en_memoria"]:
+                    avisos.append("Ordenamiento en memoria: ningún índice cubre el $sort")
+                if plan["derrame_a_disco"]:
+                    avisos.append("Derrame a disco: una etapa superó el límite de memoria")
+                consultas.append({
+                    "endpoint": plan["endpoint"],
+                    "etapas": [fila["etapa"] for fila in plan["plan_ganador"]],
+                    **{clave: plan[clave] for clave in (
+                        "indices", "collscan", "orden_en_memoria", "derrame_a_disco",
+                        "docs_examinados", "claves_examinadas", "tiempo_ms"
+                    )},
+                    "avisos": avisos
+                })
+
+            recomendaciones = []
+            if not materializada:
+                recomendaciones.append(
+                    "La colección no está normalizada: ejecute POST /normalizar/{coleccion} "
+                    "para que los índices sobre `_norm` se puedan usar"
+                )
+            faltantes = (await self.reporte(coleccion)).get("faltantes", [])
+            if faltantes:
+                recomendaciones.append(
+                    "Faltan índices declarados: " + ", ".join(i["nombre"] for i in faltantes)
+                    + " (POST /indices/{coleccion} o `python -m app.indices`)"
+                )
+
+            return {
+                "success": True,
+                "coleccion": coleccion,
+                "materializada": materializada,
+                "consultas": consultas,
+                "recomendaciones": recomendaciones
+            }
+        except Exception as e:
+            return {"success": False, "consultas": [], "error": str(e)}
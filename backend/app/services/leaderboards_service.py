@@ -0,0 +1,378 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import bisect
+import logging
+import os
+from app.services.cache_service import cache_resultados
+from app.services.normalizacion_service import (
+    CAMPO_NORMALIZADO,
+    CAMPOS_COMPLETITUD,
+    CAMPOS_ORIGEN,
+    etapas_normalizacion,
+    normalizar_documento,
+    registrar_escritura,
+)
+from app.services.rollup_service import gestor_rollup
+
+logger = logging.getLogger(__name__)
+
+# Configuración por variables de entorno
+LEADERBOARDS = [c.strip() for c in os.getenv("LEADERBOARDS", "").split(",") if c.strip()]
+# Mayor `limite` que se sirve desde memoria; pedidos mayores usan el pipeline
+LEADERBOARD_K = int(os.getenv("LEADERBOARD_K", "50"))
+# Posiciones extra que absorben bajas y caídas antes de reconstruir
+LEADERBOARD_BUFFER = int(os.getenv("LEADERBOARD_BUFFER", "50"))
+
+# Errores de change stream que obligan a reconstruir: historial perdido y token inválido
+_CODIGOS_TOKEN_PERDIDO = {260, 280, 286}
+# El servidor no es un replica set: no hay change streams
+_CODIGO_SIN_REPLICA_SET = 40573
+# Campos crudos de los que sale `_norm`: si cambian, el `_norm` calculado ya no vale
+_CAMPOS_CRUDOS = sorted(set(CAMPOS_ORIGEN.values()) | set(CAMPOS_COMPLETITUD))
+
+
+def solo_normalizacion(evento: Dict[str, Any]) -> bool:
+    """Indica si un evento `update` solo escribió `_norm` (backfill o este mismo listener)."""
+    if evento.get("operationType") != "update":
+        return False
+    descripcion = evento.get("updateDescription") or {}
+    if descripcion.get("removedFields"):
+        return False
+    campos = descripcion.get("updatedFields") or {}
+    return bool(campos) and all(campo.split(".")[0] == CAMPO_NORMALIZADO for campo in campos)
+
+
+def _pipeline_stream() -> List[Dict[str, Any]]:
+    """`$match` del change stream que descarta en el servidor los eventos de `solo_normalizacion`.
+
+    Un backfill genera un evento por documento; sin este filtro cada uno
+    traería su `updateLookup` e invalidaría la cache de la colección.
+    """
+    return [{
+        "$match": {
+            "$expr": {
+                "$or": [
+                    {"$ne": ["$operationType", "update"]},
+                    {"$gt": [{"$size": {"$ifNull": ["$updateDescription.removedFields", []]}}, 0]},
+                    # Algún campo modificado fuera de `_norm`
+                    {"$gt": [{"$size": {
+                        "$filter": {
+                            "input": {"$ifNull": [{"$objectToArray": "$updateDescription.updatedFields"}, []]},
+                            "as": "campo",
+                            "cond": {"$ne": [{"$arrayElemAt": [{"$split": ["$$campo.k", "."]}, 0]}, CAMPO_NORMALIZADO]},
+                        }
+                    }}, 0]},
+                ]
+            }
+        }
+    }]
+
+
+def _definiciones() -> Dict[str, List[Dict[str, Any]]]:
+    """Pipeline de cada leaderboard; el `$match`, `$sort` y `$project` se reutilizan en memoria."""
+    from app.services.reporte_service import ReporteService
+
+    return {
+        "top-juegos-populares": ReporteService._pipeline_top_juegos_populares(LEADERBOARD_K),
+        "hidden-gems": ReporteService._pipeline_hidden_gems(LEADERBOARD_K),
+        "trending-games": ReporteService._pipeline_trending_games(LEADERBOARD_K),
+        "top-rated-games": ReporteService._pipeline_top_rated_games(LEADERBOARD_K),
+    }
+
+
+def _valor_ruta(doc: Dict[str, Any], ruta: str) -> Any:
+    valor: Any = doc
+    for parte in ruta.split("."):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+
+def _cumple_condicion(valor: Any, condicion: Any) -> bool:
+    if not isinstance(condicion, dict):
+        return valor == condicion
+    for operador, referencia in condicion.items():
+        if operador == "$nin":
+            if valor in referencia:
+                return False
+        elif operador == "$in":
+            if valor not in referencia:
+                return False
+        elif valor is None or isinstance(valor, (str, list, dict)):
+            # Igual que MongoDB: los rangos numéricos no coinciden con nulos ni con otros tipos
+            return False
+        elif operador == "$gt" and not valor > referencia:
+            return False
+        elif operador == "$gte" and not valor >= referencia:
+            return False
+        elif operador == "$lt" and not valor < referencia:
+            return False
+        elif operador == "$lte" and not valor <= referencia:
+            return False
+    return True
+
+
+def cumple_filtro(doc: Dict[str, Any], filtro: Dict[str, Any]) -> bool:
+    """Evalúa en Python los `$match` simples de los pipelines de leaderboards."""
+    return all(_cumple_condicion(_valor_ruta(doc, ruta), condicion) for ruta, condicion in filtro.items())
+
+
+def clave_orden(doc: Dict[str, Any], orden: Dict[str, int]) -> Tuple:
+    """Clave que ordena como `$sort` (nulos primero en ascendente) con `_id` como desempate."""
+    clave: List[Any] = []
+    for ruta, direccion in orden.items():
+        valor = _valor_ruta(doc, ruta)
+        if direccion == 1:
+            clave.append((0, 0) if valor is None else (1, valor))
+        else:
+            clave.append((1, 0) if valor is None else (0, -valor))
+    clave.append(str(doc["_id"]))
+    return tuple(clave)
+
+
+def evaluar_expresion(expresion: Any, doc: Dict[str, Any]) -> Any:
+    """Evalúa las expresiones usadas en los `$project` de los leaderboards."""
+    if isinstance(expresion, str) and expresion.startswith("$"):
+        return _valor_ruta(doc, expresion[1:])
+    if isinstance(expresion, dict) and len(expresion) == 1:
+        operador, argumentos = next(iter(expresion.items()))
+        if operador == "$ifNull":
+            valor = evaluar_expresion(argumentos[0], doc)
+            return valor if valor is not None else evaluar_expresion(argumentos[1], doc)
+        if operador == "$round":
+            valor = evaluar_expresion(argumentos[0], doc)
+            return round(valor, argumentos[1]) if valor is not None else None
+    return expresion
+
+
+def proyectar(doc: Dict[str, Any], proyeccion: Dict[str, Any]) -> Dict[str, Any]:
+    return {campo: evaluar_expresion(expr, doc) for campo, expr in proyeccion.items() if campo != "_id"}
+
+
+class Leaderboard:
+    """Top-k de un leaderboard mantenido en memoria.
+
+    Guarda exactamente los `capacidad` mejores documentos según el `$sort` del
+    pipeline (k servidos + buffer): cualquier documento fuera de la estructura
+    ordena peor que el último guardado. Mientras eso se cumpla las lecturas son
+    O(k); cuando las bajas dejan menos de k documentos y la estructura no
+    contenía a todos los que cumplen el filtro, hay que reconstruir.
+    """
+
+    def __init__(self, pipeline: List[Dict[str, Any]], capacidad: int):
+        self.filtro = pipeline[0]["$match"]
+        self.orden = pipeline[1]["$sort"]
+        self.proyeccion = pipeline[3]["$project"]
+        self.capacidad = capacidad
+        self._claves: List[Tuple] = []
+        self._filas: Dict[str, Tuple[Tuple, Dict[str, Any]]] = {}
+        # True si en la última reconstrucción cabían todos los documentos que cumplen el filtro
+        self.completo = False
+
+    def cargar(self, documentos: List[Dict[str, Any]]):
+        self._claves, self._filas = [], {}
+        for doc in documentos:
+            self._insertar(doc)
+        self.completo = len(documentos) < self.capacidad
+
+    def _insertar(self, doc: Dict[str, Any]):
+        clave = clave_orden(doc, self.orden)
+        bisect.insort(self._claves, clave)
+        self._filas[str(doc["_id"])] = (clave, proyectar(doc, self.proyeccion))
+
+    def _quitar(self, id_doc: str) -> bool:
+        existente = self._filas.pop(id_doc, None)
+        if existente is None:
+            return False
+        del self._claves[bisect.bisect_left(self._claves, existente[0])]
+        return True
+
+    def aplicar(self, doc: Dict[str, Any]):
+        """Aplica una inserción o modificación (`doc` trae `_norm` ya calculado)."""
+        id_doc = str(doc["_id"])
+        self._quitar(id_doc)
+        if not cumple_filtro(doc, self.filtro):
+            return
+        clave = clave_orden(doc, self.orden)
+        # Si la estructura está recortada, lo que ordena después del último no se conoce
+        if not self.completo and (not self._claves or clave > self._claves[-1]):
+            return
+        self._insertar(doc)
+        if len(self._claves) > self.capacidad:
+            ultima = self._claves[-1]
+            self._quitar(ultima[-1])
+            self.completo = False
+
+    def eliminar(self, id_doc: Any):
+        self._quitar(str(id_doc))
+
+    def necesita_reconstruir(self, k: int) -> bool:
+        return not self.completo and len(self._claves) < k
+
+    def leer(self, limite: int) -> List[Dict[str, Any]]:
+        return [self._filas[clave[-1]][1] for clave in self._claves[:limite]]
+
+
+class GestorLeaderboards:
+    """Leaderboards en memoria por colección, actualizados con change streams.
+
+    Al iniciar se reconstruyen con una consulta por leaderboard; luego cada
+    inserción, modificación o borrado se aplica en O(k). Si el token de
+    reanudación se pierde (historial del oplog vencido) se reconstruye todo.
+    Cada evento también invalida la cache de resultados de la colección y
+    guarda el `_norm` de los documentos escritos por fuera de la API; los
+    eventos que solo tocan `_norm` (backfill) se descartan.
+    """
+
+    def __init__(self, k: int = LEADERBOARD_K, buffer: int = LEADERBOARD_BUFFER):
+        self.k = k
+        self.capacidad = k + buffer
+        self._tablas: Dict[str, Dict[str, Leaderboard]] = {}
+        self._tareas: Dict[str, asyncio.Task] = {}
+        self._listos: Dict[str, bool] = {}
+        self.eventos = 0
+        self.reconstrucciones = 0
+        # Documentos cuyo `_norm` se escribió al recibir un evento externo
+        self.normalizados = 0
+
+    def iniciar(self, db: AsyncIOMotorDatabase, colecciones: List[str]):
+        for coleccion in colecciones:
+            if coleccion not in self._tareas:
+                self._tareas[coleccion] = asyncio.create_task(self._escuchar(db, coleccion))
+
+    async def detener(self):
+        for tarea in self._tareas.values():
+            tarea.cancel()
+        await asyncio.gather(*self._tareas.values(), return_exceptions=True)
+        self._tareas.clear()
+        self._listos.clear()
+
+    def leer(self, coleccion: str, nombre: str, limite: int) -> Optional[List[Dict[str, Any]]]:
+        """Top `limite` desde memoria, o None si hay que usar el pipeline."""
+        if not self._listos.get(coleccion) or limite > self.k:
+            return None
+        tabla = self._tablas[coleccion].get(nombre)
+        return tabla.leer(limite) if tabla is not None else None
+
+    async def reconstruir(self, db: AsyncIOMotorDatabase, coleccion: str):
+        """Recalcula todos los leaderboards de la colección con una consulta cada uno."""
+        prefijo = await etapas_normalizacion(db, coleccion)
+        tablas = {}
+        for nombre, pipeline in _definiciones().items():
+            tabla = Leaderboard(pipeline, self.capacidad)
+            consulta = prefijo + [
+                {"$match": tabla.filtro},
+                {"$sort": {**tabla.orden, "_id": 1}},
+                {"$limit": self.capacidad},
+            ]
+            documentos = await db[coleccion].aggregate(consulta).to_list(length=self.capacidad)
+            tabla.cargar(documentos)
+            tablas[nombre] = tabla
+        self._tablas[coleccion] = tablas
+        self.reconstrucciones += 1
+
+    async def _escuchar(self, db: AsyncIOMotorDatabase, coleccion: str):
+        token = None
+        while True:
+            try:
+                # Abrir el stream antes de reconstruir para no perder eventos intermedios
+                async with db[coleccion].watch(
+                    _pipeline_stream(), full_document="updateLookup", resume_after=token
+                ) as stream:
+                    if token is None:
+                        await self.reconstruir(db, coleccion)
+                        self._listos[coleccion] = True
+                    async for evento in stream:
+                        token = stream.resume_token
+                        if await self._aplicar_evento(db, coleccion, evento):
+                            token = None
+                            break
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == _CODIGO_SIN_REPLICA_SET:
+                    logger.warning("Leaderboards de %s desactivados: se requiere un replica set", coleccion)
+                    self._listos[coleccion] = False
+                    return
+                if e.code in _CODIGOS_TOKEN_PERDIDO:
+                    logger.warning("Token de reanudación perdido en %s: reconstruyendo leaderboards", coleccion)
+                    token = None
+                else:
+                    logger.error("Error en el change stream de %s: %s", coleccion, e)
+                await asyncio.sleep(1)
+            except PyMongoError as e:
+                logger.error("Error en el change stream de %s: %s", coleccion, e)
+                await asyncio.sleep(1)
+
+    async def _aplicar_evento(self, db: AsyncIOMotorDatabase, coleccion: str, evento: Dict[str, Any]) -> bool:
+        """Aplica un evento; devuelve True si hay que reabrir el stream desde cero."""
+        if solo_normalizacion(evento):
+            # `_norm` ya refleja los campos crudos: no cambió nada visible
+            return False
+        self.eventos += 1
+        cache_resultados.invalidar(coleccion)
+        await registrar_escritura(db, coleccion)
+        tipo = evento["operationType"]
+        tablas = self._tablas.get(coleccion, {})
+        if tipo in ("update", "replace", "delete"):
+            # Sin la versión anterior del documento el cubo no se puede restar: se reconstruye
+            await gestor_rollup.marcar_desactualizado(db, coleccion)
+
+        if tipo in ("insert", "update", "replace"):
+            doc = evento.get("fullDocument")
+            if doc is None:
+                # El documento se borró antes del lookup; llegará su evento delete
+                return False
+            await self._persistir_normalizacion(db, coleccion, doc)
+            for tabla in tablas.values():
+                tabla.aplicar(doc)
+        elif tipo == "delete":
+            for tabla in tablas.values():
+                tabla.eliminar(evento["documentKey"]["_id"])
+        elif tipo in ("drop", "rename", "dropDatabase", "invalidate"):
+            self._listos[coleccion] = False
+            return True
+
+        if any(tabla.necesita_reconstruir(self.k) for tabla in tablas.values()):
+            await self.reconstruir(db, coleccion)
+        return False
+
+    async def _persistir_normalizacion(self, db: AsyncIOMotorDatabase, coleccion: str, doc: Dict[str, Any]):
+        """Calcula `_norm` de `doc` y lo guarda si el almacenado falta o quedó viejo.
+
+        Así los demás pipelines y `reconstruir` leen los mismos valores que los
+        leaderboards tras una escritura externa. La escritura solo aplica si los
+        campos crudos siguen como en el evento (si cambiaron, llegará otro) y su
+        propio evento `update` se descarta con `solo_normalizacion`.
+        """
+        norm = normalizar_documento(doc)
+        if doc.get(CAMPO_NORMALIZADO) != norm:
+            guarda = {campo: doc.get(campo) for campo in _CAMPOS_CRUDOS}
+            resultado = await db[coleccion].update_one(
+                {"_id": doc["_id"], **guarda, CAMPO_NORMALIZADO: {"$ne": norm}},
+                {"$set": {CAMPO_NORMALIZADO: norm}}
+            )
+            self.normalizados += resultado.modified_count
+        doc[CAMPO_NORMALIZADO] = norm
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "k": self.k,
+            "capacidad": self.capacidad,
+            "colecciones": {
+                coleccion: {
+                    "listo": self._listos.get(coleccion, False),
+                    "tamanos": {nombre: len(t._claves) for nombre, t in self._tablas.get(coleccion, {}).items()},
+                }
+                for coleccion in self._tareas
+            },
+            "eventos": self.eventos,
+            "reconstrucciones": self.reconstrucciones,
+            "normalizados": self.normalizados,
+        }
+
+
+gestor_leaderboards = GestorLeaderboards()
@@ -0,0 +1,269 @@
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import time
+
+# Métricas en memoria con salida en formato de texto de Prometheus (/metrics).
+# Los valores son por proceso: con varios workers cada uno expone los suyos.
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_DOCUMENTOS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _numero(valor: float) -> str:
+    """Número sin notación científica para enteros (buckets de bytes, conteos)."""
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def _escapar(valor: Any) -> str:
+    """Valor de etiqueta con `\\`, `"` y saltos de línea escapados (formato de texto de Prometheus)."""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatear_etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+
+    def _clave(self, etiquetas: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(etiquetas.get(nombre, "")) for nombre in self.etiquetas)
+
+    def exponer(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"] + self._lineas()
+
+    def _lineas(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def incrementar(self, valor: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def _lineas(self) -> List[str]:
+        return [
+            f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+            for clave, valor in self._valores.items()
+        ]
+
+
+class Medidor(_Metrica):
+    tipo = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def sumar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def _lineas(self) -> List[str]:
+        return [
+            f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+            for clave, valor in self._valores.items()
+        ]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Iterable[str] = (), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+        # clave => [conteos por bucket..., suma, total]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observar(self, valor: float, **etiquetas):
+        serie = self._series.setdefault(self._clave(etiquetas), [0] * len(self.buckets) + [0.0, 0])
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                serie[i] += 1
+                break
+        serie[-2] += valor
+        serie[-1] += 1
+
+    def _lineas(self) -> List[str]:
+        lineas = []
+        for clave, serie in self._series.items():
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, serie):
+                acumulado += conteo
+                etiquetas = _formatear_etiquetas(self.etiquetas, clave, f'le="{_numero(limite)}"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {_numero(acumulado)}")
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave, 'le="+Inf"')
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {_numero(serie[-1])}")
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(round(serie[-2], 6))}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {_numero(serie[-1])}")
+        return lineas
+
+
+# --- Métricas HTTP ----------------------------------------------------------
+http_duracion = Histograma(
+    "http_request_duration_seconds", "Latencia de las solicitudes HTTP por ruta", ("metodo", "ruta", "estado")
+)
+http_en_curso = Medidor("http_requests_in_progress", "Solicitudes HTTP en curso", ("metodo", "ruta"))
+http_bytes = Histograma(
+    "http_response_size_bytes", "Tamaño del cuerpo de las respuestas", ("metodo", "ruta"), BUCKETS_BYTES
+)
+
+# --- Métricas de ReporteService ---------------------------------------------
+servicio_duracion = Histograma(
+    "reporte_service_duration_seconds", "Latencia total de cada método de ReporteService", ("metodo",)
+)
+servicio_mongo = Histograma(
+    "reporte_service_mongo_seconds", "Tiempo esperando a MongoDB dentro de cada método", ("metodo",)
+)
+servicio_python = Histograma(
+    "reporte_service_python_seconds", "Tiempo fuera de MongoDB (Python) dentro de cada método", ("metodo",)
+)
+servicio_documentos = Histograma(
+    "reporte_service_documents", "Documentos devueltos por MongoDB en cada llamada", ("metodo",), BUCKETS_DOCUMENTOS
+)
+servicio_errores = Contador(
+    "reporte_service_errors_total", "Llamadas que devolvieron success=False o lanzaron una excepción", ("metodo",)
+)
+
+REGISTRO = [
+    http_duracion, http_en_curso, http_bytes,
+    servicio_duracion, servicio_mongo, servicio_python, servicio_documentos, servicio_errores,
+]
+
+
+def exponer_metricas() -> str:
+    """Todas las métricas en formato de texto de Prometheus 0.0.4."""
+    lineas: List[str] = []
+    for metrica in REGISTRO:
+        lineas.extend(metrica.exponer())
+    return "\n".join(lineas) + "\n"
+
+
+# Acumulador del método en curso: [segundos en MongoDB, documentos]
+_medicion_actual: ContextVar[Optional[List[float]]] = ContextVar("medicion_actual", default=None)
+
+
+async def a_lista(cursor, length: Optional[int]) -> List[Dict[str, Any]]:
+    """`cursor.to_list` que suma el tiempo en MongoDB y los documentos al método medido."""
+    medicion = _medicion_actual.get()
+    inicio = time.perf_counter()
+    try:
+        resultados = await cursor.to_list(length=length)
+    finally:
+        if medicion is not None:
+            medicion[0] += time.perf_counter() - inicio
+    if medicion is not None:
+        medicion[1] += len(resultados)
+    return resultados
+
+
+async def iterar(cursor) -> AsyncIterator[Dict[str, Any]]:
+    """Recorre un cursor documento a documento con la misma contabilidad que `a_lista`."""
+    medicion = _medicion_actual.get()
+    while True:
+        inicio = time.perf_counter()
+        try:
+            doc = await cursor.__anext__()
+        except StopAsyncIteration:
+            break
+        finally:
+            if medicion is not None:
+                medicion[0] += time.perf_counter() - inicio
+        if medicion is not None:
+            medicion[1] += 1
+        yield doc
+
+
+def medido(funcion):
+    """Registra latencia total, tiempo en MongoDB/Python y documentos de un método async."""
+    metodo = funcion.__name__
+
+    @wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        medicion = [0.0, 0]
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        fallo = False
+        try:
+            resultado = await funcion(*args, **kwargs)
+            fallo = isinstance(resultado, dict) and resultado.get("success") is False
+            return resultado
+        except BaseException:
+            fallo = True
+            raise
+        finally:
+            _medicion_actual.reset(token)
+            total = time.perf_counter() - inicio
+            servicio_duracion.observar(total, metodo=metodo)
+            servicio_mongo.observar(medicion[0], metodo=metodo)
+            servicio_python.observar(max(total - medicion[0], 0.0), metodo=metodo)
+            servicio_documentos.observar(medicion[1], metodo=metodo)
+            if fallo:
+                servicio_errores.incrementar(metodo=metodo)
+
+    return envoltura
+
+
+def _plantilla_ruta(app, scope) -> str:
+    """Plantilla de la ruta (`/api/reportes/estadisticas/{coleccion}`) para no etiquetar por URL."""
+    from starlette.routing import Match
+
+    for ruta in getattr(app, "routes", []):
+        coincidencia, _ = ruta.matches(scope)
+        if coincidencia == Match.FULL:
+            return getattr(ruta, "path", scope["path"])
+    return "sin_ruta"
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI: latencia, solicitudes en curso y bytes de respuesta por ruta.
+
+    Cuenta los bytes a medida que se envían, así que también mide las
+    respuestas en streaming (exportaciones CSV/NDJSON).
+    """
+
+    def __init__(self, app, rutas_excluidas: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.rutas_excluidas = set(rutas_excluidas)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.rutas_excluidas:
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        ruta = _plantilla_ruta(scope["app"], scope) if "app" in scope else scope["path"]
+        estado = {"codigo": 500, "bytes": 0}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                estado["bytes"] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        http_en_curso.sumar(1, metodo=metodo, ruta=ruta)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            http_en_curso.sumar(-1, metodo=metodo, ruta=ruta)
+            http_duracion.observar(time.perf_counter() - inicio, metodo=metodo, ruta=ruta, estado=estado["codigo"])
+            http_bytes.observar(estado["bytes"], metodo=metodo, ruta=ruta)
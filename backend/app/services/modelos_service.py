@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, List, Optional, Tuple
+import hashlib
+import json
+import os
+from app.services.cache_service import CACHE_DESACTIVADA
+from app.services.normalizacion_service import a_numero, version_datos
+
+# Configuración por variables de entorno
+MODELOS_MAX_ENTRADAS = int(os.getenv("MODELOS_MAX_ENTRADAS", "64"))
+# Colección interna donde se persisten los modelos ajustados
+COLECCION_MODELOS = "_modelos"
+# Filas máximas por llamada a `predecir`
+MAX_FILAS_PREDICCION = 100_000
+
+
+def _hash_filtros(filtros: Optional[Dict[str, Any]]) -> str:
+    texto = json.dumps(filtros or {}, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+class CacheModelos:
+    """Regresiones ajustadas, persistidas en `_modelos` con una LRU en memoria delante.
+
+    La clave es (colección, features, objetivo, hash de filtros, modo, límite,
+    versión de datos) y el `model_id` es su hash: la misma consulta sobre los
+    mismos datos no vuelve a descargar ni ajustar nada, y una escritura en la
+    colección (que incrementa su versión compartida en `_metadatos`) hace que el
+    siguiente pedido reajuste. Como el modelo queda en Mongo, cualquier worker
+    (o el mismo proceso tras reiniciarse) puede predecir con ese `model_id`; la
+    LRU solo evita leerlo de la base en cada predicción.
+    """
+
+    def __init__(self, max_entradas: int = MODELOS_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._modelos: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.predicciones = 0
+        self.cargados = 0
+
+    @staticmethod
+    async def clave(
+        db: AsyncIOMotorDatabase,
+        coleccion: str,
+        features: List[str],
+        campo_y: str,
+        filtros: Optional[Dict[str, Any]],
+        modo: str,
+        limite: Optional[int]
+    ) -> Tuple:
+        # El límite solo cambia el resultado con `modo="muestra"`
+        return (
+            coleccion, tuple(features), campo_y, _hash_filtros(filtros), modo,
+            limite if modo == "muestra" else None, await version_datos(db, coleccion)
+        )
+
+    @staticmethod
+    def model_id(clave: Tuple) -> str:
+        return hashlib.sha1(repr(clave).encode("utf-8")).hexdigest()[:16]
+
+    def _recordar(self, modelo: Dict[str, Any]):
+        self._modelos[modelo["model_id"]] = modelo
+        self._modelos.move_to_end(modelo["model_id"])
+        while len(self._modelos) > self.max_entradas:
+            self._modelos.popitem(last=False)
+            self.desalojos += 1
+
+    async def buscar(self, db: AsyncIOMotorDatabase, clave: Tuple) -> Optional[Dict[str, Any]]:
+        """Modelo ajustado con esa clave, o None."""
+        modelo = None if CACHE_DESACTIVADA else await self.obtener(db, self.model_id(clave))
+        if modelo is None:
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        return modelo
+
+    async def guardar(self, db: AsyncIOMotorDatabase, clave: Tuple, resultado: Dict[str, Any]) -> str:
+        """Guarda el resultado de una regresión exitosa y devuelve su `model_id`."""
+        model_id = self.model_id(clave)
+        modelo = {
+            "model_id": model_id,
+            "coleccion": clave[0],
+            "features": list(clave[1]),
+            "campo_y": clave[2],
+            "filtros": clave[3],
+            "modo": clave[4],
+            "limite": clave[5],
+            "version_datos": clave[6],
+            "resultado": resultado,
+            "creado": datetime.utcnow(),
+        }
+        await db[COLECCION_MODELOS].replace_one({"_id": model_id}, {"_id": model_id, **modelo}, upsert=True)
+        self._recordar(modelo)
+        return model_id
+
+    async def obtener(self, db: AsyncIOMotorDatabase, model_id: str) -> Optional[Dict[str, Any]]:
+        """Modelo por `model_id`: de la LRU o, si no está, de `_modelos`."""
+        modelo = self._modelos.get(model_id)
+        if modelo is not None:
+            self._modelos.move_to_end(model_id)
+            return modelo
+        modelo = await db[COLECCION_MODELOS].find_one({"_id": model_id})
+        if modelo is None:
+            return None
+        modelo.pop("_id", None)
+        self.cargados += 1
+        self._recordar(modelo)
+        return modelo
+
+    async def predecir(self, db: AsyncIOMotorDatabase, model_id: str, filas: List[Any]) -> Optional[Dict[str, Any]]:
+        """Predice todas las `filas` con una sola operación matricial.
+
+        Cada fila es un dict {feature: valor} o una lista en el orden de las
+        features. Las filas con algún valor faltante o no numérico predicen None.
+        Retorna None si el modelo no existe.
+        """
+        import numpy as np
+
+        modelo = await self.obtener(db, model_id)
+        if modelo is None:
+            return None
+        if len(filas) > MAX_FILAS_PREDICCION:
+            raise ValueError(f"Se aceptan hasta {MAX_FILAS_PREDICCION} filas por llamada")
+
+        features = modelo["features"]
+        matriz = np.empty((len(filas), len(features)), dtype=np.float64)
+        for i, fila in enumerate(filas):
+            if isinstance(fila, dict):
+                valores = [fila.get(f) for f in features]
+            elif isinstance(fila, list) and len(fila) == len(features):
+                valores = fila
+            else:
+                raise ValueError(f"La fila {i} debe ser un objeto o una lista de {len(features)} valores")
+            # None (faltante o no numérico) pasa a NaN
+            matriz[i] = [a_numero(v) for v in valores]
+
+        resultado = modelo["resultado"]
+        predicciones = matriz @ np.asarray(resultado["coeficientes"], dtype=np.float64) + resultado["intercept"]
+        self.predicciones += len(filas)
+        return {
+            "success": True,
+            "model_id": model_id,
+            "features": features,
+            "campo_y": modelo["campo_y"],
+            "predicciones": [float(p) if np.isfinite(p) else None for p in predicciones],
+            "n": len(filas),
+        }
+
+    async def estadisticas(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        return {
+            "modelos": len(self._modelos),
+            "persistidos": await db[COLECCION_MODELOS].count_documents({}),
+            "max_entradas": self.max_entradas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+            "cargados_de_mongo": self.cargados,
+            "filas_predichas": self.predicciones,
+        }
+
+
+cache_modelos = CacheModelos()
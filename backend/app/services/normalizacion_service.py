@@ -0,0 +1,462 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import logging
+import os
+import re
+import time
+from app.services.cache_service import cache_resultados
+
+logger = logging.getLogger(__name__)
+
+# Subdocumento donde se materializan los campos normalizados de cada juego
+CAMPO_NORMALIZADO = "_norm"
+
+# Se incrementa cada vez que cambian las reglas de normalización para que el
+# backfill vuelva a procesar los documentos escritos con reglas anteriores
+# (2: fecha de lanzamiento como fecha BSON y mes)
+VERSION_NORMALIZACION = 2
+
+# Colección interna con marcadores de estado (no se muestra en el frontend)
+COLECCION_METADATOS = "_metadatos"
+
+# Backfills lanzados al encontrar documentos sin `_norm` vigente (uno por colección)
+_normalizando: Dict[str, asyncio.Task] = {}
+
+# Segundos que se confía en un resultado positivo de `coleccion_normalizada` sin
+# volver a consultar; las escrituras por la API lo descartan antes
+NORMALIZADA_TTL = float(os.getenv("NORMALIZADA_TTL", "30"))
+# (base de datos, colección) => instante hasta el que se confía en que está normalizada
+_normalizadas: Dict[Tuple[str, str], float] = {}
+
+# Campo de origen de cada campo normalizado
+CAMPOS_ORIGEN = {
+    "rating": "Rating",
+    "reviews": "Reviews",
+    "playing": "Playing",
+    "anio": "Release_Date",
+    "generos": "Genres",
+    "desarrolladores": "Developers",
+}
+
+# Campos que cuentan para la completitud usada en la puntuación de popularidad
+CAMPOS_COMPLETITUD = ["Title", "Rating", "Genres", "Developers", "Release_Date"]
+
+# Formato declarado de `Release_Date` en el dataset ("Feb 25, 2022")
+FORMATO_FECHA = "%b %d, %Y"
+_MESES = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+_REGEX_NUMERO = re.compile(r"^-?[0-9]+(\.[0-9]+)?$")
+_REGEX_ANIO = re.compile(r"\d{4}")
+# Equivalente de FORMATO_FECHA para el servidor (también acepta el mes completo: "February 25, 2022")
+_REGEX_FECHA = r"^\s*([A-Za-z]{3})[A-Za-z]*\.?\s+([0-9]{1,2}),\s*([0-9]{4})\s*$"
+
+
+def a_numero(valor: Any) -> Optional[float]:
+    """Convierte números y strings numéricos ("4.5") a número; el resto a None."""
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return valor if valor == valor else None  # NaN => None
+    if isinstance(valor, str):
+        texto = valor.strip()
+        if _REGEX_NUMERO.match(texto):
+            return float(texto)
+    return None
+
+
+def extraer_anio(valor: Any) -> Optional[int]:
+    """Extrae el primer año de 4 dígitos de un valor ("Feb 25, 2022" => 2022)."""
+    if valor is None:
+        return None
+    match = _REGEX_ANIO.search(str(valor))
+    return int(match.group(0)) if match else None
+
+
+def parsear_fecha(valor: Any, formato: str = FORMATO_FECHA) -> Optional[datetime]:
+    """Convierte una fecha de lanzamiento a `datetime` ("Feb 25, 2022" => 2022-02-25).
+
+    Las fechas BSON se devuelven tal cual; lo que no respeta el formato
+    ("releases on TBD", "2022") devuelve None.
+    """
+    if isinstance(valor, datetime):
+        return valor
+    if not isinstance(valor, str):
+        return None
+    texto = valor.strip()
+    try:
+        return datetime.strptime(texto, formato)
+    except ValueError:
+        pass
+    if formato == FORMATO_FECHA:
+        match = re.match(_REGEX_FECHA, texto)
+        if match and match.group(1).lower() in _MESES:
+            try:
+                return datetime(int(match.group(3)), _MESES.index(match.group(1).lower()) + 1, int(match.group(2)))
+            except ValueError:
+                return None
+    return None
+
+
+def parsear_lista(valor: Any) -> List[str]:
+    """Convierte arrays o listas serializadas ("['Adventure', 'RPG']") a lista de strings."""
+    if valor is None:
+        return []
+    if isinstance(valor, list):
+        elementos = [str(v) for v in valor if v is not None]
+    else:
+        texto = str(valor).replace("[", "").replace("]", "").replace("'", "")
+        elementos = texto.split(",")
+    return [e.strip() for e in elementos if e.strip() and e.strip() != "null"]
+
+
+def normalizar_documento(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Calcula el subdocumento `_norm` de un juego a partir de sus campos crudos."""
+    rating = a_numero(doc.get(CAMPOS_ORIGEN["rating"]))
+    reviews = a_numero(doc.get(CAMPOS_ORIGEN["reviews"])) or 0
+    playing = a_numero(doc.get(CAMPOS_ORIGEN["playing"])) or 0
+    completitud = sum(1 for campo in CAMPOS_COMPLETITUD if doc.get(campo) is not None)
+    fecha = parsear_fecha(doc.get(CAMPOS_ORIGEN["anio"]))
+
+    return {
+        "v": VERSION_NORMALIZACION,
+        "rating": float(rating) if rating is not None else None,
+        "reviews": reviews,
+        "playing": playing,
+        "fecha": fecha,
+        # Sin fecha completa se conserva el año si aparece ("2022")
+        "anio": fecha.year if fecha else extraer_anio(doc.get(CAMPOS_ORIGEN["anio"])),
+        "mes": fecha.month if fecha else None,
+        "generos": parsear_lista(doc.get(CAMPOS_ORIGEN["generos"])),
+        "desarrolladores": parsear_lista(doc.get(CAMPOS_ORIGEN["desarrolladores"])),
+        "popularidad": (rating or 0) * 2 + min(reviews / 100, 5) + completitud * 0.5,
+    }
+
+
+# --- Expresiones equivalentes de agregación ---------------------------------
+# Se usan cuando una colección todavía no tiene los campos materializados, o
+# cuando un endpoint recibe un campo distinto al de origen por defecto.
+
+def expr_numero(ref: str, defecto: Any = None) -> Dict[str, Any]:
+    """Expresión que convierte `ref` a número (o `defecto` si no es convertible)."""
+    return {
+        "$cond": {
+            "if": {"$isNumber": ref},
+            "then": ref,
+            "else": {
+                "$convert": {"input": ref, "to": "double", "onError": defecto, "onNull": defecto}
+            }
+        }
+    }
+
+
+def expr_anio(ref: str) -> Dict[str, Any]:
+    """Expresión que extrae el primer año de 4 dígitos de `ref`."""
+    return {
+        "$let": {
+            "vars": {
+                "match": {
+                    "$regexFind": {
+                        "input": {"$toString": {"$ifNull": [ref, ""]}},
+                        "regex": r"\d{4}"
+                    }
+                }
+            },
+            "in": {
+                "$cond": {
+                    "if": {"$ne": ["$$match", None]},
+                    "then": {"$toInt": "$$match.match"},
+                    "else": None
+                }
+            }
+        }
+    }
+
+
+def expr_fecha(ref: str, formato: str = FORMATO_FECHA) -> Dict[str, Any]:
+    """Expresión que convierte `ref` a fecha BSON (null si no respeta `formato`).
+
+    Para el formato del dataset la fecha se arma con `$regexFind` y
+    `$dateFromParts`, que (a diferencia de `%b` en `$dateFromString`) funcionan
+    en cualquier versión de MongoDB con agregación de regex; para otros
+    formatos se usa `$dateFromString`. Las fechas BSON pasan sin cambios.
+    """
+    if formato == FORMATO_FECHA:
+        desde_texto = {
+            "$let": {
+                "vars": {"m": {"$regexFind": {"input": {"$toString": ref}, "regex": _REGEX_FECHA}}},
+                "in": {
+                    "$let": {
+                        "vars": {
+                            "mes": {"$indexOfArray": [_MESES, {"$toLower": {"$arrayElemAt": ["$$m.captures", 0]}}]}
+                        },
+                        "in": {
+                            "$cond": {
+                                "if": {"$and": [{"$ne": ["$$m", None]}, {"$gte": ["$$mes", 0]}]},
+                                "then": {
+                                    "$dateFromParts": {
+                                        "year": {"$toInt": {"$arrayElemAt": ["$$m.captures", 2]}},
+                                        "month": {"$add": ["$$mes", 1]},
+                                        "day": {"$toInt": {"$arrayElemAt": ["$$m.captures", 1]}}
+                                    }
+                                },
+                                "else": None
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    else:
+        desde_texto = {
+            "$dateFromString": {"dateString": {"$toString": ref}, "format": formato, "onError": None, "onNull": None}
+        }
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": [{"$type": ref}, "date"]}, "then": ref},
+                {"case": {"$eq": [{"$type": ref}, "string"]}, "then": desde_texto},
+            ],
+            "default": None
+        }
+    }
+
+
+def expr_lista(ref: str) -> Dict[str, Any]:
+    """Expresión que convierte arrays o listas serializadas en un array de strings."""
+    partes = {
+        "$cond": {
+            "if": {"$isArray": ref},
+            "then": ref,
+            "else": {
+                "$split": [
+                    {
+                        "$replaceAll": {
+                            "input": {
+                                "$replaceAll": {
+                                    "input": {
+                                        "$replaceAll": {
+                                            "input": {"$toString": {"$ifNull": [ref, ""]}},
+                                            "find": "[",
+                                            "replacement": ""
+                                        }
+                                    },
+                                    "find": "]",
+                                    "replacement": ""
+                                }
+                            },
+                            "find": "'",
+                            "replacement": ""
+                        }
+                    },
+                    ","
+                ]
+            }
+        }
+    }
+    return {
+        "$filter": {
+            "input": {
+                "$map": {"input": partes, "as": "p", "in": {"$trim": {"input": {"$toString": "$$p"}}}}
+            },
+            "as": "p",
+            "cond": {"$and": [{"$ne": ["$$p", ""]}, {"$ne": ["$$p", "null"]}]}
+        }
+    }
+
+
+def expr_documento_normalizado() -> Dict[str, Any]:
+    """Expresión que calcula el subdocumento `_norm` completo al vuelo."""
+    rating = expr_numero(f"${CAMPOS_ORIGEN['rating']}")
+    reviews = expr_numero(f"${CAMPOS_ORIGEN['reviews']}", 0)
+    fecha = expr_fecha(f"${CAMPOS_ORIGEN['anio']}")
+    completitud = {
+        "$add": [
+            {"$cond": [{"$eq": [{"$ifNull": [f"${campo}", None]}, None]}, 0, 1]}
+            for campo in CAMPOS_COMPLETITUD
+        ]
+    }
+    return {
+        "v": {"$literal": VERSION_NORMALIZACION},
+        "rating": rating,
+        "reviews": reviews,
+        "playing": expr_numero(f"${CAMPOS_ORIGEN['playing']}", 0),
+        "fecha": fecha,
+        "anio": {"$ifNull": [{"$year": fecha}, expr_anio(f"${CAMPOS_ORIGEN['anio']}")]},
+        "mes": {"$cond": [{"$eq": [fecha, None]}, None, {"$month": fecha}]},
+        "generos": expr_lista(f"${CAMPOS_ORIGEN['generos']}"),
+        "desarrolladores": expr_lista(f"${CAMPOS_ORIGEN['desarrolladores']}"),
+        "popularidad": {
+            "$add": [
+                {"$multiply": [{"$ifNull": [rating, 0]}, 2]},
+                {"$min": [{"$divide": [reviews, 100]}, 5]},
+                {"$multiply": [completitud, 0.5]}
+            ]
+        },
+    }
+
+
+async def registrar_escritura(db: AsyncIOMotorDatabase, coleccion: str):
+    """Incrementa la versión de datos de la colección compartida por todos los procesos.
+
+    `cache_resultados.version` es por proceso; esta se guarda en `_metadatos`
+    ("datos:<colección>") para que otro worker note que los datos cambiaron.
+    """
+    _normalizadas.pop((db.name, coleccion), None)
+    await db[COLECCION_METADATOS].update_one(
+        {"_id": f"datos:{coleccion}"},
+        {"$inc": {"version": 1}, "$set": {"actualizado": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+async def version_datos(db: AsyncIOMotorDatabase, coleccion: str) -> int:
+    """Versión de datos compartida de la colección (0 si nunca se escribió por la API)."""
+    marcador = await db[COLECCION_METADATOS].find_one({"_id": f"datos:{coleccion}"}, {"version": 1})
+    return marcador["version"] if marcador else 0
+
+
+def olvidar_normalizacion(coleccion: Optional[str] = None):
+    """Descarta los resultados positivos guardados de `coleccion_normalizada` (de una colección o todos)."""
+    for clave in [c for c in _normalizadas if coleccion is None or c[1] == coleccion]:
+        del _normalizadas[clave]
+
+
+async def coleccion_normalizada(db: AsyncIOMotorDatabase, coleccion: str) -> bool:
+    """Indica si todos los documentos de la colección tienen `_norm` con la versión vigente.
+
+    El marcador del backfill no alcanza: lo que se escribe por fuera de la API
+    (mongoimport, Compass, scripts) llega sin `_norm`. Con el marcador puesto
+    se busca además un documento pendiente (un salto en el índice `norm_version`);
+    si existe, la colección cuenta como no normalizada (`_norm` se calcula al
+    vuelo) y se lanza el backfill incremental en segundo plano para completarla.
+
+    Un resultado positivo se recuerda `NORMALIZADA_TTL` segundos, así que las
+    lecturas no pagan las dos consultas cada vez; `registrar_escritura` lo
+    descarta en este proceso, y una escritura externa se nota al vencer el plazo.
+    """
+    clave = (db.name, coleccion)
+    if _normalizadas.get(clave, 0) > time.monotonic():
+        return True
+    marcador = await db[COLECCION_METADATOS].find_one({"_id": f"normalizacion:{coleccion}"})
+    if not marcador or marcador.get("version") != VERSION_NORMALIZACION:
+        return False
+    pendiente = await db[coleccion].find_one({f"{CAMPO_NORMALIZADO}.v": {"$ne": VERSION_NORMALIZACION}}, {"_id": 1})
+    if pendiente is None:
+        _normalizadas[clave] = time.monotonic() + NORMALIZADA_TTL
+        return True
+    tarea = _normalizando.get(coleccion)
+    if tarea is None or tarea.done():
+        logger.info("%s tiene documentos sin `_norm` vigente; se completa el backfill", coleccion)
+        _normalizando[coleccion] = asyncio.create_task(NormalizacionService(db).backfill(coleccion))
+    return False
+
+
+async def etapas_normalizacion(db: AsyncIOMotorDatabase, coleccion: str) -> List[Dict[str, Any]]:
+    """Etapas a anteponer a un pipeline que lee `_norm`.
+
+    Si la colección ya está materializada no hace falta ninguna etapa y los
+    `$match`/`$sort` sobre `_norm.*` pueden usar índices; si no, `_norm` se
+    calcula al vuelo con las mismas reglas.
+    """
+    if await coleccion_normalizada(db, coleccion):
+        return []
+    return [{"$addFields": {CAMPO_NORMALIZADO: expr_documento_normalizado()}}]
+
+
+class NormalizacionService:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self.db = database
+
+    async def backfill(self, coleccion: str, tamano_lote: int = 1000) -> Dict[str, Any]:
+        """Escribe `_norm` en los documentos que no lo tienen o que usan una versión anterior.
+
+        Es incremental: al volver a ejecutarlo solo procesa los documentos pendientes.
+        """
+        try:
+            collection = self.db[coleccion]
+            pendientes = {
+                "$or": [
+                    {CAMPO_NORMALIZADO: {"$exists": False}},
+                    {f"{CAMPO_NORMALIZADO}.v": {"$ne": VERSION_NORMALIZACION}}
+                ]
+            }
+            projection = {campo: 1 for campo in set(CAMPOS_ORIGEN.values()) | set(CAMPOS_COMPLETITUD)}
+
+            procesados = 0
+            lote = []
+            cursor = collection.find(pendientes, projection).batch_size(tamano_lote)
+            async for doc in cursor:
+                lote.append(UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {CAMPO_NORMALIZADO: normalizar_documento(doc)}}
+                ))
+                if len(lote) >= tamano_lote:
+                    await collection.bulk_write(lote, ordered=False)
+                    procesados += len(lote)
+                    lote = []
+            if lote:
+                await collection.bulk_write(lote, ordered=False)
+                procesados += len(lote)
+            if procesados:
+                cache_resultados.invalidar(coleccion)
+                await registrar_escritura(self.db, coleccion)
+                # `_norm` cambió: el cubo preagregado se reconstruye completo
+                from app.services.rollup_service import gestor_rollup
+                await gestor_rollup.marcar_desactualizado(self.db, coleccion)
+
+            restantes = await collection.count_documents(pendientes)
+            if restantes == 0:
+                await self.db[COLECCION_METADATOS].update_one(
+                    {"_id": f"normalizacion:{coleccion}"},
+                    {"$set": {"version": VERSION_NORMALIZACION, "actualizado": datetime.utcnow()}},
+                    upsert=True
+                )
+
+            return {
+                "success": True,
+                "coleccion": coleccion,
+                "procesados": procesados,
+                "pendientes": restantes,
+                "completo": restantes == 0
+            }
+        except Exception as e:
+            logger.error("Error en backfill de %s: %s", coleccion, e)
+            return {"success": False, "procesados": 0, "error": str(e)}
+
+    async def insertar_juegos(self, coleccion: str, documentos: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Inserta juegos nuevos con `_norm` ya calculado para no romper la materialización."""
+        try:
+            if not documentos:
+                return {"success": True, "insertados": 0}
+            for doc in documentos:
+                doc[CAMPO_NORMALIZADO] = normalizar_documento(doc)
+            resultado = await self.db[coleccion].insert_many(documentos, ordered=False)
+            cache_resultados.invalidar(coleccion)
+            await registrar_escritura(self.db, coleccion)
+            # Los juegos nuevos se suman al cubo preagregado sin reconstruirlo
+            from app.services.rollup_service import gestor_rollup
+            await gestor_rollup.aplicar_insercion(self.db, coleccion, documentos)
+            return {"success": True, "insertados": len(resultado.inserted_ids)}
+        except Exception as e:
+            logger.error("Error insertando juegos en %s: %s", coleccion, e)
+            return {"success": False, "insertados": 0, "error": str(e)}
+
+    async def estado(self, coleccion: str) -> Dict[str, Any]:
+        """Devuelve cuántos documentos están normalizados con la versión vigente."""
+        try:
+            collection = self.db[coleccion]
+            total = await collection.estimated_document_count()
+            normalizados = await collection.count_documents({f"{CAMPO_NORMALIZADO}.v": VERSION_NORMALIZACION})
+            return {
+                "success": True,
+                "coleccion": coleccion,
+                "version": VERSION_NORMALIZACION,
+                "total_documentos": total,
+                "normalizados": normalizados,
+                "materializada": await coleccion_normalizada(self.db, coleccion)
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
@@ -1,86 +1,992 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 from datetime import datetime
-import pandas as pd
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
+import base64
+import csv
+import io
+import json
+import asyncio
+import logging
+import math
+import os
+from bson import Binary, Decimal128, ObjectId, json_util
+from pymongo.errors import ExecutionTimeout
+from app.services.analitica import (
+    AcumuladorOLS,
+    FRACCION_MAXIMA_MUESTRA,
+    Z_95,
+    acumular_ols_lote,
+    acumular_ols_snapshot,
+    ajustar_regresion_muestra,
+    ajustar_regresion_snapshot,
+    calcular_correlacion_muestra,
+    calcular_correlacion_snapshot,
+    etapas_estadisticos_ols,
+    etapas_estadisticos_pearson,
+    intervalo_media,
+    intervalo_proporcion,
+    resolver_ols,
+    resolver_pearson,
+    tamano_muestra,
+)
+from app.services.cache_service import cacheado
+from app.services.catalogo_service import CatalogoService, es_numerico
+from app.services.ejecutor import ColaLlenaError, TiempoAgotadoError, ejecutor_analitica
+from app.services.leaderboards_service import gestor_leaderboards
+from app.services.metricas import a_lista, iterar, medido
+from app.services.modelos_service import cache_modelos
+from app.services.rollup_service import gestor_rollup
+from app.services.snapshot_service import gestor_snapshots
+from app.services.normalizacion_service import (
+    CAMPO_NORMALIZADO,
+    CAMPOS_ORIGEN,
+    FORMATO_FECHA,
+    a_numero,
+    coleccion_normalizada,
+    etapas_normalizacion,
+    expr_numero,
+    expr_anio,
+    expr_fecha,
+    expr_lista,
+)
+
+logger = logging.getLogger(__name__)
+
+# Campo por defecto de los filtros `fecha_inicio`/`fecha_fin` (fecha BSON con índice)
+CAMPO_FECHA = f"{CAMPO_NORMALIZADO}.fecha"
+# Tiempo máximo del conteo filtrado que acompaña a un reporte paginado
+TIEMPO_MAXIMO_CONTEO_MS = 200
+# Documentos por página de `generar_reporte` cuando no se indica `limite`
+LIMITE_REPORTE = 1000
+
+# Documentos por bloque de la regresión con `modo="streaming"`
+TAMANO_LOTE_STREAMING = 5000
+# Documentos que lee como máximo una página de valores únicos, por valor pedido
+VALORES_UNICOS_LECTURA = 10
+# Modos de `regresion_lineal`
+MODOS_REGRESION = ("muestra", "servidor", "streaming")
+# Modos de `calcular_matriz_correlacion`
+MODOS_CORRELACION = ("muestra", "servidor")
+
+# Agregaciones simultáneas de una comparación entre colecciones
+COMPARACION_CONCURRENCIA = int(os.getenv("COMPARACION_CONCURRENCIA", "8"))
+COMPARACION_MAX_COLECCIONES = 10
+# Etiquetas pedidas por colección al comparar: la lista completa, no el top de cada una
+COMPARACION_MAX_ETIQUETAS = 1000
+
+
+def _valor_ruta(doc: Dict[str, Any], ruta: str) -> Any:
+    """Lee un campo con notación de puntos ("_norm.rating") de un documento."""
+    valor = doc
+    for parte in ruta.split("."):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+
+def _codificar_cursor(doc: Dict[str, Any], orden_campos: List) -> str:
+    """Token opaco con los valores de orden del último documento de la página."""
+    valores = [_valor_ruta(doc, campo) for campo, _ in orden_campos]
+    return base64.urlsafe_b64encode(json_util.dumps(valores).encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(token: str) -> List[Any]:
+    try:
+        return json_util.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+
+
+# Mínimo de cada clase de tipo en el orden de BSON (null/faltante < números <
+# strings < objetos < binarios < ObjectId < booleanos < fechas).
+# MongoDB solo compara valores del mismo tipo, así que `{"$gte": mínimo}`
+# alcanza exactamente los valores de esa clase. Los arrays no entran (se
+# ordenan por uno de sus elementos) ni los tipos internos como Timestamp.
+_MINIMOS_CLASE_BSON = [
+    None,
+    float("-inf"),
+    "",
+    {},
+    Binary(b""),
+    ObjectId("0" * 24),
+    False,
+    datetime.min,
+]
+
+
+def _clase_bson(valor: Any) -> int:
+    """Posición de la clase de tipo de `valor` en `_MINIMOS_CLASE_BSON`."""
+    if valor is None:
+        return 0
+    if isinstance(valor, bool):
+        return 6
+    if isinstance(valor, (int, float, Decimal128)):
+        return 1
+    for clase, tipos in ((2, str), (3, dict), (4, bytes), (5, ObjectId), (7, datetime)):
+        if isinstance(valor, tipos):
+            return clase
+    raise ValueError(f"No se puede paginar por un valor de tipo {type(valor).__name__}")
+
+
+def _posterior(campo: str, valor: Any, direccion: int) -> List[Dict[str, Any]]:
+    """Condiciones (a unir con `$or`) de los valores de `campo` posteriores a `valor`.
+
+    `{"$gt": 3}` no alcanza los strings ("N/A", "TBD") y `{"$gt": None}` no
+    alcanza nada, así que además del rango dentro del tipo de `valor` se
+    agregan completas las clases de tipo que le siguen en la dirección del orden.
+    """
+    clase = _clase_bson(valor)
+    condiciones = [] if valor is None else [{campo: {"$gt" if direccion == 1 else "$lt": valor}}]
+    if direccion == 1:
+        siguientes = _MINIMOS_CLASE_BSON[clase + 1:]
+    else:
+        siguientes = _MINIMOS_CLASE_BSON[1:clase]
+        if clase > 0:
+            # Igual a null incluye los documentos sin el campo
+            condiciones.append({campo: None})
+    condiciones.extend({campo: {"$gte": minimo}} for minimo in siguientes)
+    return condiciones
+
+
+def _filtro_keyset(valores: List[Any], orden_campos: List) -> Dict[str, Any]:
+    """Condición "posterior a `valores`" según el orden (campo, dirección) indicado."""
+    if len(valores) != len(orden_campos):
+        raise ValueError("Cursor de paginación inválido")
+    condiciones = []
+    for i, (campo, direccion) in enumerate(orden_campos):
+        iguales = {c: v for (c, _), v in zip(orden_campos[:i], valores[:i])}
+        for condicion in _posterior(campo, valores[i], direccion):
+            condiciones.append({**iguales, **condicion})
+    if not condiciones:
+        # Nada es posterior (p. ej. último null en orden descendente)
+        return {"_id": {"$in": []}}
+    return condiciones[0] if len(condiciones) == 1 else {"$or": condiciones}
+
+
+# Métrica de `comparar_colecciones` => (lista del resultado, clave de la etiqueta)
+METRICAS_COMPARACION = {
+    "rating_promedio": (None, None),
+    "distribucion_rating": ("distribucion", "rango"),
+    "conteo_generos": ("conteos", "genero"),
+    "conteo_por_anio": ("conteos", "valor"),
+}
+
+
+# Colores de cada rango de la distribución de rating
+COLORES_RANGO_RATING = {
+    "0-2 ⭐": "#ef4444",        # Rojo
+    "2-3 ⭐⭐": "#f97316",      # Naranja
+    "3-4 ⭐⭐⭐": "#eab308",    # Amarillo
+    "4-5 ⭐⭐⭐⭐": "#22c55e",  # Verde
+    "5+ ⭐⭐⭐⭐⭐": "#3b82f6", # Azul
+}
 
 class ReporteService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
+
+    async def _campo_normalizado(self, coleccion: str, campo: str, clave: str, expresion):
+        """Devuelve (etapas, ruta) para leer la versión normalizada de `campo`.
+
+        Si `campo` es el origen del campo materializado `clave` se lee `_norm.<clave>`;
+        para cualquier otro campo se calcula al vuelo con `expresion`.
+        """
+        if campo == CAMPOS_ORIGEN[clave]:
+            return await etapas_normalizacion(self.db, coleccion), f"{CAMPO_NORMALIZADO}.{clave}"
+        return [{"$addFields": {"__valor": expresion(f"${campo}")}}], "__valor"
+
+    # --- Pipelines y formato de resultados ------------------------------------
+    # Cada widget del dashboard separa la parte del pipeline que va después de la
+    # normalización y el formateo de su resultado, para que el endpoint individual
+    # y `obtener_dashboard` (que los ejecuta dentro de un `$facet`) compartan código.
+
+    @staticmethod
+    def _pipeline_conteo_por_anio(ruta_anio: str, limite: int) -> List[Dict[str, Any]]:
+        return [
+            {"$match": {ruta_anio: {"$gte": 1990, "$lte": 2030}}},
+            {"$group": {"_id": f"${ruta_anio}", "conteo": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+            {"$limit": limite}
+        ]
+
+    @staticmethod
+    def _formatear_conteo_por_anio(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        conteos = [{"valor": doc.get("_id"), "conteo": doc.get("conteo", 0)} for doc in resultados]
+        return {"success": True, "conteos": conteos, "total_valores": len(conteos)}
+
+    @staticmethod
+    def _pipeline_conteo_lista(ruta_lista: str, limite: int) -> List[Dict[str, Any]]:
+        """Conteo de elementos individuales de un campo array (géneros, desarrolladores)."""
+        return [
+            {"$project": {"_id": 0, ruta_lista: 1}},
+            {"$unwind": f"${ruta_lista}"},
+            {
+                "$group": {
+                    "_id": f"${ruta_lista}",
+                    "conteo": {"$sum": 1}
+                }
+            },
+            {
+                "$sort": {"conteo": -1}
+            },
+            {
+                "$limit": limite
+            }
+        ]
+
+    @staticmethod
+    def _formatear_conteo_generos(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        conteos = [
+            {"genero": doc.get("_id", ""), "conteo": doc.get("conteo", 0)} 
+            for doc in resultados 
+            if doc.get("_id")
+        ]
+        return {
+            "success": True, 
+            "conteos": conteos, 
+            "total_generos": len(conteos)
+        }
+
+    @staticmethod
+    def _formatear_conteo_desarrolladores(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        conteos = [
+            {"desarrollador": doc.get("_id", ""), "conteo": doc.get("conteo", 0)} 
+            for doc in resultados 
+            if doc.get("_id")
+        ]
+        return {
+            "success": True, 
+            "conteos": conteos, 
+            "total_desarrolladores": len(conteos)
+        }
+
+    @staticmethod
+    def _pipeline_rating_promedio(ruta_rating: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "$match": {
+                    ruta_rating: {"$gte": 0, "$lte": 10}
+                }
+            },
+            {
+                "$group": {
+                    "_id": None,
+                    "promedio": {"$avg": f"${ruta_rating}"},
+                    "total_ratings": {"$sum": 1},
+                    "min_rating": {"$min": f"${ruta_rating}"},
+                    "max_rating": {"$max": f"${ruta_rating}"},
+                    # Solo la usa el modo aproximado (intervalo del promedio)
+                    "desviacion": {"$stdDevSamp": f"${ruta_rating}"}
+                }
+            }
+        ]
+
+    @staticmethod
+    def _formatear_rating_promedio(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if resultados:
+            result = resultados[0]
+            promedio = round(result.get("promedio", 0), 2)
+            return {
+                "success": True,
+                "rating_promedio": promedio,
+                "total_ratings": result.get("total_ratings", 0),
+                "min_rating": result.get("min_rating", 0),
+                "max_rating": result.get("max_rating", 0)
+            }
+        return {
+            "success": True,
+            "rating_promedio": 0,
+            "total_ratings": 0,
+            "min_rating": 0,
+            "max_rating": 0
+        }
+
+    @staticmethod
+    def _pipeline_distribucion_rating(ruta_rating: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "$match": {
+                    ruta_rating: {"$gte": 0, "$lte": 10}
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "__ratingNum": f"${ruta_rating}"
+                }
+            },
+            {
+                "$addFields": {
+                    "__ratingRange": {
+                        "$switch": {
+                            "branches": [
+                                {"case": {"$and": [{"$gte": ["$__ratingNum", 0]}, {"$lt": ["$__ratingNum", 2]}]}, "then": "0-2 ⭐"},
+                                {"case": {"$and": [{"$gte": ["$__ratingNum", 2]}, {"$lt": ["$__ratingNum", 3]}]}, "then": "2-3 ⭐⭐"},
+                                {"case": {"$and": [{"$gte": ["$__ratingNum", 3]}, {"$lt": ["$__ratingNum", 4]}]}, "then": "3-4 ⭐⭐⭐"},
+                                {"case": {"$and": [{"$gte": ["$__ratingNum", 4]}, {"$lt": ["$__ratingNum", 5]}]}, "then": "4-5 ⭐⭐⭐⭐"},
+                                {"case": {"$gte": ["$__ratingNum", 5]}, "then": "5+ ⭐⭐⭐⭐⭐"}
+                            ],
+                            "default": "Sin rating"
+                        }
+                    }
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$__ratingRange",
+                    "conteo": {"$sum": 1},
+                    "promedio_rango": {"$avg": "$__ratingNum"}
+                }
+            },
+            {
+                "$sort": {"_id": 1}
+            }
+        ]
+
+    @staticmethod
+    def _formatear_distribucion_rating(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        distribucion = [
+            {
+                "rango": doc.get("_id", ""),
+                "conteo": doc.get("conteo", 0),
+                "promedio_rango": round(doc.get("promedio_rango", 0), 2),
+                "color": COLORES_RANGO_RATING.get(doc.get("_id", ""), "#6b7280")
+            }
+            for doc in resultados
+            if doc.get("_id")
+        ]
+        return {
+            "success": True,
+            "distribucion": distribucion,
+            "total_ratings": sum(d["conteo"] for d in distribucion)
+        }
+
+    # --- Modo aproximado ------------------------------------------------------
+    # `modo="aproximado"` antepone un `$sample` al mismo pipeline: el tamaño de la
+    # muestra depende solo del error pedido, así que la latencia no crece con la
+    # colección. Los conteos se escalan al total con su intervalo de confianza.
+
+    @staticmethod
+    def _validar_modo(modo: str, error: float):
+        if modo not in ("exacto", "aproximado"):
+            raise ValueError(f"Modo no soportado: {modo} (exacto o aproximado)")
+        if not 0 < error < 0.5:
+            raise ValueError("El error debe estar entre 0 y 0.5 (p. ej. 0.01 = ±1%)")
+
+    @staticmethod
+    async def _plan_muestreo(collection, error: float) -> Dict[str, Any]:
+        """Tamaño de muestra para `error`; `muestra=None` si conviene el cálculo exacto."""
+        total = await collection.estimated_document_count()
+        muestra = tamano_muestra(error, total)
+        if muestra == 0 or muestra > total * FRACCION_MAXIMA_MUESTRA:
+            return {"muestra": None, "total_documentos": total, "error": error}
+        return {"muestra": muestra, "total_documentos": total, "error": error}
+
+    @staticmethod
+    def _con_muestra(pipeline: List[Dict[str, Any]], muestreo: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # `$sample` tiene que ser la primera etapa para usar el cursor aleatorio
+        if muestreo and muestreo["muestra"]:
+            return [{"$sample": {"size": muestreo["muestra"]}}] + pipeline
+        return pipeline
+
+    @staticmethod
+    def _anotar_muestreo(resultado: Dict[str, Any], muestreo: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not muestreo:
+            return resultado
+        if not muestreo["muestra"]:
+            resultado.update(
+                modo="exacto",
+                total_documentos=muestreo["total_documentos"],
+                motivo=f"La muestra necesaria supera el {FRACCION_MAXIMA_MUESTRA:.0%} de la colección"
+            )
+            return resultado
+        resultado.update(
+            modo="aproximado",
+            muestra=muestreo["muestra"],
+            total_documentos=muestreo["total_documentos"],
+            error=muestreo["error"],
+            confianza=0.95
+        )
+        return resultado
+
+    @staticmethod
+    def _estimar_conteos(formateado: Dict[str, Any], lista: str, muestreo: Dict[str, Any]) -> Dict[str, Any]:
+        """Escala los `conteo` de la muestra al total y agrega su intervalo de confianza."""
+        muestra, total = muestreo["muestra"], muestreo["total_documentos"]
+        for item in formateado[lista]:
+            estimado, inferior, superior = intervalo_proporcion(item["conteo"], muestra, total, Z_95)
+            item["conteo_muestra"] = item["conteo"]
+            item["conteo"] = round(estimado)
+            item["intervalo"] = [math.floor(inferior), math.ceil(superior)]
+        return formateado
+
+    @staticmethod
+    def _estimar_rating_promedio(resultados: List[Dict[str, Any]], muestreo: Dict[str, Any]) -> Dict[str, Any]:
+        """Promedio de la muestra con su intervalo; min/max son los observados en la muestra."""
+        formateado = ReporteService._formatear_rating_promedio(resultados)
+        if not resultados:
+            return formateado
+        muestra, total = muestreo["muestra"], muestreo["total_documentos"]
+        result = resultados[0]
+        con_rating = result.get("total_ratings", 0)
+        estimado, inferior, superior = intervalo_proporcion(con_rating, muestra, total, Z_95)
+        desde, hasta = intervalo_media(result.get("promedio", 0), result.get("desviacion"), con_rating, round(estimado), Z_95)
+        formateado.update(
+            total_ratings=round(estimado),
+            intervalo_total_ratings=[math.floor(inferior), math.ceil(superior)],
+            intervalo_rating_promedio=[round(desde, 2), round(hasta, 2)],
+            ratings_muestra=con_rating
+        )
+        return formateado
+
+    @staticmethod
+    def _pipeline_top_juegos_populares(limite: int) -> List[Dict[str, Any]]:
+        # La puntuación de popularidad (rating, reviews y completitud) está materializada
+        # en `_norm.popularidad`, así que basta con filtrar y ordenar
+        return [
+            {
+                "$match": {
+                    "Title": {"$nin": [None, ""]},
+                    "_norm.popularidad": {"$gt": 0}
+                }
+            },
+            {"$sort": {"_norm.popularidad": -1, "_norm.rating": -1}},
+            {"$limit": limite},
+            {
+                "$project": {
+                    "_id": 0,
+                    "nombre": "$Title",
+                    "rating": {"$ifNull": ["$_norm.rating", 0]},
+                    "generos": "$Genres",
+                    "desarrolladores": "$Developers",
+                    "fecha_lanzamiento": "$Release_Date",
+                    "reviews": "$_norm.reviews",
+                    "popularidad_score": {"$round": ["$_norm.popularidad", 2]}
+                }
+            }
+        ]
+
+    @staticmethod
+    def _formatear_top_juegos_populares(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "success": True, 
+            "juegos": resultados, 
+            "total_juegos": len(resultados)
+        }
+
+    @staticmethod
+    def _pipeline_metricas_dashboard() -> List[Dict[str, Any]]:
+        return [
+            {
+                "$group": {
+                    "_id": None,
+                    "total_jugadores_activos": {"$sum": "$_norm.playing"},
+                    "total_reviews": {"$sum": "$_norm.reviews"},
+                    "juegos_2024": {
+                        "$sum": {
+                            "$cond": [
+                                {"$eq": ["$_norm.anio", 2024]}, 
+                                1, 
+                                0
+                            ]
+                        }
+                    },
+                    "total_juegos": {"$sum": 1}
+                }
+            }
+        ]
+
+    @staticmethod
+    def _formatear_metricas_dashboard(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if resultados:
+            metricas = resultados[0]
+            return {
+                "success": True,
+                "jugadores_activos": metricas.get("total_jugadores_activos", 0),
+                "reviews_totales": metricas.get("total_reviews", 0),
+                "juegos_2024": metricas.get("juegos_2024", 0),
+                "total_juegos": metricas.get("total_juegos", 0)
+            }
+        return {
+            "success": True,
+            "jugadores_activos": 0,
+            "reviews_totales": 0,
+            "juegos_2024": 0,
+            "total_juegos": 0
+        }
+
+    @staticmethod
+    def _pipeline_hidden_gems(limite: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "$match": {
+                    "Title": {"$nin": [None, ""]},
+                    "_norm.rating": {"$gte": 4.0},  # Rating alto
+                    "_norm.reviews": {"$lte": 500}  # Pocas reviews
+                }
+            },
+            {"$sort": {"_norm.rating": -1, "_norm.reviews": 1}},
+            {"$limit": limite},
+            {
+                "$project": {
+                    "_id": 0,
+                    "titulo": "$Title",
+                    "rating": "$_norm.rating",
+                    "reviews": "$_norm.reviews",
+                    "generos": "$Genres"
+                }
+            }
+        ]
+
+    @staticmethod
+    def _pipeline_trending_games(limite: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "$match": {
+                    "Title": {"$nin": [None, ""]},
+                    "_norm.rating": {"$gte": 3.5},
+                    "_norm.anio": {"$gte": 2020}  # Juegos recientes
+                }
+            },
+            {"$sort": {"_norm.anio": -1, "_norm.rating": -1}},
+            {"$limit": limite},
+            {
+                "$project": {
+                    "_id": 0,
+                    "titulo": "$Title",
+                    "rating": "$_norm.rating",
+                    "anio": "$_norm.anio",
+                    "generos": "$Genres"
+                }
+            }
+        ]
+
+    @staticmethod
+    def _pipeline_top_rated_games(limite: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "$match": {
+                    "Title": {"$nin": [None, ""]},
+                    "_norm.rating": {"$gte": 4.0},
+                    "_norm.reviews": {"$gte": 100}  # Al menos 100 reviews para ser confiable
+                }
+            },
+            {"$sort": {"_norm.rating": -1, "_norm.reviews": -1}},
+            {"$limit": limite},
+            {
+                "$project": {
+                    "_id": 0,
+                    "titulo": "$Title",
+                    "rating": "$_norm.rating",
+                    "reviews": "$_norm.reviews",
+                    "generos": "$Genres"
+                }
+            }
+        ]
+
+    @staticmethod
+    def _formatear_juegos(resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Formato común de hidden gems, trending y top rated."""
+        return {
+            "success": True,
+            "juegos": resultados,
+            "total": len(resultados)
+        }
     
-    async def generar_reporte(
+    # --- Pipelines completos por endpoint ---------------------------------------
+    # Los métodos públicos y `/explain/{endpoint}` arman el pipeline con estas
+    # funciones, así que lo que se explica es exactamente lo que se ejecuta.
+
+    async def _armar_valores_unicos(
         self,
         coleccion: str,
-        filtros: Dict[str, Any] = {},
-        campos: Optional[List[str]] = None,
-        fecha_inicio: Optional[datetime] = None,
-        fecha_fin: Optional[datetime] = None,
-        limite: int = 1000
+        campo: str,
+        limite: int = 1000,
+        despues: Any = None
+    ) -> List[Dict[str, Any]]:
+        # El `$sort` + `$limit` previos al `$group` recorren a lo sumo
+        # `(limite + 1) * VALORES_UNICOS_LECTURA` claves de un índice del campo en
+        # orden, así que cada página cuesta lo mismo sin importar la cardinalidad;
+        # el plan elegido se ve con `/explain/valores-unicos`. El cursor sigue el
+        # orden de tipos de BSON (`_posterior`), así que los strings de un campo
+        # mixto (Rating "N/A") llegan después de los números. Se pide un valor de
+        # más para saber si hay otra página; `leidos` indica si se agotó la lectura.
+        if despues is None:
+            filtro = {campo: {"$ne": None}}  # Excluir valores nulos
+        else:
+            condiciones = _posterior(campo, despues, 1)
+            filtro = condiciones[0] if len(condiciones) == 1 else {"$or": condiciones}
+        return [
+            {"$match": filtro},
+            {"$sort": {campo: 1}},
+            {"$limit": (limite + 1) * VALORES_UNICOS_LECTURA},
+            {"$group": {"_id": f"${campo}", "leidos": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+            {"$limit": limite + 1}
+        ]
+
+    async def _armar_conteo_por_campo(self, coleccion: str, campo: str, limite: int = 1000) -> List[Dict[str, Any]]:
+        return [
+            {"$group": {"_id": f"${campo}", "conteo": {"$sum": 1}}},
+            {"$match": {"_id": {"$ne": None}}},
+            {"$sort": {"_id": 1}},
+            {"$limit": limite}
+        ]
+
+    async def _armar_conteo_por_anio(
+        self, coleccion: str, campo: str = "Release_Date", limite: int = 200, formato: str = FORMATO_FECHA
     ):
-        """Genera un reporte basado en los parámetros proporcionados"""
-        
-        # Construir filtros de fecha si se proporcionan
-        if fecha_inicio or fecha_fin:
-            filtros["fecha"] = {}
+        if formato == FORMATO_FECHA:
+            # Fecha completa si se puede parsear; si no, el primer año de 4 dígitos del texto
+            etapas, ruta_anio = await self._campo_normalizado(
+                coleccion, campo, "anio", lambda ref: {"$ifNull": [{"$year": expr_fecha(ref)}, expr_anio(ref)]}
+            )
+        else:
+            # `_norm.anio` se materializa con el formato por defecto: otro formato se parsea al vuelo
+            etapas, ruta_anio = [{"$addFields": {"__valor": {"$year": expr_fecha(f"${campo}", formato)}}}], "__valor"
+        return etapas + self._pipeline_conteo_por_anio(ruta_anio, limite)
+
+    async def _armar_conteo_generos(self, coleccion: str, campo: str = "Genres", limite: int = 20):
+        # Los géneros ya vienen como array (materializado o calculado al vuelo)
+        etapas, ruta_generos = await self._campo_normalizado(coleccion, campo, "generos", expr_lista)
+        return etapas + self._pipeline_conteo_lista(ruta_generos, limite)
+
+    async def _armar_conteo_desarrolladores(self, coleccion: str, campo: str = "Developers", limite: int = 15):
+        etapas, ruta_devs = await self._campo_normalizado(coleccion, campo, "desarrolladores", expr_lista)
+        return etapas + self._pipeline_conteo_lista(ruta_devs, limite)
+
+    async def _armar_rating_promedio(self, coleccion: str, campo: str = "Rating"):
+        etapas, ruta_rating = await self._campo_normalizado(coleccion, campo, "rating", expr_numero)
+        return etapas + self._pipeline_rating_promedio(ruta_rating)
+
+    async def _armar_distribucion_rating(self, coleccion: str, campo: str = "Rating"):
+        etapas, ruta_rating = await self._campo_normalizado(coleccion, campo, "rating", expr_numero)
+        return etapas + self._pipeline_distribucion_rating(ruta_rating)
+
+    async def _armar_top_juegos_populares(self, coleccion: str, limite: int = 20):
+        return await etapas_normalizacion(self.db, coleccion) + self._pipeline_top_juegos_populares(limite)
+
+    async def _armar_metricas_dashboard(self, coleccion: str):
+        return await etapas_normalizacion(self.db, coleccion) + self._pipeline_metricas_dashboard()
+
+    async def _armar_hidden_gems(self, coleccion: str, limite: int = 5):
+        return await etapas_normalizacion(self.db, coleccion) + self._pipeline_hidden_gems(limite)
+
+    async def _armar_trending_games(self, coleccion: str, limite: int = 5):
+        return await etapas_normalizacion(self.db, coleccion) + self._pipeline_trending_games(limite)
+
+    async def _armar_top_rated_games(self, coleccion: str, limite: int = 5):
+        return await etapas_normalizacion(self.db, coleccion) + self._pipeline_top_rated_games(limite)
+
+    async def _armar_dashboard(self, coleccion: str, limite_populares: int = 20, limite_destacados: int = 5):
+        facetas = {
+            "metricas_dashboard": self._pipeline_metricas_dashboard(),
+            "rating_promedio": self._pipeline_rating_promedio("_norm.rating"),
+            "distribucion_rating": self._pipeline_distribucion_rating("_norm.rating"),
+            "conteo_generos": self._pipeline_conteo_lista("_norm.generos", 20),
+            "conteo_desarrolladores": self._pipeline_conteo_lista("_norm.desarrolladores", 15),
+            "conteo_por_anio": self._pipeline_conteo_por_anio("_norm.anio", 200),
+            "top_juegos_populares": self._pipeline_top_juegos_populares(limite_populares),
+            "hidden_gems": self._pipeline_hidden_gems(limite_destacados),
+            "trending_games": self._pipeline_trending_games(limite_destacados),
+            "top_rated_games": self._pipeline_top_rated_games(limite_destacados),
+        }
+        return await etapas_normalizacion(self.db, coleccion) + [{"$facet": facetas}]
+
+    # Endpoint => (constructor del pipeline, opciones de `aggregate`)
+    PIPELINES = {
+        "valores-unicos": ("_armar_valores_unicos", {}),
+        "conteo-por-campo": ("_armar_conteo_por_campo", {}),
+        "conteo-por-anio": ("_armar_conteo_por_anio", {}),
+        "conteo-generos": ("_armar_conteo_generos", {}),
+        "conteo-desarrolladores": ("_armar_conteo_desarrolladores", {}),
+        "rating-promedio": ("_armar_rating_promedio", {}),
+        "distribucion-rating": ("_armar_distribucion_rating", {}),
+        "top-juegos-populares": ("_armar_top_juegos_populares", {}),
+        "metricas-dashboard": ("_armar_metricas_dashboard", {}),
+        "hidden-gems": ("_armar_hidden_gems", {}),
+        "trending-games": ("_armar_trending_games", {}),
+        "top-rated-games": ("_armar_top_rated_games", {}),
+        "dashboard": ("_armar_dashboard", {"allowDiskUse": True}),
+    }
+
+    async def construir_pipeline(self, endpoint: str, coleccion: str, **parametros) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Devuelve (pipeline, opciones) exactamente como los ejecuta el método del endpoint."""
+        if endpoint not in self.PIPELINES:
+            raise ValueError(f"Endpoint sin pipeline: {endpoint}. Disponibles: {', '.join(self.PIPELINES)}")
+        constructor, opciones = self.PIPELINES[endpoint]
+        pipeline = await getattr(self, constructor)(coleccion, **parametros)
+        return pipeline, dict(opciones)
+
+    async def _filtro_fechas(
+        self,
+        coleccion: str,
+        fecha_inicio: Optional[datetime],
+        fecha_fin: Optional[datetime],
+        campo_fecha: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Filtro de rango `[fecha_inicio, fecha_fin]` sobre `campo_fecha`.
+
+        Por defecto compara contra `_norm.fecha` (fecha BSON, usa el índice
+        `norm_fecha`). Si la colección todavía no está normalizada, la fecha se
+        parsea desde `Release_Date` dentro de un `$expr`, que no usa índices.
+        """
+        if not (fecha_inicio or fecha_fin):
+            return {}
+        campo_fecha = campo_fecha or CAMPO_FECHA
+        if campo_fecha == CAMPO_FECHA and not await coleccion_normalizada(self.db, coleccion):
+            condiciones = [{"$ne": ["$$fecha", None]}]
             if fecha_inicio:
-                filtros["fecha"]["$gte"] = fecha_inicio
+                condiciones.append({"$gte": ["$$fecha", fecha_inicio]})
             if fecha_fin:
-                filtros["fecha"]["$lte"] = fecha_fin
-        
+                condiciones.append({"$lte": ["$$fecha", fecha_fin]})
+            fecha = expr_fecha(f"${CAMPOS_ORIGEN['anio']}")
+            return {"$expr": {"$let": {"vars": {"fecha": fecha}, "in": {"$and": condiciones}}}}
+
+        rango = {}
+        if fecha_inicio:
+            rango["$gte"] = fecha_inicio
+        if fecha_fin:
+            rango["$lte"] = fecha_fin
+        return {campo_fecha: rango}
+
+    @staticmethod
+    def _construir_consulta(
+        filtros: Optional[Dict[str, Any]],
+        campos: Optional[List[str]],
+        filtro_fechas: Optional[Dict[str, Any]] = None
+    ):
+        """Construye (filtros, proyección) de un reporte sin modificar los filtros recibidos."""
+        filtros = dict(filtros or {})
+        if filtro_fechas:
+            # `$and` para no pisar una condición del usuario sobre el mismo campo
+            filtros = {"$and": [filtros, filtro_fechas]} if filtros else dict(filtro_fechas)
+
         # Construir proyección de campos
-        projection = None
+        projection = {CAMPO_NORMALIZADO: 0}
         if campos:
             projection = {campo: 1 for campo in campos}
             projection["_id"] = 0
-        
-        # Ejecutar consulta
+
+        return filtros, projection
+
+    @medido
+    async def generar_reporte(
+        self,
+        coleccion: str,
+        filtros: Dict[str, Any] = {},
+        campos: Optional[List[str]] = None,
+        fecha_inicio: Optional[datetime] = None,
+        fecha_fin: Optional[datetime] = None,
+        campo_fecha: Optional[str] = None,
+        limite: Optional[int] = LIMITE_REPORTE,
+        orden: Optional[str] = None,
+        descendente: bool = False,
+        cursor: Optional[str] = None,
+        estimar_total: bool = False
+    ):
+        """Genera un reporte basado en los parámetros proporcionados.
+
+        Pagina por conjunto de claves (`orden` + `_id`): `siguiente_cursor` es un
+        token opaco que, enviado como `cursor`, continúa justo después del último
+        documento devuelto, así que cada página cuesta lo mismo que la primera.
+        `limite` vacío usa `LIMITE_REPORTE`; menor que 1 es un error.
+        """
+        if limite is None:
+            limite = LIMITE_REPORTE
+        if limite < 1:
+            raise ValueError("`limite` debe ser al menos 1")
+        filtro_fechas = await self._filtro_fechas(coleccion, fecha_inicio, fecha_fin, campo_fecha)
+        filtros, projection = self._construir_consulta(filtros, campos, filtro_fechas)
+        consulta = filtros
+        direccion = -1 if descendente else 1
+        orden_campos = [(orden, direccion), ("_id", direccion)] if orden and orden != "_id" else [("_id", direccion)]
+
+        if cursor:
+            consulta = {"$and": [filtros, _filtro_keyset(_decodificar_cursor(cursor), orden_campos)]} if filtros \
+                else _filtro_keyset(_decodificar_cursor(cursor), orden_campos)
+
+        # El token necesita `_id` y el campo de orden aunque no se hayan pedido
+        ocultar = []
+        for campo, _ in orden_campos:
+            if campos and campo not in campos:
+                if campo == "_id":
+                    projection.pop("_id")
+                else:
+                    projection[campo] = 1
+                ocultar.append(campo.split(".")[0])
+            elif not campos and campo.split(".")[0] == CAMPO_NORMALIZADO:
+                projection.pop(CAMPO_NORMALIZADO)
+                ocultar.append(CAMPO_NORMALIZADO)
+
+        # Ejecutar consulta (un documento extra indica si hay otra página)
         collection = self.db[coleccion]
-        cursor = collection.find(filtros, projection).limit(limite)
-        
-        datos = await cursor.to_list(length=limite)
-        
+        resultado = collection.find(consulta, projection).sort(orden_campos).limit(limite + 1)
+        datos = await a_lista(resultado, limite + 1)
+
+        siguiente_cursor = None
+        if len(datos) > limite:
+            datos = datos[:limite]
+            siguiente_cursor = _codificar_cursor(datos[-1], orden_campos)
+
         # Convertir ObjectId a string para JSON
         for item in datos:
+            for campo in ocultar:
+                item.pop(campo, None)
             if "_id" in item:
                 item["_id"] = str(item["_id"])
-        
+
+        total_estimado = await self._estimar_total(collection, filtros) if estimar_total else None
+
         return {
             "success": True,
             "mensaje": "Reporte generado exitosamente",
             "total_registros": len(datos),
-            "datos": datos
+            "datos": datos,
+            "siguiente_cursor": siguiente_cursor,
+            "total_estimado": total_estimado
         }
-    
-    async def obtener_colecciones(self):
-        """Obtiene la lista de colecciones disponibles en la base de datos"""
+
+    @staticmethod
+    async def _estimar_total(collection, filtros: Dict[str, Any]) -> Optional[int]:
+        """Total aproximado: metadatos si no hay filtros; conteo acotado en tiempo si los hay."""
+        if not filtros:
+            return await collection.estimated_document_count()
         try:
-            colecciones = await self.db.list_collection_names()
-            return {
-                "success": True,
-                "colecciones": colecciones
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "colecciones": [],
-                "error": str(e)
-            }
+            return await collection.count_documents(filtros, maxTimeMS=TIEMPO_MAXIMO_CONTEO_MS)
+        except ExecutionTimeout:
+            return None
+
+    async def exportar_reporte(
+        self,
+        coleccion: str,
+        formato: str = "csv",
+        filtros: Dict[str, Any] = {},
+        campos: Optional[List[str]] = None,
+        fecha_inicio: Optional[datetime] = None,
+        fecha_fin: Optional[datetime] = None,
+        campo_fecha: Optional[str] = None,
+        limite: Optional[int] = None,
+        tamano_lote: int = 1000
+    ) -> AsyncIterator[bytes]:
+        """Prepara la exportación como CSV o NDJSON y devuelve el generador de sus bloques.
+
+        La validación, el filtro de fechas, las columnas del CSV y la primera
+        lectura del cursor (que hace fallar una consulta inválida) ocurren aquí,
+        antes de que la ruta envíe el 200. El generador nunca materializa el
+        resultado completo: la memoria depende de `tamano_lote` y no de `limite`.
+        `limite` vacío o 0 exporta todos los documentos.
+
+        Las columnas del CSV son `campos` o, si no se indican, `_id` y los campos
+        del catálogo de la colección; sin catálogo hay que indicar `campos`.
+        """
+        if formato not in ("csv", "ndjson"):
+            raise ValueError(f"Formato no soportado: {formato}")
+        filtro_fechas = await self._filtro_fechas(coleccion, fecha_inicio, fecha_fin, campo_fecha)
+        filtros, projection = self._construir_consulta(filtros, campos, filtro_fechas)
+
+        columnas = None
+        if formato == "csv":
+            columnas = list(campos) if campos else await self._columnas_csv(coleccion)
+            projection = {campo: 1 for campo in columnas}
+            if "_id" not in columnas:
+                projection["_id"] = 0
+
+        cursor = self.db[coleccion].find(filtros, projection).batch_size(tamano_lote)
+        if limite:
+            cursor = cursor.limit(limite)
+        try:
+            primero = await cursor.__anext__()
+        except StopAsyncIteration:
+            primero = None
+        return self._bloques_exportacion(cursor, primero, formato, columnas, tamano_lote)
+
+    async def _columnas_csv(self, coleccion: str) -> List[str]:
+        """`_id` y los campos de primer nivel del catálogo, para que ninguna columna dependa del primer documento."""
+        catalogo_service = CatalogoService(self.db)
+        catalogo = await catalogo_service.obtener(coleccion)
+        if catalogo is None:
+            catalogo_service.perfilar_en_segundo_plano(coleccion)
+            raise ValueError(
+                f"La colección {coleccion} todavía no tiene catálogo: indique `campos` para exportar CSV"
+            )
+        return ["_id"] + [c["campo"] for c in catalogo["campos"] if c["campo"] != CAMPO_NORMALIZADO]
+
+    async def _bloques_exportacion(
+        self,
+        cursor,
+        primero: Optional[Dict[str, Any]],
+        formato: str,
+        columnas: Optional[List[str]],
+        tamano_lote: int
+    ) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        escritor = None
+        if formato == "csv":
+            escritor = csv.DictWriter(buffer, fieldnames=columnas, extrasaction="ignore")
+            escritor.writeheader()
+        if primero is None:
+            if buffer.tell():
+                yield buffer.getvalue().encode("utf-8")
+            return
+
+        async def documentos():
+            yield primero
+            async for doc in cursor:
+                yield doc
+
+        pendientes = 0
+        async for doc in documentos():
+            if escritor is None:
+                buffer.write(json.dumps(doc, default=str, ensure_ascii=False))
+                buffer.write("\n")
+            else:
+                escritor.writerow({campo: self._valor_csv(valor) for campo, valor in doc.items()})
+
+            pendientes += 1
+            if pendientes >= tamano_lote:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                pendientes = 0
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _valor_csv(valor: Any) -> Any:
+        """Serializa un valor de MongoDB para una celda CSV."""
+        if valor is None:
+            return ""
+        if isinstance(valor, (list, dict)):
+            return json.dumps(valor, default=str, ensure_ascii=False)
+        if isinstance(valor, (str, int, float)):
+            return valor
+        return str(valor)
     
+    @medido
     async def obtener_colecciones(self):
         """Obtiene la lista de colecciones disponibles"""
         colecciones = await self.db.list_collection_names()
-        return {"colecciones": colecciones}
+        # Las colecciones internas (p. ej. _metadatos) empiezan con "_"
+        return {"colecciones": [c for c in colecciones if not c.startswith("_")]}
     
+    @medido
+    @cacheado(ttl=60)
     async def obtener_estadisticas(self, coleccion: str):
         """Obtiene estadísticas básicas de una colección"""
         collection = self.db[coleccion]
-        total = await collection.count_documents({})
+        total = await collection.estimated_document_count()
         
-        # Obtener un documento de muestra para ver campos
-        muestra = await collection.find_one({})
-        campos = list(muestra.keys()) if muestra else []
+        # Los campos salen del catálogo; sin catálogo, de un documento de muestra
+        catalogo = await CatalogoService(self.db).obtener(coleccion)
+        if catalogo is not None:
+            campos = ["_id"] + [c["campo"] for c in catalogo["campos"]]
+        else:
+            CatalogoService(self.db).perfilar_en_segundo_plano(coleccion)
+            muestra = await collection.find_one({}, {CAMPO_NORMALIZADO: 0})
+            campos = [c for c in muestra.keys()] if muestra else []
         
         return {
             "coleccion": coleccion,
@@ -88,13 +994,30 @@ class ReporteService:
             "campos_disponibles": campos
         }
 
+    @medido
+    @cacheado(ttl=600)
     async def obtener_esquema_coleccion(self, coleccion: str):
-        """Obtiene el esquema (campos) de una colección"""
+        """Obtiene el esquema (campos) de una colección.
+
+        Se lee del catálogo (`CatalogoService`); si la colección aún no está
+        perfilada se usa una muestra de 100 documentos y se lanza el perfilado.
+        """
         try:
+            catalogo = await CatalogoService(self.db).obtener(coleccion)
+            if catalogo is not None:
+                return {
+                    "success": True,
+                    "campos": [c["campo"] for c in catalogo["campos"]],
+                    "tipos": {c["campo"]: c["tipos"] for c in catalogo["campos"]},
+                    "campos_numericos": [c["campo"] for c in catalogo["campos"] if es_numerico(c)],
+                    "total_documentos": catalogo["documentos"]
+                }
+
+            CatalogoService(self.db).perfilar_en_segundo_plano(coleccion)
             collection = self.db[coleccion]
             
             # Obtener algunos documentos de muestra para extraer todos los campos posibles
-            muestras = await collection.find({}).limit(100).to_list(length=100)
+            muestras = await a_lista(collection.find({}, {CAMPO_NORMALIZADO: 0}).limit(100), 100)
             
             if not muestras:
                 return {
@@ -108,7 +1031,7 @@ class ReporteService:
             for doc in muestras:
                 todos_los_campos.update(doc.keys())
             
-            # Filtrar _id ya que no suele ser útil para filtros
+            # Filtrar _id ya que no es útil para filtros
             campos = [campo for campo in sorted(todos_los_campos) if campo != '_id']
             
             return {
@@ -124,29 +1047,59 @@ class ReporteService:
                 "error": str(e)
             }
 
-    async def obtener_valores_unicos(self, coleccion: str, campo: str):
-        """Obtiene valores únicos de un campo específico"""
+    @medido
+    @cacheado(ttl=600)
+    async def obtener_valores_unicos(
+        self,
+        coleccion: str,
+        campo: str,
+        limite: int = 1000,
+        cursor: Optional[str] = None
+    ):
+        """Obtiene valores únicos de un campo específico, paginados en orden ascendente.
+
+        Envíe `siguiente_cursor` como `cursor` para la página siguiente; una
+        página lee a lo sumo `(limite + 1) * VALORES_UNICOS_LECTURA` documentos y
+        puede traer menos de `limite` valores si se repiten mucho. La
+        cardinalidad total sale del HyperLogLog del catálogo (sin recorrer la
+        colección) con los documentos perfilados hasta ahora; el perfil se
+        actualiza en la ingesta o con `POST /catalogo/{coleccion}`.
+        """
+        despues = None
+        if cursor:
+            valores_cursor = _decodificar_cursor(cursor)
+            if len(valores_cursor) != 1:
+                raise ValueError("Cursor de paginación inválido")
+            despues = valores_cursor[0]
         try:
             collection = self.db[coleccion]
             
             # Usar agregación para obtener valores únicos
-            pipeline = [
-                {"$group": {"_id": f"${campo}"}},
-                {"$match": {"_id": {"$ne": None}}},  # Excluir valores nulos
-                {"$sort": {"_id": 1}},
-                {"$limit": 1000}  # Limitar a 1000 valores únicos
-            ]
+            pipeline, _ = await self.construir_pipeline(
+                "valores-unicos", coleccion, campo=campo, limite=limite, despues=despues
+            )
             
-            cursor = collection.aggregate(pipeline)
-            resultados = await cursor.to_list(length=1000)
+            cursor_mongo = collection.aggregate(pipeline)
+            resultados = await a_lista(cursor_mongo, limite + 1)
             
-            # Extraer los valores únicos
-            valores = [doc["_id"] for doc in resultados if doc["_id"] is not None]
+            # Extraer los valores únicos. Con valores muy repetidos la lectura se
+            # agota antes de juntar `limite` y la página sale más corta, pero el
+            # cursor continúa después del último valor devuelto
+            valores = [doc["_id"] for doc in resultados[:limite] if doc["_id"] is not None]
+            lectura_agotada = sum(doc["leidos"] for doc in resultados) >= (limite + 1) * VALORES_UNICOS_LECTURA
+            siguiente = None
+            if (len(resultados) > limite or lectura_agotada) and valores:
+                siguiente = _codificar_cursor({"_id": valores[-1]}, [("_id", 1)])
+
+            cardinalidad = await CatalogoService(self.db).cardinalidad(coleccion, campo)
             
             return {
                 "success": True,
                 "valores": valores,
-                "total_valores": len(valores)
+                "total_valores": len(valores),
+                "cardinalidad_estimada": cardinalidad["estimada"] if cardinalidad else None,
+                "error_relativo": cardinalidad["error_relativo"] if cardinalidad else None,
+                "siguiente_cursor": siguiente
             }
             
         except Exception as e:
@@ -156,6 +1109,8 @@ class ReporteService:
                 "error": str(e)
             }
 
+    @medido
+    @cacheado(ttl=300)
     async def obtener_conteo_por_campo(self, coleccion: str, campo: str, limite: int = 1000):
         """Devuelve el conteo de documentos agrupados por un campo dado.
 
@@ -164,15 +1119,10 @@ class ReporteService:
         try:
             collection = self.db[coleccion]
 
-            pipeline = [
-                {"$group": {"_id": f"${campo}", "conteo": {"$sum": 1}}},
-                {"$match": {"_id": {"$ne": None}}},
-                {"$sort": {"_id": 1}},
-                {"$limit": limite}
-            ]
+            pipeline, _ = await self.construir_pipeline("conteo-por-campo", coleccion, campo=campo, limite=limite)
 
             cursor = collection.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
+            resultados = await a_lista(cursor, limite)
 
             conteos = [{"valor": doc.get("_id"), "conteo": doc.get("conteo", 0)} for doc in resultados]
 
@@ -188,388 +1138,173 @@ class ReporteService:
                 "error": str(e)
             }
 
-    async def obtener_conteo_por_anio(self, coleccion: str, campo_fecha: str, formato: str = "%b %d, %Y", limite: int = 200):
-        """Devuelve conteo de documentos agrupados por año, extrayendo de Release_Date."""
+    @medido
+    @cacheado(ttl=300)
+    async def obtener_conteo_por_anio(self, coleccion: str, campo_fecha: str, formato: str = FORMATO_FECHA, limite: int = 200):
+        """Devuelve conteo de documentos agrupados por año de `campo_fecha`, parseado con `formato` (strftime)."""
         try:
             collection = self.db[coleccion]
-            
-            # Primero ver una muestra de los datos
-            muestra = await collection.find({}).limit(5).to_list(length=5)
-            print(f"Muestra de datos de {coleccion}:")
-            for doc in muestra:
-                print(f"  {campo_fecha}: {doc.get(campo_fecha)}")
-            
-            pipeline = [
-                {
-                    "$addFields": {
-                        "__yearStr": {
-                            "$regexFind": {
-                                "input": {"$toString": {"$ifNull": [f"${campo_fecha}", ""]}},
-                                "regex": r"(\d{4})"
-                            }
-                        }
-                    }
-                },
-                {
-                    "$addFields": {
-                        "year": {
-                            "$cond": {
-                                "if": {"$ne": ["$__yearStr", None]},
-                                "then": {"$toInt": "$__yearStr.match"},
-                                "else": None
-                            }
-                        }
-                    }
-                },
-                {"$match": {"year": {"$ne": None, "$gte": 1990, "$lte": 2030}}},
-                {"$group": {"_id": "$year", "conteo": {"$sum": 1}}},
-                {"$sort": {"_id": 1}},
-                {"$limit": limite}
-            ]
 
-            print(f"Pipeline para {coleccion}.{campo_fecha}:")
-            print(pipeline)
+            if campo_fecha == CAMPOS_ORIGEN["anio"] and formato == FORMATO_FECHA:
+                # Con el cubo preagregado vigente se leen solo las celdas de cada año
+                resultados = await gestor_rollup.conteo_por_anio(self.db, coleccion, limite)
+                if resultados is not None:
+                    return {**self._formatear_conteo_por_anio(resultados), "desde_rollup": True}
+
+            pipeline, _ = await self.construir_pipeline(
+                "conteo-por-anio", coleccion, campo=campo_fecha, limite=limite, formato=formato
+            )
+
+            logger.debug("Pipeline de obtener_conteo_por_anio para %s", coleccion, extra={"pipeline": pipeline})
             
             cursor = collection.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
-            print(f"Resultados de agregación: {resultados}")
-            
-            conteos = [{"valor": doc.get("_id"), "conteo": doc.get("conteo", 0)} for doc in resultados]
-            print(f"Conteos finales: {conteos}")
+            resultados = await a_lista(cursor, limite)
             
-            return {"success": True, "conteos": conteos, "total_valores": len(conteos)}
+            return self._formatear_conteo_por_anio(resultados)
         except Exception as e:
-            print(f"Error en obtener_conteo_por_anio: {str(e)}")
+            logger.error("Error en obtener_conteo_por_anio: %s", e)
             return {"success": False, "conteos": [], "error": str(e)}
 
-    async def obtener_conteo_generos(self, coleccion: str, campo_generos: str = "Genres", limite: int = 20):
+    @medido
+    @cacheado(ttl=300)
+    async def obtener_conteo_generos(
+        self,
+        coleccion: str,
+        campo_generos: str = "Genres",
+        limite: int = 20,
+        modo: str = "exacto",
+        error: float = 0.01
+    ):
         """Devuelve conteo de géneros individuales, separando géneros múltiples.
         
         Maneja tanto arrays como strings:
         - Array: ["Adventure", "RPG"] 
         - String: "['Adventure', 'RPG']" o "Adventure, RPG"
+
+        Con `modo="aproximado"` cuenta sobre una muestra y cada conteo es una
+        estimación con su `intervalo` de confianza del 95%.
         """
+        self._validar_modo(modo, error)
         try:
             collection = self.db[coleccion]
-            
-            # Primero verificar el tipo de datos
-            muestra = await collection.find({}).limit(3).to_list(length=3)
-            print(f"Muestra de {campo_generos}:")
-            for doc in muestra:
-                genero_val = doc.get(campo_generos)
-                print(f"  Tipo: {type(genero_val)}, Valor: {genero_val}")
-            
-            # Pipeline robusto que maneja arrays y strings
-            pipeline = [
-                {
-                    "$addFields": {
-                        "__genresProcessed": {
-                            "$cond": {
-                                "if": {"$isArray": f"${campo_generos}"},
-                                # Si es array, usar directamente
-                                "then": f"${campo_generos}",
-                                # Si no es array, convertir a string y procesar
-                                "else": {
-                                    "$split": [
-                                        {
-                                            "$replaceAll": {
-                                                "input": {
-                                                    "$replaceAll": {
-                                                        "input": {
-                                                            "$replaceAll": {
-                                                                "input": {
-                                                                    "$toString": {"$ifNull": [f"${campo_generos}", ""]}
-                                                                },
-                                                                "find": "[",
-                                                                "replacement": ""
-                                                            }
-                                                        },
-                                                        "find": "]",
-                                                        "replacement": ""
-                                                    }
-                                                },
-                                                "find": "'",
-                                                "replacement": ""
-                                            }
-                                        },
-                                        ", "
-                                    ]
-                                }
-                            }
-                        }
-                    }
-                },
-                {
-                    "$unwind": "$__genresProcessed"
-                },
-                {
-                    "$addFields": {
-                        "genero": {
-                            "$trim": {
-                                "input": {"$toString": "$__genresProcessed"}
-                            }
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "genero": {"$ne": "", "$ne": None, "$ne": "null"}
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$genero",
-                        "conteo": {"$sum": 1}
-                    }
-                },
-                {
-                    "$sort": {"conteo": -1}
-                },
-                {
-                    "$limit": limite
-                }
-            ]
 
-            print(f"Pipeline géneros para {coleccion}:")
-            print(pipeline)
+            if modo == "exacto" and campo_generos == CAMPOS_ORIGEN["generos"]:
+                resultados = await gestor_rollup.conteo_lista(self.db, coleccion, "genero", limite)
+                if resultados is not None:
+                    return {**self._formatear_conteo_generos(resultados), "desde_rollup": True}
+
+            pipeline, _ = await self.construir_pipeline("conteo-generos", coleccion, campo=campo_generos, limite=limite)
+            muestreo = await self._plan_muestreo(collection, error) if modo == "aproximado" else None
+            pipeline = self._con_muestra(pipeline, muestreo)
+
+            logger.debug("Pipeline de obtener_conteo_generos para %s", coleccion, extra={"pipeline": pipeline})
 
             cursor = collection.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
-            print(f"Resultados géneros: {resultados}")
+            resultados = await a_lista(cursor, limite)
             
-            conteos = [
-                {"genero": doc.get("_id", ""), "conteo": doc.get("conteo", 0)} 
-                for doc in resultados 
-                if doc.get("_id")
-            ]
-            
-            return {
-                "success": True, 
-                "conteos": conteos, 
-                "total_generos": len(conteos)
-            }
+            formateado = self._formatear_conteo_generos(resultados)
+            if muestreo and muestreo["muestra"]:
+                formateado = self._estimar_conteos(formateado, "conteos", muestreo)
+            return self._anotar_muestreo(formateado, muestreo)
             
         except Exception as e:
-            print(f"Error en obtener_conteo_generos: {str(e)}")
+            logger.error("Error en obtener_conteo_generos: %s", e)
             return {
                 "success": False, 
                 "conteos": [], 
                 "error": str(e)
             }
 
-    async def obtener_rating_promedio(self, coleccion: str, campo_rating: str = "Rating"):
+    @medido
+    @cacheado(ttl=300)
+    async def obtener_rating_promedio(
+        self,
+        coleccion: str,
+        campo_rating: str = "Rating",
+        modo: str = "exacto",
+        error: float = 0.01
+    ):
         """Calcula el rating promedio de todos los documentos en una colección.
         
         Maneja ratings como números o strings que pueden convertirse a números.
+        Con `modo="aproximado"` el promedio y el total de ratings se estiman
+        sobre una muestra e incluyen su intervalo de confianza del 95%.
         """
+        self._validar_modo(modo, error)
         try:
             collection = self.db[coleccion]
-            
-            # Primero ver una muestra de los datos
-            muestra = await collection.find({}).limit(3).to_list(length=3)
-            print(f"Muestra de {campo_rating}:")
-            for doc in muestra:
-                rating_val = doc.get(campo_rating)
-                print(f"  Tipo: {type(rating_val)}, Valor: {rating_val}")
-            
+
+            if modo == "exacto" and campo_rating == CAMPOS_ORIGEN["rating"]:
+                resultados = await gestor_rollup.rating_promedio(self.db, coleccion)
+                if resultados is not None:
+                    return {**self._formatear_rating_promedio(resultados), "desde_rollup": True}
+
             # Pipeline para calcular promedio, manejando strings y números
-            pipeline = [
-                {
-                    "$addFields": {
-                        "__ratingNum": {
-                            "$cond": {
-                                "if": {"$eq": [{"$type": f"${campo_rating}"}, "string"]},
-                                "then": {
-                                    "$toDouble": {
-                                        "$cond": {
-                                            "if": {"$regexMatch": {"input": f"${campo_rating}", "regex": "^[0-9]+(\\.[0-9]+)?$"}},
-                                            "then": f"${campo_rating}",
-                                            "else": None
-                                        }
-                                    }
-                                },
-                                "else": {
-                                    "$cond": {
-                                        "if": {"$or": [
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "double"]},
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "int"]},
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "long"]},
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "decimal"]}
-                                        ]},
-                                        "then": {"$toDouble": f"${campo_rating}"},
-                                        "else": None
-                                    }
-                                }
-                            }
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "__ratingNum": {"$ne": None, "$gte": 0, "$lte": 10}
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": None,
-                        "promedio": {"$avg": "$__ratingNum"},
-                        "total_ratings": {"$sum": 1},
-                        "min_rating": {"$min": "$__ratingNum"},
-                        "max_rating": {"$max": "$__ratingNum"}
-                    }
-                }
-            ]
+            pipeline, _ = await self.construir_pipeline("rating-promedio", coleccion, campo=campo_rating)
+            muestreo = await self._plan_muestreo(collection, error) if modo == "aproximado" else None
+            pipeline = self._con_muestra(pipeline, muestreo)
 
-            print(f"Pipeline rating promedio para {coleccion}:")
-            print(pipeline)
+            logger.debug("Pipeline de obtener_rating_promedio para %s", coleccion, extra={"pipeline": pipeline})
 
             cursor = collection.aggregate(pipeline)
-            resultados = await cursor.to_list(length=1)
-            print(f"Resultados rating: {resultados}")
+            resultados = await a_lista(cursor, 1)
             
-            if resultados:
-                result = resultados[0]
-                promedio = round(result.get("promedio", 0), 2)
-                return {
-                    "success": True,
-                    "rating_promedio": promedio,
-                    "total_ratings": result.get("total_ratings", 0),
-                    "min_rating": result.get("min_rating", 0),
-                    "max_rating": result.get("max_rating", 0)
-                }
-            else:
-                return {
-                    "success": True,
-                    "rating_promedio": 0,
-                    "total_ratings": 0,
-                    "min_rating": 0,
-                    "max_rating": 0
-                }
+            if muestreo and muestreo["muestra"]:
+                return self._anotar_muestreo(self._estimar_rating_promedio(resultados, muestreo), muestreo)
+            return self._anotar_muestreo(self._formatear_rating_promedio(resultados), muestreo)
             
         except Exception as e:
-            print(f"Error en obtener_rating_promedio: {str(e)}")
+            logger.error("Error en obtener_rating_promedio: %s", e)
             return {
                 "success": False,
                 "rating_promedio": 0,
                 "error": str(e)
             }
 
-    async def obtener_distribucion_rating(self, coleccion: str, campo_rating: str = "Rating"):
+    @medido
+    @cacheado(ttl=300)
+    async def obtener_distribucion_rating(
+        self,
+        coleccion: str,
+        campo_rating: str = "Rating",
+        modo: str = "exacto",
+        error: float = 0.01
+    ):
         """Devuelve la distribución de ratings agrupados por rangos.
         
         Agrupa ratings en rangos: 0-1, 1-2, 2-3, 3-4, 4-5, etc.
+        Con `modo="aproximado"` cada conteo es una estimación con su `intervalo`.
         """
+        self._validar_modo(modo, error)
         try:
             collection = self.db[coleccion]
             
             # Pipeline para agrupar ratings por rangos
-            pipeline = [
-                {
-                    "$addFields": {
-                        "__ratingNum": {
-                            "$cond": {
-                                "if": {"$eq": [{"$type": f"${campo_rating}"}, "string"]},
-                                "then": {
-                                    "$toDouble": {
-                                        "$cond": {
-                                            "if": {"$regexMatch": {"input": f"${campo_rating}", "regex": "^[0-9]+(\\.[0-9]+)?$"}},
-                                            "then": f"${campo_rating}",
-                                            "else": None
-                                        }
-                                    }
-                                },
-                                "else": {
-                                    "$cond": {
-                                        "if": {"$or": [
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "double"]},
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "int"]},
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "long"]},
-                                            {"$eq": [{"$type": f"${campo_rating}"}, "decimal"]}
-                                        ]},
-                                        "then": {"$toDouble": f"${campo_rating}"},
-                                        "else": None
-                                    }
-                                }
-                            }
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "__ratingNum": {"$ne": None, "$gte": 0, "$lte": 10}
-                    }
-                },
-                {
-                    "$addFields": {
-                        "__ratingRange": {
-                            "$switch": {
-                                "branches": [
-                                    {"case": {"$and": [{"$gte": ["$__ratingNum", 0]}, {"$lt": ["$__ratingNum", 2]}]}, "then": "0-2 ⭐"},
-                                    {"case": {"$and": [{"$gte": ["$__ratingNum", 2]}, {"$lt": ["$__ratingNum", 3]}]}, "then": "2-3 ⭐⭐"},
-                                    {"case": {"$and": [{"$gte": ["$__ratingNum", 3]}, {"$lt": ["$__ratingNum", 4]}]}, "then": "3-4 ⭐⭐⭐"},
-                                    {"case": {"$and": [{"$gte": ["$__ratingNum", 4]}, {"$lt": ["$__ratingNum", 5]}]}, "then": "4-5 ⭐⭐⭐⭐"},
-                                    {"case": {"$gte": ["$__ratingNum", 5]}, "then": "5+ ⭐⭐⭐⭐⭐"}
-                                ],
-                                "default": "Sin rating"
-                            }
-                        }
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$__ratingRange",
-                        "conteo": {"$sum": 1},
-                        "promedio_rango": {"$avg": "$__ratingNum"}
-                    }
-                },
-                {
-                    "$sort": {"_id": 1}
-                }
-            ]
+            pipeline, _ = await self.construir_pipeline("distribucion-rating", coleccion, campo=campo_rating)
+            muestreo = await self._plan_muestreo(collection, error) if modo == "aproximado" else None
+            pipeline = self._con_muestra(pipeline, muestreo)
 
-            print(f"Pipeline distribución rating para {coleccion}:")
-            print(pipeline)
+            logger.debug("Pipeline de obtener_distribucion_rating para %s", coleccion, extra={"pipeline": pipeline})
 
             cursor = collection.aggregate(pipeline)
-            resultados = await cursor.to_list(length=10)
-            print(f"Resultados distribución rating: {resultados}")
-            
-            # Definir colores para cada rango
-            color_map = {
-                "0-2 ⭐": "#ef4444",        # Rojo
-                "2-3 ⭐⭐": "#f97316",      # Naranja
-                "3-4 ⭐⭐⭐": "#eab308",    # Amarillo
-                "4-5 ⭐⭐⭐⭐": "#22c55e",  # Verde
-                "5+ ⭐⭐⭐⭐⭐": "#3b82f6", # Azul
-            }
-            
-            distribucion = [
-                {
-                    "rango": doc.get("_id", ""),
-                    "conteo": doc.get("conteo", 0),
-                    "promedio_rango": round(doc.get("promedio_rango", 0), 2),
-                    "color": color_map.get(doc.get("_id", ""), "#6b7280")
-                }
-                for doc in resultados
-                if doc.get("_id")
-            ]
-            
-            total_ratings = sum(d["conteo"] for d in distribucion)
+            resultados = await a_lista(cursor, 10)
             
-            return {
-                "success": True,
-                "distribucion": distribucion,
-                "total_ratings": total_ratings
-            }
+            formateado = self._formatear_distribucion_rating(resultados)
+            if muestreo and muestreo["muestra"]:
+                formateado = self._estimar_conteos(formateado, "distribucion", muestreo)
+                formateado["total_ratings"] = sum(d["conteo"] for d in formateado["distribucion"])
+            return self._anotar_muestreo(formateado, muestreo)
             
         except Exception as e:
-            print(f"Error en obtener_distribucion_rating: {str(e)}")
+            logger.error("Error en obtener_distribucion_rating: %s", e)
             return {
                 "success": False,
                 "distribucion": [],
                 "error": str(e)
             }
 
+    @medido
+    @cacheado(ttl=300)
     async def obtener_conteo_desarrolladores(self, coleccion: str, campo_desarrolladores: str = "Developers", limite: int = 15):
         """Devuelve conteo de desarrolladores individuales, separando desarrolladores múltiples.
         
@@ -579,229 +1314,65 @@ class ReporteService:
         """
         try:
             collection = self.db[coleccion]
-            
-            # Primero verificar el tipo de datos
-            muestra = await collection.find({}).limit(3).to_list(length=3)
-            print(f"Muestra de {campo_desarrolladores}:")
-            for doc in muestra:
-                dev_val = doc.get(campo_desarrolladores)
-                print(f"  Tipo: {type(dev_val)}, Valor: {dev_val}")
-            
-            # Pipeline robusto que maneja arrays y strings
-            pipeline = [
-                {
-                    "$addFields": {
-                        "__devsProcessed": {
-                            "$cond": {
-                                "if": {"$isArray": f"${campo_desarrolladores}"},
-                                # Si es array, usar directamente
-                                "then": f"${campo_desarrolladores}",
-                                # Si no es array, convertir a string y procesar
-                                "else": {
-                                    "$split": [
-                                        {
-                                            "$replaceAll": {
-                                                "input": {
-                                                    "$replaceAll": {
-                                                        "input": {
-                                                            "$replaceAll": {
-                                                                "input": {
-                                                                    "$toString": {"$ifNull": [f"${campo_desarrolladores}", ""]}
-                                                                },
-                                                                "find": "[",
-                                                                "replacement": ""
-                                                            }
-                                                        },
-                                                        "find": "]",
-                                                        "replacement": ""
-                                                    }
-                                                },
-                                                "find": "'",
-                                                "replacement": ""
-                                            }
-                                        },
-                                        ", "
-                                    ]
-                                }
-                            }
-                        }
-                    }
-                },
-                {
-                    "$unwind": "$__devsProcessed"
-                },
-                {
-                    "$addFields": {
-                        "desarrollador": {
-                            "$trim": {
-                                "input": {"$toString": "$__devsProcessed"}
-                            }
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "desarrollador": {"$ne": "", "$ne": None, "$ne": "null"}
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$desarrollador",
-                        "conteo": {"$sum": 1}
-                    }
-                },
-                {
-                    "$sort": {"conteo": -1}
-                },
-                {
-                    "$limit": limite
-                }
-            ]
 
-            print(f"Pipeline desarrolladores para {coleccion}:")
-            print(pipeline)
+            if campo_desarrolladores == CAMPOS_ORIGEN["desarrolladores"]:
+                resultados = await gestor_rollup.conteo_lista(self.db, coleccion, "desarrollador", limite)
+                if resultados is not None:
+                    return {**self._formatear_conteo_desarrolladores(resultados), "desde_rollup": True}
+
+            # Los desarrolladores ya vienen como array (materializado o calculado al vuelo)
+            pipeline, _ = await self.construir_pipeline(
+                "conteo-desarrolladores", coleccion, campo=campo_desarrolladores, limite=limite
+            )
+
+            logger.debug("Pipeline de obtener_conteo_desarrolladores para %s", coleccion, extra={"pipeline": pipeline})
 
             cursor = collection.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
-            print(f"Resultados desarrolladores: {resultados}")
+            resultados = await a_lista(cursor, limite)
             
-            conteos = [
-                {"desarrollador": doc.get("_id", ""), "conteo": doc.get("conteo", 0)} 
-                for doc in resultados 
-                if doc.get("_id")
-            ]
-            
-            return {
-                "success": True, 
-                "conteos": conteos, 
-                "total_desarrolladores": len(conteos)
-            }
+            return self._formatear_conteo_desarrolladores(resultados)
             
         except Exception as e:
-            print(f"Error en obtener_conteo_desarrolladores: {str(e)}")
+            logger.error("Error en obtener_conteo_desarrolladores: %s", e)
             return {
                 "success": False, 
                 "conteos": [], 
                 "error": str(e)
             }
 
+    @medido
+    @cacheado(ttl=120)
     async def obtener_top_juegos_populares(self, nombre_coleccion: str, limite: int = 20) -> Dict[str, Any]:
         """
         Obtiene el top de juegos más populares basado en diferentes métricas como rating, 
         número de reviews, etc. Prioriza juegos con más datos disponibles.
         """
+        # Con change streams activos el top se lee de memoria en O(k)
+        filas = gestor_leaderboards.leer(nombre_coleccion, "top-juegos-populares", limite)
+        if filas is not None:
+            return self._formatear_top_juegos_populares(filas)
+
         try:
             coleccion = self.db[nombre_coleccion]
             
-            # Pipeline que calcula una puntuación de popularidad combinando varios factores
-            pipeline = [
-                {
-                    "$addFields": {
-                        # Normalizar rating (0-10 scale)
-                        "rating_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Rating", None]}, 
-                                    {"$ne": ["$Rating", ""]},
-                                    {"$ne": ["$Rating", "N/A"]},
-                                    {"$ne": ["$Rating", "TBD"]},
-                                    {"$not": {"$eq": [{"$type": "$Rating"}, "string"]}}
-                                ]},
-                                "then": {
-                                    "$cond": {
-                                        "if": {"$isNumber": "$Rating"},
-                                        "then": "$Rating",
-                                        "else": {
-                                            "$convert": {
-                                                "input": "$Rating",
-                                                "to": "double",
-                                                "onError": 0
-                                            }
-                                        }
-                                    }
-                                },
-                                "else": 0
-                            }
-                        },
-                        # Contar reviews si existe el campo
-                        "reviews_count": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Reviews", None]}, 
-                                    {"$ne": ["$Reviews", ""]}
-                                ]},
-                                "then": {
-                                    "$cond": {
-                                        "if": {"$isNumber": "$Reviews"},
-                                        "then": "$Reviews",
-                                        "else": 1
-                                    }
-                                },
-                                "else": 0
-                            }
-                        },
-                        # Factor de completitud de datos (más campos = más popular)
-                        "completitud": {
-                            "$add": [
-                                {"$cond": [{"$ne": ["$Title", None]}, 1, 0]},
-                                {"$cond": [{"$ne": ["$Rating", None]}, 1, 0]},
-                                {"$cond": [{"$ne": ["$Genres", None]}, 1, 0]},
-                                {"$cond": [{"$ne": ["$Developers", None]}, 1, 0]},
-                                {"$cond": [{"$ne": ["$Release_Date", None]}, 1, 0]}
-                            ]
-                        }
-                    }
-                },
-                {
-                    "$addFields": {
-                        # Calcular puntuación de popularidad
-                        "popularidad_score": {
-                            "$add": [
-                                {"$multiply": ["$rating_normalizado", 2]},  # Rating tiene peso 2
-                                {"$multiply": [{"$min": [{"$divide": ["$reviews_count", 100]}, 5]}, 1]},  # Reviews (max 5 puntos)
-                                {"$multiply": ["$completitud", 0.5]}  # Completitud de datos
-                            ]
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "Title": {"$ne": None, "$ne": ""},
-                        "popularidad_score": {"$gt": 0}
-                    }
-                },
-                {"$sort": {"popularidad_score": -1, "rating_normalizado": -1}},
-                {"$limit": limite},
-                {
-                    "$project": {
-                        "_id": 0,
-                        "nombre": "$Title",
-                        "rating": "$rating_normalizado",
-                        "generos": "$Genres",
-                        "desarrolladores": "$Developers",
-                        "fecha_lanzamiento": "$Release_Date",
-                        "reviews": "$reviews_count",
-                        "popularidad_score": {"$round": ["$popularidad_score", 2]}
-                    }
-                }
-            ]
-            
-            print(f"Pipeline juegos populares para {nombre_coleccion}:")
-            print(pipeline)
+            pipeline, _ = await self.construir_pipeline("top-juegos-populares", nombre_coleccion, limite=limite)
+
+            logger.debug("Pipeline de obtener_top_juegos_populares para %s", nombre_coleccion, extra={"pipeline": pipeline})
 
             cursor = coleccion.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
-            print(f"Resultados juegos populares: {len(resultados)} juegos")
+            resultados = await a_lista(cursor, limite)
             
-            return {
-                "success": True, 
-                "juegos": resultados, 
-                "total_juegos": len(resultados)
-            }
+            return self._formatear_top_juegos_populares(resultados)
             
         except Exception as e:
-            print(f"Error en obtener_top_juegos_populares: {str(e)}")
+            logger.error("Error en obtener_top_juegos_populares: %s", e)
+            return {
+                "success": False, 
+                "juegos": [], 
+                "error": str(e)
+            }
 
+    @medido
     async def regresion_lineal(
         self,
         coleccion: str,
@@ -809,12 +1380,45 @@ class ReporteService:
         campo_x: Optional[str] = None,
         campos_x: Optional[List[str]] = None,
         filtros: Dict[str, Any] = {},
-        limite: int = 10000
+        limite: int = 10000,
+        modo: str = "muestra"
     ) -> Dict[str, Any]:
         """Ajusta una regresión lineal simple o múltiple sobre los campos especificados.
 
-        Retorna coeficientes, intercepto, R^2 y un ejemplo de predicciones.
+        Con `modo="muestra"` se ajusta sobre los primeros `limite` documentos; con
+        `modo="servidor"` o `modo="streaming"` sobre la colección completa (ver
+        `_regresion_servidor` y `_regresion_streaming`).
+        Retorna coeficientes, intercepto, R^2, un ejemplo de predicciones y el
+        `model_id` del modelo guardado en `_modelos` (ver `cache_modelos`); si ya había un modelo
+        para la misma consulta y versión de datos se devuelve sin reajustar.
         """
+        if modo not in MODOS_REGRESION:
+            raise ValueError(f"Modo no soportado: {modo} ({', '.join(MODOS_REGRESION)})")
+        features = campos_x or ([campo_x] if campo_x else [])
+        clave = await cache_modelos.clave(self.db, coleccion, features, campo_y, filtros, modo, limite)
+        guardado = await cache_modelos.buscar(self.db, clave)
+        if guardado is not None:
+            return {**guardado["resultado"], "model_id": guardado["model_id"], "desde_cache": True}
+
+        resultado = await self._ajustar_regresion(coleccion, campo_y, campo_x, campos_x, filtros, limite, modo)
+        if resultado.get("success"):
+            resultado["model_id"] = await cache_modelos.guardar(self.db, clave, resultado)
+        return resultado
+
+    async def _ajustar_regresion(
+        self,
+        coleccion: str,
+        campo_y: str,
+        campo_x: Optional[str],
+        campos_x: Optional[List[str]],
+        filtros: Dict[str, Any],
+        limite: int,
+        modo: str
+    ) -> Dict[str, Any]:
+        if modo == "servidor":
+            return await self._regresion_servidor(coleccion, campo_y, campos_x or ([campo_x] if campo_x else []), filtros)
+        if modo == "streaming":
+            return await self._regresion_streaming(coleccion, campo_y, campos_x or ([campo_x] if campo_x else []), filtros)
         try:
             collection = self.db[coleccion]
 
@@ -830,10 +1434,18 @@ class ReporteService:
                 features.append(campo_x)
             projection[campo_y] = 1
 
+            # Sin filtros, un snapshot vigente evita descargar y decodificar los documentos
+            snapshot = await gestor_snapshots.vigente(self.db, coleccion) if not filtros else None
+            if snapshot and gestor_snapshots.contiene(snapshot, features + [campo_y]):
+                resultado = await ejecutor_analitica.ejecutar(
+                    ajustar_regresion_snapshot, snapshot["directorio"], features, campo_y, limite
+                )
+                return {**resultado, "desde_snapshot": True}
+
             cursor = collection.find(filtros, projection).limit(limite)
-            datos = await cursor.to_list(length=limite)
+            columnas, total = await self._columnas_desde_cursor(cursor, features + [campo_y])
 
-            if not datos:
+            if not total:
                 return {
                     "success": False,
                     "mensaje": "No se encontraron registros",
@@ -844,93 +1456,201 @@ class ReporteService:
                     "ejemplo_predicciones": []
                 }
 
-            df = pd.DataFrame(datos)
-
-            # Convertir a valores numéricos
-            cols_to_convert = features + [campo_y]
-            for col in cols_to_convert:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+            # El ajuste (pandas/sklearn) corre en el pool de procesos
+            return await ejecutor_analitica.ejecutar(ajustar_regresion_muestra, columnas, features, campo_y)
+        except (ColaLlenaError, TiempoAgotadoError):
+            raise
+        except Exception as e:
+            return {
+                "success": False,
+                "mensaje": "Error ajustando regresión: " + str(e),
+                "coeficientes": [],
+                "intercept": 0.0,
+                "r2": 0.0,
+                "n": 0,
+                "ejemplo_predicciones": []
+            }
 
-            df = df.dropna(subset=cols_to_convert)
+    @staticmethod
+    async def _columnas_desde_cursor(cursor, campos: Optional[List[str]] = None):
+        """Lee un cursor directo a columnas {campo: [valores]} para enviarlas al pool.
 
-            if df.empty or len(features) == 0:
-                return {
-                    "success": False,
-                    "mensaje": "No hay datos numéricos válidos o no se especificaron features",
-                    "coeficientes": [],
-                    "intercept": 0.0,
-                    "r2": 0.0,
-                    "n": 0,
-                    "ejemplo_predicciones": []
-                }
+        Solo se conservan escalares (números, strings, booleanos); el resto viaja
+        como None. Si `campos` es None las columnas se descubren sobre la marcha.
+        Retorna (columnas, número de documentos).
+        """
+        columnas: Dict[str, List[Any]] = {campo: [] for campo in campos or []}
+        total = 0
+        async for doc in iterar(cursor):
+            if campos is None:
+                for campo in doc:
+                    if campo not in columnas and campo not in ("_id", CAMPO_NORMALIZADO):
+                        columnas[campo] = [None] * total
+            for campo, valores in columnas.items():
+                valor = _valor_ruta(doc, campo)
+                valores.append(valor if isinstance(valor, (int, float, str)) else None)
+            total += 1
+        return columnas, total
 
-            X = df[features].values if len(features) > 1 else df[features[0]].values.reshape(-1, 1)
-            y = df[campo_y].values
+    async def _regresion_servidor(
+        self,
+        coleccion: str,
+        campo_y: str,
+        features: List[str],
+        filtros: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Regresión OLS sobre todos los documentos que cumplen `filtros`.
 
-            model = LinearRegression()
-            model.fit(X, y)
+        MongoDB calcula los estadísticos suficientes en un `$group` y aquí solo se
+        resuelven las ecuaciones normales, así que se transfieren O(p²) números
+        en lugar de O(n) documentos.
+        """
+        vacio = {"coeficientes": [], "intercept": 0.0, "r2": 0.0, "n": 0, "ejemplo_predicciones": []}
+        try:
+            if not features:
+                return {"success": False, "mensaje": "No se especificaron features", **vacio}
 
-            preds = model.predict(X)
-            score = float(r2_score(y, preds))
+            collection = self.db[coleccion]
+            pipeline = [{"$match": filtros}] if filtros else []
+            pipeline += etapas_estadisticos_ols(features, campo_y)
+            estadisticos = await a_lista(collection.aggregate(pipeline, allowDiskUse=True), 1)
 
-            coefs = [float(c) for c in np.atleast_1d(model.coef_).tolist()]
-            intercept = float(model.intercept_)
+            ajuste = resolver_ols(estadisticos[0] if estadisticos else None, len(features))
+            if ajuste["n"] == 0:
+                return {"success": False, "mensaje": "No hay datos numéricos válidos", **vacio}
 
+            # Ejemplo de predicciones con los primeros documentos válidos
+            projection = {"_id": 0, campo_y: 1, **{f: 1 for f in features}}
             ejemplo = []
-            sample = df.head(5)
-            for _, row in sample.iterrows():
-                input_vals = {f: (row[f] if f in row else None) for f in features}
-                x_for_pred = row[features].values.reshape(1, -1) if len(features) > 1 else [row[features[0]]]
-                try:
-                    pred_val = float(model.predict(np.array(x_for_pred).reshape(1, -1))[0])
-                except Exception:
-                    pred_val = None
-                ejemplo.append({"input": input_vals, "y": float(row[campo_y]), "pred": pred_val})
+            async for doc in collection.find(filtros, projection).limit(50):
+                valores = [a_numero(_valor_ruta(doc, f)) for f in features]
+                y = a_numero(_valor_ruta(doc, campo_y))
+                if y is None or any(v is None for v in valores):
+                    continue
+                pred = ajuste["intercept"] + sum(c * v for c, v in zip(ajuste["coeficientes"], valores))
+                ejemplo.append({"input": dict(zip(features, valores)), "y": float(y), "pred": float(pred)})
+                if len(ejemplo) == 5:
+                    break
 
             return {
                 "success": True,
-                "mensaje": "Regresión lineal ajustada",
-                "coeficientes": coefs,
-                "intercept": intercept,
-                "r2": score,
-                "n": len(df),
+                "mensaje": "Regresión lineal ajustada sobre la colección completa",
+                **ajuste,
                 "ejemplo_predicciones": ejemplo
             }
         except Exception as e:
-            return {
-                "success": False,
-                "mensaje": "Error ajustando regresión: " + str(e),
-                "coeficientes": [],
-                "intercept": 0.0,
-                "r2": 0.0,
-                "n": 0,
-                "ejemplo_predicciones": []
+            return {"success": False, "mensaje": "Error ajustando regresión: " + str(e), **vacio}
+
+    async def _regresion_streaming(
+        self,
+        coleccion: str,
+        campo_y: str,
+        features: List[str],
+        filtros: Dict[str, Any],
+        tamano_lote: int = TAMANO_LOTE_STREAMING
+    ) -> Dict[str, Any]:
+        """Regresión OLS sobre todos los documentos que cumplen `filtros`, por bloques.
+
+        Recorre el cursor de a `tamano_lote` documentos; cada bloque se convierte
+        a float64 y se acumula en XᵀX/Xᵀy en el pool de analítica
+        (`acumular_ols_lote`), y el event loop solo suma los acumuladores
+        (`AcumuladorOLS.sumar`). La memoria depende del tamaño del bloque y no de
+        la colección, y el R² sale de los mismos acumuladores, sin una segunda pasada.
+        """
+        import numpy as np
+
+        vacio = {"coeficientes": [], "intercept": 0.0, "r2": 0.0, "n": 0, "ejemplo_predicciones": []}
+        try:
+            if not features:
+                return {"success": False, "mensaje": "No se especificaron features", **vacio}
+
+            columnas = features + [campo_y]
+            snapshot = await gestor_snapshots.vigente(self.db, coleccion) if not filtros else None
+            desde_snapshot = snapshot is not None and gestor_snapshots.contiene(snapshot, columnas)
+            if desde_snapshot:
+                # Los bloques salen del snapshot (memmap) en el worker, sin consultar MongoDB
+                estadisticos, filas_ejemplo = await ejecutor_analitica.ejecutar(
+                    acumular_ols_snapshot, snapshot["directorio"], features, campo_y, tamano_lote
+                )
+            else:
+                projection = {"_id": 0, **{campo: 1 for campo in columnas}}
+                cursor = self.db[coleccion].find(filtros, projection).batch_size(tamano_lote)
+
+                acumulador = AcumuladorOLS(len(features))
+                filas_ejemplo = None
+                while True:
+                    documentos = await a_lista(cursor, tamano_lote)
+                    if not documentos:
+                        break
+                    parcial, ejemplo = await ejecutor_analitica.ejecutar(
+                        acumular_ols_lote, documentos, features, campo_y
+                    )
+                    acumulador.sumar(parcial)
+                    if filas_ejemplo is None:
+                        filas_ejemplo = ejemplo
+                estadisticos = acumulador.estadisticos()
+
+            ajuste = resolver_ols(estadisticos, len(features))
+            if ajuste["n"] == 0:
+                return {"success": False, "mensaje": "No hay datos numéricos válidos", **vacio}
+
+            ejemplo = [
+                {
+                    "input": dict(zip(features, (float(v) for v in fila[:-1]))),
+                    "y": float(fila[-1]),
+                    "pred": float(ajuste["intercept"] + np.dot(ajuste["coeficientes"], fila[:-1]))
+                }
+                for fila in filas_ejemplo
+            ]
+            resultado = {
+                "success": True,
+                "mensaje": "Regresión lineal ajustada por bloques sobre la colección completa",
+                **ajuste,
+                "ejemplo_predicciones": ejemplo
             }
-        return {
-            "success": False, 
-            "juegos": [], 
-            "error": str(e)
-        }
+            if desde_snapshot:
+                resultado["desde_snapshot"] = True
+            return resultado
+        except (ColaLlenaError, TiempoAgotadoError):
+            raise
+        except Exception as e:
+            return {"success": False, "mensaje": "Error ajustando regresión: " + str(e), **vacio}
 
+    @medido
     async def calcular_matriz_correlacion(
         self,
         coleccion: str,
         campos: Optional[List[str]] = None,
         filtros: Dict[str, Any] = {},
-        limite: int = 10000
+        limite: int = 10000,
+        modo: str = "muestra"
     ) -> Dict[str, Any]:
         """Calcula la matriz de correlación Pearson entre campos numéricos.
 
         Si `campos` es None se intentan inferir columnas numéricas a partir
-        de una muestra de documentos.
+        de una muestra de documentos. Con `modo="servidor"` se usa la colección
+        completa (ver `_correlacion_servidor`).
         """
+        if modo not in MODOS_CORRELACION:
+            raise ValueError(f"Modo no soportado: {modo} ({', '.join(MODOS_CORRELACION)})")
+        if modo == "servidor":
+            return await self._correlacion_servidor(coleccion, campos, filtros)
         try:
             collection = self.db[coleccion]
-            cursor = collection.find(filtros).limit(limite)
-            datos = await cursor.to_list(length=limite)
+            if not campos:
+                # Con catálogo solo se descargan los campos numéricos
+                campos = await CatalogoService(self.db).campos_numericos(coleccion)
+            snapshot = await gestor_snapshots.vigente(self.db, coleccion) if campos and not filtros else None
+            if snapshot and gestor_snapshots.contiene(snapshot, campos):
+                resultado = await ejecutor_analitica.ejecutar(
+                    calcular_correlacion_snapshot, snapshot["directorio"], campos, limite
+                )
+                return {**resultado, "desde_snapshot": True}
+            projection = {"_id": 0, **{c: 1 for c in campos}} if campos else {"_id": 0, CAMPO_NORMALIZADO: 0}
+            cursor = collection.find(filtros, projection).limit(limite)
+            columnas, total = await self._columnas_desde_cursor(cursor, campos or None)
 
-            if not datos:
+            if not total:
                 return {
                     "success": False,
                     "mensaje": "No se encontraron registros",
@@ -939,30 +1659,37 @@ class ReporteService:
                     "n": 0
                 }
 
-            df = pd.DataFrame(datos)
+            # pandas corre en el pool de procesos
+            return await ejecutor_analitica.ejecutar(calcular_correlacion_muestra, columnas, campos)
+        except (ColaLlenaError, TiempoAgotadoError):
+            raise
+        except Exception as e:
+            return {
+                "success": False,
+                "mensaje": "Error calculando correlación: " + str(e),
+                "fields": [],
+                "matrix": [],
+                "n": 0
+            }
+
+    async def _correlacion_servidor(
+        self,
+        coleccion: str,
+        campos: Optional[List[str]],
+        filtros: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Matriz de Pearson sobre todos los documentos que cumplen `filtros`.
 
-            # Si no se especificaron campos, inferir columnas que pueden convertirse a numéricas
+        MongoDB acumula n, sumas, sumas de cuadrados y productos cruzados por par
+        de campos en un solo recorrido; solo viajan O(p²) números.
+        """
+        try:
+            collection = self.db[coleccion]
+            if not campos:
+                campos = await CatalogoService(self.db).campos_numericos(coleccion)
+            if not campos:
+                campos = await self._inferir_campos_numericos(collection, filtros)
             if not campos:
-                posibles = []
-                for c in df.columns:
-                    if c == '_id':
-                        continue
-                    # intentar conversión a numérico en una muestra
-                    series = pd.to_numeric(df[c], errors='coerce')
-                    non_na = series.dropna()
-                    if len(non_na) >= max(1, min(10, len(df)//10)):
-                        posibles.append(c)
-                campos = posibles
-
-            # Convertir columnas seleccionadas a numéricas y filtrar
-            cols_validas = []
-            for c in campos:
-                if c in df.columns:
-                    df[c] = pd.to_numeric(df[c], errors='coerce')
-                    if df[c].dropna().shape[0] > 0:
-                        cols_validas.append(c)
-
-            if not cols_validas:
                 return {
                     "success": False,
                     "mensaje": "No se encontraron columnas numéricas válidas",
@@ -971,31 +1698,25 @@ class ReporteService:
                     "n": 0
                 }
 
-            df_clean = df[cols_validas].dropna()
-            if df_clean.empty:
+            pipeline = [{"$match": filtros}] if filtros else []
+            pipeline += etapas_estadisticos_pearson(campos)
+            estadisticos = await a_lista(collection.aggregate(pipeline, allowDiskUse=True), 1)
+            resultado = resolver_pearson(estadisticos[0] if estadisticos else None, len(campos))
+
+            if not any(resultado["n_pares"][i][i] for i in range(len(campos))):
                 return {
                     "success": False,
-                    "mensaje": "No hay suficientes datos numéricos después de limpiar NA",
-                    "fields": cols_validas,
+                    "mensaje": "No se encontraron registros",
+                    "fields": campos,
                     "matrix": [],
                     "n": 0
                 }
 
-            corr = df_clean.corr(method='pearson').round(3)
-
-            # Convertir a matriz (lista de listas) y devolver campos
-            fields = list(corr.columns)
-            matrix = corr.values.tolist()
-
-            # asegurar floats nativos
-            matrix = [[float(v) for v in row] for row in matrix]
-
             return {
                 "success": True,
-                "mensaje": "Matriz de correlación calculada",
-                "fields": fields,
-                "matrix": matrix,
-                "n": len(df_clean)
+                "mensaje": "Matriz de correlación calculada sobre la colección completa",
+                "fields": campos,
+                **resultado
             }
         except Exception as e:
             return {
@@ -1006,117 +1727,43 @@ class ReporteService:
                 "n": 0
             }
 
+    @staticmethod
+    async def _inferir_campos_numericos(collection, filtros: Dict[str, Any], muestra: int = 200) -> List[str]:
+        """Campos de primer nivel que son numéricos en al menos el 10% de una muestra."""
+        datos = await a_lista(collection.find(filtros, {CAMPO_NORMALIZADO: 0}).limit(muestra), muestra)
+        conteos: Dict[str, int] = {}
+        for doc in datos:
+            for campo, valor in doc.items():
+                if campo != "_id" and a_numero(valor) is not None:
+                    conteos[campo] = conteos.get(campo, 0) + 1
+        minimo = max(1, min(10, len(datos) // 10))
+        return [campo for campo, conteo in conteos.items() if conteo >= minimo]
+
+    @medido
+    @cacheado(ttl=120)
     async def obtener_metricas_dashboard(self, nombre_coleccion: str) -> Dict[str, Any]:
         """
         Obtiene métricas adicionales para el dashboard: jugadores activos, reviews totales, juegos 2024
         """
         try:
             coleccion = self.db[nombre_coleccion]
-            
+
+            resultados = await gestor_rollup.metricas_dashboard(self.db, nombre_coleccion)
+            if resultados is not None:
+                return {**self._formatear_metricas_dashboard(resultados), "desde_rollup": True}
+
             # Pipeline para calcular múltiples métricas en una sola consulta
-            pipeline = [
-                {
-                    "$addFields": {
-                        # Normalizar jugadores activos
-                        "playing_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Playing", None]}, 
-                                    {"$ne": ["$Playing", ""]},
-                                    {"$isNumber": "$Playing"}
-                                ]},
-                                "then": "$Playing",
-                                "else": 0
-                            }
-                        },
-                        # Normalizar reviews
-                        "reviews_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Reviews", None]}, 
-                                    {"$ne": ["$Reviews", ""]},
-                                    {"$isNumber": "$Reviews"}
-                                ]},
-                                "then": "$Reviews",
-                                "else": 0
-                            }
-                        },
-                        # Extraer año de Release_Date
-                        "anio_lanzamiento": {
-                            "$cond": {
-                                "if": {"$ne": ["$Release_Date", None]},
-                                "then": {
-                                    "$let": {
-                                        "vars": {
-                                            "match": {
-                                                "$regexFind": {
-                                                    "input": {"$toString": "$Release_Date"},
-                                                    "regex": "\\d{4}"
-                                                }
-                                            }
-                                        },
-                                        "in": {
-                                            "$cond": {
-                                                "if": {"$ne": ["$$match", None]},
-                                                "then": {
-                                                    "$toInt": "$$match.match"
-                                                },
-                                                "else": 0
-                                            }
-                                        }
-                                    }
-                                },
-                                "else": 0
-                            }
-                        }
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": None,
-                        "total_jugadores_activos": {"$sum": "$playing_normalizado"},
-                        "total_reviews": {"$sum": "$reviews_normalizado"},
-                        "juegos_2024": {
-                            "$sum": {
-                                "$cond": [
-                                    {"$eq": ["$anio_lanzamiento", 2024]}, 
-                                    1, 
-                                    0
-                                ]
-                            }
-                        },
-                        "total_juegos": {"$sum": 1}
-                    }
-                }
-            ]
+            pipeline, _ = await self.construir_pipeline("metricas-dashboard", nombre_coleccion)
             
-            print(f"Pipeline métricas dashboard para {nombre_coleccion}:")
-            print(pipeline)
+            logger.debug("Pipeline de obtener_metricas_dashboard para %s", nombre_coleccion, extra={"pipeline": pipeline})
 
             cursor = coleccion.aggregate(pipeline)
-            resultados = await cursor.to_list(length=1)
-            print(f"Resultados métricas dashboard: {resultados}")
+            resultados = await a_lista(cursor, 1)
             
-            if resultados:
-                metricas = resultados[0]
-                return {
-                    "success": True,
-                    "jugadores_activos": metricas.get("total_jugadores_activos", 0),
-                    "reviews_totales": metricas.get("total_reviews", 0),
-                    "juegos_2024": metricas.get("juegos_2024", 0),
-                    "total_juegos": metricas.get("total_juegos", 0)
-                }
-            else:
-                return {
-                    "success": True,
-                    "jugadores_activos": 0,
-                    "reviews_totales": 0,
-                    "juegos_2024": 0,
-                    "total_juegos": 0
-                }
+            return self._formatear_metricas_dashboard(resultados)
             
         except Exception as e:
-            print(f"Error en obtener_metricas_dashboard: {str(e)}")
+            logger.error("Error en obtener_metricas_dashboard: %s", e)
             return {
                 "success": False,
                 "jugadores_activos": 0,
@@ -1126,273 +1773,247 @@ class ReporteService:
                 "error": str(e)
             }
 
+    @medido
+    @cacheado(ttl=120)
     async def obtener_hidden_gems(self, nombre_coleccion: str, limite: int = 5) -> Dict[str, Any]:
         """
         Obtiene juegos 'Hidden Gems': alto rating pero pocas reviews (joyas ocultas)
         """
+        # Con change streams activos el top se lee de memoria en O(k)
+        filas = gestor_leaderboards.leer(nombre_coleccion, "hidden-gems", limite)
+        if filas is not None:
+            return self._formatear_juegos(filas)
+
         try:
             coleccion = self.db[nombre_coleccion]
             
-            pipeline = [
-                {
-                    "$addFields": {
-                        "rating_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Rating", None]}, 
-                                    {"$ne": ["$Rating", ""]},
-                                    {"$ne": ["$Rating", "N/A"]},
-                                    {"$ne": ["$Rating", "TBD"]},
-                                    {"$not": {"$eq": [{"$type": "$Rating"}, "string"]}}
-                                ]},
-                                "then": {
-                                    "$cond": {
-                                        "if": {"$isNumber": "$Rating"},
-                                        "then": "$Rating",
-                                        "else": {
-                                            "$convert": {
-                                                "input": "$Rating",
-                                                "to": "double",
-                                                "onError": 0
-                                            }
-                                        }
-                                    }
-                                },
-                                "else": 0
-                            }
-                        },
-                        "reviews_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Reviews", None]}, 
-                                    {"$ne": ["$Reviews", ""]},
-                                    {"$isNumber": "$Reviews"}
-                                ]},
-                                "then": "$Reviews",
-                                "else": 0
-                            }
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "Title": {"$ne": None, "$ne": ""},
-                        "rating_normalizado": {"$gte": 4.0},  # Rating alto
-                        "reviews_normalizado": {"$lte": 500}  # Pocas reviews
-                    }
-                },
-                {"$sort": {"rating_normalizado": -1, "reviews_normalizado": 1}},
-                {"$limit": limite},
-                {
-                    "$project": {
-                        "_id": 0,
-                        "titulo": "$Title",
-                        "rating": "$rating_normalizado",
-                        "reviews": "$reviews_normalizado",
-                        "generos": "$Genres"
-                    }
-                }
-            ]
+            pipeline, _ = await self.construir_pipeline("hidden-gems", nombre_coleccion, limite=limite)
             
             cursor = coleccion.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
+            resultados = await a_lista(cursor, limite)
             
-            return {
-                "success": True,
-                "juegos": resultados,
-                "total": len(resultados)
-            }
+            return self._formatear_juegos(resultados)
             
         except Exception as e:
-            print(f"Error en obtener_hidden_gems: {str(e)}")
+            logger.error("Error en obtener_hidden_gems: %s", e)
             return {
                 "success": False,
                 "juegos": [],
                 "error": str(e)
             }
 
+    @medido
+    @cacheado(ttl=120)
     async def obtener_trending_games(self, nombre_coleccion: str, limite: int = 5) -> Dict[str, Any]:
         """
         Obtiene juegos 'Trending': juegos recientes (2020+) con buena recepción
         """
+        # Con change streams activos el top se lee de memoria en O(k)
+        filas = gestor_leaderboards.leer(nombre_coleccion, "trending-games", limite)
+        if filas is not None:
+            return self._formatear_juegos(filas)
+
         try:
             coleccion = self.db[nombre_coleccion]
             
-            pipeline = [
-                {
-                    "$addFields": {
-                        "rating_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Rating", None]}, 
-                                    {"$ne": ["$Rating", ""]},
-                                    {"$ne": ["$Rating", "N/A"]},
-                                    {"$ne": ["$Rating", "TBD"]},
-                                    {"$not": {"$eq": [{"$type": "$Rating"}, "string"]}}
-                                ]},
-                                "then": {
-                                    "$cond": {
-                                        "if": {"$isNumber": "$Rating"},
-                                        "then": "$Rating",
-                                        "else": {
-                                            "$convert": {
-                                                "input": "$Rating",
-                                                "to": "double",
-                                                "onError": 0
-                                            }
-                                        }
-                                    }
-                                },
-                                "else": 0
-                            }
-                        },
-                        "anio_lanzamiento": {
-                            "$cond": {
-                                "if": {"$ne": ["$Release_Date", None]},
-                                "then": {
-                                    "$let": {
-                                        "vars": {
-                                            "match": {
-                                                "$regexFind": {
-                                                    "input": {"$toString": "$Release_Date"},
-                                                    "regex": "\\d{4}"
-                                                }
-                                            }
-                                        },
-                                        "in": {
-                                            "$cond": {
-                                                "if": {"$ne": ["$$match", None]},
-                                                "then": {
-                                                    "$toInt": "$$match.match"
-                                                },
-                                                "else": 0
-                                            }
-                                        }
-                                    }
-                                },
-                                "else": 0
-                            }
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "Title": {"$ne": None, "$ne": ""},
-                        "rating_normalizado": {"$gte": 3.5},
-                        "anio_lanzamiento": {"$gte": 2020}  # Juegos recientes
-                    }
-                },
-                {"$sort": {"anio_lanzamiento": -1, "rating_normalizado": -1}},
-                {"$limit": limite},
-                {
-                    "$project": {
-                        "_id": 0,
-                        "titulo": "$Title",
-                        "rating": "$rating_normalizado",
-                        "anio": "$anio_lanzamiento",
-                        "generos": "$Genres"
-                    }
-                }
-            ]
+            pipeline, _ = await self.construir_pipeline("trending-games", nombre_coleccion, limite=limite)
             
             cursor = coleccion.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
+            resultados = await a_lista(cursor, limite)
             
-            return {
-                "success": True,
-                "juegos": resultados,
-                "total": len(resultados)
-            }
+            return self._formatear_juegos(resultados)
             
         except Exception as e:
-            print(f"Error en obtener_trending_games: {str(e)}")
+            logger.error("Error en obtener_trending_games: %s", e)
             return {
                 "success": False,
                 "juegos": [],
                 "error": str(e)
             }
 
+    @medido
+    @cacheado(ttl=120)
     async def obtener_top_rated_games(self, nombre_coleccion: str, limite: int = 5) -> Dict[str, Any]:
         """
         Obtiene juegos 'Top Rated': los juegos con mejores calificaciones
         """
+        # Con change streams activos el top se lee de memoria en O(k)
+        filas = gestor_leaderboards.leer(nombre_coleccion, "top-rated-games", limite)
+        if filas is not None:
+            return self._formatear_juegos(filas)
+
         try:
             coleccion = self.db[nombre_coleccion]
             
-            pipeline = [
-                {
-                    "$addFields": {
-                        "rating_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Rating", None]}, 
-                                    {"$ne": ["$Rating", ""]},
-                                    {"$ne": ["$Rating", "N/A"]},
-                                    {"$ne": ["$Rating", "TBD"]},
-                                    {"$not": {"$eq": [{"$type": "$Rating"}, "string"]}}
-                                ]},
-                                "then": {
-                                    "$cond": {
-                                        "if": {"$isNumber": "$Rating"},
-                                        "then": "$Rating",
-                                        "else": {
-                                            "$convert": {
-                                                "input": "$Rating",
-                                                "to": "double",
-                                                "onError": 0
-                                            }
-                                        }
-                                    }
-                                },
-                                "else": 0
-                            }
-                        },
-                        "reviews_normalizado": {
-                            "$cond": {
-                                "if": {"$and": [
-                                    {"$ne": ["$Reviews", None]}, 
-                                    {"$ne": ["$Reviews", ""]},
-                                    {"$isNumber": "$Reviews"}
-                                ]},
-                                "then": "$Reviews",
-                                "else": 0
-                            }
-                        }
-                    }
-                },
-                {
-                    "$match": {
-                        "Title": {"$ne": None, "$ne": ""},
-                        "rating_normalizado": {"$gte": 4.0},
-                        "reviews_normalizado": {"$gte": 100}  # Al menos 100 reviews para ser confiable
-                    }
-                },
-                {"$sort": {"rating_normalizado": -1, "reviews_normalizado": -1}},
-                {"$limit": limite},
-                {
-                    "$project": {
-                        "_id": 0,
-                        "titulo": "$Title",
-                        "rating": "$rating_normalizado",
-                        "reviews": "$reviews_normalizado",
-                        "generos": "$Genres"
-                    }
-                }
-            ]
+            pipeline, _ = await self.construir_pipeline("top-rated-games", nombre_coleccion, limite=limite)
             
             cursor = coleccion.aggregate(pipeline)
-            resultados = await cursor.to_list(length=limite)
+            resultados = await a_lista(cursor, limite)
+            
+            return self._formatear_juegos(resultados)
             
+        except Exception as e:
+            logger.error("Error en obtener_top_rated_games: %s", e)
+            return {
+                "success": False,
+                "juegos": [],
+                "error": str(e)
+            }
+
+    @medido
+    @cacheado(ttl=120)
+    async def obtener_dashboard(
+        self,
+        nombre_coleccion: str,
+        limite_populares: int = 20,
+        limite_destacados: int = 5
+    ) -> Dict[str, Any]:
+        """Calcula todos los widgets del dashboard en una sola agregación.
+
+        La normalización se aplica una vez y alimenta un `$facet` con el pipeline de
+        cada widget, así que la colección se recorre una sola vez. Cada clave de la
+        respuesta tiene la misma forma que devuelve el endpoint individual.
+        """
+        try:
+            coleccion = self.db[nombre_coleccion]
+
+            pipeline, opciones = await self.construir_pipeline(
+                "dashboard", nombre_coleccion,
+                limite_populares=limite_populares, limite_destacados=limite_destacados
+            )
+
+            cursor = coleccion.aggregate(pipeline, **opciones)
+            resultados = await a_lista(cursor, 1)
+            facetado = resultados[0] if resultados else {}
+
             return {
                 "success": True,
-                "juegos": resultados,
-                "total": len(resultados)
+                "metricas_dashboard": self._formatear_metricas_dashboard(facetado.get("metricas_dashboard", [])),
+                "rating_promedio": self._formatear_rating_promedio(facetado.get("rating_promedio", [])),
+                "distribucion_rating": self._formatear_distribucion_rating(facetado.get("distribucion_rating", [])),
+                "conteo_generos": self._formatear_conteo_generos(facetado.get("conteo_generos", [])),
+                "conteo_desarrolladores": self._formatear_conteo_desarrolladores(facetado.get("conteo_desarrolladores", [])),
+                "conteo_por_anio": self._formatear_conteo_por_anio(facetado.get("conteo_por_anio", [])),
+                "top_juegos_populares": self._formatear_top_juegos_populares(facetado.get("top_juegos_populares", [])),
+                "hidden_gems": self._formatear_juegos(facetado.get("hidden_gems", [])),
+                "trending_games": self._formatear_juegos(facetado.get("trending_games", [])),
+                "top_rated_games": self._formatear_juegos(facetado.get("top_rated_games", [])),
             }
-            
+
         except Exception as e:
-            print(f"Error en obtener_top_rated_games: {str(e)}")
+            logger.error("Error en obtener_dashboard: %s", e)
             return {
                 "success": False,
-                "juegos": [],
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+
+    async def _metrica_coleccion(self, metrica: str, coleccion: str) -> Dict[str, Any]:
+        if metrica == "rating_promedio":
+            return await self.obtener_rating_promedio(coleccion)
+        if metrica == "distribucion_rating":
+            return await self.obtener_distribucion_rating(coleccion)
+        if metrica == "conteo_generos":
+            return await self.obtener_conteo_generos(coleccion, limite=COMPARACION_MAX_ETIQUETAS)
+        return await self.obtener_conteo_por_anio(coleccion, CAMPOS_ORIGEN["anio"], limite=COMPARACION_MAX_ETIQUETAS)
+
+    @staticmethod
+    def _alinear(resultados: Dict[str, Dict[str, Any]], lista: str, etiqueta: str) -> Dict[str, Any]:
+        """Tabla con las mismas etiquetas para todas las colecciones.
+
+        Una etiqueta que no aparece en una colección vale 0 solo si su lista vino
+        completa; si llegó a `COMPARACION_MAX_ETIQUETAS` no se sabe su conteo y vale
+        None (la colección queda en `truncadas`).
+        """
+        conteos = {
+            coleccion: {item[etiqueta]: item["conteo"] for item in resultado.get(lista, [])}
+            for coleccion, resultado in resultados.items()
+        }
+        truncadas = [
+            coleccion for coleccion, resultado in resultados.items()
+            if len(resultado.get(lista, [])) >= COMPARACION_MAX_ETIQUETAS
+        ]
+        totales: Dict[Any, int] = {}
+        for por_etiqueta in conteos.values():
+            for valor, conteo in por_etiqueta.items():
+                totales[valor] = totales.get(valor, 0) + conteo
+        # Años y rangos en su orden natural; géneros de más a menos frecuente en total
+        if etiqueta == "genero":
+            etiquetas = sorted(totales, key=lambda valor: -totales[valor])
+        else:
+            etiquetas = sorted(totales, key=str)
+        return {
+            "etiquetas": etiquetas,
+            "series": {
+                coleccion: [
+                    por_etiqueta.get(valor, None if coleccion in truncadas else 0)
+                    for valor in etiquetas
+                ]
+                for coleccion, por_etiqueta in conteos.items()
+            },
+            "truncadas": truncadas
+        }
+
+    @medido
+    async def comparar_colecciones(
+        self,
+        colecciones: List[str],
+        metricas: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Calcula las mismas métricas en varias colecciones y las alinea para compararlas.
+
+        Las agregaciones (colección × métrica) corren a la vez sobre el pool de
+        conexiones de Motor, con a lo sumo `COMPARACION_CONCURRENCIA` en curso,
+        así que la latencia se acerca a la de la colección más lenta y no a la suma.
+        Cada métrica reutiliza el método individual (y su cache).
+        """
+        metricas = metricas or list(METRICAS_COMPARACION)
+        desconocidas = [m for m in metricas if m not in METRICAS_COMPARACION]
+        if desconocidas:
+            raise ValueError(f"Métricas no soportadas: {', '.join(desconocidas)}")
+        colecciones = list(dict.fromkeys(colecciones))
+        if not 1 <= len(colecciones) <= COMPARACION_MAX_COLECCIONES:
+            raise ValueError(f"Indique entre 1 y {COMPARACION_MAX_COLECCIONES} colecciones")
+
+        semaforo = asyncio.Semaphore(COMPARACION_CONCURRENCIA)
+
+        async def calcular(metrica: str, coleccion: str) -> Dict[str, Any]:
+            async with semaforo:
+                return await self._metrica_coleccion(metrica, coleccion)
+
+        pares = [(metrica, coleccion) for metrica in metricas for coleccion in colecciones]
+        resultados = await asyncio.gather(*(calcular(m, c) for m, c in pares), return_exceptions=True)
+
+        por_metrica: Dict[str, Dict[str, Dict[str, Any]]] = {metrica: {} for metrica in metricas}
+        errores: Dict[str, Dict[str, str]] = {}
+        for (metrica, coleccion), resultado in zip(pares, resultados):
+            if isinstance(resultado, Exception) or not resultado.get("success"):
+                error = str(resultado) if isinstance(resultado, Exception) else resultado.get("error", "")
+                errores.setdefault(coleccion, {})[metrica] = error
+                continue
+            por_metrica[metrica][coleccion] = resultado
+
+        comparacion: Dict[str, Any] = {}
+        for metrica, resultados_metrica in por_metrica.items():
+            lista, etiqueta = METRICAS_COMPARACION[metrica]
+            if lista is None:
+                comparacion[metrica] = [
+                    {
+                        "coleccion": coleccion,
+                        "rating_promedio": resultado.get("rating_promedio"),
+                        "total_ratings": resultado.get("total_ratings"),
+                        "min_rating": resultado.get("min_rating"),
+                        "max_rating": resultado.get("max_rating"),
+                    }
+                    for coleccion, resultado in resultados_metrica.items()
+                ]
+            else:
+                comparacion[metrica] = self._alinear(resultados_metrica, lista, etiqueta)
+
+        return {
+            # Las colecciones que fallan quedan en `errores`; el resto se compara igual
+            "success": any(por_metrica.values()),
+            "colecciones": colecciones,
+            "metricas": metricas,
+            "comparacion": comparacion,
+            "errores": errores
+        }
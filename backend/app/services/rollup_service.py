@@ -0,0 +1,353 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel, UpdateOne
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import itertools
+import logging
+import os
+import time
+from app.services.normalizacion_service import (
+    CAMPO_NORMALIZADO,
+    COLECCION_METADATOS,
+    etapas_normalizacion,
+    normalizar_documento,
+)
+
+logger = logging.getLogger(__name__)
+
+# Configuración por variables de entorno
+# Colecciones (separadas por coma) cuyo cubo se mantiene en segundo plano
+ROLLUP = [c.strip() for c in os.getenv("ROLLUP", "").split(",") if c.strip()]
+# Cada cuántos segundos se revisa si un cubo está desactualizado
+ROLLUP_INTERVALO = float(os.getenv("ROLLUP_INTERVALO", "60"))
+# Edad máxima de un cubo: cubre modificaciones externas que no se detectan
+ROLLUP_MAX_EDAD = float(os.getenv("ROLLUP_MAX_EDAD", "3600"))
+
+# Valor de una dimensión en las celdas que la agregan completa ("todos los años")
+TODOS = "*"
+DIMENSIONES = ("anio", "genero", "desarrollador")
+# Rango de años que cuenta `conteo-por-anio` (igual que su pipeline)
+ANIO_MINIMO, ANIO_MAXIMO = 1990, 2030
+
+
+def nombre_cubo(coleccion: str) -> str:
+    return f"_rollup_{coleccion}"
+
+
+def _rating_valido(rating: Any) -> Optional[float]:
+    # Mismo criterio que `rating-promedio`: solo ratings entre 0 y 10
+    return rating if rating is not None and 0 <= rating <= 10 else None
+
+
+def celdas_documento(norm: Dict[str, Any]) -> Iterator[Tuple[Any, Any, Any]]:
+    """Celdas del cubo a las que suma un juego (su `_norm`).
+
+    Cada dimensión toma su valor y además `TODOS`, así que un juego suma una
+    vez a cada combinación año × género × desarrollador y a todos sus
+    agregados. Como `$unwind`, un género repetido en la lista cuenta dos veces.
+    """
+    return itertools.product(
+        [norm.get("anio"), TODOS],
+        [TODOS] + list(norm.get("generos") or []),
+        [TODOS] + list(norm.get("desarrolladores") or []),
+    )
+
+
+def _pipeline_cubo(destino: str) -> List[Dict[str, Any]]:
+    rating = f"${CAMPO_NORMALIZADO}.rating"
+    return [
+        {
+            "$project": {
+                "_id": 0,
+                # Un año faltante queda como null dentro del array
+                "anio": [f"${CAMPO_NORMALIZADO}.anio", TODOS],
+                "genero": {"$concatArrays": [[TODOS], {"$ifNull": [f"${CAMPO_NORMALIZADO}.generos", []]}]},
+                "desarrollador": {
+                    "$concatArrays": [[TODOS], {"$ifNull": [f"${CAMPO_NORMALIZADO}.desarrolladores", []]}]
+                },
+                "rating": {
+                    "$cond": [{"$and": [{"$gte": [rating, 0]}, {"$lte": [rating, 10]}]}, rating, None]
+                },
+                "reviews": f"${CAMPO_NORMALIZADO}.reviews",
+                "playing": f"${CAMPO_NORMALIZADO}.playing",
+            }
+        },
+        {"$unwind": "$anio"},
+        {"$unwind": "$genero"},
+        {"$unwind": "$desarrollador"},
+        {
+            "$group": {
+                "_id": {"anio": "$anio", "genero": "$genero", "desarrollador": "$desarrollador"},
+                "conteo": {"$sum": 1},
+                "conteo_rating": {"$sum": {"$cond": [{"$eq": ["$rating", None]}, 0, 1]}},
+                "suma_rating": {"$sum": "$rating"},
+                "suma_rating2": {"$sum": {"$multiply": ["$rating", "$rating"]}},
+                "min_rating": {"$min": "$rating"},
+                "max_rating": {"$max": "$rating"},
+                "suma_reviews": {"$sum": "$reviews"},
+                "suma_jugadores": {"$sum": "$playing"},
+            }
+        },
+        {"$addFields": {"anio": "$_id.anio", "genero": "$_id.genero", "desarrollador": "$_id.desarrollador"}},
+        {"$out": destino},
+    ]
+
+
+# Índices del cubo: cortes por año (género y desarrollador = TODOS), por género
+# (año y desarrollador = TODOS) y por desarrollador (año y género = TODOS)
+_INDICES_CUBO = [
+    IndexModel([("desarrollador", 1), ("genero", 1), ("anio", 1)], name="desarrollador_genero_anio"),
+    IndexModel([("anio", 1), ("genero", 1), ("desarrollador", 1)], name="anio_genero_desarrollador"),
+]
+
+
+class GestorRollup:
+    """Cubo preagregado año × género × desarrollador por colección.
+
+    Cada celda guarda conteo, suma/conteo/min/max de rating, suma de cuadrados
+    de rating, y sumas de reviews y jugadores; los conteos y promedios del
+    dashboard se leen de unos cientos de celdas en lugar de recorrer el
+    catálogo. Las inserciones por la API se suman con `$inc`; cualquier otra
+    escritura (backfill, eventos de change stream) lo marca desactualizado y
+    se reconstruye completo con un `$out` en la siguiente revisión. Un cubo
+    solo se usa si está vigente y su total coincide con el conteo de la
+    colección, lo que también detecta inserciones y borrados externos.
+
+    El estado vive en `_metadatos`, compartido por todos los workers: cada
+    marca incrementa `marcas`, y una reconstrucción solo deja el cubo vigente
+    si nadie lo marcó mientras se recalculaba.
+    """
+
+    def __init__(self, intervalo: float = ROLLUP_INTERVALO, max_edad: float = ROLLUP_MAX_EDAD):
+        self.intervalo = intervalo
+        self.max_edad = max_edad
+        self._bloqueos: Dict[str, asyncio.Lock] = {}
+        self._tarea: Optional[asyncio.Task] = None
+        self.reconstrucciones = 0
+        self.incrementales = 0
+        self.lecturas = 0
+        self.marcados = 0
+
+    def _bloqueo(self, coleccion: str) -> asyncio.Lock:
+        return self._bloqueos.setdefault(coleccion, asyncio.Lock())
+
+    @staticmethod
+    async def _metadatos(db: AsyncIOMotorDatabase, coleccion: str) -> Optional[Dict[str, Any]]:
+        return await db[COLECCION_METADATOS].find_one({"_id": f"rollup:{coleccion}"})
+
+    async def reconstruir(self, db: AsyncIOMotorDatabase, coleccion: str) -> Dict[str, Any]:
+        """Recalcula el cubo completo; `$out` reemplaza el anterior de forma atómica."""
+        async with self._bloqueo(coleccion):
+            inicio = time.perf_counter()
+            # Marcas previas a la reconstrucción: las cubre el `$out`
+            marcas = ((await self._metadatos(db, coleccion)) or {}).get("marcas", 0)
+            destino = nombre_cubo(coleccion)
+            pipeline = await etapas_normalizacion(db, coleccion) + _pipeline_cubo(destino)
+            await db[coleccion].aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+            # `$out` conserva los índices de la colección que reemplaza
+            await db[destino].create_indexes(_INDICES_CUBO)
+
+            total = await db[destino].find_one({dim: TODOS for dim in DIMENSIONES})
+            documentos = total["conteo"] if total else 0
+            celdas = await db[destino].estimated_document_count()
+            await db[COLECCION_METADATOS].update_one(
+                {"_id": f"rollup:{coleccion}"},
+                {"$set": {"documentos": documentos, "celdas": celdas, "actualizado": datetime.utcnow()}},
+                upsert=True
+            )
+            # Vigente solo si ningún worker lo marcó durante la reconstrucción
+            await db[COLECCION_METADATOS].update_one(
+                {"_id": f"rollup:{coleccion}", "marcas": marcas or {"$in": [0, None]}},
+                {"$set": {"vigente": True}}
+            )
+            self.reconstrucciones += 1
+            segundos = time.perf_counter() - inicio
+            logger.info("Cubo de %s: %d celdas para %d juegos en %.2f s", coleccion, celdas, documentos, segundos)
+            return {"coleccion": coleccion, "celdas": celdas, "documentos": documentos, "segundos": round(segundos, 3)}
+
+    async def aplicar_insercion(self, db: AsyncIOMotorDatabase, coleccion: str, documentos: List[Dict[str, Any]]):
+        """Suma juegos recién insertados a un cubo existente (una escritura por celda distinta)."""
+        if not documentos or await self._metadatos(db, coleccion) is None:
+            return
+        celdas: Dict[Tuple, Dict[str, Any]] = {}
+        for doc in documentos:
+            norm = doc.get(CAMPO_NORMALIZADO) or normalizar_documento(doc)
+            rating = _rating_valido(norm.get("rating"))
+            for celda in celdas_documento(norm):
+                acumulado = celdas.setdefault(celda, {
+                    "inc": dict.fromkeys(
+                        ("conteo", "conteo_rating", "suma_rating", "suma_rating2", "suma_reviews", "suma_jugadores"), 0
+                    ),
+                    "ratings": [],
+                })
+                inc = acumulado["inc"]
+                inc["conteo"] += 1
+                inc["suma_reviews"] += norm.get("reviews") or 0
+                inc["suma_jugadores"] += norm.get("playing") or 0
+                if rating is not None:
+                    inc["conteo_rating"] += 1
+                    inc["suma_rating"] += rating
+                    inc["suma_rating2"] += rating * rating
+                    acumulado["ratings"].append(rating)
+
+        operaciones = []
+        for celda, acumulado in celdas.items():
+            valores = dict(zip(DIMENSIONES, celda))
+            actualizacion: Dict[str, Any] = {"$inc": acumulado["inc"], "$setOnInsert": valores}
+            if acumulado["ratings"]:
+                actualizacion["$min"] = {"min_rating": min(acumulado["ratings"])}
+                actualizacion["$max"] = {"max_rating": max(acumulado["ratings"])}
+            operaciones.append(UpdateOne({"_id": valores}, actualizacion, upsert=True))
+
+        try:
+            async with self._bloqueo(coleccion):
+                await db[nombre_cubo(coleccion)].bulk_write(operaciones, ordered=False)
+                await db[COLECCION_METADATOS].update_one(
+                    {"_id": f"rollup:{coleccion}"}, {"$inc": {"documentos": len(documentos)}}
+                )
+            self.incrementales += 1
+        except Exception as e:
+            # Los juegos ya se insertaron: el cubo se corrige en la próxima reconstrucción
+            logger.error("Error sumando juegos al cubo de %s: %s", coleccion, e)
+            await self.marcar_desactualizado(db, coleccion)
+
+    async def marcar_desactualizado(self, db: AsyncIOMotorDatabase, coleccion: str):
+        """Invalida el cubo hasta la próxima reconstrucción, para todos los workers."""
+        self.marcados += 1
+        await db[COLECCION_METADATOS].update_one(
+            {"_id": f"rollup:{coleccion}"}, {"$set": {"vigente": False}, "$inc": {"marcas": 1}}
+        )
+
+    async def disponible(self, db: AsyncIOMotorDatabase, coleccion: str) -> bool:
+        """True si el cubo está vigente y cubre exactamente los documentos de la colección."""
+        metadatos = await self._metadatos(db, coleccion)
+        if not metadatos or not metadatos.get("vigente"):
+            return False
+        return metadatos.get("documentos") == await db[coleccion].estimated_document_count()
+
+    async def _celdas(
+        self, db: AsyncIOMotorDatabase, coleccion: str, filtro: Dict[str, Any]
+    ) -> Optional[List[Dict[str, Any]]]:
+        if not await self.disponible(db, coleccion):
+            return None
+        self.lecturas += 1
+        return await db[nombre_cubo(coleccion)].find(filtro, {"_id": 0}).to_list(length=None)
+
+    # --- Lecturas con la forma de salida de los pipelines de ReporteService ---
+
+    async def conteo_por_anio(self, db: AsyncIOMotorDatabase, coleccion: str, limite: int) -> Optional[List[Dict[str, Any]]]:
+        celdas = await self._celdas(db, coleccion, {
+            "genero": TODOS, "desarrollador": TODOS, "anio": {"$gte": ANIO_MINIMO, "$lte": ANIO_MAXIMO}
+        })
+        if celdas is None:
+            return None
+        celdas.sort(key=lambda c: c["anio"])
+        return [{"_id": c["anio"], "conteo": c["conteo"]} for c in celdas[:limite]]
+
+    async def conteo_lista(
+        self, db: AsyncIOMotorDatabase, coleccion: str, dimension: str, limite: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Conteo por género o por desarrollador (las otras dos dimensiones en `TODOS`)."""
+        filtro = {dim: TODOS for dim in DIMENSIONES if dim != dimension}
+        filtro[dimension] = {"$ne": TODOS}
+        celdas = await self._celdas(db, coleccion, filtro)
+        if celdas is None:
+            return None
+        celdas.sort(key=lambda c: c["conteo"], reverse=True)
+        return [{"_id": c[dimension], "conteo": c["conteo"]} for c in celdas[:limite]]
+
+    async def _totales(
+        self, db: AsyncIOMotorDatabase, coleccion: str, anios: List[Any]
+    ) -> Optional[Dict[Any, Dict[str, Any]]]:
+        """Celdas de `anios` sumando todos los géneros y desarrolladores ({} para un año sin juegos)."""
+        celdas = await self._celdas(db, coleccion, {"anio": {"$in": anios}, "genero": TODOS, "desarrollador": TODOS})
+        if celdas is None:
+            return None
+        return {c["anio"]: c for c in celdas}
+
+    async def rating_promedio(self, db: AsyncIOMotorDatabase, coleccion: str) -> Optional[List[Dict[str, Any]]]:
+        totales = await self._totales(db, coleccion, [TODOS])
+        if totales is None:
+            return None
+        celda = totales.get(TODOS, {})
+        n = celda.get("conteo_rating", 0)
+        if not n:
+            return []
+        suma, suma2 = celda["suma_rating"], celda["suma_rating2"]
+        varianza = (suma2 - suma * suma / n) / (n - 1) if n > 1 else None
+        return [{
+            "promedio": suma / n,
+            "total_ratings": n,
+            "min_rating": celda.get("min_rating"),
+            "max_rating": celda.get("max_rating"),
+            "desviacion": max(varianza, 0.0) ** 0.5 if varianza is not None else None,
+        }]
+
+    async def metricas_dashboard(self, db: AsyncIOMotorDatabase, coleccion: str) -> Optional[List[Dict[str, Any]]]:
+        # 2024: el mismo año que cuenta `_pipeline_metricas_dashboard`
+        totales = await self._totales(db, coleccion, [TODOS, 2024])
+        if totales is None:
+            return None
+        total = totales.get(TODOS)
+        if not total:
+            return []
+        return [{
+            "total_jugadores_activos": total["suma_jugadores"],
+            "total_reviews": total["suma_reviews"],
+            "juegos_2024": totales.get(2024, {}).get("conteo", 0),
+            "total_juegos": total["conteo"],
+        }]
+
+    # --- Mantenimiento en segundo plano ------------------------------------
+
+    def iniciar(self, db: AsyncIOMotorDatabase, colecciones: List[str]):
+        if colecciones and self._tarea is None:
+            self._tarea = asyncio.create_task(self._revisar(db, colecciones))
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+
+    async def _revisar(self, db: AsyncIOMotorDatabase, colecciones: List[str]):
+        while True:
+            for coleccion in colecciones:
+                try:
+                    metadatos = await self._metadatos(db, coleccion)
+                    vencido = (
+                        metadatos is None
+                        or (datetime.utcnow() - metadatos["actualizado"]).total_seconds() > self.max_edad
+                    )
+                    if vencido or not await self.disponible(db, coleccion):
+                        await self.reconstruir(db, coleccion)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error("Error actualizando el cubo de %s: %s", coleccion, e)
+            await asyncio.sleep(self.intervalo)
+
+    async def estado(self, db: AsyncIOMotorDatabase, coleccion: str) -> Dict[str, Any]:
+        metadatos = await self._metadatos(db, coleccion) or {}
+        metadatos.pop("_id", None)
+        return {
+            "coleccion": coleccion,
+            "cubo": nombre_cubo(coleccion),
+            "disponible": await self.disponible(db, coleccion),
+            **metadatos,
+        }
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "colecciones": ROLLUP,
+            "intervalo_segundos": self.intervalo,
+            "max_edad_segundos": self.max_edad,
+            "reconstrucciones": self.reconstrucciones,
+            "incrementales": self.incrementales,
+            "lecturas": self.lecturas,
+            "marcados": self.marcados,
+        }
+
+
+gestor_rollup = GestorRollup()
@@ -0,0 +1,70 @@
+from typing import Any, Optional
+import hashlib
+import json
+import math
+
+# Estructuras probabilísticas de tamaño fijo para perfilar colecciones grandes
+# sin guardar los valores vistos.
+
+
+def _clave_valor(valor: Any) -> bytes:
+    """Representación estable de un valor (el tipo forma parte de la clave: 1 != "1")."""
+    if isinstance(valor, str):
+        return b"s" + valor.encode("utf-8")
+    if isinstance(valor, bool):
+        return b"b1" if valor else b"b0"
+    if isinstance(valor, (int, float)):
+        # 4 y 4.0 son el mismo valor para MongoDB
+        return b"n" + repr(float(valor)).encode("ascii")
+    return b"j" + json.dumps(valor, sort_keys=True, default=str).encode("utf-8")
+
+
+class HyperLogLog:
+    """Estimador de cardinalidad HyperLogLog.
+
+    Con la precisión por defecto (p=12) ocupa 4 KB y el error típico es ~1.6%
+    sin importar cuántos valores distintos haya. Dos sketches de la misma
+    precisión se combinan con `combinar`, así que se pueden actualizar de forma
+    incremental y guardar como bytes.
+    """
+
+    def __init__(self, precision: int = 12, registros: Optional[bytes] = None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registros = bytearray(registros) if registros is not None else bytearray(self.m)
+        if len(self.registros) != self.m:
+            raise ValueError("El tamaño de los registros no coincide con la precisión")
+
+    def agregar(self, valor: Any):
+        x = int.from_bytes(hashlib.blake2b(_clave_valor(valor), digest_size=8).digest(), "big")
+        indice = x >> (64 - self.precision)
+        resto = x & ((1 << (64 - self.precision)) - 1)
+        rango = (64 - self.precision) - resto.bit_length() + 1
+        if rango > self.registros[indice]:
+            self.registros[indice] = rango
+
+    def combinar(self, otro: "HyperLogLog"):
+        if otro.precision != self.precision:
+            raise ValueError("Solo se pueden combinar sketches de la misma precisión")
+        self.registros = bytearray(max(a, b) for a, b in zip(self.registros, otro.registros))
+
+    def estimar(self) -> int:
+        alfa = 0.7213 / (1 + 1.079 / self.m)
+        estimacion = alfa * self.m * self.m / sum(2.0 ** -r for r in self.registros)
+        ceros = self.registros.count(0)
+        # Corrección para cardinalidades pequeñas (conteo lineal)
+        if estimacion <= 2.5 * self.m and ceros:
+            estimacion = self.m * math.log(self.m / ceros)
+        return int(round(estimacion))
+
+    @property
+    def error_relativo(self) -> float:
+        """Error estándar relativo de `estimar` (1.04 / √m)."""
+        return 1.04 / math.sqrt(self.m)
+
+    def a_bytes(self) -> bytes:
+        return bytes(self.registros)
+
+    @classmethod
+    def desde_bytes(cls, datos: bytes) -> "HyperLogLog":
+        return cls(precision=int(math.log2(len(datos))), registros=datos)
@@ -0,0 +1,322 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from app.services.ejecutor import ejecutor_analitica
+from app.services.metricas import a_lista
+from app.services.normalizacion_service import (
+    CAMPO_NORMALIZADO,
+    VERSION_NORMALIZACION,
+    a_numero,
+    normalizar_documento,
+    version_datos,
+)
+
+logger = logging.getLogger(__name__)
+
+# Configuración por variables de entorno
+# Directorio de los snapshots (en Railway, un volumen para que sobrevivan al reinicio)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+# Colecciones (separadas por coma) cuyo snapshot se construye al arrancar si falta o está desactualizado
+SNAPSHOTS = [c.strip() for c in os.getenv("SNAPSHOTS", "").split(",") if c.strip()]
+
+# Cambia si cambia la forma de los archivos; un snapshot de otra versión se ignora
+VERSION_FORMATO = 1
+TAMANO_LOTE_SNAPSHOT = 5000
+ARCHIVO_MANIFIESTO = "manifest.json"
+# Campos de `_norm` que se guardan como columnas `_norm.<campo>`
+_CAMPOS_NORMALIZADOS = ("rating", "reviews", "playing", "anio", "mes")
+# Campos lista de `_norm` que se guardan como códigos de categoría
+_CAMPOS_CATEGORIA = ("generos", "desarrolladores")
+
+
+async def huella_datos(db: AsyncIOMotorDatabase, coleccion: str) -> Dict[str, Any]:
+    """Versión de datos de la colección.
+
+    Conteo (metadatos) y último `_id` (índice `_id`) detectan inserciones y
+    borrados de cualquier origen sin leer documentos; `escrituras` es la
+    versión compartida que incrementa cada escritura hecha por la API desde
+    cualquier worker (`registrar_escritura`).
+    """
+    ultimo = await db[coleccion].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return {
+        "documentos": await db[coleccion].estimated_document_count(),
+        "ultimo_id": str(ultimo["_id"]) if ultimo else None,
+        "escrituras": await version_datos(db, coleccion),
+        "normalizacion": VERSION_NORMALIZACION,
+    }
+
+
+def leer_manifiesto(coleccion: str, raiz: str = SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    ruta = os.path.join(raiz, coleccion, ARCHIVO_MANIFIESTO)
+    try:
+        with open(ruta, encoding="utf-8") as archivo:
+            manifiesto = json.load(archivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifiesto.get("version_formato") != VERSION_FORMATO:
+        return None
+    manifiesto["directorio"] = os.path.abspath(os.path.join(raiz, coleccion, manifiesto["id"]))
+    return manifiesto
+
+
+class Snapshot:
+    """Columnas de un snapshot abiertas con `np.memmap` (`np.load(mmap_mode="r")`).
+
+    Abrirlo solo lee el manifiesto y los encabezados `.npy`: los datos se
+    cargan bajo demanda desde la cache de páginas del sistema operativo, y las
+    columnas y sus rebanadas son vistas sin copia.
+    """
+
+    def __init__(self, directorio: str):
+        import numpy as np
+
+        with open(os.path.join(directorio, ARCHIVO_MANIFIESTO), encoding="utf-8") as archivo:
+            self.manifiesto = json.load(archivo)
+        self.filas = self.manifiesto["filas"]
+        self._columnas = {
+            nombre: np.load(os.path.join(directorio, info["archivo"]), mmap_mode="r")
+            for nombre, info in self.manifiesto["columnas"].items()
+        }
+        self._categorias = {
+            nombre: (
+                np.load(os.path.join(directorio, info["codigos"]), mmap_mode="r"),
+                np.load(os.path.join(directorio, info["offsets"]), mmap_mode="r"),
+                info["valores"],
+            )
+            for nombre, info in self.manifiesto["categorias"].items()
+        }
+
+    def columnas(self, nombres: List[str], limite: Optional[int] = None) -> Dict[str, Any]:
+        """{nombre: arreglo float64} de las primeras `limite` filas (NaN = faltante o no numérico)."""
+        return {nombre: self._columnas[nombre][:limite] for nombre in nombres}
+
+    def categoria(self, nombre: str) -> Tuple[Any, Any, List[str]]:
+        """(códigos, offsets, valores): los códigos de la fila i son `codigos[offsets[i]:offsets[i + 1]]`."""
+        return self._categorias[nombre]
+
+
+# Snapshots abiertos en este proceso (incluye los workers del pool)
+_abiertos: Dict[str, Snapshot] = {}
+
+
+def abrir_snapshot(directorio: str) -> Snapshot:
+    """Abre (una vez por proceso) el snapshot de `directorio`; no consulta MongoDB."""
+    snapshot = _abiertos.get(directorio)
+    if snapshot is None:
+        # Cada construcción usa un directorio nuevo: uno abierto nunca cambia
+        padre = os.path.dirname(directorio)
+        for anterior in [d for d in _abiertos if os.path.dirname(d) == padre]:
+            del _abiertos[anterior]
+        snapshot = _abiertos[directorio] = Snapshot(directorio)
+    return snapshot
+
+
+def columnas_lote(documentos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnas de un lote de documentos; corre en el pool de analítica.
+
+    Devuelve {"columnas": {campo: arreglo float64}, "categorias": {nombre:
+    (valores, códigos, longitudes)}}. Los códigos son locales al lote y
+    `GestorSnapshots.construir` los traduce a su vocabulario global.
+    """
+    import numpy as np
+
+    # `_norm` materializado si está al día; si no, se calcula con las mismas reglas
+    normalizados = [
+        doc[CAMPO_NORMALIZADO]
+        if (doc.get(CAMPO_NORMALIZADO) or {}).get("v") == VERSION_NORMALIZACION
+        else normalizar_documento(doc)
+        for doc in documentos
+    ]
+    campos = {campo for doc in documentos for campo in doc if campo not in ("_id", CAMPO_NORMALIZADO)}
+    columnas = {
+        campo: np.array([a_numero(doc.get(campo)) for doc in documentos], dtype=np.float64)
+        for campo in campos
+    }
+    for campo in _CAMPOS_NORMALIZADOS:
+        columnas[f"{CAMPO_NORMALIZADO}.{campo}"] = np.array(
+            [a_numero(norm.get(campo)) for norm in normalizados], dtype=np.float64
+        )
+    categorias = {}
+    for nombre in _CAMPOS_CATEGORIA:
+        vocabulario: Dict[str, int] = {}
+        codigos: List[int] = []
+        longitudes: List[int] = []
+        for norm in normalizados:
+            valores = norm.get(nombre) or []
+            codigos.extend(vocabulario.setdefault(valor, len(vocabulario)) for valor in valores)
+            longitudes.append(len(valores))
+        categorias[nombre] = (
+            list(vocabulario), np.array(codigos, dtype=np.int32), np.array(longitudes, dtype=np.int64)
+        )
+    return {"columnas": columnas, "categorias": categorias}
+
+
+def _escribir(raiz: str, coleccion: str, manifiesto: Dict[str, Any], arreglos: Dict[str, Any]) -> int:
+    """Escribe los `.npy` en un directorio nuevo y publica el manifiesto con un `os.replace` atómico."""
+    import numpy as np
+
+    base = os.path.join(raiz, coleccion)
+    directorio = os.path.join(base, manifiesto["id"])
+    os.makedirs(directorio, exist_ok=True)
+    for archivo, arreglo in arreglos.items():
+        np.save(os.path.join(directorio, archivo), arreglo)
+    contenido = json.dumps(manifiesto, ensure_ascii=False, indent=2)
+    with open(os.path.join(directorio, ARCHIVO_MANIFIESTO), "w", encoding="utf-8") as archivo:
+        archivo.write(contenido)
+    temporal = os.path.join(base, ARCHIVO_MANIFIESTO + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, os.path.join(base, ARCHIVO_MANIFIESTO))
+
+    # Las versiones anteriores siguen accesibles para quien ya las tenga mapeadas
+    for nombre in os.listdir(base):
+        if nombre != manifiesto["id"] and os.path.isdir(os.path.join(base, nombre)):
+            shutil.rmtree(os.path.join(base, nombre), ignore_errors=True)
+    return sum(arreglo.nbytes for arreglo in arreglos.values())
+
+
+class GestorSnapshots:
+    """Snapshots columnares en disco de los campos numéricos de una colección.
+
+    Cada snapshot guarda una columna float64 por campo numérico de primer
+    nivel (Rating, Reviews, Playing y cualquier otro que sea numérico), las de
+    `_norm` (`_norm.rating`, `_norm.anio`, ...) y los géneros y
+    desarrolladores como códigos, más un manifiesto con la versión de datos
+    (`huella_datos`). La regresión y la correlación sin filtros lo abren
+    desde el worker con memmap en lugar de descargar y decodificar documentos.
+    """
+
+    def __init__(self, raiz: str = SNAPSHOT_DIR):
+        self.raiz = raiz
+        self.construcciones = 0
+
+    async def construir(
+        self, db: AsyncIOMotorDatabase, coleccion: str, tamano_lote: int = TAMANO_LOTE_SNAPSHOT
+    ) -> Dict[str, Any]:
+        """Recorre la colección una vez y escribe un snapshot nuevo.
+
+        Cada lote se convierte en columnas en el pool de analítica
+        (`columnas_lote`); el event loop solo junta los arreglos.
+        """
+        import numpy as np
+
+        inicio = time.perf_counter()
+        huella = await huella_datos(db, coleccion)
+
+        bloques: Dict[str, List[Any]] = {}
+        vocabularios: Dict[str, Dict[str, int]] = {nombre: {} for nombre in _CAMPOS_CATEGORIA}
+        codigos: Dict[str, List[Any]] = {nombre: [] for nombre in _CAMPOS_CATEGORIA}
+        longitudes: Dict[str, List[Any]] = {nombre: [] for nombre in _CAMPOS_CATEGORIA}
+        filas = 0
+
+        cursor = db[coleccion].find({}).batch_size(tamano_lote)
+        while True:
+            documentos = await a_lista(cursor, tamano_lote)
+            if not documentos:
+                break
+            lote = await ejecutor_analitica.ejecutar(columnas_lote, documentos)
+            for campo in lote["columnas"]:
+                # Un campo que aparece recién en este lote no tiene valores en los anteriores
+                bloques.setdefault(campo, [np.full(filas, np.nan)] if filas else [])
+            for campo, lista in bloques.items():
+                lista.append(lote["columnas"].get(campo, np.full(len(documentos), np.nan)))
+            for nombre, (valores, codigos_lote, longitudes_lote) in lote["categorias"].items():
+                vocabulario = vocabularios[nombre]
+                traduccion = np.array([vocabulario.setdefault(valor, len(vocabulario)) for valor in valores], dtype=np.int32)
+                codigos[nombre].append(traduccion[codigos_lote])
+                longitudes[nombre].append(longitudes_lote)
+            filas += len(documentos)
+
+        # Mismo criterio que `_inferir_campos_numericos`: numérico en al menos el 10% (hasta 10 valores)
+        minimo = max(1, min(10, filas // 10))
+        arreglos: Dict[str, Any] = {}
+        columnas: Dict[str, Dict[str, Any]] = {}
+        for i, (campo, lista) in enumerate(sorted(bloques.items())):
+            columna = np.concatenate(lista) if lista else np.empty(0)
+            no_nulos = int(np.isfinite(columna).sum())
+            if no_nulos < minimo and not campo.startswith(f"{CAMPO_NORMALIZADO}."):
+                continue
+            archivo = f"c{i}.npy"
+            arreglos[archivo] = columna
+            columnas[campo] = {"archivo": archivo, "dtype": "float64", "no_nulos": no_nulos}
+        categorias: Dict[str, Dict[str, Any]] = {}
+        for nombre in _CAMPOS_CATEGORIA:
+            # Los códigos de la fila i son `codigos[offsets[i]:offsets[i + 1]]`
+            longitudes_filas = np.concatenate(longitudes[nombre] or [np.empty(0, dtype=np.int64)])
+            arreglos[f"{nombre}.codigos.npy"] = np.concatenate(codigos[nombre] or [np.empty(0, dtype=np.int32)])
+            arreglos[f"{nombre}.offsets.npy"] = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(longitudes_filas)])
+            categorias[nombre] = {
+                "codigos": f"{nombre}.codigos.npy",
+                "offsets": f"{nombre}.offsets.npy",
+                "valores": list(vocabularios[nombre]),
+            }
+
+        manifiesto = {
+            "version_formato": VERSION_FORMATO,
+            "id": datetime.utcnow().strftime("%Y%m%dT%H%M%S%f"),
+            "coleccion": coleccion,
+            "filas": filas,
+            "creado": datetime.utcnow().isoformat(),
+            "version_datos": huella,
+            "columnas": columnas,
+            "categorias": categorias,
+        }
+        # Escribir cientos de MB bloquearía el event loop: va a un hilo (NumPy suelta el GIL)
+        bytes_escritos = await asyncio.get_running_loop().run_in_executor(
+            None, _escribir, self.raiz, coleccion, manifiesto, arreglos
+        )
+        self.construcciones += 1
+        segundos = time.perf_counter() - inicio
+        logger.info("Snapshot de %s: %d filas, %d columnas en %.2f s", coleccion, filas, len(columnas), segundos)
+        return {
+            "coleccion": coleccion,
+            "id": manifiesto["id"],
+            "filas": filas,
+            "columnas": list(columnas),
+            "categorias": {nombre: len(info["valores"]) for nombre, info in categorias.items()},
+            "bytes": bytes_escritos,
+            "segundos": round(segundos, 3),
+        }
+
+    async def vigente(self, db: AsyncIOMotorDatabase, coleccion: str) -> Optional[Dict[str, Any]]:
+        """Manifiesto del snapshot si refleja los datos actuales; None si falta o está desactualizado.
+
+        Compara la huella guardada con la actual (`huella_datos`): detecta
+        inserciones y borrados de cualquier origen y toda escritura hecha por
+        la API en cualquier worker. Las modificaciones externas (Compass,
+        scripts) solo cuentan si un change stream las registra (colecciones de
+        `LEADERBOARDS`); sin él hay que reconstruir con `POST /snapshot/{coleccion}`.
+        """
+        manifiesto = leer_manifiesto(coleccion, self.raiz)
+        if manifiesto is None or manifiesto["version_datos"] != await huella_datos(db, coleccion):
+            return None
+        return manifiesto
+
+    @staticmethod
+    def contiene(manifiesto: Dict[str, Any], campos: List[str]) -> bool:
+        return all(campo in manifiesto["columnas"] for campo in campos)
+
+    async def estado(self, db: AsyncIOMotorDatabase, coleccion: str) -> Dict[str, Any]:
+        manifiesto = leer_manifiesto(coleccion, self.raiz)
+        if manifiesto is None:
+            return {"coleccion": coleccion, "existe": False, "vigente": False}
+        return {
+            "coleccion": coleccion,
+            "existe": True,
+            "vigente": await self.vigente(db, coleccion) is not None,
+            "id": manifiesto["id"],
+            "filas": manifiesto["filas"],
+            "creado": manifiesto["creado"],
+            "version_datos": manifiesto["version_datos"],
+            "columnas": list(manifiesto["columnas"]),
+            "categorias": {nombre: len(info["valores"]) for nombre, info in manifiesto["categorias"].items()},
+        }
+
+
+gestor_snapshots = GestorSnapshots()
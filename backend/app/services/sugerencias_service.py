@@ -0,0 +1,334 @@
+from collections import Counter, OrderedDict
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import ExecutionTimeout
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import time
+import unicodedata
+from app.services.cache_service import cache_resultados
+from app.services.catalogo_service import CatalogoService
+from app.services.ejecutor import ejecutor_analitica
+from app.services.normalizacion_service import (
+    CAMPO_NORMALIZADO,
+    CAMPOS_ORIGEN,
+    coleccion_normalizada,
+    etapas_normalizacion,
+    parsear_lista,
+)
+
+logger = logging.getLogger(__name__)
+
+# Configuración por variables de entorno
+# Segundos tras los cuales un diccionario se reconstruye (en segundo plano)
+SUGERENCIAS_TTL = float(os.getenv("SUGERENCIAS_TTL", "600"))
+# Mayor `limite` aceptado; también el tamaño de los tops precalculados
+SUGERENCIAS_MAX = 50
+# Prefijos que abarcan más valores que esto tienen su top precalculado; los demás
+# se resuelven recorriendo su rango (como mucho este número de elementos)
+UMBRAL_RANGO = 2000
+
+# Diccionarios en memoria como máximo (LRU por colección y campo)
+SUGERENCIAS_MAX_DICCIONARIOS = int(os.getenv("SUGERENCIAS_MAX_DICCIONARIOS", "32"))
+# Tiempo máximo de la consulta por rango que responde mientras se construye el diccionario
+TIEMPO_MAXIMO_FRIO_MS = 200
+
+# Campos guardados como lista: se sugiere cada elemento y no la lista completa
+_CAMPOS_LISTA = {CAMPOS_ORIGEN["generos"]: "generos", CAMPOS_ORIGEN["desarrolladores"]: "desarrolladores"}
+# Campos con índice de sugerencias declarado (`indices_service`); además se aceptan
+# los campos de texto del catálogo de la colección
+CAMPOS_SUGERENCIAS = ["Title", *_CAMPOS_LISTA]
+# Compara como `normalizar_texto`: strength 1 ignora mayúsculas y acentos, y en
+# español la ñ es una letra aparte (no equivale a n)
+COLACION_SUGERENCIAS = {"locale": "es", "strength": 1}
+
+
+def normalizar_texto(valor: Any) -> str:
+    """Forma de comparación: sin mayúsculas ni acentos salvo la ñ ("Pokémon" => "pokemon", "Ñu" => "ñu")."""
+    texto = unicodedata.normalize("NFKD", str(valor))
+    sin_acentos = "".join(
+        c for i, c in enumerate(texto)
+        if not unicodedata.combining(c) or (c == "\u0303" and i > 0 and texto[i - 1] in "nN")
+    )
+    return unicodedata.normalize("NFC", sin_acentos).casefold()
+
+
+class DiccionarioValores:
+    """Valores distintos de un campo ordenados por su forma normalizada.
+
+    Un prefijo corresponde a un rango contiguo del arreglo ordenado, que se
+    ubica con dos búsquedas binarias; de ese rango se devuelven los valores más
+    frecuentes. Los prefijos cuyo rango supera `UMBRAL_RANGO` (los cortos, que
+    pueden abarcar casi todo el diccionario) traen el top ya calculado.
+    """
+
+    def __init__(self, frecuencias: List[Tuple[Any, int]]):
+        entradas = sorted(
+            ((normalizar_texto(valor), valor, conteo) for valor, conteo in frecuencias),
+            key=lambda e: (e[0], -e[2])
+        )
+        self.claves = [e[0] for e in entradas]
+        self.valores = [e[1] for e in entradas]
+        self.frecuencias = [e[2] for e in entradas]
+
+        # Top de cada prefijo con rango grande, bajando desde el prefijo vacío
+        self.tops: Dict[str, List[int]] = {}
+        pendientes = [("", 0, len(self.claves))]
+        while pendientes:
+            prefijo, inicio, fin = pendientes.pop()
+            if fin - inicio <= UMBRAL_RANGO:
+                continue
+            self.tops[prefijo] = heapq.nlargest(SUGERENCIAS_MAX, range(inicio, fin), key=self.frecuencias.__getitem__)
+            i = bisect.bisect_right(self.claves, prefijo, inicio, fin)  # La clave igual al prefijo no tiene hijos
+            while i < fin:
+                hijo = self.claves[i][:len(prefijo) + 1]
+                _, fin_hijo = self._rango(hijo, i)
+                pendientes.append((hijo, i, fin_hijo))
+                i = fin_hijo
+
+    def __len__(self) -> int:
+        return len(self.claves)
+
+    def _rango(self, prefijo: str, desde: int = 0) -> Tuple[int, int]:
+        inicio = bisect.bisect_left(self.claves, prefijo, desde)
+        # Primera clave que ya no empieza con el prefijo
+        fin = bisect.bisect_left(self.claves, prefijo[:-1] + chr(ord(prefijo[-1]) + 1), inicio)
+        return inicio, fin
+
+    def buscar(self, prefijo: str, limite: int) -> List[Dict[str, Any]]:
+        """Los `limite` valores más frecuentes que empiezan con `prefijo` (sin distinguir mayúsculas)."""
+        prefijo = normalizar_texto(prefijo)
+        if prefijo in self.tops:
+            indices = self.tops[prefijo][:limite]
+        elif not prefijo:
+            indices = heapq.nlargest(limite, range(len(self)), key=self.frecuencias.__getitem__)
+        else:
+            inicio, fin = self._rango(prefijo)
+            indices = heapq.nlargest(limite, range(inicio, fin), key=self.frecuencias.__getitem__)
+        return [{"valor": self.valores[i], "conteo": self.frecuencias[i]} for i in indices]
+
+
+def construir_diccionario(frecuencias: List[Tuple[Any, int]]) -> DiccionarioValores:
+    """Ordena el diccionario (se ejecuta en el pool de procesos de `ejecutor`)."""
+    return DiccionarioValores(frecuencias)
+
+
+class GestorSugerencias:
+    """Diccionarios de valores por (colección, campo) para autocompletar filtros.
+
+    Solo se aceptan `CAMPOS_SUGERENCIAS` y los campos de texto del catálogo. El
+    diccionario se construye en segundo plano con un solo `$group` la primera vez
+    que se consulta el campo; mientras tanto se responde con una consulta por
+    rango del prefijo (índice con `COLACION_SUGERENCIAS`, acotada en documentos
+    y en tiempo; si la colección no tiene `_norm`, los géneros y desarrolladores
+    se leen de los campos crudos). Se guardan a lo sumo `max_diccionarios` (LRU). Cuando vence
+    `SUGERENCIAS_TTL` o cambia la versión de datos de la colección (ver
+    `CacheResultados.invalidar`) se sigue respondiendo con el diccionario
+    anterior mientras se reconstruye en segundo plano.
+    """
+
+    def __init__(self, ttl: float = SUGERENCIAS_TTL, max_diccionarios: int = SUGERENCIAS_MAX_DICCIONARIOS):
+        self.ttl = ttl
+        self.max_diccionarios = max_diccionarios
+        # (colección, campo) => (versión de datos, instante de construcción, diccionario)
+        self._diccionarios: "OrderedDict[Tuple[str, str], Tuple[int, float, DiccionarioValores]]" = OrderedDict()
+        self._construyendo: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.construcciones = 0
+        self.desalojos = 0
+        self.respuestas_en_frio = 0
+
+    @staticmethod
+    async def validar_campo(db: AsyncIOMotorDatabase, coleccion: str, campo: str):
+        """ValueError si `campo` no está en `CAMPOS_SUGERENCIAS` ni es un campo de texto del catálogo."""
+        if campo in CAMPOS_SUGERENCIAS:
+            return
+        catalogo = await CatalogoService(db).obtener(coleccion)
+        if catalogo and any(c["campo"] == campo and "string" in c["tipos"] for c in catalogo["campos"]):
+            return
+        raise ValueError(
+            f"Campo sin sugerencias: {campo}. Se aceptan {', '.join(CAMPOS_SUGERENCIAS)} "
+            "y los campos de texto del catálogo de la colección"
+        )
+
+    @staticmethod
+    async def _pipeline(db: AsyncIOMotorDatabase, coleccion: str, campo: str) -> List[Dict[str, Any]]:
+        if campo in _CAMPOS_LISTA:
+            ruta = f"{CAMPO_NORMALIZADO}.{_CAMPOS_LISTA[campo]}"
+            return await etapas_normalizacion(db, coleccion) + [
+                {"$project": {"_id": 0, "valor": f"${ruta}"}},
+                {"$unwind": "$valor"},
+                {"$group": {"_id": "$valor", "conteo": {"$sum": 1}}},
+            ]
+        return [
+            {"$group": {"_id": f"${campo}", "conteo": {"$sum": 1}}},
+            {"$match": {"_id": {"$nin": [None, ""]}}},
+        ]
+
+    async def _construir(self, db: AsyncIOMotorDatabase, coleccion: str, campo: str) -> DiccionarioValores:
+        version = cache_resultados.version(coleccion)
+        inicio = time.perf_counter()
+        pipeline = await self._pipeline(db, coleccion, campo)
+        frecuencias = [
+            (doc["_id"], doc["conteo"])
+            async for doc in db[coleccion].aggregate(pipeline, allowDiskUse=True)
+            # Listas u objetos sueltos no son valores de filtro
+            if not isinstance(doc["_id"], (list, dict))
+        ]
+        diccionario = await ejecutor_analitica.ejecutar(construir_diccionario, frecuencias)
+        self._diccionarios[(coleccion, campo)] = (version, time.monotonic(), diccionario)
+        self._diccionarios.move_to_end((coleccion, campo))
+        while len(self._diccionarios) > self.max_diccionarios:
+            self._diccionarios.popitem(last=False)
+            self.desalojos += 1
+        self.construcciones += 1
+        logger.info(
+            "Diccionario de sugerencias %s.%s: %d valores en %.2f s",
+            coleccion, campo, len(diccionario), time.perf_counter() - inicio
+        )
+        return diccionario
+
+    def _lanzar(self, db: AsyncIOMotorDatabase, coleccion: str, campo: str) -> asyncio.Task:
+        """Una sola construcción en curso por (colección, campo)."""
+        clave = (coleccion, campo)
+        tarea = self._construyendo.get(clave)
+        if tarea is None or tarea.done():
+            tarea = self._construyendo[clave] = asyncio.create_task(self._construir(db, coleccion, campo))
+            tarea.add_done_callback(lambda t: self._terminar(clave, t))
+        return tarea
+
+    def _terminar(self, clave: Tuple[str, str], tarea: asyncio.Task):
+        if self._construyendo.get(clave) is tarea:
+            del self._construyendo[clave]
+        if not tarea.cancelled() and tarea.exception() is not None:
+            logger.error("Error construyendo sugerencias: %s", tarea.exception())
+
+    def diccionario(self, db: AsyncIOMotorDatabase, coleccion: str, campo: str) -> Optional[DiccionarioValores]:
+        """Diccionario del campo, o None si todavía no existe (queda construyéndose)."""
+        guardado = self._diccionarios.get((coleccion, campo))
+        if guardado is None:
+            self._lanzar(db, coleccion, campo)
+            return None
+        self._diccionarios.move_to_end((coleccion, campo))
+        version, construido, diccionario = guardado
+        if version != cache_resultados.version(coleccion) or time.monotonic() - construido > self.ttl:
+            self._lanzar(db, coleccion, campo)
+        return diccionario
+
+    @staticmethod
+    def _pipeline_rango(campo: str, prefijo: str, limite: int) -> List[Dict[str, Any]]:
+        """Valores que empiezan con `prefijo` según `COLACION_SUGERENCIAS`, entre los primeros `UMBRAL_RANGO` documentos."""
+        ruta = f"{CAMPO_NORMALIZADO}.{_CAMPOS_LISTA[campo]}" if campo in _CAMPOS_LISTA else campo
+        # U+FFFF tiene el mayor peso de la colación: cierra el rango del prefijo
+        rango = {"$gte": prefijo, "$lt": prefijo + "\uffff"} if prefijo else {"$nin": [None, ""]}
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {ruta: rango}},
+            {"$limit": UMBRAL_RANGO},
+            {"$project": {"_id": 0, "valor": f"${ruta}"}},
+        ]
+        if campo in _CAMPOS_LISTA:
+            # El documento coincide si algún elemento está en el rango; se cuentan solo esos
+            pipeline += [{"$unwind": "$valor"}, {"$match": {"valor": rango}}]
+        return pipeline + [
+            {"$group": {"_id": "$valor", "conteo": {"$sum": 1}}},
+            {"$sort": {"conteo": -1, "_id": 1}},
+            {"$limit": limite},
+        ]
+
+    async def _sugerir_por_rango(
+        self, db: AsyncIOMotorDatabase, coleccion: str, campo: str, prefijo: str, limite: int
+    ) -> List[Dict[str, Any]]:
+        """Respuesta sin diccionario: conteos sobre una ventana acotada, no sobre toda la colección."""
+        self.respuestas_en_frio += 1
+        if campo in _CAMPOS_LISTA and not await coleccion_normalizada(db, coleccion):
+            return await self._sugerir_sin_normalizar(db, coleccion, campo, prefijo, limite)
+        cursor = db[coleccion].aggregate(
+            self._pipeline_rango(campo, prefijo, limite),
+            collation=COLACION_SUGERENCIAS,
+            maxTimeMS=TIEMPO_MAXIMO_FRIO_MS
+        )
+        try:
+            return [
+                {"valor": doc["_id"], "conteo": doc["conteo"]}
+                async for doc in cursor
+                if not isinstance(doc["_id"], (list, dict))
+            ]
+        except ExecutionTimeout:
+            return []
+
+    @staticmethod
+    async def _sugerir_sin_normalizar(
+        db: AsyncIOMotorDatabase, coleccion: str, campo: str, prefijo: str, limite: int
+    ) -> List[Dict[str, Any]]:
+        """Respuesta en frío de un campo lista en una colección sin `_norm`.
+
+        Lee el campo crudo (array o lista serializada) de los primeros
+        `UMBRAL_RANGO` documentos y compara con `normalizar_texto`, igual que el
+        diccionario.
+        """
+        clave = normalizar_texto(prefijo)
+        conteos: Counter = Counter()
+        cursor = db[coleccion].find(
+            {campo: {"$nin": [None, ""]}}, {"_id": 0, campo: 1}
+        ).limit(UMBRAL_RANGO).max_time_ms(TIEMPO_MAXIMO_FRIO_MS)
+        try:
+            async for doc in cursor:
+                conteos.update(v for v in parsear_lista(doc.get(campo)) if normalizar_texto(v).startswith(clave))
+        except ExecutionTimeout:
+            pass  # Se responde con lo contado hasta el corte
+        mayores = sorted(conteos.items(), key=lambda e: (-e[1], e[0]))[:limite]
+        return [{"valor": valor, "conteo": conteo} for valor, conteo in mayores]
+
+    async def sugerir(
+        self,
+        db: AsyncIOMotorDatabase,
+        coleccion: str,
+        campo: str,
+        prefijo: str,
+        limite: int = 10
+    ) -> Dict[str, Any]:
+        """Sugerencias para `prefijo`; ValueError si el campo no se acepta (ver `validar_campo`)."""
+        limite = min(limite, SUGERENCIAS_MAX)
+        if (coleccion, campo) not in self._diccionarios:
+            await self.validar_campo(db, coleccion, campo)
+        try:
+            diccionario = self.diccionario(db, coleccion, campo)
+            if diccionario is None:
+                return {
+                    "success": True,
+                    "sugerencias": await self._sugerir_por_rango(db, coleccion, campo, prefijo, limite),
+                    "total_valores": None,
+                    "parcial": True
+                }
+            return {
+                "success": True,
+                "sugerencias": diccionario.buscar(prefijo, limite),
+                "total_valores": len(diccionario)
+            }
+        except Exception as e:
+            logger.error("Error en sugerencias de %s.%s: %s", coleccion, campo, e)
+            return {"success": False, "sugerencias": [], "error": str(e)}
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "construcciones": self.construcciones,
+            "respuestas_en_frio": self.respuestas_en_frio,
+            "desalojos": self.desalojos,
+            "max_diccionarios": self.max_diccionarios,
+            "ttl_segundos": self.ttl,
+            "diccionarios": [
+                {
+                    "coleccion": coleccion,
+                    "campo": campo,
+                    "valores": len(diccionario),
+                    "edad_segundos": round(time.monotonic() - construido, 1),
+                    "vigente": version == cache_resultados.version(coleccion),
+                }
+                for (coleccion, campo), (version, construido, diccionario) in self._diccionarios.items()
+            ],
+        }
+
+
+gestor_sugerencias = GestorSugerencias()
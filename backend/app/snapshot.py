@@ -0,0 +1,34 @@
+"""Construye o consulta snapshots columnares desde la línea de comandos.
+
+Uso:
+    python -m app.snapshot juegos_2024           # construye el snapshot
+    python -m app.snapshot juegos_2024 --estado  # manifiesto y vigencia
+"""
+import argparse
+import asyncio
+import json
+from app.database import obtener_database, cerrar_clientes
+from app.services.ejecutor import ejecutor_analitica
+from app.services.snapshot_service import gestor_snapshots
+
+
+async def main(colecciones, estado: bool):
+    database = obtener_database()
+    try:
+        for coleccion in colecciones:
+            if estado:
+                resultado = await gestor_snapshots.estado(database, coleccion)
+            else:
+                resultado = await gestor_snapshots.construir(database, coleccion)
+            print(json.dumps(resultado, indent=2, ensure_ascii=False, default=str))
+    finally:
+        ejecutor_analitica.cerrar()
+        cerrar_clientes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshots columnares de las colecciones de juegos")
+    parser.add_argument("colecciones", nargs="+")
+    parser.add_argument("--estado", action="store_true", help="solo mostrar el manifiesto y si está vigente")
+    args = parser.parse_args()
+    asyncio.run(main(args.colecciones, args.estado))
@@ -0,0 +1,155 @@
+"""Generador de datos sintéticos de videojuegos para los benchmarks.
+
+Produce documentos con la misma forma que el dataset original (los campos y
+formatos que `normalizacion_service` sabe interpretar): `Rating` numérico, como
+string o "N/A"/"TBD", `Genres`/`Developers` como listas serializadas
+("['Adventure', 'RPG']"), `Release_Date` como "Feb 25, 2022", etc.
+
+Con la misma semilla y tamaño el resultado es idéntico, así que dos corridas
+en commits distintos miden exactamente los mismos datos:
+
+    python -m benchmarks.generador 100k
+    python -m benchmarks.generador 10000 --coleccion juegos_bench --normalizar
+"""
+from typing import Any, Dict, Iterator, List
+import argparse
+import math
+import os
+import random
+
+# Tamaños con nombre; también se acepta un número
+TAMANOS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+SEMILLA = 2024
+TAMANO_LOTE = 5000
+
+GENEROS = [
+    "Adventure", "RPG", "Shooter", "Platform", "Indie", "Strategy", "Puzzle", "Simulator",
+    "Fighting", "Racing", "Sport", "Turn Based Strategy", "Tactical", "Arcade", "Music",
+    "Visual Novel", "Brawler", "Point-and-Click", "Card & Board Game", "Real Time Strategy",
+]
+MESES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+_ADJETIVOS = [
+    "Dark", "Final", "Super", "Eternal", "Lost", "Hollow", "Crimson", "Silent", "Ancient", "Neon",
+    "Broken", "Wild", "Infinite", "Golden", "Shadow", "Iron", "Forgotten", "Cosmic", "Little", "Last",
+]
+_SUSTANTIVOS = [
+    "Souls", "Fantasy", "Legends", "Knight", "Odyssey", "Kingdom", "Frontier", "Tactics", "Rush",
+    "Chronicles", "Dungeon", "Horizon", "Quest", "Arena", "Protocol", "Garden", "Empire", "Hunter",
+    "Drift", "Saga",
+]
+_SUFIJOS_ESTUDIO = ["Studios", "Games", "Interactive", "Entertainment", "Software", "Works", "Digital"]
+
+
+def _zipf(rng: random.Random, n: int) -> int:
+    """Índice en [0, n) con probabilidad ~1/(índice + 1): pocos valores muy frecuentes."""
+    return min(int(math.exp(rng.random() * math.log(n + 1))) - 1, n - 1)
+
+
+def _lista_serializada(valores: List[str]) -> str:
+    return "[" + ", ".join(f"'{v}'" for v in valores) + "]"
+
+
+def _estudios(rng: random.Random, cantidad: int) -> List[str]:
+    nombres = set()
+    while len(nombres) < cantidad:
+        nombres.add(f"{rng.choice(_ADJETIVOS)} {rng.choice(_SUSTANTIVOS)} {rng.choice(_SUFIJOS_ESTUDIO)}")
+    return sorted(nombres)
+
+
+def generar_juegos(cantidad: int, semilla: int = SEMILLA) -> Iterator[Dict[str, Any]]:
+    """Genera `cantidad` juegos de forma determinista para la `semilla` dada."""
+    rng = random.Random(semilla)
+    estudios = _estudios(rng, max(50, min(5000, cantidad // 20)))
+    # Orden fijo pero no alfabético: la popularidad de un estudio no depende de su nombre
+    rng.shuffle(estudios)
+
+    for i in range(cantidad):
+        juego: Dict[str, Any] = {
+            "Title": f"{rng.choice(_ADJETIVOS)} {rng.choice(_SUSTANTIVOS)}"
+                     + (f" {rng.randint(2, 9)}" if rng.random() < 0.2 else "")
+                     + (f" #{i}" if rng.random() < 0.5 else ""),
+        }
+
+        # Los años recientes tienen más juegos; un 2% sin fecha definida
+        if rng.random() < 0.02:
+            juego["Release_Date"] = "releases on TBD"
+        else:
+            anio = 2024 - min(int(rng.expovariate(1 / 8)), 44)
+            juego["Release_Date"] = f"{rng.choice(MESES)} {rng.randint(1, 28):02d}, {anio}"
+
+        # Rating: mayormente número; también string numérico, "N/A", "TBD" o ausente
+        rating = round(min(5.0, max(0.5, rng.gauss(3.4, 0.7))), 1)
+        tipo_rating = rng.random()
+        if tipo_rating < 0.05:
+            juego["Rating"] = "N/A"
+        elif tipo_rating < 0.07:
+            juego["Rating"] = "TBD"
+        elif tipo_rating < 0.17:
+            juego["Rating"] = str(rating)
+        elif tipo_rating < 0.98:
+            juego["Rating"] = rating
+
+        # Géneros y desarrolladores como en el CSV original; algunos ya como array
+        generos = sorted({GENEROS[_zipf(rng, len(GENEROS))] for _ in range(rng.randint(1, 3))})
+        desarrolladores = sorted({estudios[_zipf(rng, len(estudios))] for _ in range(rng.choice((1, 1, 1, 2)))})
+        if rng.random() < 0.1:
+            juego["Genres"], juego["Developers"] = generos, desarrolladores
+        else:
+            juego["Genres"], juego["Developers"] = _lista_serializada(generos), _lista_serializada(desarrolladores)
+
+        # Métricas de actividad correlacionadas con el rating (para regresión/correlación)
+        base = rng.lognormvariate(4 + (rating - 3) * 0.8, 1.2)
+        reviews = int(base)
+        juego["Reviews"] = str(reviews) if rng.random() < 0.05 else reviews
+        juego["Playing"] = int(base * rng.uniform(0.02, 0.3))
+        juego["Plays"] = int(base * rng.uniform(5, 15))
+        juego["Backlogs"] = int(base * rng.uniform(1, 4))
+        juego["Wishlist"] = int(base * rng.uniform(0.5, 3))
+        juego["Times_Listed"] = int(base * rng.uniform(0.2, 1.5))
+        yield juego
+
+
+def cantidad_desde_texto(texto: str) -> int:
+    return TAMANOS.get(texto.lower()) or int(texto.replace("_", ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga juegos sintéticos en MongoDB para benchmarks")
+    parser.add_argument("tamano", help="10k, 100k, 1m o un número de documentos")
+    parser.add_argument("--coleccion", help="Nombre de la colección (por defecto juegos_<tamano>)")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--normalizar", action="store_true", help="Materializa `_norm` después de cargar")
+    args = parser.parse_args()
+
+    # Por defecto un mongod local: los benchmarks nunca deberían apuntar a Atlas
+    os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DATABASE_NAME", "videogames_bench")
+    from app.database import obtener_database_sync
+
+    cantidad = cantidad_desde_texto(args.tamano)
+    nombre = args.coleccion or f"juegos_{args.tamano.lower()}"
+    collection = obtener_database_sync()[nombre]
+    collection.drop()
+
+    lote: List[Dict[str, Any]] = []
+    for juego in generar_juegos(cantidad, args.semilla):
+        lote.append(juego)
+        if len(lote) >= TAMANO_LOTE:
+            collection.insert_many(lote, ordered=False)
+            lote = []
+    if lote:
+        collection.insert_many(lote, ordered=False)
+    print(f"{cantidad} juegos en {collection.database.name}.{nombre} (semilla {args.semilla})")
+
+    if args.normalizar:
+        import asyncio
+        from app.database import obtener_database
+        from app.services.normalizacion_service import NormalizacionService
+
+        resultado = asyncio.run(NormalizacionService(obtener_database()).backfill(nombre))
+        print(f"Normalizados: {resultado.get('procesados')}")
+
+
+if __name__ == "__main__":
+    main()
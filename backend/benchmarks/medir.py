@@ -0,0 +1,329 @@
+"""Mide cada método de ReporteService y cada endpoint contra un mongod local.
+
+Por cada caso registra p50/p95 de latencia, documentos y claves examinados por
+MongoDB (profiler de la base de datos) y el pico de memoria de Python
+(tracemalloc). El profiler y tracemalloc corren en una pasada aparte para no
+inflar las latencias. Los resultados se guardan como JSON con el commit actual
+para comparar corridas:
+
+    python -m benchmarks.generador 100k --normalizar
+    python -m benchmarks.medir juegos_100k
+    python -m benchmarks.medir --comparar resultados/antes.json resultados/despues.json
+
+La cache de resultados se desactiva salvo que se pase `--con-cache`.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+Caso = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano (p en [0, 100])."""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def _commit_actual() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        sucio = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True
+        ).stdout.strip())
+        return {"commit": commit, "cambios_sin_commit": sucio}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "cambios_sin_commit": None}
+
+
+async def llamar_endpoint(app, metodo: str, ruta: str, cuerpo: Optional[Dict[str, Any]] = None,
+                          query: str = "") -> Tuple[int, int]:
+    """Invoca la aplicación ASGI directamente (sin red) y devuelve (estado, bytes)."""
+    datos = json.dumps(cuerpo, default=str).encode() if cuerpo is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": metodo,
+        "scheme": "http",
+        "path": ruta,
+        "raw_path": ruta.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(datos)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    respuesta = {"estado": 0, "bytes": 0}
+    enviado = False
+
+    async def recibir():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {"type": "http.request", "body": datos, "more_body": False}
+        # El cliente nunca se desconecta; las respuestas en streaming terminan solas
+        await asyncio.Event().wait()
+
+    async def enviar(mensaje):
+        if mensaje["type"] == "http.response.start":
+            respuesta["estado"] = mensaje["status"]
+        elif mensaje["type"] == "http.response.body":
+            respuesta["bytes"] += len(mensaje.get("body", b""))
+
+    await app(scope, recibir, enviar)
+    return respuesta["estado"], respuesta["bytes"]
+
+
+def casos_servicio(db, coleccion: str) -> List[Caso]:
+    from app.services.reporte_service import ReporteService
+
+    service = ReporteService(db)
+    features = ["Reviews", "Playing", "Plays", "Backlogs"]
+    return [
+        ("generar_reporte", lambda: service.generar_reporte(coleccion, limite=1000)),
+        ("generar_reporte[orden=rating]", lambda: service.generar_reporte(
+            coleccion, limite=100, orden="_norm.rating", descendente=True, estimar_total=True)),
+        ("obtener_estadisticas", lambda: service.obtener_estadisticas(coleccion)),
+        ("obtener_esquema_coleccion", lambda: service.obtener_esquema_coleccion(coleccion)),
+        ("obtener_valores_unicos", lambda: service.obtener_valores_unicos(coleccion, "Rating")),
+        ("obtener_conteo_por_campo", lambda: service.obtener_conteo_por_campo(coleccion, "Rating")),
+        ("obtener_conteo_por_anio", lambda: service.obtener_conteo_por_anio(coleccion, "Release_Date")),
+        ("obtener_conteo_generos", lambda: service.obtener_conteo_generos(coleccion)),
+        ("obtener_rating_promedio", lambda: service.obtener_rating_promedio(coleccion)),
+        ("obtener_distribucion_rating", lambda: service.obtener_distribucion_rating(coleccion)),
+        ("obtener_conteo_desarrolladores", lambda: service.obtener_conteo_desarrolladores(coleccion)),
+        ("obtener_top_juegos_populares", lambda: service.obtener_top_juegos_populares(coleccion)),
+        ("obtener_metricas_dashboard", lambda: service.obtener_metricas_dashboard(coleccion)),
+        ("obtener_hidden_gems", lambda: service.obtener_hidden_gems(coleccion)),
+        ("obtener_trending_games", lambda: service.obtener_trending_games(coleccion)),
+        ("obtener_top_rated_games", lambda: service.obtener_top_rated_games(coleccion)),
+        ("obtener_dashboard", lambda: service.obtener_dashboard(coleccion)),
+        ("regresion_lineal[muestra]", lambda: service.regresion_lineal(
+            coleccion, "Rating", campos_x=features, limite=10000)),
+        ("regresion_lineal[servidor]", lambda: service.regresion_lineal(
+            coleccion, "Rating", campos_x=features, modo="servidor")),
+        ("calcular_matriz_correlacion[muestra]", lambda: service.calcular_matriz_correlacion(
+            coleccion, ["Rating"] + features, limite=10000)),
+        ("calcular_matriz_correlacion[servidor]", lambda: service.calcular_matriz_correlacion(
+            coleccion, ["Rating"] + features, modo="servidor")),
+    ]
+
+
+def casos_endpoints(coleccion: str) -> List[Caso]:
+    from app.main import app
+
+    base = "/api/reportes"
+
+    def get(ruta: str, query: str = ""):
+        return lambda: llamar_endpoint(app, "GET", base + ruta, query=query)
+
+    def post(ruta: str, cuerpo: Dict[str, Any], query: str = ""):
+        return lambda: llamar_endpoint(app, "POST", base + ruta, cuerpo, query)
+
+    features = ["Reviews", "Playing", "Plays", "Backlogs"]
+    return [
+        ("POST /generar", post("/generar", {"coleccion": coleccion, "limite": 1000})),
+        ("POST /generar/stream?format=csv", post(
+            "/generar/stream", {"coleccion": coleccion, "limite": 10000}, "format=csv")),
+        ("GET /estadisticas", get(f"/estadisticas/{coleccion}")),
+        ("GET /esquema", get(f"/esquema/{coleccion}")),
+        ("GET /valores-unicos", get(f"/valores-unicos/{coleccion}/Rating")),
+        ("GET /conteo-por-campo", get(f"/conteo-por-campo/{coleccion}/Rating")),
+        ("GET /conteo-por-anio", get(f"/conteo-por-anio/{coleccion}/Release_Date")),
+        ("GET /conteo-generos", get(f"/conteo-generos/{coleccion}")),
+        ("GET /rating-promedio", get(f"/rating-promedio/{coleccion}")),
+        ("GET /distribucion-rating", get(f"/distribucion-rating/{coleccion}")),
+        ("GET /conteo-desarrolladores", get(f"/conteo-desarrolladores/{coleccion}")),
+        ("GET /top-juegos-populares", get(f"/top-juegos-populares/{coleccion}")),
+        ("GET /metricas-dashboard", get(f"/metricas-dashboard/{coleccion}")),
+        ("GET /hidden-gems", get(f"/hidden-gems/{coleccion}")),
+        ("GET /trending-games", get(f"/trending-games/{coleccion}")),
+        ("GET /top-rated-games", get(f"/top-rated-games/{coleccion}")),
+        ("GET /dashboard", get(f"/dashboard/{coleccion}")),
+        ("POST /regresion-lineal", post("/regresion-lineal", {
+            "coleccion": coleccion, "campo_y": "Rating", "campos_x": features, "limite": 10000})),
+        ("POST /correlacion-matriz", post("/correlacion-matriz", {
+            "coleccion": coleccion, "campos": ["Rating"] + features, "limite": 10000})),
+    ]
+
+
+async def _examinados(db, funcion: Callable[[], Awaitable[Any]]) -> Dict[str, Optional[int]]:
+    """Ejecuta una vez con el profiler activo y suma docs/claves examinados de esa llamada."""
+    desde = datetime.utcnow()
+    try:
+        await db.command("profile", 2)
+    except Exception:
+        # Sin permisos de profiler (p. ej. Atlas compartido)
+        await funcion()
+        return {"docs_examinados": None, "claves_examinadas": None, "operaciones": None}
+    try:
+        await funcion()
+    finally:
+        await db.command("profile", 0)
+
+    docs = claves = operaciones = 0
+    # Lecturas, getMore y agregaciones de la llamada (sin los propios comandos `profile`)
+    async for entrada in db["system.profile"].find({"ts": {"$gte": desde}, "command.profile": {"$exists": False}}):
+        docs += entrada.get("docsExamined", 0)
+        claves += entrada.get("keysExamined", 0)
+        operaciones += 1
+    return {"docs_examinados": docs, "claves_examinadas": claves, "operaciones": operaciones}
+
+
+async def _memoria_pico_kb(funcion: Callable[[], Awaitable[Any]]) -> float:
+    tracemalloc.start()
+    try:
+        await funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1024, 1)
+
+
+async def medir_caso(db, nombre: str, funcion: Callable[[], Awaitable[Any]],
+                     repeticiones: int, calentamiento: int) -> Dict[str, Any]:
+    respuesta = None
+    for _ in range(max(1, calentamiento)):
+        respuesta = await funcion()
+    # Un caso que falla mide el camino de error: se deja constancia en el resultado
+    if isinstance(respuesta, tuple):
+        correcto = respuesta[0] < 400
+    else:
+        correcto = not (isinstance(respuesta, dict) and respuesta.get("success") is False)
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    return {
+        "caso": nombre,
+        "correcto": correcto,
+        "repeticiones": repeticiones,
+        "p50_ms": round(percentil(tiempos, 50), 2),
+        "p95_ms": round(percentil(tiempos, 95), 2),
+        "min_ms": round(min(tiempos), 2),
+        "max_ms": round(max(tiempos), 2),
+        **await _examinados(db, funcion),
+        "memoria_pico_kb": await _memoria_pico_kb(funcion),
+    }
+
+
+async def ejecutar(coleccion: str, repeticiones: int, calentamiento: int,
+                   filtro: Optional[str], solo: str) -> Dict[str, Any]:
+    from app.database import obtener_database, cerrar_clientes, DATABASE_NAME
+    from app.services.ejecutor import ejecutor_analitica
+
+    db = obtener_database()
+    casos: List[Caso] = []
+    if solo in ("todo", "servicio"):
+        casos += [(f"servicio:{n}", f) for n, f in casos_servicio(db, coleccion)]
+    if solo in ("todo", "endpoints"):
+        casos += [(f"endpoint:{n}", f) for n, f in casos_endpoints(coleccion)]
+    if filtro:
+        casos = [(n, f) for n, f in casos if filtro in n]
+
+    resultados = []
+    try:
+        for nombre, funcion in casos:
+            resultado = await medir_caso(db, nombre, funcion, repeticiones, calentamiento)
+            resultados.append(resultado)
+            print(f"{nombre:<50} p50 {resultado['p50_ms']:>9.2f} ms  p95 {resultado['p95_ms']:>9.2f} ms  "
+                  f"docs {resultado['docs_examinados']}" + ("" if resultado["correcto"] else "  (ERROR)"))
+        documentos = await db[coleccion].estimated_document_count()
+        version = (await db.command("buildInfo")).get("version")
+    finally:
+        ejecutor_analitica.cerrar()
+        cerrar_clientes()
+
+    return {
+        **_commit_actual(),
+        "fecha": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "base_de_datos": DATABASE_NAME,
+        "coleccion": coleccion,
+        "documentos": documentos,
+        "mongodb": version,
+        "python": platform.python_version(),
+        "cache": os.environ.get("CACHE_DESACTIVADA") != "true",
+        "repeticiones": repeticiones,
+        "calentamiento": calentamiento,
+        "resultados": resultados,
+    }
+
+
+def comparar(ruta_base: str, ruta_nueva: str):
+    """Imprime la variación de p50/p95 y documentos examinados entre dos corridas."""
+    with open(ruta_base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(ruta_nueva, encoding="utf-8") as f:
+        nueva = json.load(f)
+    anteriores = {r["caso"]: r for r in base["resultados"]}
+
+    print(f"{base.get('commit')} ({base['documentos']} docs) -> {nueva.get('commit')} ({nueva['documentos']} docs)")
+    for r in nueva["resultados"]:
+        previo = anteriores.get(r["caso"])
+        if previo is None:
+            print(f"{r['caso']:<50} nuevo")
+            continue
+        variacion = (r["p50_ms"] / previo["p50_ms"] - 1) * 100 if previo["p50_ms"] else 0.0
+        print(f"{r['caso']:<50} p50 {previo['p50_ms']:>9.2f} -> {r['p50_ms']:>9.2f} ms ({variacion:+.1f}%)  "
+              f"p95 {previo['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f} ms  "
+              f"docs {previo['docs_examinados']} -> {r['docs_examinados']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ReporteService y de los endpoints")
+    parser.add_argument("coleccion", nargs="?", help="Colección a medir (ver benchmarks.generador)")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--calentamiento", type=int, default=2)
+    parser.add_argument("--filtro", help="Solo los casos cuyo nombre contiene este texto")
+    parser.add_argument("--solo", choices=["todo", "servicio", "endpoints"], default="todo")
+    parser.add_argument("--con-cache", action="store_true", help="Mide con la cache de resultados activa")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto en benchmarks/resultados)")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVA"), help="Compara dos archivos de resultados")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+    if not args.coleccion:
+        parser.error("indique la colección a medir")
+
+    # Antes de importar la aplicación: la configuración se lee al importar
+    os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DATABASE_NAME", "videogames_bench")
+    os.environ["CACHE_DESACTIVADA"] = "false" if args.con_cache else "true"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    informe = asyncio.run(ejecutar(args.coleccion, args.repeticiones, args.calentamiento, args.filtro, args.solo))
+
+    salida = args.salida
+    if salida is None:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        marca = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        salida = os.path.join(DIRECTORIO_RESULTADOS, f"{marca}_{informe['commit'] or 'sin-git'}_{args.coleccion}.json")
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"Resultados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
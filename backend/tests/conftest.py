@@ -0,0 +1,43 @@
+import functools
+import os
+
+# Un solo proceso de analítica alcanza para las pruebas
+os.environ.setdefault("ANALITICA_WORKERS", "1")
+
+import mongomock.collection
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from app.services.cache_service import cache_resultados
+from app.services.ejecutor import ejecutor_analitica
+from app.services.normalizacion_service import olvidar_normalizacion
+
+
+def _sin_sort(metodo):
+    # pymongo >= 4.11 pasa `sort` a las operaciones de `bulk_write`, que mongomock no conoce
+    @functools.wraps(metodo)
+    def envoltura(self, *args, sort=None, **kwargs):
+        return metodo(self, *args, **kwargs)
+    return envoltura
+
+
+mongomock.collection.BulkOperationBuilder.add_update = _sin_sort(mongomock.collection.BulkOperationBuilder.add_update)
+mongomock.collection.BulkOperationBuilder.add_replace = _sin_sort(mongomock.collection.BulkOperationBuilder.add_replace)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db():
+    """Base de datos mongomock nueva por prueba, sin resultados cacheados de otras pruebas."""
+    cache_resultados.invalidar()
+    olvidar_normalizacion()
+    return AsyncMongoMockClient()["pruebas"]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def cerrar_ejecutor():
+    yield
+    ejecutor_analitica.cerrar()
@@ -0,0 +1,227 @@
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from pydantic import ValidationError
+from app.database import get_database
+from app.models import CorrelacionRequest, RegresionRequest
+from app.routes import reportes
+from app.services.analitica import (
+    AcumuladorOLS,
+    acumular_ols_lote,
+    calcular_correlacion_muestra,
+    intervalo_media,
+    intervalo_proporcion,
+    resolver_ols,
+    resolver_pearson,
+    tamano_muestra,
+)
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+
+def _estadisticos_ols(x, y):
+    """Lo que calcula el `$group` de `etapas_estadisticos_ols`, hecho con NumPy."""
+    estadisticos = {"n": len(y), "y": y.sum(), "yy": y @ y}
+    for i in range(x.shape[1]):
+        estadisticos[f"x{i}"] = x[:, i].sum()
+        estadisticos[f"xy_{i}"] = x[:, i] @ y
+        for j in range(i, x.shape[1]):
+            estadisticos[f"xx_{i}_{j}"] = x[:, i] @ x[:, j]
+    return estadisticos
+
+
+def test_resolver_ols_coincide_con_minimos_cuadrados():
+    rng = np.random.default_rng(7)
+    x = rng.normal(size=(200, 3))
+    y = x @ np.array([1.5, -2.0, 0.25]) + 4 + rng.normal(scale=0.1, size=200)
+
+    ajuste = resolver_ols(_estadisticos_ols(x, y), 3)
+    esperado = np.linalg.lstsq(np.column_stack([np.ones(200), x]), y, rcond=None)[0]
+    assert ajuste["intercept"] == pytest.approx(esperado[0])
+    assert ajuste["coeficientes"] == pytest.approx(list(esperado[1:]))
+    residuos = y - esperado[0] - x @ esperado[1:]
+    assert ajuste["r2"] == pytest.approx(1 - residuos @ residuos / ((y - y.mean()) @ (y - y.mean())))
+    assert ajuste["n"] == 200
+
+
+def test_resolver_ols_tolera_features_colineales_y_vacio():
+    x = np.arange(10.0)
+    ajuste = resolver_ols(_estadisticos_ols(np.column_stack([x, 2 * x]), 3 * x + 1), 2)
+    assert ajuste["r2"] == pytest.approx(1.0)
+    assert ajuste["intercept"] == pytest.approx(1.0)
+    assert resolver_ols(None, 2) == {"coeficientes": [], "intercept": 0.0, "r2": 0.0, "n": 0}
+
+
+async def test_regresion_servidor(db):
+    await db["juegos"].insert_many([{"Reviews": i, "Playing": i % 3, "Rating": 2 * i - (i % 3) + 1} for i in range(30)])
+    resultado = await ReporteService(db).regresion_lineal(
+        "juegos", "Rating", campos_x=["Reviews", "Playing"], modo="servidor"
+    )
+    assert resultado["success"] and resultado["n"] == 30
+    assert resultado["coeficientes"] == pytest.approx([2.0, -1.0])
+    assert resultado["intercept"] == pytest.approx(1.0)
+    assert len(resultado["ejemplo_predicciones"]) == 5
+
+
+async def test_regresion_rechaza_modos_desconocidos(db):
+    with pytest.raises(ValidationError):
+        RegresionRequest(coleccion="juegos", campo_y="Rating", campo_x="Reviews", modo="Servidor")
+    with pytest.raises(ValueError):
+        await ReporteService(db).regresion_lineal("juegos", "Rating", campo_x="Reviews", modo="stream")
+    assert await db["_modelos"].count_documents({}) == 0
+
+
+def _estadisticos_pearson(columnas):
+    """Lo que calcula el `$group` de `etapas_estadisticos_pearson` (pares completos), con NumPy."""
+    estadisticos = {"completos": int(np.isfinite(np.column_stack(columnas)).all(axis=1).sum())}
+    for i, x in enumerate(columnas):
+        for j in range(i, len(columnas)):
+            y = columnas[j]
+            ambos = np.isfinite(x) & np.isfinite(y)
+            xs, ys = x[ambos], y[ambos]
+            sufijo = f"{i}_{j}"
+            estadisticos.update({
+                f"n_{sufijo}": int(ambos.sum()), f"sx_{sufijo}": xs.sum(), f"sy_{sufijo}": ys.sum(),
+                f"sxx_{sufijo}": xs @ xs, f"syy_{sufijo}": ys @ ys, f"sxy_{sufijo}": xs @ ys,
+            })
+    return estadisticos
+
+
+def test_resolver_pearson_coincide_con_corrcoef():
+    rng = np.random.default_rng(3)
+    a = rng.normal(size=100)
+    b = 0.8 * a + rng.normal(scale=0.5, size=100)
+    c = rng.normal(size=100)
+    resultado = resolver_pearson(_estadisticos_pearson([a, b, c]), 3)
+    esperado = np.corrcoef([a, b, c]).round(3)
+    np.testing.assert_allclose(np.array(resultado["matrix"], dtype=float), esperado, atol=1e-3)
+    assert resultado["n"] == 100
+
+
+def test_resolver_pearson_pares_completos_e_indefinidas():
+    a = np.array([1.0, 2.0, 3.0, 4.0])
+    b = np.array([2.0, 4.0, np.nan, 8.0])
+    constante = np.array([5.0, 5.0, 5.0, 5.0])
+    resultado = resolver_pearson(_estadisticos_pearson([a, b, constante]), 3)
+    # a y b se correlacionan con las 3 filas donde ambos existen
+    assert resultado["matrix"][0][1] == 1.0
+    assert resultado["n_pares"][0][1] == 3
+    # Varianza nula: indefinida
+    assert resultado["matrix"][0][2] is None
+    assert resultado["n"] == 3
+    assert resolver_pearson(None, 2)["matrix"] == [[None, None], [None, None]]
+
+
+def test_correlacion_muestra_convierte_strings():
+    columnas = {"a": ["1", "2", "3", "N/A"], "b": [2, 4, 6, 8], "t": ["x", "y", "z", "w"]}
+    resultado = calcular_correlacion_muestra(columnas, ["a", "b", "t"])
+    assert resultado["fields"] == ["a", "b"]
+    assert resultado["matrix"] == [[1.0, 1.0], [1.0, 1.0]]
+    assert resultado["n"] == 3
+
+
+async def test_correlacion_rechaza_modos_desconocidos(db):
+    with pytest.raises(ValidationError):
+        CorrelacionRequest(coleccion="juegos", modo="streaming")
+    with pytest.raises(ValueError):
+        await ReporteService(db).calcular_matriz_correlacion("juegos", ["Rating", "Reviews"], modo="Servidor")
+
+
+def test_acumulador_por_bloques_igual_a_una_pasada():
+    rng = np.random.default_rng(11)
+    datos = rng.normal(size=(1000, 3))
+    datos[::17, 1] = np.nan  # filas incompletas se descartan
+    por_bloques, completo = AcumuladorOLS(2), AcumuladorOLS(2)
+    for inicio in range(0, 1000, 64):
+        por_bloques.agregar(datos[inicio:inicio + 64])
+    completo.agregar(datos)
+    assert por_bloques.n == completo.n == 1000 - len(range(0, 1000, 17))
+    a, b = por_bloques.estadisticos(), completo.estadisticos()
+    assert a.keys() == b.keys()
+    assert all(a[k] == pytest.approx(b[k]) for k in a)
+
+
+def test_acumular_lote_y_sumar():
+    documentos = [{"x": str(i), "_norm": {"y": 2 * i + 1}} for i in range(10)] + [{"x": "N/A", "_norm": {"y": 1}}]
+    total = AcumuladorOLS(1)
+    for inicio in (0, 4, 8):
+        parcial, _ = acumular_ols_lote(documentos[inicio:inicio + 4], ["x"], "_norm.y")
+        total.sumar(parcial)
+    assert total.n == 10
+    assert resolver_ols(total.estadisticos(), 1)["coeficientes"] == pytest.approx([2.0])
+    assert acumular_ols_lote([], ["x"], "_norm.y")[0].n == 0
+
+
+async def test_regresion_streaming_igual_a_servidor(db):
+    await db["juegos"].insert_many([
+        {"Reviews": i, "Playing": (i * 7) % 11, "Rating": 0.5 * i + 0.1 * ((i * 7) % 11) + (i % 2)}
+        for i in range(50)
+    ] + [{"Reviews": "N/A", "Rating": 3}])
+    service = ReporteService(db)
+    streaming = await service._regresion_streaming("juegos", "Rating", ["Reviews", "Playing"], {}, tamano_lote=8)
+    servidor = await service._regresion_servidor("juegos", "Rating", ["Reviews", "Playing"], {"Reviews": {"$type": "number"}})
+    assert streaming["success"] and streaming["n"] == 50
+    assert streaming["coeficientes"] == pytest.approx(servidor["coeficientes"])
+    assert streaming["r2"] == pytest.approx(servidor["r2"])
+    assert len(streaming["ejemplo_predicciones"]) == 5
+
+
+def test_tamano_muestra():
+    assert tamano_muestra(0.01, 10_000_000) == 9595
+    assert tamano_muestra(0.01, 500) <= 500
+    assert tamano_muestra(0.05, 0) == 0
+
+
+def test_intervalo_proporcion_wilson():
+    estimado, inferior, superior = intervalo_proporcion(30, 1000, 100_000)
+    assert estimado == pytest.approx(3000)
+    assert inferior < estimado < superior
+    # Cero éxitos no da un intervalo de ancho cero
+    _, inferior, superior = intervalo_proporcion(0, 1000, 100_000)
+    assert inferior == 0.0 and superior > 0
+    # Con la colección completa no hay incertidumbre
+    assert intervalo_proporcion(30, 1000, 1000) == (30.0, 30.0, 30.0)
+
+
+def test_intervalo_media():
+    desde, hasta = intervalo_media(3.5, 1.0, 400, 1_000_000)
+    assert desde == pytest.approx(3.5 - 1.959964 / 20, rel=1e-3)
+    assert hasta == pytest.approx(3.5 + 1.959964 / 20, rel=1e-3)
+    assert intervalo_media(3.5, None, 400, 1000) == (3.5, 3.5)
+
+
+def test_validar_modo():
+    ReporteService._validar_modo("aproximado", 0.01)
+    with pytest.raises(ValueError):
+        ReporteService._validar_modo("rapido", 0.01)
+    with pytest.raises(ValueError):
+        ReporteService._validar_modo("aproximado", 0.6)
+
+
+@pytest.mark.parametrize("ruta", ["conteo-generos", "rating-promedio", "distribucion-rating"])
+async def test_ruta_rechaza_modos_desconocidos(db, ruta):
+    app = FastAPI()
+    app.include_router(reportes.router)
+    app.dependency_overrides[get_database] = lambda: db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://prueba") as cliente:
+        respuesta = await cliente.get(f"/api/reportes/{ruta}/juegos", params={"modo": "aprox"})
+    assert respuesta.status_code == 422
+
+
+async def test_coleccion_chica_se_calcula_exacta(db):
+    await db["juegos"].insert_many([{"Title": f"J{i}"} for i in range(100)])
+    muestreo = await ReporteService._plan_muestreo(db["juegos"], 0.01)
+    assert muestreo["muestra"] is None
+    pipeline = [{"$match": {}}]
+    assert ReporteService._con_muestra(pipeline, muestreo) == pipeline
+    assert ReporteService._anotar_muestreo({}, muestreo)["modo"] == "exacto"
+
+
+def test_estimar_conteos_escala_al_total():
+    muestreo = {"muestra": 1000, "total_documentos": 100_000, "error": 0.01}
+    formateado = ReporteService._estimar_conteos({"conteos": [{"genero": "RPG", "conteo": 250}]}, "conteos", muestreo)
+    item = formateado["conteos"][0]
+    assert item["conteo"] == 25_000 and item["conteo_muestra"] == 250
+    assert item["intervalo"][0] < 25_000 < item["intervalo"][1]
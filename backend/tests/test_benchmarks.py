@@ -0,0 +1,36 @@
+from benchmarks.generador import GENEROS, cantidad_desde_texto, generar_juegos
+from benchmarks.medir import percentil
+from app.services.normalizacion_service import normalizar_documento
+
+
+def test_generador_determinista():
+    assert list(generar_juegos(200)) == list(generar_juegos(200))
+    assert list(generar_juegos(200, semilla=1)) != list(generar_juegos(200))
+    assert sum(1 for _ in generar_juegos(1234)) == 1234
+
+
+def test_generador_normalizable():
+    ratings = []
+    for juego in generar_juegos(2000):
+        norm = normalizar_documento(juego)
+        assert norm["generos"] and set(norm["generos"]) <= set(GENEROS)
+        assert norm["desarrolladores"]
+        assert norm["anio"] is None or 1980 <= norm["anio"] <= 2024
+        ratings.append(norm["rating"])
+    # Mezcla de ratings válidos y no numéricos ("N/A", "TBD" o ausente)
+    validos = [r for r in ratings if r is not None]
+    assert 0.85 * len(ratings) < len(validos) < len(ratings)
+    assert all(0.5 <= r <= 5.0 for r in validos)
+
+
+def test_cantidad_desde_texto():
+    assert cantidad_desde_texto("100K") == 100_000
+    assert cantidad_desde_texto("1m") == 1_000_000
+    assert cantidad_desde_texto("25_000") == 25_000
+
+
+def test_percentil():
+    valores = list(range(1, 101))
+    assert percentil(valores, 50) == 50
+    assert percentil(valores, 95) == 95
+    assert percentil([7.0], 95) == 7.0
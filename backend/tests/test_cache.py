@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.routes import reportes
+from app.services.cache_service import CacheResultados, EsperaAgotadaError, cacheado
+from app.services.normalizacion_service import registrar_escritura
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_single_flight_comparte_un_calculo():
+    cache = CacheResultados()
+    llamadas = []
+
+    async def calcular():
+        llamadas.append(1)
+        await asyncio.sleep(0.01)
+        return {"success": True}
+
+    clave = ("metodo", "db", "juegos", 0, ())
+    resultados = await asyncio.gather(*(cache.compartir(clave, calcular) for _ in range(5)))
+    assert len(llamadas) == 1
+    assert resultados == [{"success": True}] * 5
+    assert cache.coalescidas == 4
+
+
+async def test_espera_agotada_no_cancela_el_calculo():
+    cache = CacheResultados()
+    terminado = asyncio.Event()
+
+    async def calcular():
+        await asyncio.sleep(0.05)
+        terminado.set()
+        return 1
+
+    with pytest.raises(EsperaAgotadaError):
+        await cache.compartir(("metodo", "db", "juegos", 0, ()), calcular, espera=0.001)
+    await asyncio.wait_for(terminado.wait(), 1)
+    assert cache.esperas_agotadas == 1
+
+
+async def test_ruta_responde_503_con_retry_after(db, monkeypatch):
+    async def agotada(self, *args, **kwargs):
+        raise EsperaAgotadaError("obtener_conteo_generos no terminó en 30 s")
+
+    monkeypatch.setattr(ReporteService, "obtener_conteo_generos", agotada)
+    with pytest.raises(HTTPException) as error:
+        await reportes.conteo_generos("juegos", db=db)
+    assert error.value.status_code == 503
+    assert error.value.headers == {"Retry-After": reportes.REINTENTO_ESPERA_AGOTADA}
+
+
+def test_lru_desaloja_la_entrada_menos_usada():
+    cache = CacheResultados(max_entradas=2)
+    cache.guardar(("m", "db", "a", 0, ""), 1, ttl=60)
+    cache.guardar(("m", "db", "b", 0, ""), 2, ttl=60)
+    assert cache.obtener(("m", "db", "a", 0, "")) == (True, 1)
+    cache.guardar(("m", "db", "c", 0, ""), 3, ttl=60)
+    assert cache.obtener(("m", "db", "b", 0, "")) == (False, None)
+    assert cache.obtener(("m", "db", "a", 0, "")) == (True, 1)
+    assert cache.desalojos == 1
+
+
+def test_ttl_vencido_cuenta_como_fallo():
+    cache = CacheResultados()
+    cache.guardar(("m", "db", "a", 0, ""), 1, ttl=0)
+    assert cache.obtener(("m", "db", "a", 0, "")) == (False, None)
+    assert (cache.expiraciones, cache.fallos) == (1, 1)
+
+
+def test_invalidar_una_coleccion_o_todas():
+    cache = CacheResultados()
+    cache.guardar(("m", "db", "a", 0, ""), 1, ttl=60)
+    cache.guardar(("m", "db", "b", 0, ""), 2, ttl=60)
+    cache.invalidar("a")
+    assert cache.version("a") == 1 and cache.version("b") == 0
+    assert cache.obtener(("m", "db", "a", 0, ""))[0] is False
+    assert cache.obtener(("m", "db", "b", 0, ""))[0] is True
+    cache.invalidar()
+    assert cache.version("a") == 2
+    assert cache.estadisticas()["entradas"] == 0
+
+
+class _Lector:
+    def __init__(self, db):
+        self.db = db
+        self.lecturas = 0
+
+    @cacheado(ttl=60)
+    async def leer(self, coleccion: str):
+        self.lecturas += 1
+        return {"success": True, "lecturas": self.lecturas}
+
+
+async def test_escritura_de_otro_worker_invalida_la_cache(db):
+    lector = _Lector(db)
+    assert (await lector.leer("juegos"))["lecturas"] == 1
+    assert (await lector.leer("juegos"))["lecturas"] == 1
+    # Otro proceso escribió por la API: la versión local de este no cambió
+    await registrar_escritura(db, "juegos")
+    assert (await lector.leer("juegos"))["lecturas"] == 2
+    assert (await lector.leer("otra"))["lecturas"] == 3
@@ -0,0 +1,51 @@
+import pytest
+from app.services.catalogo_service import CatalogoService, perfilar_lote
+
+pytestmark = pytest.mark.anyio
+
+JUEGOS = [
+    {"Title": "A", "Rating": 4.5, "Genres": "['RPG']"},
+    {"Title": "B", "Rating": "N/A", "Genres": "['Indie']"},
+    {"Title": "C", "Rating": "3.9", "Genres": "['RPG']"},
+    {"Title": "D", "Rating": None},
+]
+
+
+def test_perfilar_lote():
+    perfil = perfilar_lote([dict(juego, _id=i) for i, juego in enumerate(JUEGOS)])
+    assert "_id" not in perfil
+    assert perfil["Rating"]["tipos"] == {"double": 1, "string": 2, "null": 1}
+    assert (perfil["Rating"]["presentes"], perfil["Rating"]["nulos"], perfil["Rating"]["numericos"]) == (4, 1, 2)
+    assert perfil["Genres"]["presentes"] == 3
+    assert len(perfil["Title"]["hll"]) == 4096
+
+
+async def test_perfilar_en_el_pool_e_incremental(db):
+    await db.juegos.insert_many([dict(juego) for juego in JUEGOS])
+    servicio = CatalogoService(db)
+
+    resultado = await servicio.perfilar("juegos", tamano_lote=3)
+    assert resultado["success"] and resultado["procesados"] == 4
+
+    catalogo = await servicio.obtener("juegos")
+    rating = next(c for c in catalogo["campos"] if c["campo"] == "Rating")
+    assert rating["tasa_nulos"] == 0.25
+    assert rating["proporcion_numerica"] == round(2 / 3, 4)
+    assert (await servicio.cardinalidad("juegos", "Genres"))["estimada"] == 2
+
+    # Solo los documentos nuevos
+    await db.juegos.insert_one({"Title": "E", "Rating": 5, "Genres": "['Puzzle']"})
+    assert (await servicio.perfilar("juegos"))["procesados"] == 1
+    assert (await servicio.cardinalidad("juegos", "Genres"))["estimada"] == 3
+    assert await servicio.campos_numericos("juegos") == ["Rating"]
+
+
+async def test_borrados_rehacen_el_perfil(db):
+    await db.juegos.insert_many([dict(juego) for juego in JUEGOS])
+    servicio = CatalogoService(db)
+    await servicio.perfilar("juegos")
+
+    await db.juegos.delete_many({"Genres": "['RPG']"})
+    resultado = await servicio.perfilar("juegos")
+    assert resultado["procesados"] == 2 and resultado["documentos"] == 2
+    assert (await servicio.cardinalidad("juegos", "Genres"))["estimada"] == 1
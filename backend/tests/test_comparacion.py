@@ -0,0 +1,40 @@
+import pytest
+from app.services import reporte_service
+from app.services.normalizacion_service import NormalizacionService
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+
+def _juegos(generos):
+    return [{"Title": f"Juego {i}", "Genres": str([genero])} for i, genero in enumerate(generos)]
+
+
+async def test_generos_fuera_del_top_no_valen_cero(db):
+    # 25 géneros en "a": el menos frecuente queda fuera de un top-20
+    generos_a = [f"G{n:02d}" for n in range(25) for _ in range(30 - n)]
+    await db["a"].insert_many(_juegos(generos_a))
+    await db["b"].insert_many(_juegos(["G24"] * 50 + ["G00"]))
+    for coleccion in ("a", "b"):
+        await NormalizacionService(db).backfill(coleccion)
+
+    resultado = await ReporteService(db).comparar_colecciones(["a", "b"], ["conteo_generos"])
+    tabla = resultado["comparacion"]["conteo_generos"]
+    indice = tabla["etiquetas"].index("G24")
+    assert tabla["series"]["a"][indice] == 6
+    assert tabla["series"]["b"][indice] == 50
+    # G01 no está en "b" y su lista es completa: ahí sí es 0
+    assert tabla["series"]["b"][tabla["etiquetas"].index("G01")] == 0
+    assert tabla["truncadas"] == []
+
+
+def test_alinear_lista_truncada_usa_none(monkeypatch):
+    monkeypatch.setattr(reporte_service, "COMPARACION_MAX_ETIQUETAS", 2)
+    resultados = {
+        "a": {"conteos": [{"genero": "RPG", "conteo": 5}, {"genero": "Indie", "conteo": 3}]},
+        "b": {"conteos": [{"genero": "Shooter", "conteo": 4}]},
+    }
+    tabla = ReporteService._alinear(resultados, "conteos", "genero")
+    assert tabla["etiquetas"] == ["RPG", "Shooter", "Indie"]
+    assert tabla["series"] == {"a": [5, None, 3], "b": [0, 4, 0]}
+    assert tabla["truncadas"] == ["a"]
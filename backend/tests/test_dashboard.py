@@ -0,0 +1,43 @@
+import pytest
+from app.services.normalizacion_service import NormalizacionService
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+# Faceta del dashboard => endpoint individual con el mismo pipeline
+FACETAS = {
+    "metricas_dashboard": "metricas-dashboard",
+    "rating_promedio": "rating-promedio",
+    "distribucion_rating": "distribucion-rating",
+    "conteo_generos": "conteo-generos",
+    "conteo_desarrolladores": "conteo-desarrolladores",
+    "conteo_por_anio": "conteo-por-anio",
+    "top_juegos_populares": "top-juegos-populares",
+    "hidden_gems": "hidden-gems",
+    "trending_games": "trending-games",
+    "top_rated_games": "top-rated-games",
+}
+
+
+async def test_facetas_iguales_a_los_endpoints_individuales(db):
+    # mongomock no implementa `$round` ni `$stdDevSamp`: se comparan los pipelines
+    await db["juegos"].insert_one({"Title": "A", "Rating": "4.5", "Release_Date": "Mar 1, 2022"})
+    await NormalizacionService(db).backfill("juegos")
+    service = ReporteService(db)
+
+    pipeline, opciones = await service.construir_pipeline("dashboard", "juegos")
+    assert opciones == {"allowDiskUse": True}
+    # Normalizada: la colección se recorre una vez, directo al `$facet`
+    assert len(pipeline) == 1
+    facetas = pipeline[0]["$facet"]
+    assert set(facetas) == set(FACETAS)
+    for faceta, endpoint in FACETAS.items():
+        parametros = {"campo": "Release_Date"} if endpoint == "conteo-por-anio" else {}
+        individual, _ = await service.construir_pipeline(endpoint, "juegos", **parametros)
+        assert facetas[faceta] == individual, faceta
+
+
+async def test_dashboard_sin_normalizar_normaliza_antes_del_facet(db):
+    await db["juegos"].insert_one({"Title": "A", "Rating": "4.5"})
+    pipeline, _ = await ReporteService(db).construir_pipeline("dashboard", "juegos")
+    assert "$facet" in pipeline[-1] and len(pipeline) > 1
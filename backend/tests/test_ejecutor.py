@@ -0,0 +1,19 @@
+import os
+import pytest
+from app.services import ejecutor
+from app.services.ejecutor import ColaLlenaError, EjecutorAnalitica
+
+pytestmark = pytest.mark.anyio
+
+
+def test_nucleos_disponibles_respeta_la_afinidad(monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1, 2}, raising=False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 64)
+    assert ejecutor._nucleos_disponibles() == 3
+
+
+async def test_cola_llena_rechaza_sin_esperar():
+    pool = EjecutorAnalitica(workers=1, cola_max=0, timeout=1)
+    with pytest.raises(ColaLlenaError):
+        await pool.ejecutar(sum, [1, 2])
+    assert pool.rechazados == 1
@@ -0,0 +1,81 @@
+import pytest
+from app.services.explain_service import analizar_plan, normalizar_explain
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+# `explain` clásico: `$cursor` con el plan y luego las etapas del pipeline
+CLASICO = {
+    "stages": [
+        {
+            "$cursor": {
+                "queryPlanner": {
+                    "winningPlan": {
+                        "stage": "PROJECTION_SIMPLE",
+                        "inputStage": {
+                            "stage": "FETCH",
+                            "inputStage": {"stage": "IXSCAN", "indexName": "norm_generos", "direction": "forward"},
+                        },
+                    },
+                    "rejectedPlans": [{"stage": "COLLSCAN"}],
+                },
+                "executionStats": {"nReturned": 500, "executionTimeMillis": 40, "totalDocsExamined": 500, "totalKeysExamined": 500},
+            },
+            "nReturned": 500,
+            "executionTimeMillisEstimate": 10,
+        },
+        {"$group": {}, "nReturned": 20, "executionTimeMillisEstimate": 35, "usedDisk": False},
+        {"$sort": {}, "nReturned": 20, "executionTimeMillisEstimate": 36},
+    ],
+    "serverInfo": {"version": "7.0.0"},
+}
+
+# SBE: todo el pipeline empujado al motor de consultas, plan en la raíz
+SBE = {
+    "queryPlanner": {
+        "winningPlan": {
+            "queryPlan": {
+                "stage": "SORT",
+                "inputStage": {"stage": "COLLSCAN"},
+            }
+        }
+    },
+    "executionStats": {"nReturned": 5, "executionTimeMillis": 12, "totalDocsExamined": 1000, "totalKeysExamined": 0},
+}
+
+
+def test_normalizar_explain_clasico():
+    resultado = normalizar_explain(CLASICO)
+    assert resultado["plan_ganador"] == [
+        {"nivel": 0, "etapa": "PROJECTION_SIMPLE"},
+        {"nivel": 1, "etapa": "FETCH"},
+        {"nivel": 2, "etapa": "IXSCAN", "indice": "norm_generos", "direccion": "forward"},
+    ]
+    assert resultado["indices"] == ["norm_generos"]
+    # El COLLSCAN rechazado no cuenta; el `$sort` después del `$group` ordena grupos
+    assert not resultado["collscan"] and not resultado["orden_en_memoria"]
+    assert [e["tiempo_propio_ms"] for e in resultado["etapas"]] == [10, 25, 1]
+    assert resultado["devueltos"] == 20 and resultado["docs_examinados"] == 500
+
+
+def test_normalizar_explain_sbe():
+    resultado = normalizar_explain(SBE)
+    assert resultado["collscan"] and resultado["orden_en_memoria"]
+    assert resultado["etapas"] == [
+        {"etapa": "$cursor", "devueltos": 5, "tiempo_ms": 12, "tiempo_propio_ms": 12, "derrame_a_disco": False}
+    ]
+
+
+def test_sort_sobre_group_no_es_orden_en_memoria():
+    plan = {"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "GROUP", "inputStage": {"stage": "COLLSCAN"}}}}}
+    assert not analizar_plan(plan)["orden_en_memoria"]
+
+
+def test_derrame_a_disco():
+    con_derrame = {**CLASICO, "stages": CLASICO["stages"][:1] + [{"$group": {}, "spills": 2}]}
+    assert normalizar_explain(con_derrame)["derrame_a_disco"]
+
+
+async def test_endpoint_sin_pipeline(db):
+    with pytest.raises(ValueError):
+        await ReporteService(db).construir_pipeline("no-existe", "juegos")
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.models import ReporteRequest
+from app.routes import reportes
+from app.services.catalogo_service import CatalogoService
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+
+async def _leer(contenido) -> str:
+    return b"".join([bloque async for bloque in contenido]).decode("utf-8")
+
+
+async def test_csv_usa_columnas_del_catalogo(db):
+    # El primer documento no tiene `Reviews`: antes esa columna se perdía
+    await db["juegos"].insert_many([
+        {"Title": "A", "Rating": "4.5"},
+        {"Title": "B", "Reviews": "120", "Genres": ["RPG"]},
+    ])
+    await CatalogoService(db).perfilar("juegos")
+    contenido = await ReporteService(db).exportar_reporte("juegos", tamano_lote=1)
+    filas = list(csv.DictReader(io.StringIO(await _leer(contenido))))
+    assert list(filas[0]) == ["_id", "Genres", "Rating", "Reviews", "Title"]
+    assert filas[1]["Reviews"] == "120"
+    assert filas[1]["Genres"] == '["RPG"]'
+
+
+async def test_csv_sin_catalogo_pide_campos(db):
+    await db["juegos"].insert_one({"Title": "A"})
+    with pytest.raises(ValueError):
+        await ReporteService(db).exportar_reporte("juegos")
+    contenido = await ReporteService(db).exportar_reporte("juegos", campos=["Title", "Rating"])
+    assert await _leer(contenido) == "Title,Rating\r\nA,\r\n"
+
+
+async def test_ndjson_y_coleccion_vacia(db):
+    await db["juegos"].insert_many([{"Title": f"J{i}"} for i in range(3)])
+    contenido = await ReporteService(db).exportar_reporte("juegos", formato="ndjson", limite=2)
+    lineas = (await _leer(contenido)).splitlines()
+    assert [json.loads(linea)["Title"] for linea in lineas] == ["J0", "J1"]
+    vacio = await ReporteService(db).exportar_reporte("otra", campos=["Title"])
+    assert await _leer(vacio) == "Title\r\n"
+
+
+async def test_errores_antes_de_enviar_la_respuesta(db, monkeypatch):
+    async def sin_fechas(self, *args, **kwargs):
+        raise ValueError("campo_fecha inválido")
+
+    monkeypatch.setattr(ReporteService, "_filtro_fechas", sin_fechas)
+    request = ReporteRequest(coleccion="juegos", campos=["Title"], fecha_inicio=datetime(2020, 1, 1))
+    with pytest.raises(HTTPException) as error:
+        await reportes.generar_reporte_stream(request, format="csv", db=db)
+    assert error.value.status_code == 400
+
+
+async def test_consulta_invalida_falla_antes_de_enviar(db):
+    await db["juegos"].insert_one({"Title": "A"})
+    request = ReporteRequest(coleccion="juegos", campos=["Title"], filtros={"Title": {"$operadorInexistente": 1}})
+    with pytest.raises(HTTPException) as error:
+        await reportes.generar_reporte_stream(request, format="ndjson", db=db)
+    assert error.value.status_code == 500
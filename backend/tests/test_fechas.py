@@ -0,0 +1,55 @@
+from datetime import datetime
+import pytest
+from app.services.normalizacion_service import NormalizacionService, expr_fecha, parsear_fecha
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+JUEGOS = [
+    {"Title": "Hades", "Release_Date": "Dec 10, 2019"},
+    {"Title": "Elden Ring", "Release_Date": "Feb 25, 2022"},
+    {"Title": "Hollow Knight", "Release_Date": "Feb 24, 2017"},
+    {"Title": "Silksong", "Release_Date": "releases on TBD"},
+]
+
+
+def test_parsear_fecha_casos_limite():
+    assert parsear_fecha(" Feb 25, 2022 ") == datetime(2022, 2, 25)
+    assert parsear_fecha("feb 5, 2019") == datetime(2019, 2, 5)
+    assert parsear_fecha(datetime(2020, 1, 1)) == datetime(2020, 1, 1)
+    # Día inexistente, mes desconocido o sin día: no es una fecha
+    assert parsear_fecha("Feb 30, 2022") is None
+    assert parsear_fecha("Foo 10, 2022") is None
+    assert parsear_fecha("2022") is None
+    assert parsear_fecha(2022) is None
+    assert parsear_fecha("2022-02-25", "%Y-%m-%d") == datetime(2022, 2, 25)
+
+
+def test_expr_fecha_otro_formato_usa_date_from_string():
+    expresion = expr_fecha("$Fecha", "%Y-%m-%d")
+    desde_texto = expresion["$switch"]["branches"][1]["then"]
+    assert desde_texto["$dateFromString"]["format"] == "%Y-%m-%d"
+    assert desde_texto["$dateFromString"]["onError"] is None
+
+
+async def test_filtro_fechas_sin_normalizar_usa_expr(db):
+    await db.juegos.insert_many([dict(j) for j in JUEGOS])
+    servicio = ReporteService(db)
+    assert await servicio._filtro_fechas("juegos", None, None) == {}
+    filtro = await servicio._filtro_fechas("juegos", datetime(2019, 1, 1), None)
+    assert "$expr" in filtro
+
+
+async def test_reporte_por_rango_de_fechas(db):
+    await db.juegos.insert_many([dict(j) for j in JUEGOS])
+    await NormalizacionService(db).backfill("juegos")
+    servicio = ReporteService(db)
+
+    filtro = await servicio._filtro_fechas("juegos", datetime(2019, 1, 1), datetime(2022, 2, 25))
+    assert filtro == {"_norm.fecha": {"$gte": datetime(2019, 1, 1), "$lte": datetime(2022, 2, 25)}}
+
+    resultado = await servicio.generar_reporte(
+        "juegos", campos=["Title"], fecha_inicio=datetime(2019, 1, 1), fecha_fin=datetime(2022, 2, 25)
+    )
+    assert resultado["success"]
+    assert sorted(d["Title"] for d in resultado["datos"]) == ["Elden Ring", "Hades"]
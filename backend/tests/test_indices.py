@@ -0,0 +1,32 @@
+import pytest
+from app.services.indices_service import INDICES_DECLARADOS, IndicesService, _firma
+from app.services.sugerencias_service import COLACION_SUGERENCIAS
+
+pytestmark = pytest.mark.anyio
+
+
+def test_firma_distingue_colacion():
+    claves = [("Title", 1)]
+    assert _firma(claves, None) != _firma(claves, COLACION_SUGERENCIAS)
+    # Solo cuentan locale y strength (el servidor completa el resto de opciones)
+    assert _firma(claves, COLACION_SUGERENCIAS) == _firma(
+        claves, {**COLACION_SUGERENCIAS, "caseLevel": False, "version": "57.1"}
+    )
+    # strength por defecto es 3
+    assert _firma(claves, {"locale": "es"}) == _firma(claves, {"locale": "es", "strength": 3})
+
+
+def test_indices_declarados_sin_duplicados():
+    nombres = [indice["nombre"] for indice in INDICES_DECLARADOS]
+    firmas = [_firma(indice["claves"], indice.get("collation")) for indice in INDICES_DECLARADOS]
+    assert len(set(nombres)) == len(nombres)
+    assert len(set(firmas)) == len(firmas)
+
+
+async def test_crear_indices(db):
+    await db.juegos.insert_one({"Title": "Hades"})
+    resultado = await IndicesService(db).crear("juegos")
+    assert resultado["success"]
+    assert sorted(resultado["indices"]) == sorted(i["nombre"] for i in INDICES_DECLARADOS)
+    existentes = [indice["name"] async for indice in db.juegos.list_indexes()]
+    assert set(resultado["indices"]) <= set(existentes)
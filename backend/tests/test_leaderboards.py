@@ -0,0 +1,107 @@
+from bson import ObjectId
+import pytest
+from app.services.leaderboards_service import (
+    GestorLeaderboards,
+    Leaderboard,
+    _definiciones,
+    _pipeline_stream,
+    solo_normalizacion,
+)
+from app.services.normalizacion_service import COLECCION_METADATOS, VERSION_NORMALIZACION, NormalizacionService
+
+pytestmark = pytest.mark.anyio
+
+
+def _juego(i, rating, reviews):
+    return {"Title": f"Juego {i}", "Rating": rating, "Reviews": str(reviews), "Genres": "['Indie']"}
+
+
+def _evento_update(campos, removidos=()):
+    return {
+        "operationType": "update",
+        "updateDescription": {"updatedFields": campos, "removedFields": list(removidos)},
+    }
+
+
+EVENTOS = [
+    (_evento_update({"_norm": {"v": 2}}), True),
+    (_evento_update({"_norm.rating": 4.5, "_norm.reviews": 3}), True),
+    (_evento_update({"_norm": {"v": 2}, "Rating": "4.5"}), False),
+    (_evento_update({"_normal": 1}), False),
+    (_evento_update({"_norm.rating": 4.5}, removidos=["Rating"]), False),
+    ({"operationType": "insert", "fullDocument": {"_id": 1}}, False),
+    ({"operationType": "delete", "documentKey": {"_id": 1}}, False),
+]
+
+
+@pytest.mark.parametrize("evento,esperado", EVENTOS)
+def test_solo_normalizacion(evento, esperado):
+    assert solo_normalizacion(evento) is esperado
+
+
+async def test_el_filtro_del_servidor_coincide_con_solo_normalizacion(db):
+    await db.eventos.insert_many([dict(evento, i=i) for i, (evento, _) in enumerate(EVENTOS)])
+    pasan = {doc["i"] async for doc in db.eventos.aggregate(_pipeline_stream())}
+    assert pasan == {i for i, (_, esperado) in enumerate(EVENTOS) if not esperado}
+
+
+def test_leaderboard_mantiene_el_top_k():
+    tabla = Leaderboard(_definiciones()["hidden-gems"], capacidad=3)
+    docs = [
+        {"_id": i, "Title": f"J{i}", "_norm": {"rating": rating, "reviews": reviews}}
+        for i, (rating, reviews) in enumerate([(4.9, 10), (4.2, 100), (4.5, 50), (3.0, 1), (4.5, 20)])
+    ]
+    tabla.cargar(docs[:2])
+    assert tabla.completo
+    tabla.aplicar(docs[2])
+    tabla.aplicar(docs[3])  # no cumple el filtro (rating < 4)
+    assert tabla.completo
+    tabla.aplicar(docs[4])  # desplaza al último (J1)
+    assert [fila["titulo"] for fila in tabla.leer(5)] == ["J0", "J4", "J2"]
+    assert not tabla.completo
+
+    tabla.eliminar(0)
+    tabla.eliminar(4)
+    assert tabla.necesita_reconstruir(3)
+
+
+@pytest.fixture
+async def coleccion(db):
+    await NormalizacionService(db).insertar_juegos("juegos", [_juego(i, "4.5", 10 * i) for i in range(5)])
+    await db[COLECCION_METADATOS].insert_one({"_id": "normalizacion:juegos", "version": VERSION_NORMALIZACION})
+    return db
+
+
+async def test_escritura_externa_persiste_norm(coleccion):
+    gestor = GestorLeaderboards(k=3, buffer=2)
+    await gestor.reconstruir(coleccion, "juegos")
+
+    # Alguien edita Rating desde Compass: el `_norm` guardado queda viejo
+    await coleccion.juegos.update_one({"Title": "Juego 4"}, {"$set": {"Rating": "1.0"}})
+    doc = await coleccion.juegos.find_one({"Title": "Juego 4"})
+    assert doc["_norm"]["rating"] == 4.5
+    await gestor._aplicar_evento(coleccion, "juegos", {"operationType": "update", "fullDocument": doc})
+
+    guardado = await coleccion.juegos.find_one({"Title": "Juego 4"})
+    assert guardado["_norm"]["rating"] == 1.0
+    assert gestor.normalizados == 1
+
+    # Reconstruir desde MongoDB da lo mismo que la versión en memoria
+    en_memoria = {nombre: tabla.leer(3) for nombre, tabla in gestor._tablas["juegos"].items()}
+    await gestor.reconstruir(coleccion, "juegos")
+    assert {nombre: tabla.leer(3) for nombre, tabla in gestor._tablas["juegos"].items()} == en_memoria
+
+
+async def test_no_pisa_una_version_mas_nueva(coleccion):
+    gestor = GestorLeaderboards(k=3, buffer=2)
+    doc = await coleccion.juegos.find_one({"Title": "Juego 1"})
+    doc["Rating"] = "2.0"  # el evento trae un valor que ya cambió en la base
+    await gestor._aplicar_evento(coleccion, "juegos", {"operationType": "update", "fullDocument": doc})
+    assert (await coleccion.juegos.find_one({"Title": "Juego 1"}))["_norm"]["rating"] == 4.5
+    assert gestor.normalizados == 0
+
+
+async def test_eventos_de_backfill_se_descartan(coleccion):
+    gestor = GestorLeaderboards()
+    await gestor._aplicar_evento(coleccion, "juegos", _evento_update({"_norm": {"v": 2}}))
+    assert gestor.eventos == 0
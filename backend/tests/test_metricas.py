@@ -0,0 +1,78 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.services.metricas import (
+    Contador,
+    Histograma,
+    MiddlewareMetricas,
+    a_lista,
+    http_duracion,
+    medido,
+    servicio_documentos,
+    servicio_errores,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def test_histograma_acumula_buckets():
+    histograma = Histograma("latencia", "Latencia", ("metodo",), buckets=(0.1, 1))
+    for valor in (0.05, 0.5, 3):
+        histograma.observar(valor, metodo="a")
+    assert histograma.exponer() == [
+        "# HELP latencia Latencia",
+        "# TYPE latencia histogram",
+        'latencia_bucket{metodo="a",le="0.1"} 1',
+        'latencia_bucket{metodo="a",le="1"} 2',
+        'latencia_bucket{metodo="a",le="+Inf"} 3',
+        'latencia_sum{metodo="a"} 3.55',
+        'latencia_count{metodo="a"} 3',
+    ]
+
+
+def test_contador_por_etiqueta():
+    contador = Contador("errores_total", "Errores", ("metodo",))
+    contador.incrementar(metodo="a")
+    contador.incrementar(2, metodo="a")
+    contador.incrementar(metodo="b")
+    assert contador.exponer()[2:] == ['errores_total{metodo="a"} 3', 'errores_total{metodo="b"} 1']
+
+
+def test_etiquetas_escapadas():
+    contador = Contador("rutas_total", "Rutas", ("ruta",))
+    contador.incrementar(ruta='/a"b\\c\nd')
+    assert contador.exponer()[2] == 'rutas_total{ruta="/a\\"b\\\\c\\nd"} 1'
+
+
+def _serie(metrica, *clave):
+    return metrica._series.get(clave) if hasattr(metrica, "_series") else metrica._valores.get(clave)
+
+
+async def test_medido_cuenta_documentos_y_fallos(db):
+    await db["juegos"].insert_many([{"Title": str(i)} for i in range(7)])
+
+    @medido
+    async def metodo_prueba_metricas(fallar: bool):
+        documentos = await a_lista(db["juegos"].find({}), None)
+        return {"success": not fallar, "n": len(documentos)}
+
+    await metodo_prueba_metricas(False)
+    await metodo_prueba_metricas(True)
+    serie = _serie(servicio_documentos, "metodo_prueba_metricas")
+    assert serie[-1] == 2 and serie[-2] == 14
+    assert _serie(servicio_errores, "metodo_prueba_metricas") == 1
+
+
+async def test_middleware_etiqueta_por_plantilla_de_ruta():
+    app = FastAPI()
+
+    @app.get("/juegos/{coleccion}")
+    async def juegos(coleccion: str):
+        return {"coleccion": coleccion}
+
+    app.add_middleware(MiddlewareMetricas)
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://prueba") as cliente:
+        for coleccion in ("a", "b"):
+            assert (await cliente.get(f"/juegos/{coleccion}")).status_code == 200
+    assert _serie(http_duracion, "GET", "/juegos/{coleccion}", "200")[-1] == 2
@@ -0,0 +1,56 @@
+import pytest
+from app.services.modelos_service import COLECCION_MODELOS, CacheModelos
+from app.services.normalizacion_service import registrar_escritura
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+
+def _resultado(coeficientes, intercept):
+    return {"success": True, "coeficientes": coeficientes, "intercept": intercept, "r2": 1.0, "n": 10}
+
+
+async def test_modelo_persistido_sirve_en_otra_instancia(db):
+    cache = CacheModelos()
+    clave = await cache.clave(db, "juegos", ["Reviews", "Playing"], "Rating", {}, "muestra", 100)
+    model_id = await cache.guardar(db, clave, _resultado([2.0, 0.5], 1.0))
+    assert await db[COLECCION_MODELOS].count_documents({"_id": model_id}) == 1
+
+    # Otro worker (o el mismo tras reiniciar) no tiene el modelo en memoria
+    otra = CacheModelos()
+    prediccion = await otra.predecir(db, model_id, [{"Reviews": 10, "Playing": 4}, [1, "x"]])
+    assert prediccion["predicciones"] == [23.0, None]
+    assert otra.cargados == 1
+    assert (await otra.buscar(db, clave))["model_id"] == model_id
+    assert await otra.predecir(db, "inexistente", [[1, 2]]) is None
+
+
+async def test_escritura_cambia_model_id(db):
+    cache = CacheModelos()
+    antes = await cache.clave(db, "juegos", ["Reviews"], "Rating", {}, "servidor", 100)
+    await cache.guardar(db, antes, _resultado([1.0], 0.0))
+    await registrar_escritura(db, "juegos")
+    despues = await cache.clave(db, "juegos", ["Reviews"], "Rating", {}, "servidor", 100)
+    assert cache.model_id(antes) != cache.model_id(despues)
+    assert await CacheModelos().buscar(db, despues) is None
+
+
+async def test_lru_desaloja_sin_perder_el_modelo(db):
+    cache = CacheModelos(max_entradas=1)
+    ids = []
+    for campo in ("Reviews", "Playing"):
+        clave = await cache.clave(db, "juegos", [campo], "Rating", {}, "servidor", None)
+        ids.append(await cache.guardar(db, clave, _resultado([1.0], 0.0)))
+    assert cache.desalojos == 1
+    assert (await cache.predecir(db, ids[0], [[3]]))["predicciones"] == [3.0]
+
+
+async def test_regresion_lineal_devuelve_modelo_guardado(db):
+    await db["juegos"].insert_many([{"Reviews": i, "Rating": 2 * i + 1} for i in range(20)])
+    service = ReporteService(db)
+    primero = await service.regresion_lineal("juegos", "Rating", campo_x="Reviews")
+    assert primero["success"] and "desde_cache" not in primero
+    segundo = await service.regresion_lineal("juegos", "Rating", campo_x="Reviews")
+    assert segundo["desde_cache"] and segundo["model_id"] == primero["model_id"]
+    modelo = await db[COLECCION_MODELOS].find_one({"_id": primero["model_id"]})
+    assert modelo["resultado"]["coeficientes"] == pytest.approx([2.0])
@@ -0,0 +1,108 @@
+from datetime import datetime
+import pytest
+from app.services import normalizacion_service
+from app.services.normalizacion_service import (
+    COLECCION_METADATOS,
+    VERSION_NORMALIZACION,
+    NormalizacionService,
+    a_numero,
+    coleccion_normalizada,
+    etapas_normalizacion,
+    olvidar_normalizacion,
+    registrar_escritura,
+    normalizar_documento,
+    parsear_fecha,
+    parsear_lista,
+)
+
+pytestmark = pytest.mark.anyio
+
+JUEGO = {
+    "Title": "Elden Ring",
+    "Rating": "4.5",
+    "Reviews": "3900",
+    "Playing": "1200",
+    "Release_Date": "Feb 25, 2022",
+    "Genres": "['Adventure', 'RPG']",
+    "Developers": "['FromSoftware', 'Bandai Namco Entertainment']",
+}
+
+
+def test_a_numero():
+    assert a_numero("4.5") == 4.5
+    assert a_numero(" 12 ") == 12.0
+    assert a_numero(3) == 3
+    for valor in ("N/A", "TBD", "", None, True, float("nan"), "1e3"):
+        assert a_numero(valor) is None
+
+
+def test_parsear_lista_y_fecha():
+    assert parsear_lista("['Adventure', 'RPG']") == ["Adventure", "RPG"]
+    assert parsear_lista(["Indie", None, " Puzzle "]) == ["Indie", "Puzzle"]
+    assert parsear_lista("[]") == []
+    assert parsear_fecha("Feb 25, 2022") == datetime(2022, 2, 25)
+    assert parsear_fecha("February 5, 2019") == datetime(2019, 2, 5)
+    assert parsear_fecha("releases on TBD") is None
+
+
+def test_normalizar_documento():
+    norm = normalizar_documento(JUEGO)
+    assert norm["v"] == VERSION_NORMALIZACION
+    assert (norm["rating"], norm["reviews"], norm["playing"]) == (4.5, 3900.0, 1200.0)
+    assert (norm["fecha"], norm["anio"], norm["mes"]) == (datetime(2022, 2, 25), 2022, 2)
+    assert norm["generos"] == ["Adventure", "RPG"]
+    assert norm["popularidad"] == 4.5 * 2 + 5 + 5 * 0.5
+
+    incompleto = normalizar_documento({"Rating": "N/A", "Release_Date": "2019"})
+    assert incompleto["rating"] is None and incompleto["reviews"] == 0
+    assert (incompleto["fecha"], incompleto["anio"]) == (None, 2019)
+
+
+async def test_backfill_marca_la_coleccion(db):
+    await db.juegos.insert_many([dict(JUEGO, Title=f"Juego {i}") for i in range(5)])
+    assert not await coleccion_normalizada(db, "juegos")
+
+    resultado = await NormalizacionService(db).backfill("juegos", tamano_lote=2)
+    assert resultado["success"] and resultado["procesados"] == 5 and resultado["completo"]
+    assert await coleccion_normalizada(db, "juegos")
+    assert await etapas_normalizacion(db, "juegos") == []
+
+
+async def test_documentos_externos_desactivan_el_marcador_y_se_completan(db):
+    await NormalizacionService(db).insertar_juegos("juegos", [dict(JUEGO) for _ in range(3)])
+    await db[COLECCION_METADATOS].insert_one({"_id": "normalizacion:juegos", "version": VERSION_NORMALIZACION})
+    assert await coleccion_normalizada(db, "juegos")
+
+    # Escritura por fuera de la API (mongoimport, Compass): sin `_norm`. El
+    # resultado positivo se recuerda hasta que vence `NORMALIZADA_TTL`
+    await db.juegos.insert_one(dict(JUEGO, Title="Importado"))
+    assert await coleccion_normalizada(db, "juegos")
+    olvidar_normalizacion("juegos")
+    assert not await coleccion_normalizada(db, "juegos")
+    assert await etapas_normalizacion(db, "juegos") != []
+
+    await normalizacion_service._normalizando["juegos"]
+    importado = await db.juegos.find_one({"Title": "Importado"})
+    assert importado["_norm"]["rating"] == 4.5
+    assert await coleccion_normalizada(db, "juegos")
+
+
+async def test_version_anterior_cuenta_como_pendiente(db):
+    await db.juegos.insert_one(dict(JUEGO, _norm={"v": VERSION_NORMALIZACION - 1}))
+    await db[COLECCION_METADATOS].insert_one({"_id": "normalizacion:juegos", "version": VERSION_NORMALIZACION})
+    assert not await coleccion_normalizada(db, "juegos")
+    await normalizacion_service._normalizando["juegos"]
+    assert (await db.juegos.find_one({}))["_norm"]["v"] == VERSION_NORMALIZACION
+
+
+async def test_resultado_positivo_se_recuerda_hasta_una_escritura(db):
+    await NormalizacionService(db).insertar_juegos("juegos", [dict(JUEGO) for _ in range(3)])
+    await db[COLECCION_METADATOS].insert_one({"_id": "normalizacion:juegos", "version": VERSION_NORMALIZACION})
+    assert await coleccion_normalizada(db, "juegos")
+
+    # Sin consultas mientras el resultado está vigente
+    await db[COLECCION_METADATOS].delete_one({"_id": "normalizacion:juegos"})
+    assert await coleccion_normalizada(db, "juegos")
+    # Una escritura por la API lo descarta
+    await registrar_escritura(db, "juegos")
+    assert not await coleccion_normalizada(db, "juegos")
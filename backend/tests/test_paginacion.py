@@ -0,0 +1,84 @@
+import pytest
+from app.services.reporte_service import ReporteService, _filtro_keyset, _posterior
+
+pytestmark = pytest.mark.anyio
+
+# Rating real del catálogo: números, "N/A"/"TBD", null y documentos sin el campo
+RATINGS = [3.5, 1, "N/A", None, 4.2, "TBD", 1, None, 0, "N/A", 2.7, 4.2, 10]
+
+
+@pytest.fixture
+async def coleccion(db):
+    documentos = [{"Title": f"Juego {i}", "Rating": rating} for i, rating in enumerate(RATINGS)]
+    documentos += [{"Title": "Sin rating A"}, {"Title": "Sin rating B"}]
+    await db.juegos.insert_many(documentos)
+    return db
+
+
+async def _recorrer(servicio, **parametros):
+    ids, cursor, paginas = [], None, 0
+    while True:
+        pagina = await servicio.generar_reporte("juegos", cursor=cursor, **parametros)
+        ids.extend(doc["_id"] for doc in pagina["datos"])
+        cursor = pagina["siguiente_cursor"]
+        paginas += 1
+        if cursor is None or paginas > 50:
+            return ids
+
+
+@pytest.mark.parametrize("descendente", [False, True])
+@pytest.mark.parametrize("limite", [1, 2, 3, 5])
+async def test_recorre_rating_de_tipos_mezclados_sin_perder_documentos(coleccion, limite, descendente):
+    servicio = ReporteService(coleccion)
+    ids = await _recorrer(servicio, orden="Rating", descendente=descendente, limite=limite)
+
+    esperados = [str(doc["_id"]) async for doc in coleccion.juegos.find({}, {"_id": 1})]
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(esperados)
+
+
+async def test_respeta_el_orden_de_tipos_de_bson(coleccion):
+    servicio = ReporteService(coleccion)
+    ids = await _recorrer(servicio, orden="Rating", limite=2)
+    por_id = {str(doc["_id"]): doc.get("Rating") async for doc in coleccion.juegos.find({})}
+    ratings = [por_id[i] for i in ids]
+
+    # null y faltantes, luego números ascendentes, luego strings
+    assert ratings[:4] == [None] * 4
+    assert ratings[4:12] == [0, 1, 1, 2.7, 3.5, 4.2, 4.2, 10]
+    assert ratings[12:] == ["N/A", "N/A", "TBD"]
+
+
+async def test_recorre_por_id(coleccion):
+    servicio = ReporteService(coleccion)
+    ids = await _recorrer(servicio, limite=4)
+    assert len(ids) == len(set(ids)) == len(RATINGS) + 2
+
+
+def test_posterior_agrega_las_clases_de_tipo_siguientes():
+    assert {"Rating": {"$gte": ""}} in _posterior("Rating", 4.2, 1)
+    assert {"Rating": {"$gte": float("-inf")}} not in _posterior("Rating", "N/A", 1)
+    # Desde null solo siguen los valores no nulos
+    assert {"Rating": {"$gt": None}} not in _posterior("Rating", None, 1)
+    # En orden descendente, después de los números vienen null y faltantes
+    assert {"Rating": None} in _posterior("Rating", 0, -1)
+    assert _posterior("Rating", None, -1) == []
+
+
+def test_filtro_keyset_rechaza_cursores_invalidos():
+    with pytest.raises(ValueError):
+        _filtro_keyset([1], [("Rating", 1), ("_id", 1)])
+    with pytest.raises(ValueError):
+        _filtro_keyset([[1, 2], "x"], [("Generos", 1), ("_id", 1)])
+
+
+async def test_limite_vacio_usa_el_tamano_por_defecto(coleccion):
+    pagina = await ReporteService(coleccion).generar_reporte("juegos", limite=None)
+    assert pagina["total_registros"] == len(RATINGS) + 2
+    assert pagina["siguiente_cursor"] is None
+
+
+@pytest.mark.parametrize("limite", [0, -5])
+async def test_limite_menor_que_uno_es_un_error(coleccion, limite):
+    with pytest.raises(ValueError):
+        await ReporteService(coleccion).generar_reporte("juegos", limite=limite)
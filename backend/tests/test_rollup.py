@@ -0,0 +1,101 @@
+import pytest
+from app.services import rollup_service
+from app.services.normalizacion_service import NormalizacionService, normalizar_documento
+from app.services.rollup_service import TODOS, GestorRollup, celdas_documento
+
+pytestmark = pytest.mark.anyio
+
+
+def _juego(i):
+    return {
+        "Title": f"Juego {i}",
+        "Rating": str(round(1 + (i % 40) / 10, 1)) if i % 5 else "N/A",
+        "Reviews": str(10 * i),
+        "Playing": i % 13,
+        "Release_Date": f"Mar {1 + i % 28}, {2020 + i % 4}",
+        "Genres": "['RPG', 'Indie']" if i % 2 else "['Shooter']",
+        "Developers": f"['Estudio {i % 3}']",
+    }
+
+
+def test_celdas_documento():
+    celdas = list(celdas_documento({"anio": 2022, "generos": ["RPG", "Indie"], "desarrolladores": ["A"]}))
+    # 2 años (2022 y TODOS) × 3 géneros × 2 desarrolladores
+    assert len(celdas) == 12
+    assert (2022, "RPG", "A") in celdas and (TODOS, TODOS, TODOS) in celdas
+    assert list(celdas_documento({})) == [(None, TODOS, TODOS), (TODOS, TODOS, TODOS)]
+
+
+@pytest.fixture
+async def gestor(db, monkeypatch):
+    """Cubo vigente sin celdas: se llena solo con las inserciones de `insertar_juegos`.
+
+    (mongomock no evalúa rutas dentro de arrays literales en `$project`, así que
+    el `$out` de `reconstruir` no se puede ejecutar aquí.)
+    """
+    gestor = GestorRollup()
+    monkeypatch.setattr(rollup_service, "gestor_rollup", gestor)
+    await db["_metadatos"].insert_one({"_id": "rollup:juegos", "vigente": True, "documentos": 0})
+    return gestor
+
+
+async def _insertar(db, juegos):
+    resultado = await NormalizacionService(db).insertar_juegos("juegos", juegos)
+    assert resultado["success"]
+
+
+async def test_celdas_incrementales_coinciden_con_los_juegos(db, gestor):
+    # En dos tandas: la segunda suma a celdas existentes
+    await _insertar(db, [_juego(i) for i in range(25)])
+    await _insertar(db, [_juego(i) for i in range(25, 40)])
+    assert gestor.incrementales == 2
+    assert await gestor.disponible(db, "juegos")
+
+    generos = await gestor.conteo_lista(db, "juegos", "genero", 10)
+    assert sorted((g["_id"], g["conteo"]) for g in generos) == [("Indie", 20), ("RPG", 20), ("Shooter", 20)]
+    anios = await gestor.conteo_por_anio(db, "juegos", 10)
+    assert anios == [{"_id": 2020 + k, "conteo": 10} for k in range(4)]
+
+    ratings = [normalizar_documento(_juego(i))["rating"] for i in range(40) if i % 5]
+    promedio = (await gestor.rating_promedio(db, "juegos"))[0]
+    assert promedio["total_ratings"] == len(ratings)
+    assert promedio["promedio"] == pytest.approx(sum(ratings) / len(ratings))
+    assert (promedio["min_rating"], promedio["max_rating"]) == (min(ratings), max(ratings))
+
+    metricas = (await gestor.metricas_dashboard(db, "juegos"))[0]
+    assert metricas["total_juegos"] == 40
+    assert metricas["total_reviews"] == sum(10 * i for i in range(40))
+
+
+async def test_cubo_no_se_usa_si_cambia_el_conteo(db, gestor):
+    await _insertar(db, [_juego(i) for i in range(5)])
+    assert await gestor.conteo_lista(db, "juegos", "genero", 10) is not None
+    await db["juegos"].insert_one(_juego(99))  # escritura externa
+    assert await gestor.conteo_lista(db, "juegos", "genero", 10) is None
+    await gestor.marcar_desactualizado(db, "juegos")
+    assert not await gestor.disponible(db, "juegos")
+
+
+async def test_marcas_compartidas_entre_workers(db, gestor, monkeypatch):
+    """Dos workers (dos `GestorRollup`) sobre la misma base de datos."""
+    otro = GestorRollup()
+    # `$out` trivial: mongomock no ejecuta el pipeline real del cubo
+    monkeypatch.setattr(rollup_service, "_pipeline_cubo", lambda destino: [{"$out": destino}])
+
+    await otro.marcar_desactualizado(db, "juegos")
+    assert not await gestor.disponible(db, "juegos")
+    await gestor.reconstruir(db, "juegos")
+    assert await gestor.disponible(db, "juegos")
+    # El mismo worker vuelve a marcarlo después de una reconstrucción ajena
+    await otro.marcar_desactualizado(db, "juegos")
+    assert not await gestor.disponible(db, "juegos")
+
+    # Una marca durante la reconstrucción la deja desactualizada
+    async def etapas_con_escritura(db, coleccion):
+        await otro.marcar_desactualizado(db, coleccion)
+        return []
+
+    monkeypatch.setattr(rollup_service, "etapas_normalizacion", etapas_con_escritura)
+    await gestor.reconstruir(db, "juegos")
+    assert not await gestor.disponible(db, "juegos")
+    assert otro.estadisticas()["marcados"] == 3
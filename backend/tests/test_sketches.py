@@ -0,0 +1,37 @@
+import pytest
+from app.services.sketches import HyperLogLog
+
+
+def test_estima_la_cardinalidad_dentro_del_error():
+    sketch = HyperLogLog()
+    for i in range(50000):
+        sketch.agregar(f"juego-{i}")
+        sketch.agregar(f"juego-{i}")  # los repetidos no cuentan
+    assert abs(sketch.estimar() - 50000) / 50000 < 4 * sketch.error_relativo
+
+
+def test_cardinalidades_pequenas_son_casi_exactas():
+    sketch = HyperLogLog()
+    for valor in ["RPG", "Indie", "RPG", 4.5, 4, 4.0, "4"]:
+        sketch.agregar(valor)
+    # 4 y 4.0 son el mismo valor; "4" es otro
+    assert sketch.estimar() == 5
+
+
+def test_combinar_equivale_a_un_solo_sketch():
+    a, b, total = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        (a if i % 2 else b).agregar(i)
+        total.agregar(i)
+    a.combinar(b)
+    assert a.a_bytes() == total.a_bytes()
+
+
+def test_bytes_ida_y_vuelta():
+    sketch = HyperLogLog(precision=10)
+    for i in range(500):
+        sketch.agregar(i)
+    copia = HyperLogLog.desde_bytes(sketch.a_bytes())
+    assert copia.precision == 10 and copia.estimar() == sketch.estimar()
+    with pytest.raises(ValueError):
+        copia.combinar(HyperLogLog())
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from app.services.analitica import acumular_ols_snapshot, resolver_ols
+from app.services.normalizacion_service import NormalizacionService, registrar_escritura
+from app.services.snapshot_service import GestorSnapshots, abrir_snapshot, columnas_lote
+
+pytestmark = pytest.mark.anyio
+
+
+def _juego(i):
+    return {
+        "Title": f"Juego {i}",
+        "Rating": "N/A" if i % 7 == 0 else str(round(1 + (i % 40) / 10, 1)),
+        "Reviews": str(10 * i),
+        "Playing": i % 13,
+        "Release_Date": f"Mar {1 + i % 28}, {2000 + i % 20}",
+        "Genres": "['RPG', 'Indie']" if i % 2 else "['Shooter']",
+        "Developers": f"['Estudio {i % 3}']",
+    }
+
+
+def test_columnas_lote():
+    lote = columnas_lote([_juego(i) for i in range(1, 5)] + [{"Title": "Sin datos"}])
+    np.testing.assert_array_equal(lote["columnas"]["Reviews"], [10, 20, 30, 40, np.nan])
+    np.testing.assert_array_equal(lote["columnas"]["_norm.anio"], [2001, 2002, 2003, 2004, np.nan])
+    assert np.isnan(lote["columnas"]["Title"]).all()
+    valores, codigos, longitudes = lote["categorias"]["generos"]
+    assert valores == ["RPG", "Indie", "Shooter"]
+    assert codigos.tolist() == [0, 1, 2, 0, 1, 2]
+    assert longitudes.tolist() == [2, 1, 2, 1, 0]
+
+
+@pytest.fixture
+async def gestor(db, tmp_path):
+    await NormalizacionService(db).insertar_juegos("juegos", [_juego(i) for i in range(200)])
+    # Un campo que aparece recién al final no tiene valores en las filas anteriores
+    await db.juegos.insert_one({"Title": "Tardío", "Metacritic": 88})
+    return GestorSnapshots(str(tmp_path))
+
+
+async def test_construir_y_abrir(db, gestor):
+    resultado = await gestor.construir(db, "juegos", tamano_lote=64)
+    assert resultado["filas"] == 201
+    assert {"Rating", "Reviews", "Playing", "_norm.rating", "_norm.anio"} <= set(resultado["columnas"])
+
+    manifiesto = await gestor.vigente(db, "juegos")
+    snapshot = abrir_snapshot(manifiesto["directorio"])
+    columnas = snapshot.columnas(["Reviews", "_norm.rating"])
+    assert columnas["Reviews"][:3].tolist() == [0, 10, 20]
+    assert np.isnan(columnas["_norm.rating"][0]) and columnas["_norm.rating"][1] == 1.1
+
+    codigos, offsets, valores = snapshot.categoria("generos")
+    assert [valores[c] for c in codigos[offsets[1]:offsets[2]]] == ["RPG", "Indie"]
+    assert offsets[-1] == len(codigos)
+
+
+async def test_ols_del_snapshot_igual_al_de_los_documentos(db, gestor):
+    await gestor.construir(db, "juegos", tamano_lote=64)
+    manifiesto = await gestor.vigente(db, "juegos")
+    estadisticos, _ = acumular_ols_snapshot(manifiesto["directorio"], ["Reviews"], "_norm.rating", 50)
+
+    x, y = [], []
+    async for doc in db.juegos.find({"_norm.rating": {"$ne": None}, "Reviews": {"$exists": True}}):
+        x.append(float(doc["Reviews"]))
+        y.append(doc["_norm"]["rating"])
+    pendiente, intercepto = np.polyfit(x, y, 1)
+    modelo = resolver_ols(estadisticos, 1)
+    assert modelo["n"] == len(x)
+    assert modelo["coeficientes"][0] == pytest.approx(pendiente)
+    assert modelo["intercept"] == pytest.approx(intercepto)
+
+
+async def test_escrituras_de_cualquier_worker_lo_desactualizan(db, gestor):
+    await gestor.construir(db, "juegos")
+    assert await gestor.vigente(db, "juegos") is not None
+
+    # Otro proceso con su propio GestorSnapshots lo ve vigente
+    assert await GestorSnapshots(gestor.raiz).vigente(db, "juegos") is not None
+
+    # Una modificación registrada por otro worker (sin cambiar el conteo)
+    await registrar_escritura(db, "juegos")
+    assert await gestor.vigente(db, "juegos") is None
+
+    await gestor.construir(db, "juegos")
+    await NormalizacionService(db).insertar_juegos("juegos", [_juego(999)])
+    assert await gestor.vigente(db, "juegos") is None
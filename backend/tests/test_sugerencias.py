@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from app.services import sugerencias_service
+from app.services.normalizacion_service import NormalizacionService
+from app.services.sugerencias_service import DiccionarioValores, GestorSugerencias, normalizar_texto
+
+pytestmark = pytest.mark.anyio
+
+
+def test_normalizar_texto():
+    assert normalizar_texto("Pokémon") == "pokemon"
+    assert normalizar_texto("ÁRBOL") == "arbol"
+    # Como la colación "es": la ñ es una letra aparte
+    assert normalizar_texto("Ñandú") == "ñandu"
+    assert normalizar_texto("año") != normalizar_texto("ano")
+
+
+def test_diccionario_busca_por_prefijo_y_frecuencia():
+    diccionario = DiccionarioValores([("Pokémon", 5), ("pokedex", 9), ("Portal", 2), ("Zelda", 7)])
+    assert [s["valor"] for s in diccionario.buscar("POK", 10)] == ["pokedex", "Pokémon"]
+    assert [s["valor"] for s in diccionario.buscar("", 2)] == ["pokedex", "Zelda"]
+    assert diccionario.buscar("x", 5) == []
+
+
+def test_diccionario_distingue_la_ene():
+    diccionario = DiccionarioValores([("Ñu Games", 3), ("Nubla", 2)])
+    assert [s["valor"] for s in diccionario.buscar("nu", 10)] == ["Nubla"]
+    assert [s["valor"] for s in diccionario.buscar("ñu", 10)] == ["Ñu Games"]
+
+
+def test_diccionario_tops_precalculados(monkeypatch):
+    monkeypatch.setattr(sugerencias_service, "UMBRAL_RANGO", 3)
+    frecuencias = [(f"a{i}", i) for i in range(10)] + [("b", 100)]
+    diccionario = DiccionarioValores(frecuencias)
+    assert "" in diccionario.tops and "a" in diccionario.tops
+    assert [s["valor"] for s in diccionario.buscar("a", 3)] == ["a9", "a8", "a7"]
+    assert diccionario.buscar("", 1) == [{"valor": "b", "conteo": 100}]
+
+
+async def _esperar_diccionario(gestor, coleccion, campo):
+    for _ in range(200):
+        if (coleccion, campo) in gestor._diccionarios:
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("El diccionario no se construyó")
+
+
+async def test_primera_consulta_responde_por_rango(db):
+    titulos = ["pokemon", "pokemon", "pokedex", "portal", "zelda"]
+    await db["juegos"].insert_many([{"Title": t, "Genres": "['RPG', 'Puzzle']"} for t in titulos])
+    await NormalizacionService(db).backfill("juegos")
+    gestor = GestorSugerencias()
+
+    frio = await gestor.sugerir(db, "juegos", "Title", "pok")
+    assert frio["parcial"] and frio["total_valores"] is None
+    assert frio["sugerencias"] == [{"valor": "pokemon", "conteo": 2}, {"valor": "pokedex", "conteo": 1}]
+    generos = await gestor.sugerir(db, "juegos", "Genres", "P")
+    assert generos["sugerencias"] == [{"valor": "Puzzle", "conteo": 5}]
+
+    await _esperar_diccionario(gestor, "juegos", "Title")
+    caliente = await gestor.sugerir(db, "juegos", "Title", "POK")
+    assert "parcial" not in caliente and caliente["total_valores"] == 4
+    assert gestor.respuestas_en_frio == 2
+
+
+async def test_campo_no_permitido(db):
+    await db["juegos"].insert_one({"Title": "pokemon", "Precio": 10})
+    with pytest.raises(ValueError):
+        await GestorSugerencias().sugerir(db, "juegos", "$Precio", "p")
+
+
+async def test_diccionarios_acotados(db):
+    await db["juegos"].insert_many([{"Title": f"juego {i}"} for i in range(3)])
+    gestor = GestorSugerencias(max_diccionarios=1)
+    for coleccion in ("juegos", "otros"):
+        await gestor.sugerir(db, coleccion, "Title", "j")
+        await _esperar_diccionario(gestor, coleccion, "Title")
+    assert list(gestor._diccionarios) == [("otros", "Title")]
+    assert gestor.desalojos == 1
+
+
+async def test_primera_consulta_sin_normalizar_lee_los_campos_crudos(db):
+    await db["juegos"].insert_many([
+        {"Title": "a", "Genres": "['RPG', 'Puzzle']", "Developers": "['Ñu Games']"},
+        {"Title": "b", "Genres": ["Platform", "Puzzle"], "Developers": "['Nubla']"},
+        {"Title": "c", "Genres": "[]"},
+    ])
+    gestor = GestorSugerencias()
+    generos = await gestor.sugerir(db, "juegos", "Genres", "p")
+    assert generos["parcial"]
+    assert generos["sugerencias"] == [{"valor": "Puzzle", "conteo": 2}, {"valor": "Platform", "conteo": 1}]
+    desarrolladores = await gestor.sugerir(db, "juegos", "Developers", "NU")
+    assert desarrolladores["sugerencias"] == [{"valor": "Nubla", "conteo": 1}]
@@ -0,0 +1,49 @@
+import pytest
+from app.services import reporte_service
+from app.services.reporte_service import ReporteService
+
+pytestmark = pytest.mark.anyio
+
+
+async def _recorrer(servicio, campo, limite):
+    valores, cursor = [], None
+    for _ in range(50):
+        pagina = await servicio.obtener_valores_unicos("juegos", campo, limite=limite, cursor=cursor)
+        assert pagina["success"], pagina
+        valores.extend(pagina["valores"])
+        cursor = pagina["siguiente_cursor"]
+        if cursor is None:
+            break
+    return valores
+
+
+@pytest.mark.parametrize("limite", [1, 2, 3, 10])
+async def test_recorre_numeros_y_luego_strings(db, limite):
+    ratings = [4.5, "N/A", 3, None, "TBD", 3, 1.2, "N/A", 10]
+    await db.juegos.insert_many([{"Rating": rating} for rating in ratings] + [{"Title": "Sin rating"}])
+
+    valores = await _recorrer(ReporteService(db), "Rating", limite)
+    assert valores == [1.2, 3, 4.5, 10, "N/A", "TBD"]
+
+
+async def test_valores_de_texto(db):
+    await db.juegos.insert_many([{"Title": t} for t in ["b", "a", "c", "a"]])
+    assert await _recorrer(ReporteService(db), "Title", 2) == ["a", "b", "c"]
+
+
+async def test_cursor_invalido(db):
+    with pytest.raises(ValueError):
+        await ReporteService(db).obtener_valores_unicos("juegos", "Rating", cursor="no-es-un-cursor")
+
+
+async def test_valores_muy_repetidos_acotan_la_lectura(db, monkeypatch):
+    monkeypatch.setattr(reporte_service, "VALORES_UNICOS_LECTURA", 2)
+    # 10 copias de cada género: con limite=2 una página lee 6 documentos
+    await db.juegos.insert_many([{"Genero": g} for g in "abcde" for _ in range(10)])
+    servicio = ReporteService(db)
+
+    pagina = await servicio.obtener_valores_unicos("juegos", "Genero", limite=2)
+    assert pagina["valores"] == ["a"] and pagina["siguiente_cursor"]
+    pipeline, _ = await servicio.construir_pipeline("valores-unicos", "juegos", campo="Genero", limite=2)
+    assert pipeline[2] == {"$limit": 6}
+    assert await _recorrer(servicio, "Genero", 2) == list("abcde")
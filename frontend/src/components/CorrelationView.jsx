@@ -7,6 +7,7 @@ export default function CorrelationView({ colecciones = [] }) {
   const [camposDisponibles, setCamposDisponibles] = useState([]);
   const [camposSeleccionados, setCamposSeleccionados] = useState([]);
   const [limite, setLimite] = useState(5000);
+  const [modo, setModo] = useState('muestra');
   const [loading, setLoading] = useState(false);
   const [resultado, setResultado] = useState(null);
 
@@ -50,7 +51,7 @@ export default function CorrelationView({ colecciones = [] }) {
     setLoading(true);
     setResultado(null);
     try{
-      const payload = { coleccion, campos: camposSeleccionados.filter(Boolean), limite };
+      const payload = { coleccion, campos: camposSeleccionados.filter(Boolean), limite, modo };
       const res = await reportesAPI.matrizCorrelacion(payload);
       setResultado(res.data);
     }catch(e){
@@ -79,8 +80,18 @@ export default function CorrelationView({ colecciones = [] }) {
           ))}
         </div>
 
-        <label>Límite de registros</label>
-        <input type="number" value={limite} onChange={e=>setLimite(Number(e.target.value))} />
+        <label>Datos a usar</label>
+        <select value={modo} onChange={e=>setModo(e.target.value)}>
+          <option value="muestra">Primeros registros (muestra)</option>
+          <option value="servidor">Colección completa (cálculo en servidor)</option>
+        </select>
+
+        {modo === 'muestra' && (
+          <>
+            <label>Límite de registros</label>
+            <input type="number" value={limite} onChange={e=>setLimite(Number(e.target.value))} />
+          </>
+        )}
 
         <div className="actions">
           <button className="btn-primary" onClick={ejecutar} disabled={loading}>{loading? 'Calculando...':'Calcular'}</button>
@@ -105,7 +116,9 @@ export default function CorrelationView({ colecciones = [] }) {
                     <tr key={i}>
                       <td className="row-label">{resultado.fields[i]}</td>
                       {row.map((v,j)=> (
-                        <td key={j} style={{background: colorFor(v)}} title={v}>{v.toFixed(3)}</td>
+                        v === null
+                          ? <td key={j} title="No definida">—</td>
+                          : <td key={j} style={{background: colorFor(v)}} title={resultado.n_pares ? `${v} (n = ${resultado.n_pares[i][j]})` : v}>{v.toFixed(3)}</td>
                       ))}
                     </tr>
                   ))}
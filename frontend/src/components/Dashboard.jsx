@@ -54,156 +54,68 @@ function Dashboard({ onCambiarVista }) {
       statsArr.forEach(s => { statsObj[s.nombre] = s; });
       setEstadisticas(statsObj);
 
-      // Cargar conteo por año desde Release_Date
+      // Cargar los widgets de la colección preferida
       if (coleccionesData.length > 0) {
         const preferida = coleccionesData.includes('Videogames') ? 'Videogames' : coleccionesData[0];
-        console.log('Intentando cargar datos de año para colección:', preferida);
-        
+        // Todos los widgets llegan en una sola respuesta (una pasada por la colección)
         try {
-          const rAnio = await reportesAPI.conteoPorAnio(preferida, 'Release_Date');
-          console.log('Respuesta del API:', rAnio);
-          const conteos = rAnio.data?.conteos || [];
-          console.log('Conteos recibidos:', conteos);
-          
+          const rDashboard = await reportesAPI.dashboard(preferida, 20, 5);
+          const datos = rDashboard.data || {};
+
           // Normalizar a {year, count}
-          const serie = conteos
+          const serie = (datos.conteo_por_anio?.conteos || [])
             .filter(d => d.valor !== null && d.valor !== undefined)
             .map(d => ({ year: d.valor, count: d.conteo }));
-          console.log('Serie normalizada:', serie);
           setSeriesAnio(serie);
-        } catch (e) {
-          console.error('Error cargando conteo por año:', e);
-          setSeriesAnio([]);
-        }
 
-        // Cargar conteo de géneros
-        try {
-          const rGeneros = await reportesAPI.conteoGeneros(preferida, 'Genres');
-          console.log('Respuesta géneros:', rGeneros);
-          const generosData = rGeneros.data?.conteos || [];
-          
           // Normalizar a {genero, count}
-          const serieGeneros = generosData.map(g => ({
+          setSeriesGeneros((datos.conteo_generos?.conteos || []).map(g => ({
             genero: g.genero,
             count: g.conteo
-          }));
-          console.log('Serie géneros:', serieGeneros);
-          setSeriesGeneros(serieGeneros);
-        } catch (e) {
-          console.error('Error cargando géneros:', e);
-          setSeriesGeneros([]);
-        }
+          })));
 
-        // Cargar rating promedio
-        try {
-          const rRating = await reportesAPI.ratingPromedio(preferida, 'Rating');
-          console.log('Respuesta rating promedio:', rRating);
-          const promedio = rRating.data?.rating_promedio || 0;
-          console.log('Rating promedio:', promedio);
-          setRatingPromedio(promedio);
-        } catch (e) {
-          console.error('Error cargando rating promedio:', e);
-          setRatingPromedio(0);
-        }
+          setRatingPromedio(datos.rating_promedio?.rating_promedio || 0);
 
-        // Cargar distribución de rating
-        try {
-          const rDistribucion = await reportesAPI.distribucionRating(preferida, 'Rating');
-          console.log('Respuesta distribución rating:', rDistribucion);
-          const distribucion = rDistribucion.data?.distribucion || [];
-          
           // Normalizar a {rango, count, color}
-          const serieDistribucion = distribucion.map(d => ({
+          setDistribucionRating((datos.distribucion_rating?.distribucion || []).map(d => ({
             rango: d.rango,
             count: d.conteo,
             color: d.color
-          }));
-          console.log('Serie distribución:', serieDistribucion);
-          setDistribucionRating(serieDistribucion);
-        } catch (e) {
-          console.error('Error cargando distribución rating:', e);
-          setDistribucionRating([]);
-        }
+          })));
 
-        // Cargar desarrolladores
-        try {
-          const rDesarrolladores = await reportesAPI.conteoDesarrolladores(preferida, 'Developers');
-          console.log('Respuesta desarrolladores:', rDesarrolladores);
-          const desarrolladoresData = rDesarrolladores.data?.conteos || [];
-          
           // Normalizar a {desarrollador, count}
-          const serieDesarrolladores = desarrolladoresData.map(d => ({
+          setSeriesDesarrolladores((datos.conteo_desarrolladores?.conteos || []).map(d => ({
             desarrollador: d.desarrollador,
             count: d.conteo
-          }));
-          console.log('Serie desarrolladores:', serieDesarrolladores);
-          setSeriesDesarrolladores(serieDesarrolladores);
-        } catch (e) {
-          console.error('Error cargando desarrolladores:', e);
-          setSeriesDesarrolladores([]);
-        }
+          })));
 
-        // Cargar top juegos populares
-        try {
-          const rTopJuegos = await reportesAPI.topJuegosPopulares(preferida, 20);
-          console.log('Respuesta top juegos:', rTopJuegos);
-          const juegosData = rTopJuegos.data?.juegos || [];
-          console.log('Top juegos populares:', juegosData);
-          setTopJuegosPopulares(juegosData);
-        } catch (e) {
-          console.error('Error cargando top juegos populares:', e);
-          setTopJuegosPopulares([]);
-        }
+          setTopJuegosPopulares(datos.top_juegos_populares?.juegos || []);
 
-        // Cargar métricas adicionales
-        try {
-          const rMetricas = await reportesAPI.metricasDashboard(preferida);
-          console.log('Respuesta métricas adicionales:', rMetricas);
-          const metricas = rMetricas.data || {};
+          const metricas = datos.metricas_dashboard || {};
           setMetricasAdicionales({
             jugadores_activos: metricas.jugadores_activos || 0,
             reviews_totales: metricas.reviews_totales || 0,
             juegos_2024: metricas.juegos_2024 || 0
           });
+
+          setHiddenGems(datos.hidden_gems?.juegos || []);
+          setTrendingGames(datos.trending_games?.juegos || []);
+          setTopRatedGames(datos.top_rated_games?.juegos || []);
         } catch (e) {
-          console.error('Error cargando métricas adicionales:', e);
+          console.error('Error cargando el dashboard:', e);
+          setSeriesAnio([]);
+          setSeriesGeneros([]);
+          setRatingPromedio(0);
+          setDistribucionRating([]);
+          setSeriesDesarrolladores([]);
+          setTopJuegosPopulares([]);
           setMetricasAdicionales({
             jugadores_activos: 0,
             reviews_totales: 0,
             juegos_2024: 0
           });
-        }
-
-        // Cargar Hidden Gems
-        try {
-          const rHidden = await reportesAPI.hiddenGems(preferida, 5);
-          console.log('Respuesta hidden gems:', rHidden);
-          const hiddenData = rHidden.data?.juegos || [];
-          setHiddenGems(hiddenData);
-        } catch (e) {
-          console.error('Error cargando hidden gems:', e);
           setHiddenGems([]);
-        }
-
-        // Cargar Trending Games
-        try {
-          const rTrending = await reportesAPI.trendingGames(preferida, 5);
-          console.log('Respuesta trending games:', rTrending);
-          const trendingData = rTrending.data?.juegos || [];
-          setTrendingGames(trendingData);
-        } catch (e) {
-          console.error('Error cargando trending games:', e);
           setTrendingGames([]);
-        }
-
-        // Cargar Top Rated Games
-        try {
-          const rTopRated = await reportesAPI.topRatedGames(preferida, 5);
-          console.log('Respuesta top rated games:', rTopRated);
-          const topRatedData = rTopRated.data?.juegos || [];
-          setTopRatedGames(topRatedData);
-        } catch (e) {
-          console.error('Error cargando top rated games:', e);
           setTopRatedGames([]);
         }
       }
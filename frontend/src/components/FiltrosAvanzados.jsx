@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { reportesAPI } from '../services/api';
 import './FiltrosAvanzados.css';
 
@@ -61,32 +61,35 @@ function FiltrosAvanzados({ coleccion, onFiltrosChange, filtrosIniciales = {} })
     }
   };
 
-  const obtenerValoresUnicos = async (campo) => {
+  // Sugerencias por prefijo desde el servidor: no se descargan todos los valores del campo
+  const obtenerSugerencias = async (campo, texto = '') => {
     try {
-      setLoading(true);
-      console.log(`Obteniendo valores únicos para campo: ${campo} en colección: ${coleccion}`);
-      const response = await reportesAPI.obtenerValoresUnicos(coleccion, campo);
-      console.log(`Respuesta valores únicos para ${campo}:`, response.data);
-      
-      if (response.data && response.data.valores) {
-        console.log(`Valores obtenidos para ${campo}:`, response.data.valores);
-        return response.data.valores;
+      const response = await reportesAPI.obtenerSugerencias(coleccion, campo, texto);
+      if (response.data && response.data.sugerencias) {
+        return response.data.sugerencias.map((sugerencia) => sugerencia.valor);
       }
       return [];
     } catch (error) {
-      console.error(`Error al obtener valores únicos para ${campo}:`, error);
+      console.error(`Error al obtener sugerencias para ${campo}:`, error);
       return [];
-    } finally {
-      setLoading(false);
     }
   };
 
+  // Consulta las sugerencias cuando el usuario deja de escribir
+  const temporizadores = useRef({});
+  const pedirSugerencias = (numero, campo, texto, setValores) => {
+    clearTimeout(temporizadores.current[numero]);
+    temporizadores.current[numero] = setTimeout(async () => {
+      setValores(await obtenerSugerencias(campo, texto));
+    }, 150);
+  };
+
   const manejarCambioCampo1 = async (campo) => {
     setCampoSeleccionado1(campo);
     setValorSeleccionado1('');
     
     if (campo) {
-      const valores = await obtenerValoresUnicos(campo);
+      const valores = await obtenerSugerencias(campo);
       setValoresDisponibles1(valores);
     } else {
       setValoresDisponibles1([]);
@@ -100,7 +103,7 @@ function FiltrosAvanzados({ coleccion, onFiltrosChange, filtrosIniciales = {} })
     setValorSeleccionado2('');
     
     if (campo) {
-      const valores = await obtenerValoresUnicos(campo);
+      const valores = await obtenerSugerencias(campo);
       setValoresDisponibles2(valores);
     } else {
       setValoresDisponibles2([]);
@@ -111,11 +114,13 @@ function FiltrosAvanzados({ coleccion, onFiltrosChange, filtrosIniciales = {} })
 
   const manejarCambioValor1 = (valor) => {
     setValorSeleccionado1(valor);
+    pedirSugerencias(1, campoSeleccionado1, valor, setValoresDisponibles1);
     actualizarFiltros(campoSeleccionado1, valor, campoSeleccionado2, valorSeleccionado2);
   };
 
   const manejarCambioValor2 = (valor) => {
     setValorSeleccionado2(valor);
+    pedirSugerencias(2, campoSeleccionado2, valor, setValoresDisponibles2);
     actualizarFiltros(campoSeleccionado1, valorSeleccionado1, campoSeleccionado2, valor);
   };
 
@@ -180,18 +185,19 @@ function FiltrosAvanzados({ coleccion, onFiltrosChange, filtrosIniciales = {} })
 
           <div className="filtro-item">
             <label>Valor 1:</label>
-            <select
+            <input
+              type="text"
+              list="valores-filtro-1"
+              placeholder="Escribe para buscar..."
               value={valorSeleccionado1}
               onChange={(e) => manejarCambioValor1(e.target.value)}
               disabled={!campoSeleccionado1 || loading}
-            >
-              <option value="">Seleccionar valor...</option>
+            />
+            <datalist id="valores-filtro-1">
               {valoresDisponibles1.map((valor, index) => (
-                <option key={index} value={valor}>
-                  {valor !== null && valor !== undefined ? String(valor) : '(vacío)'}
-                </option>
+                <option key={index} value={String(valor)} />
               ))}
-            </select>
+            </datalist>
           </div>
 
           {/* Segundo Filtro */}
@@ -215,18 +221,19 @@ function FiltrosAvanzados({ coleccion, onFiltrosChange, filtrosIniciales = {} })
 
           <div className="filtro-item">
             <label>Valor 2:</label>
-            <select
+            <input
+              type="text"
+              list="valores-filtro-2"
+              placeholder="Escribe para buscar..."
               value={valorSeleccionado2}
               onChange={(e) => manejarCambioValor2(e.target.value)}
               disabled={!campoSeleccionado2 || loading}
-            >
-              <option value="">Seleccionar valor...</option>
+            />
+            <datalist id="valores-filtro-2">
               {valoresDisponibles2.map((valor, index) => (
-                <option key={index} value={valor}>
-                  {valor !== null && valor !== undefined ? String(valor) : '(vacío)'}
-                </option>
+                <option key={index} value={String(valor)} />
               ))}
-            </select>
+            </datalist>
           </div>
         </div>
       )}
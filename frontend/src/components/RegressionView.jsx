@@ -8,9 +8,12 @@ export default function RegressionView({ colecciones = [] }) {
   const [campoX, setCampoX] = useState('');
   const [campoY, setCampoY] = useState('');
   const [limite, setLimite] = useState(1000);
+  const [modo, setModo] = useState('muestra');
   const [loading, setLoading] = useState(false);
   const [resultado, setResultado] = useState(null);
   const [datosPlot, setDatosPlot] = useState([]);
+  const [valoresPrediccion, setValoresPrediccion] = useState('');
+  const [predicciones, setPredicciones] = useState([]);
 
   useEffect(() => {
     if (coleccion) fetchEsquema(coleccion);
@@ -37,8 +40,9 @@ export default function RegressionView({ colecciones = [] }) {
     setLoading(true);
     setResultado(null);
     setDatosPlot([]);
+    setPredicciones([]);
     try {
-      const payload = { coleccion, campo_x: campoX, campo_y: campoY, limite };
+      const payload = { coleccion, campo_x: campoX, campo_y: campoY, limite, modo };
       const res = await reportesAPI.regresionLineal(payload);
       if (res.data && res.data.success) {
         setResultado(res.data);
@@ -61,6 +65,25 @@ export default function RegressionView({ colecciones = [] }) {
     }
   }
 
+  // Predicciones "qué pasaría si" con el modelo ya ajustado (sin volver a consultar la colección)
+  async function predecir(e) {
+    e && e.preventDefault();
+    if (!resultado?.model_id) return;
+    const filas = valoresPrediccion
+      .split(',')
+      .map(v => v.trim())
+      .filter(v => v !== '')
+      .map(v => ({ [campoX]: Number(v) }));
+    if (!filas.length) return;
+    try {
+      const res = await reportesAPI.predecirRegresion(resultado.model_id, filas);
+      setPredicciones(filas.map((fila, i) => ({ x: fila[campoX], pred: res.data.predicciones[i] })));
+    } catch (err) {
+      console.error('Error en predicción:', err);
+      alert('Error al predecir: ' + (err.response?.data?.detail || err.message));
+    }
+  }
+
   // Simple scatter + regression line renderer for single-feature models
   function ScatterPlot({ data = [], coef = [], intercept = 0 }) {
     if (!data.length) return <div className="no-data">No hay datos para graficar</div>;
@@ -131,8 +154,18 @@ export default function RegressionView({ colecciones = [] }) {
             {campos.map(c => <option key={c} value={c}>{c}</option>)}
           </select>
 
-          <label>Máx. registros a usar</label>
-          <input type="number" value={limite} onChange={e => setLimite(Number(e.target.value))} />
+          <label>Datos a usar</label>
+          <select value={modo} onChange={e => setModo(e.target.value)}>
+            <option value="muestra">Primeros registros (muestra)</option>
+            <option value="servidor">Colección completa (cálculo en servidor)</option>
+          </select>
+
+          {modo === 'muestra' && (
+            <>
+              <label>Máx. registros a usar</label>
+              <input type="number" value={limite} onChange={e => setLimite(Number(e.target.value))} />
+            </>
+          )}
 
           <div className="form-actions">
             <button type="submit" className="btn-primary" disabled={loading}>{loading ? 'Ejecutando...' : 'Ajustar regresión'}</button>
@@ -175,6 +208,33 @@ export default function RegressionView({ colecciones = [] }) {
               </div>
             )}
 
+            {/* predicciones con el modelo guardado */}
+            {resultado.model_id && (
+              <div className="ejemplo">
+                <h5>Predecir</h5>
+                <form onSubmit={predecir}>
+                  <label>Valores de {campoX} (separados por coma)</label>
+                  <input type="text" value={valoresPrediccion} onChange={e => setValoresPrediccion(e.target.value)} />
+                  <button type="submit" className="btn-secondary">Predecir</button>
+                </form>
+                {predicciones.length > 0 && (
+                  <table>
+                    <thead>
+                      <tr><th>{campoX}</th><th>Pred</th></tr>
+                    </thead>
+                    <tbody>
+                      {predicciones.map((p, i) => (
+                        <tr key={i}>
+                          <td>{p.x}</td>
+                          <td>{p.pred ?? '—'}</td>
+                        </tr>
+                      ))}
+                    </tbody>
+                  </table>
+                )}
+              </div>
+            )}
+
             {/* scatter plot (si hay datos) */}
             <div className="plot-section">
               <h5>Scatter y línea de regresión</h5>
@@ -38,13 +38,14 @@ function ReporteForm({ onReporteGenerado }) {
     setLoading(true);
 
     try {
-      const response = await reportesAPI.generarReporte({
+      const solicitud = {
         coleccion: coleccionSeleccionada,
         filtros: filtrosAvanzados,
         limite: parseInt(limite),
-      });
+      };
+      const response = await reportesAPI.generarReporte({ ...solicitud, estimar_total: true });
 
-      onReporteGenerado(response.data);
+      onReporteGenerado(response.data, solicitud);
     } catch (error) {
       console.error('Error al generar reporte:', error);
       alert('Error al generar reporte: ' + error.message);
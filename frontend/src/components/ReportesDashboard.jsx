@@ -9,6 +9,8 @@ import './ReportesDashboard.css';
 
 function ReportesDashboard() {
   const [reporteData, setReporteData] = useState(null);
+  const [solicitudReporte, setSolicitudReporte] = useState(null);
+  const [cargandoPagina, setCargandoPagina] = useState(false);
   const [colecciones, setColecciones] = useState([]);
   const [estadisticasGlobales, setEstadisticasGlobales] = useState({});
   const [loading, setLoading] = useState(true);
@@ -50,11 +52,35 @@ function ReportesDashboard() {
     }
   };
 
-  const handleReporteGenerado = (data) => {
+  const handleReporteGenerado = (data, solicitud) => {
     setReporteData(data);
+    setSolicitudReporte(solicitud);
     setVistaActiva('resultados');
   };
 
+  // Pide la página siguiente con el cursor devuelto y la agrega a los resultados
+  const cargarMasResultados = async () => {
+    if (!reporteData?.siguiente_cursor || !solicitudReporte) return;
+    try {
+      setCargandoPagina(true);
+      const response = await reportesAPI.generarReporte({
+        ...solicitudReporte,
+        cursor: reporteData.siguiente_cursor,
+      });
+      const datos = [...reporteData.datos, ...response.data.datos];
+      setReporteData({
+        ...reporteData,
+        datos,
+        total_registros: datos.length,
+        siguiente_cursor: response.data.siguiente_cursor,
+      });
+    } catch (error) {
+      console.error('Error cargando más resultados:', error);
+    } finally {
+      setCargandoPagina(false);
+    }
+  };
+
   const handleVolverGenerador = () => {
     setVistaActiva('generador');
   };
@@ -144,9 +170,19 @@ function ReportesDashboard() {
                   </button>
                   {reporteData && (
                     <span className="resultados-info">
-                      {reporteData.total_registros} registros encontrados
+                      {reporteData.total_registros} registros cargados
+                      {reporteData.total_estimado != null && ` de ~${reporteData.total_estimado.toLocaleString()}`}
                     </span>
                   )}
+                  {reporteData?.siguiente_cursor && (
+                    <button
+                      className="btn-secondary"
+                      onClick={cargarMasResultados}
+                      disabled={cargandoPagina}
+                    >
+                      {cargandoPagina ? 'Cargando...' : 'Cargar más'}
+                    </button>
+                  )}
                 </div>
               </div>
               <div className="panel-body">
@@ -181,9 +217,19 @@ function ReportesDashboard() {
                   </button>
                   {reporteData && (
                     <span className="resultados-info">
-                      {reporteData.total_registros} registros encontrados
+                      {reporteData.total_registros} registros cargados
+                      {reporteData.total_estimado != null && ` de ~${reporteData.total_estimado.toLocaleString()}`}
                     </span>
                   )}
+                  {reporteData?.siguiente_cursor && (
+                    <button
+                      className="btn-secondary"
+                      onClick={cargarMasResultados}
+                      disabled={cargandoPagina}
+                    >
+                      {cargandoPagina ? 'Cargando...' : 'Cargar más'}
+                    </button>
+                  )}
                 </div>
               </div>
               <div className="panel-body">
@@ -24,6 +24,9 @@ export const reportesAPI = {
     api.get(`/reportes/estadisticas/${coleccion}`),
   
   generarReporte: (datos) => api.post('/reportes/generar', datos),
+
+  exportarReporte: (datos, format = 'csv') =>
+    api.post('/reportes/generar/stream', datos, { params: { format }, responseType: 'blob' }),
   
   obtenerEsquemaColeccion: (coleccion) =>
     api.get(`/reportes/esquema/${coleccion}`),
@@ -31,6 +34,9 @@ export const reportesAPI = {
   obtenerValoresUnicos: (coleccion, campo) =>
     api.get(`/reportes/valores-unicos/${coleccion}/${campo}`),
 
+  obtenerSugerencias: (coleccion, campo, q, limite = 20) =>
+    api.get(`/reportes/sugerencias/${coleccion}/${campo}`, { params: { q, limite } }),
+
   conteoPorCampo: (coleccion, campo) =>
     api.get(`/reportes/conteo-por-campo/${coleccion}/${campo}`),
 
@@ -63,9 +69,18 @@ export const reportesAPI = {
 
   topRatedGames: (coleccion, limite = 5) =>
     api.get(`/reportes/top-rated-games/${coleccion}`, { params: { limite } }),
+
+  // Todos los widgets del dashboard en una sola llamada
+  dashboard: (coleccion, limitePopulares = 20, limiteDestacados = 5) =>
+    api.get(`/reportes/dashboard/${coleccion}`, {
+      params: { limite_populares: limitePopulares, limite_destacados: limiteDestacados }
+    }),
   
   // Regresión lineal
   regresionLineal: (payload) => api.post('/reportes/regresion-lineal', payload),
+
+  predecirRegresion: (modelId, filas) =>
+    api.post(`/reportes/regresion-lineal/${modelId}/predecir`, { filas }),
   
   // Matriz de correlación
   matrizCorrelacion: (payload) => api.post('/reportes/correlacion-matriz', payload),